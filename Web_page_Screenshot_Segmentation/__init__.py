@@ -2,7 +2,9 @@ from .blank_spliter import find_height_spliter
 from .color_spliter import color_height_spliter
 from .drawer import draw_line
 from .spliter import split_and_save_image, split_and_save_image_pil
-from .master import split_heights
+from .master import detect_candidates, split_heights
+from .candidates import merge_candidates
+from .manifest import SegmentManifest, SegmentRecord
 
 __all__ = [
     "find_height_spliter",
@@ -11,4 +13,8 @@ __all__ = [
     "split_and_save_image",
     "split_and_save_image_pil",
     "split_heights",
+    "detect_candidates",
+    "merge_candidates",
+    "SegmentManifest",
+    "SegmentRecord",
 ]
@@ -0,0 +1,416 @@
+import asyncio
+import contextlib
+import inspect
+import os
+import time
+from concurrent.futures import Executor
+from functools import partial
+
+from PIL import Image
+
+from .control import RunControl
+from .governor import MemoryGovernor, estimate_decoded_bytes
+from .image_io import ImageTooLargeError, load_image, probe_image_header
+from .manifest import SegmentManifest
+from .master import (
+    _detect_heights,
+    _planned,
+    _save_split_image,
+    _SegmentExporter,
+    split_and_export_segments,
+    split_heights,
+)
+from .spliter import _encode_slice_pil
+
+# Parameters of the sync functions that the async variants do not take: jobs
+# are admitted by a limiter instead of a governor, and inputs are always paths
+_UNSUPPORTED_PARAMS = ("governor", "source_path")
+
+
+def estimate_pixel_memory(img_data: bytes) -> int:
+    """
+    Estimates the peak memory needed to segment an encoded image.
+
+    Only the image header is parsed, so this is cheap compared to decoding.
+
+    :param img_data: The encoded image bytes.
+    :return: The estimated number of bytes, or the encoded size if the header
+             cannot be read.
+    """
+    try:
+        header = probe_image_header(img_data)
+    except IOError:
+        return len(img_data)
+    return estimate_decoded_bytes(header)
+
+
+class PixelMemoryLimiter:
+    """
+    Limits concurrent segmentation jobs by their estimated pixel memory.
+
+    The asyncio counterpart of :class:`governor.MemoryGovernor`: jobs are
+    planned and their memory is reserved by a governor, so estimates and the
+    reduced decode of large images are the same as in the sync API, but jobs
+    wait for the budget without blocking the event loop. Use one limiter per
+    event loop; its governor must not be shared with threads.
+
+    :param budget_bytes: Total bytes that admitted jobs may use at once.
+    :param large_image_bytes: Estimate above which images use a reduced
+                              decode, see :class:`governor.MemoryGovernor`.
+                              None disables the reduced strategy.
+    """
+
+    def __init__(self, budget_bytes: int, large_image_bytes: int | None = None):
+        self.governor = MemoryGovernor(budget_bytes, large_image_bytes)
+        self._condition = asyncio.Condition()
+
+    @property
+    def budget_bytes(self) -> int:
+        return self.governor.budget_bytes
+
+    @property
+    def in_use(self) -> int:
+        return self.governor.in_use
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, nbytes: int):
+        """
+        Waits until ``nbytes`` fit into the budget and holds them until exit.
+
+        A job larger than the whole budget is admitted once nothing else is
+        running.
+
+        :param nbytes: The number of bytes to reserve.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.governor.acquire(nbytes, timeout=0))
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.governor.release(nbytes)
+                self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def admit(self, img_data: bytes, full_image: bool = False):
+        """
+        Plans a job with the governor and holds its memory until exit.
+
+        :param img_data: The encoded image bytes.
+        :param full_image: Whether the job also needs the full-resolution
+                           image afterwards, e.g. to export segments.
+        :return: A context manager yielding the decode reduction factor.
+        :raises ImageTooLargeError: If the header exceeds the image size limits.
+        """
+        try:
+            admission = self.governor.plan(img_data, full_image)
+        except ImageTooLargeError:
+            raise
+        except IOError:
+            # The header cannot be read; decoding reports why
+            yield 1
+            return
+        async with self.reserve(admission.nbytes):
+            yield admission.reduce_factor
+
+
+def _read_bytes(file_path: str) -> bytes:
+    try:
+        with open(file_path, "rb") as f:
+            return f.read()
+    except Exception as e:
+        raise IOError(f"Failed to read image file: {e}")
+
+
+def _check_params(func, params: dict):
+    # Rejects parameters of the sync function that the async variant cannot apply
+    for name in _UNSUPPORTED_PARAMS:
+        if name in params:
+            raise ValueError(f"The async API does not support the {name} parameter")
+    try:
+        inspect.signature(func).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f"Invalid segmentation parameters: {e}")
+
+
+def _decode(
+    img_data: bytes,
+    file_path: str,
+    reduce_factor: int = 1,
+    control: RunControl | None = None,
+    column_stride: int = 1,
+    max_decode_pixels: int | None = None,
+    export: bool = False,
+) -> tuple:
+    reduce_factor, column_stride = _planned(
+        control, img_data, reduce_factor, column_stride, max_decode_pixels, export
+    )
+    img = load_image(img_data, reduce_factor, name=file_path)
+    return img, reduce_factor, column_stride
+
+
+async def _run(executor: Executor | None, func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+@contextlib.asynccontextmanager
+async def _admit(limiter: PixelMemoryLimiter | None, img_data: bytes, full_image: bool):
+    # Yields the decode reduction factor chosen by the limiter
+    if limiter is None:
+        yield 1
+        return
+    async with limiter.admit(img_data, full_image) as reduce_factor:
+        yield reduce_factor
+
+
+async def split_heights_async(
+    file_path: str,
+    split: bool = False,
+    output_dir: str = "result",
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    merge_threshold: int = 350,
+    executor: Executor | None = None,
+    limiter: PixelMemoryLimiter | None = None,
+    full_resolution: bool = False,
+    preview_max_dim: int = 2048,
+    preview_labels: bool = False,
+    contact_sheet: bool = False,
+    **kwargs,
+) -> list[int] | str:
+    """
+    Asynchronous variant of :func:`master.split_heights`.
+
+    The file is read on the event loop's default executor, and decoding,
+    detection and drawing run on ``executor``. Cancelling the task stops the
+    pipeline at the next stage boundary; a stage that already started on the
+    executor runs to completion but its result is discarded.
+
+    :param file_path: Path to the image file.
+    :param split: If True, saves a preview of the image with split lines drawn.
+    :param output_dir: The directory to save the split image.
+    :param executor: Executor for the CPU stages. Defaults to the event loop's
+                     default executor.
+    :param limiter: Optional limiter that admits the job by its estimated
+                    pixel memory before decoding; large images are detected
+                    on a reduced decode, see :class:`PixelMemoryLimiter`.
+    :param kwargs: Further parameters of :func:`master.split_heights`, e.g.
+                   ``columns``, ``detectors`` or ``max_decode_pixels``; not
+                   ``governor``, use ``limiter`` instead.
+    :return: A list of split line heights or the path to the split image.
+    :raises ValueError: If a parameter is unknown or not supported.
+
+    The threshold and preview parameters are the same as in
+    :func:`master.split_heights`.
+    """
+    _check_params(split_heights, kwargs)
+    writer = kwargs.pop("writer", None)
+    max_decode_pixels = kwargs.pop("max_decode_pixels", None)
+    analysis = kwargs.get("analysis")
+    img_data = await _run(None, _read_bytes, file_path)
+    async with _admit(limiter, img_data, full_image=False) as reduce_factor:
+        decoding = time.perf_counter()
+        img, reduce_factor, kwargs["column_stride"] = await _run(
+            executor,
+            _decode,
+            img_data,
+            file_path,
+            reduce_factor,
+            kwargs.get("control"),
+            kwargs.get("column_stride", 1),
+            max_decode_pixels,
+        )
+        if analysis is not None:
+            analysis.setdefault("seconds", {})["decode"] = time.perf_counter() - decoding
+        del img_data
+        heights, _ = await _run(
+            executor,
+            partial(
+                _detect_heights,
+                img,
+                height_threshold,
+                variation_threshold,
+                color_threshold,
+                color_variation_threshold,
+                merge_threshold,
+                scale=reduce_factor,
+                **kwargs,
+            ),
+        )
+        if split:
+            return await _run(
+                executor,
+                _save_split_image,
+                img,
+                [h // reduce_factor for h in heights],
+                file_path,
+                output_dir,
+                full_resolution,
+                preview_max_dim,
+                preview_labels,
+                contact_sheet,
+                writer,
+            )
+        return heights
+
+
+async def split_and_export_segments_async(
+    file_path: str,
+    output_dir: str = "segments",
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    merge_threshold: int = 350,
+    auto_crop: bool = False,
+    crop_threshold: int = 240,
+    crop_min_width: int = 50,
+    write_manifest: bool = True,
+    return_manifest: bool = False,
+    dedup: bool = False,
+    dedup_threshold: int = 10,
+    executor: Executor | None = None,
+    limiter: PixelMemoryLimiter | None = None,
+    target_width: int | None = None,
+    max_pixels: int | None = None,
+    **kwargs,
+) -> str | SegmentManifest:
+    """
+    Asynchronous variant of :func:`master.split_and_export_segments`.
+
+    Each segment is cropped, encoded and written as its own executor job, so
+    a cancelled export stops between segments. Segments already written stay
+    on disk and no manifest is written for a cancelled export.
+
+    :param executor: Executor for the CPU stages and segment writes. Defaults
+                     to the event loop's default executor. Segment jobs share
+                     state, so this should be a thread pool.
+    :param limiter: Optional limiter that admits the job by its estimated
+                    pixel memory before decoding; large images are detected
+                    on a reduced decode and exported at full resolution.
+    :param kwargs: Further parameters of
+                   :func:`master.split_and_export_segments`, e.g. ``columns``,
+                   ``detectors``, ``writer`` or ``control``; not ``governor``,
+                   use ``limiter`` instead.
+    :return: The absolute path to the output directory containing all segments,
+             or the segment manifest if ``return_manifest`` is True.
+    :raises ValueError: If a parameter is unknown or not supported.
+
+    The other parameters are the same as in
+    :func:`master.split_and_export_segments`.
+    """
+    _check_params(split_and_export_segments, kwargs)
+    writer = kwargs.pop("writer", None)
+    max_decode_pixels = kwargs.pop("max_decode_pixels", None)
+    control = kwargs.get("control")
+    analysis = kwargs.get("analysis")
+    if kwargs.get("thresholds") is None:
+        kwargs["thresholds"] = {}
+    used = kwargs["thresholds"]
+    seconds = {} if analysis is None else analysis.setdefault("seconds", {})
+    img_data = await _run(None, _read_bytes, file_path)
+    async with _admit(limiter, img_data, full_image=True) as reduce_factor:
+        decoding = time.perf_counter()
+        img, reduce_factor, kwargs["column_stride"] = await _run(
+            executor,
+            _decode,
+            img_data,
+            file_path,
+            reduce_factor,
+            control,
+            kwargs.get("column_stride", 1),
+            max_decode_pixels,
+            True,
+        )
+        seconds["decode"] = time.perf_counter() - decoding
+        heights, labels = await _run(
+            executor,
+            partial(
+                _detect_heights,
+                img,
+                height_threshold,
+                variation_threshold,
+                color_threshold,
+                color_variation_threshold,
+                merge_threshold,
+                scale=reduce_factor,
+                **kwargs,
+            ),
+        )
+        if reduce_factor != 1:
+            # Detected on a reduced decode; the segments are cut at full resolution
+            del img
+            decoding = time.perf_counter()
+            img, _, _ = await _run(executor, _decode, img_data, file_path)
+            seconds["decode"] += time.perf_counter() - decoding
+            if analysis is not None:
+                analysis.update(width=img.shape[1], height=img.shape[0])
+        del img_data
+        exporter = await _run(
+            executor,
+            _SegmentExporter,
+            img,
+            heights,
+            labels,
+            file_path,
+            output_dir,
+            auto_crop,
+            crop_threshold,
+            crop_min_width,
+            dedup,
+            dedup_threshold,
+            target_width,
+            max_pixels,
+            writer,
+            kwargs.get("workspace"),
+        )
+        if kwargs.get("auto_thresholds"):
+            exporter.manifest.thresholds = dict(used)
+        if control is not None:
+            exporter.manifest.degraded = control.degraded
+        exporting = time.perf_counter()
+        for i in range(exporter.count):
+            await _run(executor, exporter.export, i)
+            if control is not None:
+                control.report("export", i + 1, exporter.count)
+        manifest = await _run(executor, exporter.finish, write_manifest)
+        seconds["export"] = time.perf_counter() - exporting
+
+    if return_manifest:
+        return manifest
+    return os.path.abspath(output_dir)
+
+
+async def split_and_save_image_pil_async(
+    img: Image.Image,
+    heights: list[int],
+    executor: Executor | None = None,
+    target_width: int | None = None,
+    max_pixels: int | None = None,
+) -> list[bytes]:
+    """
+    Asynchronous variant of :func:`spliter.split_and_save_image_pil`.
+
+    Each slice is cropped and PNG-encoded as its own executor job, so the
+    task can be cancelled between slices.
+
+    :param img: The input PIL image.
+    :param heights: A list of integer heights to split the image at.
+    :param executor: Executor for the encode jobs. Defaults to the event
+                     loop's default executor.
+    :param target_width: Width to downscale wider slices to, see
+                         :func:`spliter.split_and_save_image_pil`.
+    :param max_pixels: Largest number of pixels of a slice.
+    :return: A list of bytes, where each element is a split image in PNG format.
+    """
+    split_heights = sorted(list(set([0] + heights + [img.height])))
+    images = []
+    for start_y, end_y in zip(split_heights, split_heights[1:]):
+        images.append(
+            await _run(
+                executor, _encode_slice_pil, img, start_y, end_y, target_width, max_pixels
+            )
+        )
+    return images
@@ -0,0 +1,180 @@
+import importlib
+import importlib.util
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Backends for decoding and detection
+BACKENDS = ("opencv", "numpy")
+# Environment variable that selects the backend at import time
+BACKEND_ENV = "SCREENSHOT_SEGMENTATION_BACKEND"
+# Fixed-point BGR -> gray weights of cv2.COLOR_BGR2GRAY (0.114, 0.587, 0.299)
+GRAY_WEIGHTS = (3735, 19235, 9798)
+GRAY_SHIFT = 15
+
+
+class _LazyModule:
+    """
+    Imports a module on first attribute access.
+
+    Modules import OpenCV through this proxy, so importing the package does
+    not load OpenCV and the numpy backend works without it installed.
+    """
+
+    def __init__(self, name: str, hint: str):
+        self._name = name
+        self._hint = hint
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(f"{self._name} is not installed; {self._hint}") from e
+        return getattr(self._module, attr)
+
+
+cv2 = _LazyModule(
+    "cv2", f"install opencv-python, or set {BACKEND_ENV}=numpy for detection only"
+)
+
+
+def opencv_available() -> bool:
+    """
+    Checks whether OpenCV can be imported.
+
+    :return: True if ``cv2`` is installed.
+    """
+    return importlib.util.find_spec("cv2") is not None
+
+
+def _default_backend() -> str:
+    backend = os.environ.get(BACKEND_ENV)
+    if backend in BACKENDS:
+        return backend
+    return "opencv" if opencv_available() else "numpy"
+
+
+_backend = _default_backend()
+
+
+def get_backend() -> str:
+    """
+    Returns the backend used for decoding and detection.
+
+    :return: ``"opencv"`` or ``"numpy"``.
+    """
+    return _backend
+
+
+def set_backend(name: str):
+    """
+    Selects the backend used for decoding and detection in this process.
+
+    The ``"numpy"`` backend decodes with Pillow and computes everything the
+    detectors need with NumPy, so OpenCV is never imported. Drawing, previews
+    and segment export still use OpenCV.
+
+    :param name: ``"opencv"`` or ``"numpy"``.
+    :raises ValueError: If the backend is unknown.
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (available: {', '.join(BACKENDS)})")
+    _backend = name
+
+
+def to_gray(
+    image: np.ndarray, band_rows: int = 1024, dst: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Converts a BGR image to grayscale with the selected backend.
+
+    The numpy backend uses the same fixed-point weights as OpenCV, so both
+    give identical results for 8-bit images.
+
+    :param image: The image as a NumPy array (BGR or already grayscale).
+    :param band_rows: Rows converted at a time by the numpy backend.
+    :param dst: If given, a uint8 array of the image's height and width that
+                receives the result, e.g. a reused buffer.
+    :return: The grayscale image; the image itself if it is already grayscale.
+    """
+    if image.ndim == 2:
+        return image
+    if _backend == "opencv":
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst)
+    gray = np.empty(image.shape[:2], dtype=np.uint8) if dst is None else dst
+    for start in range(0, image.shape[0], band_rows):
+        band = image[start : start + band_rows]
+        # Widen before weighting: NumPy 1.x would multiply uint8 by a scalar in uint16
+        weighted = band[..., 0].astype(np.uint32)
+        weighted *= np.uint32(GRAY_WEIGHTS[0])
+        channel = np.empty_like(weighted)
+        for c in (1, 2):
+            np.copyto(channel, band[..., c])
+            channel *= np.uint32(GRAY_WEIGHTS[c])
+            weighted += channel
+        weighted += np.uint32(1 << (GRAY_SHIFT - 1))
+        weighted >>= GRAY_SHIFT
+        gray[start : start + len(band)] = weighted
+    return gray
+
+
+def sliding_max(values: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Returns the maximum of each value and its ``radius`` neighbors on each side.
+
+    :param values: A 1-D float array.
+    :param radius: The number of neighbors on each side.
+    :return: The windowed maxima, same length as ``values``.
+    """
+    values = values.astype(np.float32)
+    if len(values) == 0:
+        return values
+    if _backend == "opencv":
+        kernel = np.ones((2 * radius + 1, 1), np.uint8)
+        return cv2.dilate(values.reshape(-1, 1), kernel).ravel()
+    padded = np.pad(values, radius, constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1)
+    return windows.max(axis=1)
+
+
+def decode_pil(img_data: np.ndarray, reduce_factor: int = 1, grayscale: bool = False):
+    """
+    Decodes an image with Pillow into the layout OpenCV would return.
+
+    JPEGs are decoded at the reduced size directly (DCT scaling); other formats
+    are decoded and then box-reduced. EXIF orientation is applied as OpenCV
+    does.
+
+    :param img_data: The encoded image bytes as a uint8 array.
+    :param reduce_factor: Decode at 1/2, 1/4 or 1/8 of the size if 2, 4 or 8.
+    :param grayscale: Decode a single grayscale channel instead of BGR.
+    :return: The decoded image (BGR or grayscale).
+    """
+    with Image.open(BytesIO(img_data.tobytes())) as img:
+        width = img.width
+        if reduce_factor > 1 and img.format == "JPEG":
+            img.draft("RGB", (width // reduce_factor, img.height // reduce_factor))
+        # Whatever the JPEG draft did not reduce is reduced after decoding
+        remaining = reduce_factor // round(width / img.width)
+        img = ImageOps.exif_transpose(img)
+        if img.mode.startswith("I;16"):
+            # 16-bit grayscale: keep the high byte like OpenCV
+            img = Image.fromarray((np.asarray(img, dtype=np.uint16) >> 8).astype(np.uint8))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        if remaining > 1:
+            img = img.reduce(remaining)
+        rgb = np.asarray(img)
+    # Copying channel by channel is faster than a reversed-stride copy
+    bgr = np.empty(rgb.shape[:2] + (3,), dtype=np.uint8)
+    for channel in range(3):
+        bgr[..., channel] = rgb[..., 2 - channel]
+    del rgb
+    if grayscale:
+        return to_gray(bgr)
+    return bgr
@@ -0,0 +1,1154 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import queue
+import re
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from functools import partial
+
+from .candidates import MERGE_POLICIES
+from .governor import MemoryGovernor
+from .image_io import choose_reduce_factor, load_image, probe_image_header
+from .manifest import content_hash
+from .master import _detect_heights, _SegmentExporter, split_and_export_segments
+from .metrics import REGISTRY
+from .pipeline import Stage, StagedPipeline
+from .results import RESULT_FORMATS, ResultsWriter, image_record
+from .templates import TemplateCache
+from .workspace import Workspace, thread_workspace
+
+# File extensions picked up when a directory is given as input
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+STATUSES = ("pending", "running", "done", "failed")
+# Parameters of split_and_export_segments that the pipelined batch cannot
+# apply, as they hold objects that do not fit a staged run; each stage thread
+# uses its own workspace
+_UNPIPELINED_PARAMS = (
+    "governor",
+    "control",
+    "writer",
+    "return_manifest",
+    "workspace",
+    "analysis",
+)
+
+# Export parameters added after the first ledgers were written. They are left
+# out of a job's parameters while at their defaults, so that jobs added before
+# keep their params keys and are not run again
+_OPTIONAL_PARAMS = ("auto_thresholds", "target_width", "max_pixels", "max_decode_pixels")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    input_path TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    content_hash TEXT,
+    output_dir TEXT,
+    segments INTEGER,
+    started_at REAL,
+    finished_at REAL,
+    elapsed REAL,
+    timings TEXT,
+    error TEXT,
+    UNIQUE (input_path, params_hash)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+@dataclass
+class Job:
+    """
+    One claimed entry of a :class:`JobLedger`.
+
+    :param id: Row id of the job in the ledger.
+    :param input_path: Path of the image to segment.
+    :param params: Keyword arguments for
+                   :func:`master.split_and_export_segments`.
+    :param attempts: Number of times the job has been claimed, including
+                     this one.
+    """
+
+    id: int
+    input_path: str
+    params: dict
+    attempts: int
+
+
+def params_key(params: dict) -> str:
+    """
+    Returns a short stable hash of segmentation parameters.
+
+    :param params: JSON-serializable keyword arguments.
+    :return: The first 16 hex digits of the SHA-256 of the sorted JSON.
+    """
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def default_worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLedger:
+    """
+    Persistent record of a batch of segmentation jobs in a SQLite file.
+
+    Each job is one input path with one set of parameters. The ledger stores
+    its status, number of attempts, the content hash of the input, timings
+    and the output location, so an interrupted batch can be resumed: jobs
+    that are done are never claimed again.
+
+    Several processes, also on several nodes, may share one ledger file.
+    Jobs are claimed inside an exclusive write transaction, so each job is
+    handed to one worker at a time. A claim is a lease: if a worker dies, its
+    jobs become claimable again once ``lease_seconds`` have passed, until
+    they have used up ``max_attempts``; a job that keeps killing its worker
+    then ends up failed. Workers renew the lease when they start a job
+    (:meth:`start`) and while it runs (:meth:`renew`), so jobs waiting in a
+    slow worker are not handed out twice. The file
+    must live on a filesystem with working POSIX locks (local disks, NFSv4);
+    the rollback journal is used because WAL mode needs shared memory on one
+    host.
+
+    :param path: Path of the ledger file; created if missing.
+    :param max_attempts: Claims after which a failing job stays failed.
+    :param lease_seconds: Seconds a worker may hold a job before it is
+                          considered lost and handed out again.
+    :param worker: Name recorded for jobs claimed by this instance
+                   (default: ``host:pid``).
+    :param timeout: Seconds to wait for another process's lock on the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = 3,
+        lease_seconds: float = 600,
+        worker: str | None = None,
+        timeout: float = 60,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker = worker or default_worker_name()
+        # Autocommit mode; transactions are opened explicitly
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def add(self, paths, params: dict | None = None) -> int:
+        """
+        Adds jobs for paths not yet in the ledger with these parameters.
+
+        Adding the same paths again, e.g. after a restart, does nothing.
+
+        :param paths: Input image paths.
+        :param params: Keyword arguments for
+                       :func:`master.split_and_export_segments`; must be
+                       JSON-serializable.
+        :return: The number of jobs added.
+        """
+        params = params or {}
+        encoded = json.dumps(params, sort_keys=True)
+        key = params_key(params)
+        conn = self._transaction()
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (input_path, params_hash, params) VALUES (?, ?, ?)",
+                ((os.path.abspath(p), key, encoded) for p in paths),
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, limit: int = 1) -> list[Job]:
+        """
+        Claims up to ``limit`` jobs for this worker.
+
+        Pending jobs are handed out first, then jobs whose lease expired and
+        failed jobs with attempts left. Jobs whose lease expired on their
+        last attempt are marked failed instead.
+
+        :param limit: Maximum number of jobs to claim.
+        :return: The claimed jobs; empty when no work is left.
+        """
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', finished_at = ?,
+                    error = 'Lease expired after ' || attempts || ' attempts'
+                WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+                """,
+                (now, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                """
+                SELECT id, input_path, params, attempts FROM jobs
+                WHERE status = 'pending'
+                   OR (status = 'running' AND lease_until < ? AND attempts < ?)
+                   OR (status = 'failed' AND attempts < ?)
+                ORDER BY status != 'pending', id
+                LIMIT ?
+                """,
+                (now, self.max_attempts, self.max_attempts, limit),
+            ).fetchall()
+            conn.executemany(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                    worker = ?, lease_until = ?, started_at = NULL
+                WHERE id = ?
+                """,
+                ((self.worker, now + self.lease_seconds, row[0]) for row in rows),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [Job(row[0], row[1], json.loads(row[2]), row[3] + 1) for row in rows]
+
+    def _finish(self, job: Job, **fields) -> bool:
+        names = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._transaction()
+        try:
+            # Only the current lease holder may record the outcome
+            cursor = conn.execute(
+                f"UPDATE jobs SET {names} WHERE id = ? AND worker = ? AND status = 'running'",
+                (*fields.values(), job.id, self.worker),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def start(self, job: Job) -> bool:
+        """
+        Records that work on a claimed job begins, and renews its lease.
+
+        :param job: The claimed job.
+        :return: False if this worker no longer holds the job, e.g. because
+                 its lease expired and another worker claimed it; the job
+                 must then be skipped.
+        """
+        now = time.time()
+        return self._finish(job, lease_until=now + self.lease_seconds, started_at=now)
+
+    def renew(self, jobs: list[Job]):
+        """
+        Extends the leases of jobs this worker is still working on.
+
+        :param jobs: The claimed jobs.
+        """
+        conn = self._transaction()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                ((time.time() + self.lease_seconds, job.id, self.worker) for job in jobs),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def complete(
+        self,
+        job: Job,
+        input_hash: str,
+        output_dir: str,
+        segments: int,
+        elapsed: float,
+        timings: dict | None = None,
+    ) -> bool:
+        """
+        Marks a claimed job as done.
+
+        :param job: The claimed job.
+        :param input_hash: Hex SHA-256 of the input file.
+        :param output_dir: Directory the segments were written to.
+        :param segments: Number of segments exported.
+        :param elapsed: Wall time of the job in seconds.
+        :param timings: Per-detector wall times in seconds.
+        :return: False if this worker no longer holds the job, e.g. because
+                 its lease expired and another worker claimed it; the job is
+                 then not recorded as done and runs again.
+        """
+        return self._finish(
+            job,
+            status="done",
+            content_hash=input_hash,
+            output_dir=output_dir,
+            segments=segments,
+            finished_at=time.time(),
+            elapsed=elapsed,
+            timings=json.dumps(timings or {}),
+            error=None,
+        )
+
+    def fail(self, job: Job, error: str, elapsed: float):
+        """
+        Marks a claimed job as failed. It is retried while attempts are left.
+
+        :param job: The claimed job.
+        :param error: Description of the failure.
+        :param elapsed: Wall time of the attempt in seconds.
+        """
+        self._finish(
+            job, status="failed", finished_at=time.time(), elapsed=elapsed, error=error
+        )
+
+    def counts(self) -> dict[str, int]:
+        """
+        Counts the jobs by status.
+
+        Failed jobs with attempts left are counted as ``"failed"`` too.
+
+        :return: The number of jobs per status, for every status.
+        """
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self._conn.execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ):
+            counts[status] = count
+        return counts
+
+
+def output_location(output_root: str, input_path: str, input_hash: str) -> str:
+    """
+    Returns the directory for the segments of one input.
+
+    The content hash keeps inputs with the same file name apart.
+
+    :param output_root: Directory holding all outputs of the batch.
+    :param input_path: Path of the input image.
+    :param input_hash: Hex SHA-256 of the input file.
+    :return: ``<output_root>/<name>-<first 12 digits of the hash>``.
+    """
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_root, f"{name}-{input_hash[:12]}")
+
+
+def segment_input(
+    input_path: str,
+    output_root: str,
+    params: dict,
+    template_cache: TemplateCache | None = None,
+    workspace: Workspace | None = None,
+    analysis: dict | None = None,
+    governor: MemoryGovernor | None = None,
+) -> tuple[str, str, int, dict]:
+    """
+    Segments one input image and exports its segments.
+
+    :param input_path: Path of the image to segment.
+    :param output_root: Directory holding all outputs of the batch.
+    :param params: Keyword arguments for
+                   :func:`master.split_and_export_segments`.
+    :param template_cache: Page templates to reuse split heights from, see
+                           :class:`templates.TemplateCache`.
+    :param workspace: Reused scratch buffers, see :class:`workspace.Workspace`.
+    :param analysis: If given, receives the detection summary, see
+                     :func:`master.split_and_export_segments`.
+    :param governor: Memory governor shared by the threads segmenting images,
+                     see :class:`governor.MemoryGovernor`.
+    :return: The content hash, the output directory, the number of segments
+             and the per-detector timings.
+    :raises IOError: If the input cannot be read.
+    """
+    try:
+        with open(input_path, "rb") as f:
+            data = f.read()
+    except Exception as e:
+        raise IOError(f"Failed to read image file: {e}")
+    input_hash = content_hash(data)
+    output_dir = output_location(output_root, input_path, input_hash)
+    timings = {}
+    # The bytes read for the hash are decoded, so the input is read only once
+    manifest = split_and_export_segments(
+        data,
+        output_dir,
+        source_path=input_path,
+        return_manifest=True,
+        timings=timings,
+        template_cache=template_cache,
+        workspace=workspace,
+        analysis=analysis,
+        governor=governor,
+        **params,
+    )
+    return input_hash, os.path.abspath(output_dir), len(manifest.segments), timings
+
+
+def run_job(
+    job: Job,
+    output_root: str,
+    template_cache: TemplateCache | None = None,
+    analysis: dict | None = None,
+    governor: MemoryGovernor | None = None,
+) -> tuple[str, str, int, dict]:
+    """
+    Segments one job's input and exports its segments.
+
+    :param job: The claimed job.
+    :param output_root: Directory holding all outputs of the batch.
+    :param template_cache: Page templates to reuse split heights from.
+    :param analysis: If given, receives the detection summary.
+    :param governor: Memory governor that admits the job.
+    :return: The result of :func:`segment_input`.
+    :raises IOError: If the input cannot be read.
+    """
+    return segment_input(
+        job.input_path,
+        output_root,
+        job.params,
+        template_cache,
+        thread_workspace(),
+        analysis,
+        governor,
+    )
+
+
+def run_batch(
+    ledger: JobLedger,
+    output_root: str,
+    claim_size: int = 8,
+    max_jobs: int | None = None,
+    metrics_file: str | None = None,
+    template_cache: TemplateCache | None = None,
+    results: ResultsWriter | None = None,
+    profile_bins: int = 0,
+    governor: MemoryGovernor | None = None,
+) -> dict[str, int]:
+    """
+    Works through the jobs of a ledger until none are left.
+
+    Jobs are claimed ``claim_size`` at a time; each finished job is recorded
+    immediately, so an interrupted run loses at most the jobs it was working
+    on, and those are handed out again after their lease expires. Start this
+    in as many processes as needed, all on the same ledger.
+
+    :param ledger: The job ledger.
+    :param output_root: Directory holding all outputs of the batch.
+    :param claim_size: Number of jobs claimed per ledger transaction.
+    :param max_jobs: Stop after this many jobs (default: no limit).
+    :param metrics_file: If given, the metrics of :data:`metrics.REGISTRY`
+                         are written to this file after every claimed batch.
+    :param template_cache: If given, images that share a page template with
+                           an earlier one reuse its split heights, see
+                           :class:`templates.TemplateCache`.
+    :param results: If given, a record of each completed job is appended to
+                    it, see :class:`results.ResultsWriter`.
+    :param profile_bins: If positive, the records hold the row statistics
+                         downsampled to this many bins.
+    :param governor: If given, each job is admitted against its memory
+                     budget, see :class:`governor.MemoryGovernor`. Share one
+                     governor between all runners of a process.
+    :return: The number of jobs this call completed (``"done"``), failed
+             (``"failed"``) and finished after another worker had taken over
+             their lease (``"lost"``); lost jobs are not recorded.
+    """
+    result = {"done": 0, "failed": 0, "lost": 0}
+    while max_jobs is None or sum(result.values()) < max_jobs:
+        limit = claim_size
+        if max_jobs is not None:
+            limit = min(limit, max_jobs - sum(result.values()))
+        jobs = ledger.claim(limit)
+        if not jobs:
+            break
+        for job in jobs:
+            # Jobs claimed together are leased again as each one starts
+            if not ledger.start(job):
+                print(f"Skipping {job.input_path}: its lease was taken over")
+                continue
+            start = time.perf_counter()
+            analysis = None if results is None else {}
+            try:
+                input_hash, output_dir, segments, timings = run_job(
+                    job, output_root, template_cache, analysis, governor
+                )
+            except Exception as e:
+                ledger.fail(job, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+                print(f"✗ {job.input_path} (attempt {job.attempts}): {e}")
+                result["failed"] += 1
+                continue
+            if not ledger.complete(
+                job, input_hash, output_dir, segments, time.perf_counter() - start, timings
+            ):
+                print(f"Lost {job.input_path}: its lease was taken over while it ran")
+                result["lost"] += 1
+                continue
+            if results is not None:
+                results.append(
+                    image_record(job.input_path, analysis, timings, profile_bins, input_hash)
+                )
+            result["done"] += 1
+        if metrics_file is not None:
+            REGISTRY.write(metrics_file)
+    return result
+
+
+def _export_arguments(params: dict) -> dict:
+    """
+    Completes job parameters with the defaults of split_and_export_segments.
+
+    :raises ValueError: If a parameter is unknown or cannot be pipelined.
+    """
+    try:
+        bound = inspect.signature(split_and_export_segments).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f"Invalid segmentation parameters: {e}")
+    bound.apply_defaults()
+    arguments = bound.arguments
+    for name in _UNPIPELINED_PARAMS:
+        if name in params:
+            raise ValueError(f"The pipelined batch does not support the {name} parameter")
+    return arguments
+
+
+def _read_job(job: Job) -> tuple[Job, bytes]:
+    # Prefetch stage: only file I/O, so the next inputs are read during compute
+    try:
+        with open(job.input_path, "rb") as f:
+            return job, f.read()
+    except Exception as e:
+        raise IOError(f"Failed to read image file: {e}")
+
+
+def _analyze_job(
+    read: tuple[Job, bytes],
+    output_root: str,
+    template_cache: TemplateCache | None,
+    record: bool = False,
+    governor: MemoryGovernor | None = None,
+) -> tuple:
+    # Decode and detect stage; returns an exporter holding the decoded image.
+    # Memory admitted by the governor stays reserved until the export stage
+    # has written the segments and dropped the image
+    job, data = read
+    a = _export_arguments(job.params)
+    input_hash = content_hash(data)
+    reduce_factor = choose_reduce_factor(probe_image_header(data), a["max_decode_pixels"])
+    reserved = 0
+    if governor is not None:
+        admission = governor.plan(data, full_image=True)
+        reduce_factor = max(reduce_factor, admission.reduce_factor)
+        governor.acquire(admission.nbytes)
+        reserved = admission.nbytes
+    try:
+        return _analyze(
+            job, data, a, input_hash, reduce_factor, output_root, template_cache, record
+        ) + (reserved,)
+    except BaseException:
+        if governor is not None:
+            governor.release(reserved)
+        raise
+
+
+def _analyze(
+    job: Job,
+    data: bytes,
+    a: dict,
+    input_hash: str,
+    reduce_factor: int,
+    output_root: str,
+    template_cache: TemplateCache | None,
+    record: bool,
+) -> tuple:
+    # Decodes, detects and builds the exporter of an admitted job
+    decoding = time.perf_counter()
+    img = load_image(data, reduce_factor)
+    seconds = {"decode": time.perf_counter() - decoding}
+    analysis = {"seconds": seconds} if record else None
+    timings = {} if a["timings"] is None else a["timings"]
+    used = {} if a["thresholds"] is None else a["thresholds"]
+    heights, labels = _detect_heights(
+        img,
+        a["height_threshold"],
+        a["variation_threshold"],
+        a["color_threshold"],
+        a["color_variation_threshold"],
+        a["merge_threshold"],
+        columns=a["columns"],
+        column_stride=a["column_stride"],
+        row_stride=a["row_stride"],
+        detectors=a["detectors"],
+        timings=timings,
+        merge_policy=a["merge_policy"],
+        auto_thresholds=a["auto_thresholds"],
+        thresholds=used,
+        template_cache=template_cache,
+        workspace=thread_workspace(),
+        analysis=analysis,
+        scale=reduce_factor,
+    )
+    if reduce_factor != 1:
+        # Detected on a reduced decode; the segments are cut at full resolution
+        del img
+        decoding = time.perf_counter()
+        img = load_image(data)
+        seconds["decode"] += time.perf_counter() - decoding
+        if analysis is not None:
+            analysis.update(width=img.shape[1], height=img.shape[0])
+    del data
+    exporter = _SegmentExporter(
+        img,
+        heights,
+        labels,
+        job.input_path,
+        output_location(output_root, job.input_path, input_hash),
+        a["auto_crop"],
+        a["crop_threshold"],
+        a["crop_min_width"],
+        a["dedup"],
+        a["dedup_threshold"],
+        a["target_width"],
+        a["max_pixels"],
+    )
+    if a["auto_thresholds"]:
+        exporter.manifest.thresholds = dict(used)
+    return exporter, a["write_manifest"], input_hash, timings, analysis
+
+
+def _export_job(
+    analyzed: tuple, governor: MemoryGovernor | None = None
+) -> tuple[str, str, int, dict, dict | None]:
+    # Encode and write stage; the result matches segment_input plus the analysis
+    exporter, write_manifest, input_hash, timings, analysis, reserved = analyzed
+    exporter.workspace = thread_workspace()
+    exporting = time.perf_counter()
+    try:
+        for i in range(exporter.count):
+            exporter.export(i)
+        manifest = exporter.finish(write_manifest)
+    finally:
+        if governor is not None:
+            governor.release(reserved)
+    if analysis is not None:
+        analysis["seconds"]["export"] = time.perf_counter() - exporting
+    return input_hash, manifest.output_dir, len(manifest.segments), timings, analysis
+
+
+def run_batch_pipelined(
+    ledger: JobLedger,
+    output_root: str,
+    claim_size: int = 8,
+    max_jobs: int | None = None,
+    metrics_file: str | None = None,
+    prefetch: int = 4,
+    read_workers: int = 2,
+    analyze_workers: int | None = None,
+    export_workers: int | None = None,
+    stats: list | None = None,
+    template_cache: TemplateCache | None = None,
+    results: ResultsWriter | None = None,
+    profile_bins: int = 0,
+    governor: MemoryGovernor | None = None,
+) -> dict[str, int]:
+    """
+    Works through the jobs of a ledger with overlapping read, compute and write.
+
+    Like :func:`run_batch`, but each job goes through three
+    :class:`pipeline.Stage` s connected by bounded queues: reading the input
+    bytes, decoding and detecting, and encoding and writing the segments.
+    While one image is analyzed the next ``prefetch`` inputs are already
+    being read and the previous ones encoded, so slow (e.g. network) storage
+    and the CPU stay busy at the same time. At most ``export_workers``
+    decoded images wait for the export stage, which bounds memory use. Jobs
+    are claimed only as the pipeline has room, so leases do not run out in a
+    queue.
+
+    The output is the same as with :func:`run_batch`. Jobs with a memory
+    governor, run control or writer in their parameters are failed with a
+    ValueError, as those hold state that a staged run cannot share; pass the
+    governor as ``governor`` instead.
+
+    :param prefetch: Number of inputs read ahead of the analysis.
+    :param read_workers: Threads reading inputs.
+    :param analyze_workers: Threads decoding and detecting (default: half the
+                            CPU count).
+    :param export_workers: Threads encoding and writing segments (default:
+                           half the CPU count).
+    :param stats: If given, receives one :class:`pipeline.StageStats` per
+                  stage with its utilization once the run has finished.
+    :param template_cache: Page templates to reuse split heights from, shared
+                           by the analysis threads.
+    :param results: If given, a record of each completed job is appended to
+                    it from the calling thread, see :func:`run_batch`.
+    :param profile_bins: Bins of the row profiles in the records.
+    :param governor: If given, the analysis threads admit each job against
+                     its memory budget before decoding, and the memory stays
+                     reserved until its segments are written.
+    :return: The number of jobs this call completed (``"done"``), failed
+             (``"failed"``) and finished after another worker had taken over
+             their lease (``"lost"``); lost jobs are not recorded.
+
+    The other parameters are the same as in :func:`run_batch`.
+    """
+    half = max(1, (os.cpu_count() or 2) // 2)
+    analyze_workers = analyze_workers or half
+    export_workers = export_workers or half
+    stages = [
+        Stage("read", _read_job, read_workers, prefetch),
+        Stage(
+            "analyze",
+            partial(
+                _analyze_job,
+                output_root=output_root,
+                template_cache=template_cache,
+                record=results is not None,
+                governor=governor,
+            ),
+            analyze_workers,
+            export_workers,
+        ),
+        Stage("export", partial(_export_job, governor=governor), export_workers),
+    ]
+    # Enough jobs in flight to fill every stage and queue
+    window = read_workers + prefetch + analyze_workers + 2 * export_workers
+    result = {"done": 0, "failed": 0, "lost": 0}
+    started = {}
+    in_flight = {}
+    claimed = 0
+    exhausted = False
+    # The leases of queued and running jobs are renewed while waiting
+    renew_seconds = max(1.0, ledger.lease_seconds / 3)
+    renewed = time.monotonic()
+    with StagedPipeline(stages, buffer=window) as pipe:
+        while True:
+            while not exhausted and len(started) < window:
+                limit = min(claim_size, window - len(started))
+                if max_jobs is not None:
+                    limit = min(limit, max_jobs - claimed)
+                jobs = ledger.claim(limit) if limit > 0 else []
+                if not jobs:
+                    exhausted = True
+                    break
+                for job in jobs:
+                    if not ledger.start(job):
+                        continue
+                    started[job.id] = time.perf_counter()
+                    in_flight[job.id] = job
+                    pipe.put(job)
+                claimed += len(jobs)
+            if not started:
+                break
+            try:
+                finished = pipe.get(timeout=max(0.0, renewed + renew_seconds - time.monotonic()))
+            except queue.Empty:
+                finished = None
+            if time.monotonic() - renewed >= renew_seconds:
+                ledger.renew(list(in_flight.values()))
+                renewed = time.monotonic()
+            if finished is None:
+                continue
+            job, outcome, error = finished
+            del in_flight[job.id]
+            elapsed = time.perf_counter() - started.pop(job.id)
+            if error is not None:
+                ledger.fail(job, f"{type(error).__name__}: {error}", elapsed)
+                print(f"✗ {job.input_path} (attempt {job.attempts}): {error}")
+                result["failed"] += 1
+            else:
+                input_hash, output_dir, segments, timings, analysis = outcome
+                if not ledger.complete(job, input_hash, output_dir, segments, elapsed, timings):
+                    print(f"Lost {job.input_path}: its lease was taken over while it ran")
+                    result["lost"] += 1
+                else:
+                    if results is not None:
+                        results.append(
+                            image_record(
+                                job.input_path, analysis, timings, profile_bins, input_hash
+                            )
+                        )
+                    result["done"] += 1
+            if metrics_file is not None:
+                REGISTRY.write(metrics_file)
+    if stats is not None:
+        stats.extend(pipe.stats)
+    return result
+
+
+def collect_inputs(inputs: list[str]) -> list[str]:
+    """
+    Expands directories into the image files below them.
+
+    :param inputs: File and directory paths.
+    :return: The file paths, with directories walked recursively and sorted.
+    """
+    paths = []
+    for item in inputs:
+        if not os.path.isdir(item):
+            paths.append(item)
+            continue
+        for root, _, files in os.walk(item):
+            paths.extend(
+                os.path.join(root, name)
+                for name in sorted(files)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+    return paths
+
+
+def memory_governor(budget_mib: int, workers: int = 1) -> MemoryGovernor:
+    """
+    Creates the memory governor for the ``--memory_budget`` flag.
+
+    Images whose estimate exceeds one worker's share of the budget are
+    detected on a reduced decode.
+
+    :param budget_mib: The budget in MiB.
+    :param workers: Number of workers sharing the budget.
+    :return: The governor.
+    :raises ValueError: If the budget or the number of workers is not positive.
+    """
+    if budget_mib <= 0 or workers <= 0:
+        raise ValueError(
+            f"Memory budget and workers must be positive, got {budget_mib} MiB and {workers}"
+        )
+    budget_bytes = budget_mib * 1024**2
+    return MemoryGovernor(budget_bytes, large_image_bytes=budget_bytes // workers)
+
+
+def add_export_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the detection and export flags of ``screenshot-segment`` to a parser.
+
+    :param parser: The parser of a tool that exports segments.
+    """
+    parser.add_argument(
+        "-ht",
+        "--height_threshold",
+        type=int,
+        default=102,
+        help="The height threshold of the low variation region.",
+    )
+    parser.add_argument(
+        "-vt",
+        "--variation_threshold",
+        type=float,
+        default=0.5,
+        help="The variation threshold of the low variation region.",
+    )
+    parser.add_argument(
+        "-ct",
+        "--color_threshold",
+        type=int,
+        default=100,
+        help="The threshold of the color difference.",
+    )
+    parser.add_argument(
+        "-cvt",
+        "--color_variation_threshold",
+        type=int,
+        default=15,
+        help="The threshold of the color difference variation.",
+    )
+    parser.add_argument(
+        "-mt",
+        "--merge_threshold",
+        type=int,
+        default=350,
+        help="The least distance between two split lines.",
+    )
+    parser.add_argument(
+        "-at",
+        "--auto_thresholds",
+        type=bool,
+        default=False,
+        help="Derive -vt, -ct and -cvt from each image.",
+    )
+    parser.add_argument(
+        "-crop",
+        "--auto_crop",
+        type=bool,
+        default=False,
+        help="Crop blank areas from the left and right of the segments.",
+    )
+    parser.add_argument(
+        "-dd",
+        "--dedup",
+        type=bool,
+        default=False,
+        help="Skip exporting duplicate and near-duplicate segments.",
+    )
+    parser.add_argument(
+        "-tw",
+        "--target_width",
+        type=int,
+        default=None,
+        help="Downscale exported segments wider than this to this width.",
+    )
+    parser.add_argument(
+        "-mpx",
+        "--max_pixels",
+        type=int,
+        default=None,
+        help="Downscale exported segments to at most this many pixels.",
+    )
+    parser.add_argument(
+        "-mdp",
+        "--max_decode_pixels",
+        type=int,
+        default=None,
+        help="Detect larger images on a reduced decode of at most this many pixels.",
+    )
+    parser.add_argument(
+        "-det",
+        "--detectors",
+        type=str,
+        default="blank,color",
+        help="Comma-separated detectors to run: blank, color, rule, band.",
+    )
+    parser.add_argument(
+        "-mp",
+        "--merge_policy",
+        type=str,
+        default="first",
+        choices=MERGE_POLICIES,
+        help="Which of two close split lines to keep: the first or the highest scored.",
+    )
+
+
+def export_params(args: argparse.Namespace) -> dict:
+    """
+    Collects the flags added by :func:`add_export_arguments`.
+
+    Parameters added in later versions are only included when they differ
+    from their defaults, so the same flags give the same :func:`params_key`
+    as before.
+
+    :param args: The parsed arguments.
+    :return: Keyword arguments for :func:`master.split_and_export_segments`.
+    """
+    params = dict(
+        height_threshold=args.height_threshold,
+        variation_threshold=args.variation_threshold,
+        color_threshold=args.color_threshold,
+        color_variation_threshold=args.color_variation_threshold,
+        merge_threshold=args.merge_threshold,
+        auto_thresholds=args.auto_thresholds,
+        auto_crop=args.auto_crop,
+        dedup=args.dedup,
+        target_width=args.target_width,
+        max_pixels=args.max_pixels,
+        max_decode_pixels=args.max_decode_pixels,
+        detectors=[n.strip() for n in args.detectors.split(",") if n.strip()],
+        merge_policy=args.merge_policy,
+    )
+    defaults = inspect.signature(split_and_export_segments).parameters
+    for name in _OPTIONAL_PARAMS:
+        if params[name] == defaults[name].default:
+            del params[name]
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Segment many screenshots, resumably, tracked in a job ledger."
+    )
+    parser.add_argument("ledger", type=str, help="Path of the SQLite ledger file.")
+    parser.add_argument(
+        "inputs", type=str, nargs="*", help="Image files or directories to add to the ledger."
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=str,
+        default="segments",
+        help="The directory to save the segments of all images.",
+    )
+    parser.add_argument(
+        "-ma",
+        "--max_attempts",
+        type=int,
+        default=3,
+        help="How many times a failing image is tried.",
+    )
+    parser.add_argument(
+        "-ls",
+        "--lease_seconds",
+        type=float,
+        default=600,
+        help="Seconds after which a job held by a lost worker is handed out again.",
+    )
+    parser.add_argument(
+        "-cl",
+        "--claim_size",
+        type=int,
+        default=8,
+        help="Number of jobs claimed from the ledger at a time.",
+    )
+    parser.add_argument(
+        "-st", "--status", type=bool, default=False, help="Only print the job counts."
+    )
+    parser.add_argument(
+        "-pl",
+        "--pipelined",
+        type=bool,
+        default=False,
+        help="Overlap reading, analysis and export of consecutive images in stages.",
+    )
+    parser.add_argument(
+        "-pf",
+        "--prefetch",
+        type=int,
+        default=4,
+        help="Number of images read ahead in the pipelined mode.",
+    )
+    parser.add_argument(
+        "-aw",
+        "--analyze_workers",
+        type=int,
+        default=None,
+        help="Threads decoding and detecting in the pipelined mode.",
+    )
+    parser.add_argument(
+        "-ew",
+        "--export_workers",
+        type=int,
+        default=None,
+        help="Threads encoding and writing segments in the pipelined mode.",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        type=str,
+        default=None,
+        help="Write the pipeline metrics in the Prometheus text format to this file.",
+    )
+    parser.add_argument(
+        "-mport",
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Serve the pipeline metrics for Prometheus on this local port.",
+    )
+    parser.add_argument(
+        "-tc",
+        "--template_cache",
+        type=str,
+        default=None,
+        help="File of page templates whose split heights are reused; loaded and saved.",
+    )
+    parser.add_argument(
+        "-rd",
+        "--results_dir",
+        type=str,
+        default=None,
+        help="Append a columnar record of each image's results to shards in this directory.",
+    )
+    parser.add_argument(
+        "-rfmt",
+        "--results_format",
+        type=str,
+        default=None,
+        choices=RESULT_FORMATS,
+        help="Format of the results shards (default: parquet if pyarrow is installed).",
+    )
+    parser.add_argument(
+        "-pb",
+        "--profile_bins",
+        type=int,
+        default=0,
+        help="Store the row profiles in the results, downsampled to this many bins.",
+    )
+    parser.add_argument(
+        "-mb",
+        "--memory_budget",
+        type=int,
+        default=None,
+        help="MiB that the images being segmented may use at once; larger images are reduced.",
+    )
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    if args.metrics_port is not None:
+        REGISTRY.serve(args.metrics_port)
+    template_cache = None
+    if args.template_cache is not None:
+        template_cache = TemplateCache.load(args.template_cache)
+    governor = None
+    if args.memory_budget is not None:
+        governor = memory_governor(args.memory_budget)
+    results = None
+    if args.results_dir is not None:
+        # Workers on the same directory write separately numbered shards
+        prefix = "results-" + re.sub(r"[^\w.-]", "-", default_worker_name())
+        results = ResultsWriter(args.results_dir, args.results_format, prefix=prefix)
+    with JobLedger(args.ledger, args.max_attempts, args.lease_seconds) as ledger:
+        if not args.status:
+            added = ledger.add(collect_inputs(args.inputs), export_params(args))
+            print(f"Added {added} jobs to {os.path.abspath(args.ledger)}")
+            if args.pipelined:
+                stats = []
+                result = run_batch_pipelined(
+                    ledger,
+                    args.output_dir,
+                    args.claim_size,
+                    metrics_file=args.metrics_file,
+                    prefetch=args.prefetch,
+                    analyze_workers=args.analyze_workers,
+                    export_workers=args.export_workers,
+                    stats=stats,
+                    template_cache=template_cache,
+                    results=results,
+                    profile_bins=args.profile_bins,
+                    governor=governor,
+                )
+                for stage in stats:
+                    print(stage)
+            else:
+                result = run_batch(
+                    ledger,
+                    args.output_dir,
+                    args.claim_size,
+                    metrics_file=args.metrics_file,
+                    template_cache=template_cache,
+                    results=results,
+                    profile_bins=args.profile_bins,
+                    governor=governor,
+                )
+            print(
+                f"Completed {result['done']} jobs, {result['failed']} failed, "
+                f"{result['lost']} lost"
+            )
+            if template_cache is not None:
+                print(template_cache.report())
+                template_cache.save(args.template_cache)
+            if results is not None:
+                results.close()
+                print(f"Wrote {results.records} results to {len(results.shards)} shards")
+        print(ledger.counts())
+
+
+if __name__ == "__main__":
+    main()
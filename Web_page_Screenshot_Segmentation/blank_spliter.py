@@ -1,9 +1,77 @@
-import cv2
 import numpy as np
+from .backend import to_gray
+from .columns import sample_columns
+from .row_runs import per_unique_row
+from .workspace import Workspace, scratch
+
+
+def row_laplacian_variance(
+    gray: np.ndarray, band_rows: int = 1024, workspace: Workspace | None = None
+) -> np.ndarray:
+    """
+    Computes the variance of the Laplacian of each row, treated as its own image.
+
+    For a one-row image, ``cv2.Laplacian`` with the default reflect-101 border
+    reduces to the horizontal second difference ``g[x-1] + g[x+1] - 2 * g[x]``,
+    with ``2 * (g[1] - g[0])`` and ``2 * (g[-2] - g[-1])`` at the edges. It is
+    computed here for all rows at once with exact integer sums, band by band to
+    bound the temporary memory, in int32 band buffers that are updated in place.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param band_rows: Number of rows processed at a time.
+    :param workspace: If given, the band buffers are taken from it.
+    :return: One variance per row, as float64.
+    """
+    height, width = gray.shape
+    variances = np.zeros(height, dtype=np.float64)
+    if width < 2:
+        return variances
+    shape = (min(band_rows, height), width)
+    bands = scratch(workspace, "laplacian.band", shape, np.int32)
+    laplacians = scratch(workspace, "laplacian.values", shape, np.int32)
+    for start in range(0, height, band_rows):
+        source = gray[start : start + band_rows]
+        band, laplacian = bands[: len(source)], laplacians[: len(source)]
+        np.copyto(band, source)
+        inner = laplacian[:, 1:-1]
+        np.add(band[:, :-2], band[:, 2:], out=inner)
+        inner -= band[:, 1:-1]
+        inner -= band[:, 1:-1]
+        np.subtract(band[:, 1], band[:, 0], out=laplacian[:, 0])
+        np.subtract(band[:, -2], band[:, -1], out=laplacian[:, -1])
+        laplacian[:, 0] *= 2
+        laplacian[:, -1] *= 2
+        sums = laplacian.sum(axis=1, dtype=np.int64)
+        squares = np.einsum("ij,ij->i", laplacian, laplacian, dtype=np.int64)
+        variances[start : start + len(band)] = (squares - sums * sums / width) / width
+    return variances
+
+
+def low_variation_runs(
+    row_values: np.ndarray, height_threshold: int, variation_threshold: float
+) -> list[tuple[int, int]]:
+    """
+    Finds runs of consecutive rows whose value is below a threshold.
+
+    :param row_values: One statistic per row, e.g. the Laplacian variance.
+    :param height_threshold: The minimum length of a run to be kept.
+    :param variation_threshold: Rows below this value belong to a run.
+    :return: A list of ``(start, end)`` row ranges, ``end`` exclusive.
+    """
+    low = np.concatenate(([False], row_values < variation_threshold, [False]))
+    edges = np.flatnonzero(low[1:] != low[:-1])
+    starts, ends = edges[::2], edges[1::2]
+    keep = (ends - starts) >= height_threshold
+    return [(int(a), int(b)) for a, b in zip(starts[keep], ends[keep])]
 
 
 def find_low_variation_regions(
-    image: np.ndarray, height_threshold: int, variation_threshold: float
+    image: np.ndarray,
+    height_threshold: int,
+    variation_threshold: float,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
 ) -> list[tuple[int, int]]:
     """
     Finds regions in an image with low vertical variation.
@@ -15,31 +83,27 @@ def find_low_variation_regions(
     :param image: The input image as a NumPy array.
     :param height_threshold: The minimum height of a region to be considered.
     :param variation_threshold: The variance threshold to determine low variation.
+    :param columns: Column band to analyze: ``None`` for the full width, an
+                    ``(x0, x1)`` band, or ``"auto"`` for the widest content band.
+    :param column_stride: Analyze only every ``column_stride``-th column.
+    :param row_stride: Row stride for the column statistics of ``"auto"``.
     :return: A list of tuples, where each tuple contains the start and end
              row of a low variation region.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    regions = []
-    start_row = None
-
-    for i in range(gray.shape[0]):
-        row_variation = cv2.Laplacian(gray[i : i + 1, :], cv2.CV_64F).var()
-        if row_variation < variation_threshold:
-            if start_row is None:
-                start_row = i
-        else:
-            if start_row is not None and (i - start_row) >= height_threshold:
-                regions.append((start_row, i))
-            start_row = None
-
-    if start_row is not None and (gray.shape[0] - start_row) >= height_threshold:
-        regions.append((start_row, gray.shape[0]))
-
-    return regions
+    gray = to_gray(image)
+    gray = sample_columns(gray, columns, column_stride, row_stride)
+    # Runs of identical rows (margins, solid bands) are computed once
+    row_variation = per_unique_row(row_laplacian_variance, gray)
+    return low_variation_runs(row_variation, height_threshold, variation_threshold)
 
 
 def find_height_spliter(
-    image: np.ndarray, height_threshold: int, variation_threshold: float
+    image: np.ndarray,
+    height_threshold: int,
+    variation_threshold: float,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
 ) -> list[int]:
     """
     Finds split points in an image based on low variation regions.
@@ -50,8 +114,13 @@ def find_height_spliter(
     :param image: The input image as a NumPy array.
     :param height_threshold: The minimum height of a region to be considered.
     :param variation_threshold: The variance threshold to determine low variation.
+    :param columns: Column band to analyze, see :func:`find_low_variation_regions`.
+    :param column_stride: Analyze only every ``column_stride``-th column.
+    :param row_stride: Row stride for the column statistics of ``"auto"``.
     :return: A list of integer heights representing the midpoints of low
              variation regions.
     """
-    regions = find_low_variation_regions(image, height_threshold, variation_threshold)
+    regions = find_low_variation_regions(
+        image, height_threshold, variation_threshold, columns, column_stride, row_stride
+    )
     return [start + (end - start) // 2 for start, end in regions]
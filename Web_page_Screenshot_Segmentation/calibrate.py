@@ -0,0 +1,100 @@
+from dataclasses import replace
+
+import numpy as np
+
+from .color_spliter import color_change_rows
+from .detectors import DetectorParams, RowProfile
+
+# The thresholds chosen by calibrate_thresholds
+CALIBRATED = ("variation_threshold", "color_threshold", "color_variation_threshold")
+# Color changes must be this many times above the Otsu cut between noise
+# and real differences of uniform rows
+COLOR_MARGIN = 4
+# Below this separability the histogram has no two clear classes, e.g. an
+# image without background rows, and the default threshold is kept
+MIN_SEPARABILITY = 0.7
+MIN_VARIATION_THRESHOLD = 0.5
+# Smaller background changes are not visible as a new section
+MIN_COLOR_DIFFERENCE = 8
+
+
+def otsu_threshold(values: np.ndarray, bins: int = 256) -> tuple[float, float]:
+    """
+    Splits values into two classes with Otsu's method on a log scale.
+
+    Row statistics span several orders of magnitude, so the histogram is
+    built over ``log1p(values)``.
+
+    :param values: Non-negative values, e.g. one statistic per row.
+    :param bins: Number of histogram bins.
+    :return: The cut between the classes, in the units of ``values``, and the
+             separability: the between-class share of the total variance, from
+             0 (one class) to 1 (two distinct values).
+    """
+    logs = np.log1p(np.asarray(values, dtype=np.float64))
+    total_variance = logs.var() if len(logs) else 0.0
+    if total_variance == 0:
+        return float(np.expm1(logs[0])) if len(logs) else 0.0, 0.0
+    counts, edges = np.histogram(logs, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    below = np.cumsum(counts)[:-1]
+    above = len(logs) - below
+    sums = np.cumsum(counts * centers)
+    mean_below = sums[:-1] / np.maximum(below, 1)
+    mean_above = (sums[-1] - sums[:-1]) / np.maximum(above, 1)
+    between = below * above * (mean_below - mean_above) ** 2 / len(logs) ** 2
+    i = int(np.argmax(between))
+    return float(np.expm1(edges[i + 1])), float(min(1.0, between[i] / total_variance))
+
+
+def calibrate_thresholds(profile: RowProfile, params: DetectorParams) -> DetectorParams:
+    """
+    Derives the blank and color thresholds of one image from its row statistics.
+
+    - ``variation_threshold``: the Otsu cut of the per-row Laplacian variance
+      separates background rows, including their encoding noise, from
+      content rows.
+    - ``color_threshold``: the Otsu cut of the per-row variance separates
+      uniform rows from content rows.
+    - ``color_variation_threshold``: the Otsu cut of the nonzero mean
+      differences between consecutive uniform rows separates encoding noise
+      from real background changes; a split needs :data:`COLOR_MARGIN` times
+      that difference.
+
+    Each threshold keeps its value from ``params`` if its histogram does not
+    have two clear classes. Chosen values are rounded to 3 decimals, so the
+    reported values reproduce the run when passed as fixed thresholds.
+
+    :param profile: The row statistics of the analyzed image.
+    :param params: The fixed thresholds, used as fallbacks.
+    :return: A copy of ``params`` with the calibrated thresholds.
+    """
+    chosen = {}
+    cut, separability = otsu_threshold(profile.laplacian_variance)
+    if separability >= MIN_SEPARABILITY:
+        chosen["variation_threshold"] = max(MIN_VARIATION_THRESHOLD, cut)
+
+    row_means, row_vars = profile.mean_variance
+    color_threshold = params.color_threshold
+    cut, separability = otsu_threshold(row_vars)
+    if separability >= MIN_SEPARABILITY:
+        color_threshold = chosen["color_threshold"] = round(cut, 3)
+
+    # All differences between consecutive uniform rows, not only the changes
+    _, _, differences = color_change_rows(row_means, row_vars, color_threshold, -1)
+    differences = differences[differences > 0]
+    if len(differences) > 1:
+        cut, separability = otsu_threshold(differences)
+        if separability >= MIN_SEPARABILITY:
+            chosen["color_variation_threshold"] = max(MIN_COLOR_DIFFERENCE, cut * COLOR_MARGIN)
+    return replace(params, **{name: round(float(v), 3) for name, v in chosen.items()})
+
+
+def threshold_values(params: DetectorParams) -> dict[str, float]:
+    """
+    Returns the calibrated thresholds of ``params`` for reporting.
+
+    :param params: The detector parameters.
+    :return: The values of :data:`CALIBRATED`.
+    """
+    return {name: getattr(params, name) for name in CALIBRATED}
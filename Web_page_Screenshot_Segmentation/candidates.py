@@ -0,0 +1,150 @@
+import numpy as np
+
+from .manifest import label_boundaries
+
+# Longest detector name the candidate table can hold
+MAX_SOURCE_LENGTH = 16
+# One split candidate: the split row, the rows the separator spans (end
+# exclusive), its strength and the detector that found it
+CANDIDATE_DTYPE = np.dtype(
+    [
+        ("row", np.int64),
+        ("start", np.int64),
+        ("end", np.int64),
+        ("score", np.float64),
+        ("source", f"U{MAX_SOURCE_LENGTH}"),
+    ]
+)
+# Merge policies accepted by merge_candidates
+MERGE_POLICIES = ("first", "score")
+
+
+def make_candidates(
+    rows,
+    starts=None,
+    ends=None,
+    scores=None,
+    source: str = "",
+) -> np.ndarray:
+    """
+    Builds a candidate table from per-candidate columns.
+
+    :param rows: The split rows.
+    :param starts: The first row of each separator. Defaults to the split row.
+    :param ends: The row after each separator. Defaults to the split row + 1.
+    :param scores: The strength of each candidate. Defaults to 1.
+    :param source: The name of the detector that found the candidates.
+    :return: A structured array of :data:`CANDIDATE_DTYPE`, sorted by row.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    table = np.empty(len(rows), dtype=CANDIDATE_DTYPE)
+    table["row"] = rows
+    table["start"] = rows if starts is None else starts
+    table["end"] = rows + 1 if ends is None else ends
+    table["score"] = 1.0 if scores is None else scores
+    table["source"] = source
+    return np.sort(table, order="row", kind="stable")
+
+
+def as_candidates(found, source: str = "") -> np.ndarray:
+    """
+    Converts a detector result to a candidate table.
+
+    :param found: A candidate table, or a list of ``(row, score)`` pairs.
+    :param source: The detector name to record in the table.
+    :return: A structured array of :data:`CANDIDATE_DTYPE`.
+    """
+    if isinstance(found, np.ndarray) and found.dtype == CANDIDATE_DTYPE:
+        table = found.copy()
+        table["source"] = source
+        return table
+    pairs = list(found)
+    rows = [row for row, _ in pairs]
+    scores = [score for _, score in pairs]
+    return make_candidates(rows, scores=scores, source=source)
+
+
+def scale_candidates(table: np.ndarray, scale: int) -> np.ndarray:
+    """
+    Converts candidate rows of a reduced image to full-resolution rows.
+
+    :param table: The candidate table.
+    :param scale: The factor the image was reduced by.
+    :return: A new table with ``row``, ``start`` and ``end`` multiplied.
+    """
+    table = table.copy()
+    for field in ("row", "start", "end"):
+        table[field] *= scale
+    return table
+
+
+def merge_candidates(
+    table: np.ndarray,
+    threshold: int,
+    min_height: int = 200,
+    policy: str = "first",
+) -> np.ndarray:
+    """
+    Selects the split rows from a candidate table.
+
+    Candidates above ``min_height`` are kept so that no two kept rows are
+    within ``threshold`` of each other. With ``"first"`` the topmost candidate
+    of a cluster wins, which matches :func:`master.remove_close_values`. With
+    ``"score"`` the strongest candidates are kept first; scores are divided by
+    the largest score of their detector so that detectors with different score
+    units can be compared.
+
+    :param table: The candidate table.
+    :param threshold: The minimum difference between two kept rows.
+    :param min_height: The minimum row to keep.
+    :param policy: ``"first"`` or ``"score"``.
+    :return: The kept candidates, one per split row, sorted by row.
+    :raises ValueError: If the policy is unknown.
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(
+            f"Unknown merge policy: {policy} (available: {', '.join(MERGE_POLICIES)})"
+        )
+    table = table[table["row"] >= min_height]
+    if len(table) == 0:
+        return table
+
+    if policy == "first":
+        order = np.argsort(table["row"], kind="stable")
+    else:
+        strength = table["score"].copy()
+        for source in np.unique(table["source"]):
+            mask = table["source"] == source
+            peak = strength[mask].max()
+            if peak > 0:
+                strength[mask] /= peak
+        # Strongest first; ties go to the upper row
+        order = np.lexsort((table["row"], -strength))
+
+    kept = []
+    kept_rows = []
+    for i in order:
+        row = table["row"][i]
+        if policy == "first":
+            # Rows come in order, so only the last kept row can be close
+            close = bool(kept_rows) and row - kept_rows[-1] <= threshold
+        else:
+            close = any(abs(row - k) <= threshold for k in kept_rows)
+        if not close:
+            kept.append(i)
+            kept_rows.append(row)
+    return np.sort(table[kept], order="row", kind="stable")
+
+
+def candidate_labels(kept: np.ndarray, table: np.ndarray) -> list[str]:
+    """
+    Names the detectors that found each kept row.
+
+    :param kept: The merged candidates, see :func:`merge_candidates`.
+    :param table: The full candidate table.
+    :return: One label per kept row, joining the names of all detectors with
+             a candidate on that row with ``+``, e.g. ``"blank+color"``.
+    """
+    sources = list(dict.fromkeys(table["source"].tolist()))
+    rows = {source: table["row"][table["source"] == source].tolist() for source in sources}
+    return label_boundaries(kept["row"].tolist(), rows)
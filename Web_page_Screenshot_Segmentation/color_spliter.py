@@ -1,38 +1,97 @@
-import cv2
 import numpy as np
+from .backend import to_gray
+from .columns import sample_columns
+from .row_runs import per_unique_row
+from .workspace import Workspace, scratch
+
+
+def row_mean_variance(
+    gray: np.ndarray, band_rows: int = 1024, workspace: Workspace | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the mean and variance of each row of a grayscale image.
+
+    The sums are accumulated as exact integers, band by band, which avoids the
+    full-size float64 temporaries of ``np.var``.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param band_rows: Number of rows processed at a time.
+    :param workspace: If given, the int32 band buffer is taken from it.
+    :return: The row means and row variances, as float64 arrays.
+    """
+    height, width = gray.shape
+    means = np.zeros(height, dtype=np.float64)
+    variances = np.zeros(height, dtype=np.float64)
+    if width == 0:
+        return means, variances
+    bands = scratch(workspace, "mean_variance.band", (min(band_rows, height), width), np.int32)
+    for start in range(0, height, band_rows):
+        source = gray[start : start + band_rows]
+        band = bands[: len(source)]
+        np.copyto(band, source)
+        sums = band.sum(axis=1, dtype=np.int64)
+        squares = np.einsum("ij,ij->i", band, band, dtype=np.int64)
+        end = start + len(band)
+        means[start:end] = sums / width
+        variances[start:end] = (squares - sums * sums / width) / width
+    return means, variances
+
+
+def color_change_rows(
+    row_means: np.ndarray,
+    row_vars: np.ndarray,
+    var_color_threshold: float,
+    color_difference_threshold: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds low-variance rows whose color differs from the previous such row.
+
+    :param row_means: The mean of each row.
+    :param row_vars: The variance of each row.
+    :param var_color_threshold: The variance threshold to identify low-variance rows.
+    :param color_difference_threshold: The minimum color difference to consider
+                                       a split point.
+    :return: The split rows, the low-variance row each one was compared with,
+             and their color differences.
+    """
+    # Only low-variance rows take part; each is compared with the previous one
+    uniform_rows = np.flatnonzero(row_vars < var_color_threshold)
+    differences = np.abs(np.diff(row_means[uniform_rows]))
+    changed = differences > color_difference_threshold
+    return uniform_rows[1:][changed], uniform_rows[:-1][changed], differences[changed]
 
 
 def color_height_spliter(
-    image: np.ndarray, var_color_threshold: float, color_difference_threshold: float
+    image: np.ndarray,
+    var_color_threshold: float,
+    color_difference_threshold: float,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
 ) -> list[int]:
     """
     Finds split points in an image based on color differences between rows.
 
     This function analyzes an image to find horizontal split points by identifying
     rows with low color variance and significant color differences from the
-    previous row.
+    previous low-variance row.
 
     :param image: The input image as a NumPy array.
     :param var_color_threshold: The variance threshold to identify low-variance rows.
     :param color_difference_threshold: The minimum color difference to consider
                                        a split point.
+    :param columns: Column band to analyze: ``None`` for the full width, an
+                    ``(x0, x1)`` band, or ``"auto"`` for the widest content band.
+    :param column_stride: Analyze only every ``column_stride``-th column.
+    :param row_stride: Row stride for the column statistics of ``"auto"``.
     :return: A list of integer heights representing the potential split points.
     """
-    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image_gray = to_gray(image)
+    image_gray = sample_columns(image_gray, columns, column_stride, row_stride)
 
     # Calculate row-wise variance and mean using NumPy
-    row_vars = np.var(image_gray, axis=1)
-    row_means = np.mean(image_gray, axis=1)
-
-    height_list = []
-    previous_row_color = None
-
-    for i in range(len(row_vars)):
-        if row_vars[i] < var_color_threshold:
-            if previous_row_color is not None:
-                color_difference = np.linalg.norm(row_means[i] - previous_row_color)
-                if color_difference > color_difference_threshold:
-                    height_list.append(i)
-            previous_row_color = row_means[i]
-
-    return height_list
+    row_means, row_vars = per_unique_row(row_mean_variance, image_gray)
+    rows, _, _ = color_change_rows(
+        row_means, row_vars, var_color_threshold, color_difference_threshold
+    )
+    return rows.tolist()
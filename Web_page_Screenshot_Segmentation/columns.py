@@ -0,0 +1,124 @@
+import numpy as np
+
+from .workspace import Workspace, scratch
+
+
+def column_variance(
+    gray: np.ndarray, band_rows: int = 1024, workspace: Workspace | None = None
+) -> np.ndarray:
+    """
+    Computes the variance of each column of a grayscale image.
+
+    The sums are accumulated as exact integers over int32 squares of one
+    band of rows at a time, instead of the full-size float64 temporaries of
+    ``np.var``.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param band_rows: Number of rows processed at a time.
+    :param workspace: If given, the band buffer is taken from it.
+    :return: One variance per column, as float64.
+    """
+    height, width = gray.shape
+    if height == 0:
+        return np.zeros(width, dtype=np.float64)
+    sums = np.zeros(width, dtype=np.int64)
+    squares = np.zeros(width, dtype=np.int64)
+    bands = scratch(workspace, "columns.squares", (min(band_rows, height), width), np.int32)
+    for start in range(0, height, band_rows):
+        source = gray[start : start + band_rows]
+        band = bands[: len(source)]
+        sums += source.sum(axis=0, dtype=np.int64)
+        np.square(source, out=band, dtype=np.int32)
+        squares += band.sum(axis=0, dtype=np.int64)
+    return (squares - sums * sums / height) / height
+
+
+def content_columns(
+    gray: np.ndarray,
+    threshold: int = 240,
+    row_stride: int = 1,
+    workspace: Workspace | None = None,
+) -> np.ndarray:
+    """
+    Flags the columns of a grayscale image that contain content.
+
+    A column has content if its variance is at least 5% of the largest column
+    variance, or if it has pixels noticeably darker than ``threshold``.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param threshold: Pixel value threshold for detecting blank areas (0-255).
+    :param row_stride: Use only every ``row_stride``-th row for the statistics.
+    :param workspace: If given, temporary buffers are taken from it.
+    :return: A boolean array with one entry per column.
+    """
+    sampled = gray[::row_stride]
+    # Variance of pixel values in each column
+    col_variance = column_variance(sampled, workspace=workspace)
+    # Minimum pixel value in each column
+    col_min = np.min(sampled, axis=0)
+
+    # Normalize variance to 0-1 range for comparison
+    max_variance = np.max(col_variance) if np.max(col_variance) > 0 else 1
+    normalized_variance = col_variance / max_variance
+
+    has_variance = normalized_variance > 0.05  # At least 5% of max variance
+    has_dark_pixels = col_min < (threshold - 30)  # Noticeably darker than threshold
+    return has_variance | has_dark_pixels
+
+
+def main_column_band(
+    gray: np.ndarray, threshold: int = 240, row_stride: int = 1, max_gap: int | None = None
+) -> tuple[int, int]:
+    """
+    Finds the widest band of content columns, ignoring narrow edge features.
+
+    Content columns separated by fewer than ``max_gap`` blank columns are
+    joined, and the widest joined run is returned. Scrollbars, sidebars and
+    ads separated from the main content by a blank gutter are left out.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param threshold: Pixel value threshold for detecting blank areas (0-255).
+    :param row_stride: Use only every ``row_stride``-th row for the statistics.
+    :param max_gap: Widest blank gap to bridge. Defaults to 2% of the width.
+    :return: The ``(x0, x1)`` column band, where ``x1`` is exclusive. The full
+             width is returned when no content is found.
+    """
+    width = gray.shape[1]
+    if max_gap is None:
+        max_gap = max(1, width // 50)
+    cols = np.flatnonzero(content_columns(gray, threshold, row_stride))
+    if len(cols) == 0:
+        return 0, width
+
+    # Split the content columns into runs wherever the gap is too wide
+    breaks = np.flatnonzero(np.diff(cols) > max_gap + 1)
+    starts = np.concatenate(([cols[0]], cols[breaks + 1]))
+    ends = np.concatenate((cols[breaks], [cols[-1]])) + 1
+    widest = np.argmax(ends - starts)
+    return int(starts[widest]), int(ends[widest])
+
+
+def sample_columns(
+    gray: np.ndarray,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+) -> np.ndarray:
+    """
+    Restricts a grayscale image to the columns a detector should analyze.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param columns: ``None`` for all columns, an ``(x0, x1)`` band, or
+                    ``"auto"`` for :func:`main_column_band`.
+    :param column_stride: Keep only every ``column_stride``-th column.
+    :param row_stride: Row stride for the column statistics of ``"auto"``.
+    :return: A view of the selected columns.
+    """
+    if columns == "auto":
+        columns = main_column_band(gray, row_stride=row_stride)
+    if columns is not None:
+        x0, x1 = columns
+        gray = gray[:, x0:x1]
+    if column_stride > 1:
+        gray = gray[:, ::column_stride]
+    return gray
@@ -0,0 +1,231 @@
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+from .image_io import ImageHeader
+
+# Rows of each band between progress reports and cancellation checks
+BAND_ROWS = 4096
+# Decode time per megapixel of the full image, measured on the sample PNG and
+# JPEGs; only JPEG decoding gets cheaper with a reduced decode
+DECODE_SECONDS_PER_MEGAPIXEL = 0.012
+# Detection time per analyzed megapixel; the sample images take 0.005-0.015 s
+DETECT_SECONDS_PER_MEGAPIXEL = 0.01
+# Share of the JPEG decode time that a reduced decode does not save
+JPEG_FIXED_SHARE = 0.25
+# Crop and encode time of exported segments per megapixel of the full image;
+# the sample images take 0.0026-0.0039 s
+EXPORT_SECONDS_PER_MEGAPIXEL = 0.003
+# Plan to finish within this share of the remaining budget, as the time
+# estimates are rough
+BUDGET_SHARE = 0.8
+# Strategies as (decode reduce factor, column stride), from full quality to cheapest
+STRATEGIES = ((1, 1), (2, 1), (4, 1), (8, 1), (8, 4))
+
+# Progress callback: (stage, rows done, rows total)
+Progress = Callable[[str, int, int], None]
+
+
+class Cancelled(Exception):
+    """
+    Raised when a run is stopped through its :class:`CancelToken`.
+    """
+
+
+class DeadlineExceeded(Cancelled, TimeoutError):
+    """
+    Raised when a run is still going at its deadline.
+    """
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag, safe to set from any thread.
+
+    Cancelling does not interrupt a running NumPy or OpenCV call; the run
+    stops at its next check, at most one row band or segment later.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class RunControl:
+    """
+    Time budget, progress reporting and cancellation of one segmentation run.
+
+    Pass it as ``control`` to :func:`master.split_heights` or
+    :func:`master.split_and_export_segments`. Before decoding, the run picks
+    the first of :data:`STRATEGIES` whose estimated time fits the remaining
+    budget, so a short budget switches to a reduced decode and sampled
+    columns instead of running out of time. The chosen strategy is recorded
+    in :attr:`reduce_factor` and :attr:`column_stride`, and :attr:`degraded`
+    tells whether the result is such a best-effort result.
+
+    The row statistics are computed in bands of :data:`BAND_ROWS` rows;
+    after each band, and before each detector and exported segment, the
+    progress callback is called and the token and deadline are checked.
+    Detectors run concurrently, so the callback may be called from several
+    threads.
+
+    :param deadline: Seconds the run may take from now, or None for no limit.
+    :param progress: Called as ``progress(stage, done, total)``, where stage
+                     is ``"laplacian"``, ``"mean_variance"`` or ``"export"``.
+    :param cancel: Token that stops the run when cancelled.
+    :param speed: Factor applied to the time estimates, e.g. 2 on a machine
+                  twice as slow as the one the estimates were measured on.
+    """
+
+    def __init__(
+        self,
+        deadline: float | None = None,
+        progress: Progress | None = None,
+        cancel: CancelToken | None = None,
+        speed: float = 1.0,
+    ):
+        self.expires_at = None if deadline is None else time.monotonic() + deadline
+        self.progress = progress
+        self.cancel = cancel
+        self.speed = speed
+        self.reduce_factor = 1
+        self.column_stride = 1
+        self.degraded = False
+
+    def remaining(self) -> float | None:
+        """
+        Returns the seconds left until the deadline, or None without one.
+        """
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def check(self):
+        """
+        Stops the run if it was cancelled or its deadline has passed.
+
+        :raises Cancelled: If the token was cancelled.
+        :raises DeadlineExceeded: If the deadline has passed.
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise Cancelled("Segmentation was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Segmentation exceeded its deadline by {-remaining:.3f} s")
+
+    def report(self, stage: str, done: int, total: int):
+        """
+        Reports progress, then checks for cancellation and the deadline.
+
+        :param stage: The running stage.
+        :param done: Rows (or segments) done so far.
+        :param total: Rows (or segments) in the stage.
+        """
+        if self.progress is not None:
+            self.progress(stage, done, total)
+        self.check()
+
+    def estimate(
+        self, header: ImageHeader, reduce_factor: int, column_stride: int, export: bool = False
+    ) -> float:
+        """
+        Estimates the seconds to decode and detect an image with a strategy.
+
+        :param header: The image header.
+        :param reduce_factor: Decode reduction factor.
+        :param column_stride: Analyze every ``column_stride``-th column.
+        :param export: Whether the segments are exported afterwards. The export
+                       always needs the full-resolution image, so a reduced
+                       decode is followed by a second, full one.
+        :return: The estimated wall time.
+        """
+        megapixels = header.pixels / 1e6
+        full_decode = megapixels * DECODE_SECONDS_PER_MEGAPIXEL
+        decode = full_decode
+        if header.format == "jpeg":
+            decode *= JPEG_FIXED_SHARE + (1 - JPEG_FIXED_SHARE) / reduce_factor**2
+        detect = megapixels / reduce_factor**2 / column_stride * DETECT_SECONDS_PER_MEGAPIXEL
+        seconds = decode + detect
+        if export:
+            seconds += megapixels * EXPORT_SECONDS_PER_MEGAPIXEL
+            if reduce_factor != 1:
+                seconds += full_decode
+        return seconds * self.speed
+
+    def plan(
+        self,
+        header: ImageHeader,
+        reduce_factor: int = 1,
+        column_stride: int = 1,
+        export: bool = False,
+    ) -> tuple[int, int]:
+        """
+        Chooses the strategy that fits the remaining budget.
+
+        Strategies cheaper than the given ones are tried in order, and the
+        first one estimated to take at most :data:`BUDGET_SHARE` of the
+        remaining time is used; if none fits, the fastest is used. A strategy
+        estimated to be slower than the given one is never chosen, e.g. a
+        reduced PNG decode before an export, which decodes the image twice. A
+        PNG decode always costs the full image, so a deadline shorter than
+        that is missed even by the fastest strategy.
+
+        :param header: The image header.
+        :param reduce_factor: The reduction already required, e.g. by a
+                              memory governor.
+        :param column_stride: The requested column stride.
+        :param export: Whether the segments are exported afterwards, see
+                       :meth:`estimate`.
+        :return: The reduce factor and column stride to use.
+        """
+        self.check()
+        chosen = (reduce_factor, column_stride)
+        remaining = self.remaining()
+        if remaining is not None:
+            options = [
+                (max(reduce_factor, r), max(column_stride, s)) for r, s in STRATEGIES
+            ]
+            seconds = [self.estimate(header, *option, export) for option in options]
+            # The first of the fastest options, so ties keep the better quality
+            chosen = options[seconds.index(min(seconds))]
+            for option, estimate in zip(options, seconds):
+                if estimate <= remaining * BUDGET_SHARE:
+                    chosen = option
+                    break
+        self.reduce_factor, self.column_stride = chosen
+        self.degraded = chosen != (reduce_factor, column_stride)
+        return chosen
+
+
+def banded(stat, gray: np.ndarray, control: RunControl, stage: str):
+    """
+    Computes a per-row statistic band by band, reporting after each band.
+
+    :param stat: A function from a grayscale image to one array of values per
+                 row, or to a tuple of such arrays. It must not compare rows
+                 with their neighbors.
+    :param gray: The grayscale image as a NumPy array.
+    :param control: Receives the progress and may stop the run.
+    :param stage: The stage name passed to the progress callback.
+    :return: The result of ``stat`` for every row of ``gray``.
+    """
+    total = gray.shape[0]
+    if total <= BAND_ROWS:
+        values = stat(gray)
+        control.report(stage, total, total)
+        return values
+    parts = []
+    for start in range(0, total, BAND_ROWS):
+        parts.append(stat(gray[start : start + BAND_ROWS]))
+        control.report(stage, min(start + BAND_ROWS, total), total)
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(values) for values in zip(*parts))
+    return np.concatenate(parts)
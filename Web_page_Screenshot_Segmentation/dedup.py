@@ -0,0 +1,121 @@
+import hashlib
+import math
+
+import numpy as np
+
+from .backend import cv2
+
+# Gray level and mean color differences up to this are compression noise
+NOISE_LEVELS = 24
+# Side length of the untrimmed layout hash; coarse enough that segments cut a
+# few rows apart from the same layout still agree
+LAYOUT_SIZE = 8
+
+
+def segment_fingerprint(segment: np.ndarray, hash_size: int = 32, trim: bool = True) -> int:
+    """
+    Computes an average hash (aHash) of a segment from a tiny downsample.
+
+    Uniform margins around the content are trimmed first so that segments
+    cut a few rows apart from the same layout still line up. The content is
+    then reduced to a ``hash_size`` x ``hash_size`` grayscale thumbnail, and
+    each bit records whether a pixel is darker than the thumbnail mean.
+    Visually similar segments give hashes with a small Hamming distance.
+    Uniform segments hash to 0 whatever their color, so compare their mean
+    colors too, as :class:`SegmentDeduplicator` does.
+
+    :param segment: The segment as a NumPy array (BGR or grayscale).
+    :param hash_size: Side length of the hash grid; the hash has
+                      ``hash_size ** 2`` bits.
+    :param trim: Whether to trim the uniform margins first.
+    :return: The fingerprint as an integer.
+    """
+    if segment.ndim == 3:
+        segment = cv2.cvtColor(segment, cv2.COLOR_BGR2GRAY)
+    if trim:
+        content = cv2.absdiff(segment, np.full_like(segment, segment[0, 0])) > NOISE_LEVELS
+        rows = np.flatnonzero(content.any(axis=1))
+        cols = np.flatnonzero(content.any(axis=0))
+        if len(rows) == 0:
+            return 0
+        segment = segment[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1]
+    small = cv2.resize(segment, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small < small.mean()).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """
+    Counts the differing bits between two fingerprints.
+
+    :param a: The first fingerprint.
+    :param b: The second fingerprint.
+    :return: The number of differing bits.
+    """
+    return bin(a ^ b).count("1")
+
+
+class SegmentDeduplicator:
+    """
+    Remembers exported segments and reports exact and near duplicates.
+
+    Exact duplicates are found by hashing the raw pixels. Near duplicates are
+    segments of similar size whose fingerprints differ by at most
+    ``threshold`` bits. Their mean colors must also agree, and so must a
+    coarse fingerprint of the untrimmed segment, so uniform bands of
+    different colors and inverted content are never taken for duplicates.
+
+    :param threshold: Maximum Hamming distance between fingerprints of near
+                      duplicates. Use 0 to only drop identical fingerprints.
+    :param size_tolerance: Maximum relative difference in height and width
+                           for two segments to be compared.
+    :param hash_size: Side length of the fingerprint grid.
+    """
+
+    def __init__(
+        self, threshold: int = 10, size_tolerance: float = 0.1, hash_size: int = 32
+    ):
+        self.threshold = threshold
+        self.size_tolerance = size_tolerance
+        self.hash_size = hash_size
+        # The same share of differing bits as ``threshold`` allows
+        self.layout_threshold = math.ceil(threshold * LAYOUT_SIZE**2 / hash_size**2)
+        self._exact: dict[tuple, int] = {}
+        self._seen: list[tuple[int, int, int, int, int, np.ndarray]] = []
+
+    def _similar_size(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        return all(
+            abs(x - y) <= self.size_tolerance * max(x, y) for x, y in zip(a, b)
+        )
+
+    def find(self, segment: np.ndarray, index: int) -> int | None:
+        """
+        Checks a segment against the previously kept ones and remembers it.
+
+        :param segment: The segment as a NumPy array.
+        :param index: The index to report for this segment if it is kept.
+        :return: The index of the segment it duplicates, or None if it is new.
+        """
+        shape = segment.shape
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(segment).data, digest_size=16
+        ).digest()
+        exact_key = (shape, digest)
+        if exact_key in self._exact:
+            return self._exact[exact_key]
+
+        fingerprint = segment_fingerprint(segment, self.hash_size)
+        layout = segment_fingerprint(segment, LAYOUT_SIZE, trim=False)
+        color = segment.reshape(shape[0] * shape[1], -1).mean(axis=0)
+        for kept_index, height, width, kept_fingerprint, kept_layout, kept_color in self._seen:
+            if (
+                self._similar_size(shape[:2], (height, width))
+                and hamming_distance(fingerprint, kept_fingerprint) <= self.threshold
+                and hamming_distance(layout, kept_layout) <= self.layout_threshold
+                and np.abs(color - kept_color).max() <= NOISE_LEVELS
+            ):
+                return kept_index
+
+        self._exact[exact_key] = index
+        self._seen.append((index, shape[0], shape[1], fingerprint, layout, color))
+        return None
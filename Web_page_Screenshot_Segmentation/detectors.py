@@ -0,0 +1,463 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Callable
+
+import numpy as np
+
+from .backend import sliding_max
+from .blank_spliter import low_variation_runs, row_laplacian_variance
+from .candidates import CANDIDATE_DTYPE, MAX_SOURCE_LENGTH, as_candidates, make_candidates
+from .color_spliter import color_change_rows, row_mean_variance
+from .control import RunControl, banded
+from .row_runs import MAX_UNIQUE_FRACTION, identical_row_runs, per_unique_row
+from .workspace import Workspace, scratch
+
+# Detectors run by split_heights when none are selected
+DEFAULT_DETECTORS = ("blank", "color")
+
+
+@dataclass
+class DetectorParams:
+    """
+    Thresholds shared by the detectors.
+
+    Row counts (``height_threshold``, ``rule_max_thickness`` and
+    ``band_window``) are in rows of the analyzed image; use :meth:`scaled`
+    for a reduced decode.
+
+    :param height_threshold: The minimum height of a blank region.
+    :param variation_threshold: The Laplacian variance below which a row is blank.
+    :param color_threshold: The variance below which a row has a uniform color.
+    :param color_variation_threshold: The minimum color difference of a split.
+    :param edge_threshold: The gray level step that counts as an edge pixel.
+    :param rule_edge_density: The fraction of edge pixels that makes a row the
+                              border of a horizontal rule.
+    :param rule_max_thickness: The thickest horizontal rule, in rows.
+    :param band_window: Rows averaged above and below a background change.
+    """
+
+    height_threshold: int = 102
+    variation_threshold: float = 0.5
+    color_threshold: int = 100
+    color_variation_threshold: int = 15
+    edge_threshold: int = 32
+    rule_edge_density: float = 0.9
+    rule_max_thickness: int = 4
+    band_window: int = 32
+
+    def scaled(self, scale: int) -> "DetectorParams":
+        """
+        Returns the parameters for an image reduced by ``scale``.
+
+        :param scale: The factor the image was reduced by.
+        :return: A copy with the row counts divided by ``scale``.
+        """
+        if scale == 1:
+            return self
+        return replace(
+            self,
+            height_threshold=self.height_threshold // scale,
+            rule_max_thickness=max(1, self.rule_max_thickness // scale),
+            band_window=max(1, self.band_window // scale),
+        )
+
+
+class RowProfile:
+    """
+    Per-row statistics of a grayscale image, shared by all detectors.
+
+    Each statistic is computed on first use and cached. Detectors may run in
+    different threads; a statistic is computed only once even if several of
+    them ask for it at the same time. With ``collapse``, statistics are
+    computed once per run of byte-identical rows and expanded back to rows.
+    With a ``control``, the Laplacian variance and the mean and variance are
+    computed in row bands that report progress and check for cancellation.
+    With a ``workspace``, the unique rows and the band temporaries of the
+    statistics are kept in its reusable buffers.
+
+    :param gray: The grayscale image, already restricted to the analyzed columns.
+    :param collapse: Whether to collapse runs of identical rows.
+    :param control: Progress, deadline and cancellation of the run.
+    :param workspace: Reusable buffers for the statistics.
+    """
+
+    def __init__(
+        self,
+        gray: np.ndarray,
+        collapse: bool = True,
+        control: RunControl | None = None,
+        workspace: Workspace | None = None,
+    ):
+        self.gray = gray
+        self.height = gray.shape[0]
+        self.collapse = collapse
+        self.control = control
+        self.workspace = workspace
+        self._cache = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bands(cls, bands, edge_thresholds: tuple[int, ...] = (32,)) -> "RowProfile":
+        """
+        Builds a profile from consecutive horizontal bands of a grayscale image.
+
+        The row statistics are computed band by band and concatenated, so the
+        full image is never held in memory. The profile has no ``gray`` image,
+        and edge densities are only available for ``edge_thresholds``.
+
+        :param bands: An iterable of grayscale bands of equal width, top to bottom.
+        :param edge_thresholds: The edge thresholds to precompute.
+        :return: The profile of the stacked bands.
+        """
+        laplacian, means, variances = [], [], []
+        edges = {threshold: [] for threshold in edge_thresholds}
+        previous = None
+        for band in bands:
+            profile = cls(band)
+            laplacian.append(profile.laplacian_variance)
+            band_means, band_vars = profile.mean_variance
+            means.append(band_means)
+            variances.append(band_vars)
+            for threshold, parts in edges.items():
+                density = profile.edge_density(threshold).copy()
+                if previous is not None and len(band):
+                    # The first row is compared with the last row of the band above
+                    density[0] = _edge_density(
+                        np.vstack((previous, band[:1])), threshold
+                    )[1]
+                parts.append(density)
+            if len(band):
+                previous = band[-1:]
+
+        def joined(parts):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float64)
+
+        profile = cls(np.zeros((0, 0), dtype=np.uint8), collapse=False)
+        profile.gray = None
+        profile._cache["laplacian"] = joined(laplacian)
+        profile._cache["mean_variance"] = (joined(means), joined(variances))
+        for threshold, parts in edges.items():
+            profile._cache[("edges", threshold)] = joined(parts)
+        profile.height = len(profile._cache["laplacian"])
+        return profile
+
+    def _cached(self, key, compute: Callable):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    @property
+    def runs(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        The first row and length of each run of identical rows, or None if
+        rows are not collapsed.
+        """
+        if not self.collapse:
+            return None
+        return self._cached(
+            "runs", lambda: identical_row_runs(self.gray, workspace=self.workspace)
+        )
+
+    @property
+    def unique_rows(self) -> np.ndarray | None:
+        """
+        The first row of each run, shared by the statistics, or None if rows
+        are not collapsed or too few rows repeat.
+        """
+        runs = self.runs
+        if runs is None or len(runs[0]) > MAX_UNIQUE_FRACTION * self.height:
+            return None
+        return self._cached("unique_rows", lambda: self._gather(runs[0]))
+
+    def _gather(self, starts: np.ndarray) -> np.ndarray:
+        shape = (len(starts),) + self.gray.shape[1:]
+        out = scratch(self.workspace, "unique_rows", shape, self.gray.dtype)
+        return np.take(self.gray, starts, axis=0, out=out)
+
+    def _per_row(self, stat, stage: str):
+        if self.workspace is not None:
+            stat = partial(stat, workspace=self.workspace)
+        if self.control is not None:
+            stat = partial(banded, stat, control=self.control, stage=stage)
+        if not self.collapse:
+            return stat(self.gray)
+        return per_unique_row(stat, self.gray, self.runs, self.unique_rows)
+
+    @property
+    def laplacian_variance(self) -> np.ndarray:
+        """The variance of the Laplacian of each row."""
+        return self._cached(
+            "laplacian", lambda: self._per_row(row_laplacian_variance, "laplacian")
+        )
+
+    @property
+    def mean_variance(self) -> tuple[np.ndarray, np.ndarray]:
+        """The mean and variance of each row."""
+        return self._cached(
+            "mean_variance", lambda: self._per_row(row_mean_variance, "mean_variance")
+        )
+
+    def statistics(self) -> dict[str, np.ndarray]:
+        """
+        Returns the per-row statistics computed so far, by name.
+
+        Nothing is computed here: e.g. the Laplacian variance is only included
+        if a detector used it.
+
+        :return: Arrays of one value per row, under ``"laplacian_variance"``,
+                 ``"mean"``, ``"variance"`` and ``"edge_density_<threshold>"``.
+        """
+        with self._lock:
+            cache = dict(self._cache)
+        found = {}
+        if "laplacian" in cache:
+            found["laplacian_variance"] = cache["laplacian"]
+        if "mean_variance" in cache:
+            found["mean"], found["variance"] = cache["mean_variance"]
+        for key, values in cache.items():
+            if isinstance(key, tuple) and key[0] == "edges":
+                found[f"edge_density_{key[1]}"] = values
+        return found
+
+    def edge_density(self, threshold: int) -> np.ndarray:
+        """
+        Returns the fraction of columns where each row differs from the one above.
+
+        :param threshold: The minimum absolute gray level difference of an edge.
+        :return: One fraction per row; the first row is 0.
+        """
+        return self._cached(("edges", threshold), lambda: self._edges(threshold))
+
+    def _edges(self, threshold: int) -> np.ndarray:
+        if self.gray is None:
+            raise ValueError(f"Edge density for threshold {threshold} was not precomputed")
+        # Detectors may ask for several thresholds at once, so each gets its buffers
+        buffers = f"edges.{threshold}"
+        unique = self.unique_rows
+        if unique is None:
+            return _edge_density(self.gray, threshold, workspace=self.workspace, name=buffers)
+        # Repeated rows have no edges, and the row above each run start is
+        # the previous run's row, so only the run starts need comparing
+        starts, _ = self.runs
+        density = np.zeros(self.height, dtype=np.float64)
+        density[starts] = _edge_density(
+            unique, threshold, workspace=self.workspace, name=buffers
+        )
+        return density
+
+
+def _edge_density(
+    gray: np.ndarray,
+    threshold: int,
+    band_rows: int = 1024,
+    workspace: Workspace | None = None,
+    name: str = "edges",
+) -> np.ndarray:
+    density = np.zeros(gray.shape[0], dtype=np.float64)
+    height, width = gray.shape
+    if width == 0 or height < 2:
+        return density
+    shape = (min(band_rows, height - 1) + 1, width)
+    bands = scratch(workspace, f"{name}.band", shape, np.int16)
+    steps = scratch(workspace, f"{name}.steps", shape, np.int16)
+    edges = scratch(workspace, f"{name}.flags", shape, bool)
+    for start in range(1, height, band_rows):
+        source = gray[start - 1 : start + band_rows]
+        band = bands[: len(source)]
+        step, edge = steps[: len(source) - 1], edges[: len(source) - 1]
+        np.copyto(band, source)
+        np.subtract(band[1:], band[:-1], out=step)
+        np.abs(step, out=step)
+        np.greater(step, threshold, out=edge)
+        density[start : start + len(step)] = np.count_nonzero(edge, axis=1) / width
+    return density
+
+
+# Detector function: (profile, params) -> candidate table
+DETECTORS: dict[str, Callable[[RowProfile, DetectorParams], np.ndarray]] = {}
+
+
+def register_detector(name: str):
+    """
+    Registers a detector function under ``name``.
+
+    A detector takes a :class:`RowProfile` and the :class:`DetectorParams`
+    and returns its split candidates, either as a table built with
+    :func:`candidates.make_candidates` or as a list of ``(row, score)`` pairs.
+    A larger score means a stronger separator. Registering an existing name
+    replaces that detector.
+
+    :param name: The name used to select the detector, at most
+                 :data:`candidates.MAX_SOURCE_LENGTH` characters long as it is
+                 stored in the candidate table.
+    :return: A decorator that registers the function and returns it unchanged.
+    :raises ValueError: If the name is empty or too long.
+    """
+    if not name or len(name) > MAX_SOURCE_LENGTH:
+        raise ValueError(
+            f"Detector names must have 1 to {MAX_SOURCE_LENGTH} characters: {name!r}"
+        )
+
+    def decorator(func):
+        DETECTORS[name] = func
+        return func
+
+    return decorator
+
+
+@register_detector("blank")
+def detect_blank(profile: RowProfile, params: DetectorParams) -> np.ndarray:
+    """
+    Splits in the middle of tall blank regions, scored by the region height.
+    """
+    runs = low_variation_runs(
+        profile.laplacian_variance, params.height_threshold, params.variation_threshold
+    )
+    spans = np.array(runs, dtype=np.int64).reshape(-1, 2)
+    starts, ends = spans[:, 0], spans[:, 1]
+    return make_candidates(starts + (ends - starts) // 2, starts, ends, ends - starts)
+
+
+@register_detector("color")
+def detect_color(profile: RowProfile, params: DetectorParams) -> np.ndarray:
+    """
+    Splits where the color of uniform rows changes, scored by the difference.
+    The span runs from the uniform row the change was measured against.
+    """
+    row_means, row_vars = profile.mean_variance
+    rows, previous, differences = color_change_rows(
+        row_means, row_vars, params.color_threshold, params.color_variation_threshold
+    )
+    # The color changes somewhere after the previous uniform row
+    return make_candidates(rows, previous + 1, rows + 1, differences)
+
+
+@register_detector("rule")
+def detect_rule(profile: RowProfile, params: DetectorParams) -> np.ndarray:
+    """
+    Splits on thin horizontal rules that span the analyzed width.
+
+    A rule is bounded by two rows that differ from their neighbor in almost
+    every column, at most ``rule_max_thickness`` rows apart, with uniform
+    rows in between. The split is placed on the rule and scored by the edge
+    density of its borders.
+    """
+    density = profile.edge_density(params.edge_threshold)
+    _, row_vars = profile.mean_variance
+    borders = np.flatnonzero(density >= params.rule_edge_density)
+    if len(borders) < 2:
+        return make_candidates([])
+    tops, bottoms = borders[:-1], borders[1:]
+    thin = (bottoms - tops) <= params.rule_max_thickness
+    # All rows of the rule itself must be uniform
+    uniform = np.concatenate(([0], np.cumsum(row_vars < params.color_threshold)))
+    thin &= (uniform[bottoms] - uniform[tops]) == (bottoms - tops)
+    tops, bottoms = tops[thin], bottoms[thin]
+    if len(tops) == 0:
+        return make_candidates([])
+    # A border shared by two rules belongs to the first one only
+    keep = np.concatenate(([True], tops[1:] >= bottoms[:-1]))
+    tops, bottoms = tops[keep], bottoms[keep]
+    scores = (density[tops] + density[bottoms]) / 2
+    return make_candidates(tops + (bottoms - tops) // 2, tops, bottoms, scores)
+
+
+@register_detector("band")
+def detect_band(profile: RowProfile, params: DetectorParams) -> np.ndarray:
+    """
+    Splits where the page background changes to a differently colored band.
+
+    The background of each row is the mean of the last uniform row at or above
+    it, so text on a band does not break the band up. A split is placed where
+    the average background of the ``band_window`` rows below differs from the
+    rows above by at least ``color_variation_threshold``, at the strongest
+    change within the window, and scored by that difference.
+    """
+    row_means, row_vars = profile.mean_variance
+    uniform = row_vars < params.color_threshold
+    if not uniform.any():
+        return make_candidates([])
+    # Forward-fill the background from the last uniform row
+    last = np.maximum.accumulate(np.where(uniform, np.arange(profile.height), -1))
+    last[last < 0] = np.argmax(uniform)
+    background = row_means[last]
+
+    window = params.band_window
+    if profile.height < 2 * window:
+        return make_candidates([])
+    sums = np.concatenate(([0.0], np.cumsum(background)))
+    rows = np.arange(window, profile.height - window + 1)
+    above = sums[rows] - sums[rows - window]
+    below = sums[rows + window] - sums[rows]
+    change = np.abs(below - above) / window
+
+    # Keep the first row of each local maximum within the window
+    peak = sliding_max(change, window)
+    rising = np.concatenate(([True], change[1:] > change[:-1]))
+    found = np.flatnonzero(
+        (change >= params.color_variation_threshold)
+        & (change.astype(np.float32) >= peak)
+        & rising
+    )
+    return make_candidates(rows[found], scores=change[found])
+
+
+def run_detectors(
+    profile: RowProfile,
+    params: DetectorParams,
+    names: list[str] | tuple[str, ...] | None = None,
+    max_workers: int | None = None,
+    timings: dict | None = None,
+) -> np.ndarray:
+    """
+    Runs the selected detectors on a shared row profile.
+
+    Independent detectors run concurrently in a thread pool; the NumPy and
+    OpenCV kernels they use release the GIL. If the profile has a
+    ``control``, it is checked before each detector starts.
+
+    :param profile: The row profile of the analyzed image.
+    :param params: The detector thresholds.
+    :param names: The detectors to run. Defaults to :data:`DEFAULT_DETECTORS`.
+    :param max_workers: Threads to use. Defaults to one per detector.
+    :param timings: If given, the wall time of each detector in seconds is
+                    stored in it under the detector name.
+    :return: The candidates of all detectors in one table, grouped by detector
+             in the order of ``names``, with ``source`` set to the detector name.
+    :raises ValueError: If no detector is selected or a detector name is not
+                        registered.
+    """
+    names = list(DEFAULT_DETECTORS if names is None else names)
+    if not names:
+        raise ValueError(f"No detectors selected (available: {', '.join(sorted(DETECTORS))})")
+    unknown = [name for name in names if name not in DETECTORS]
+    if unknown:
+        raise ValueError(
+            f"Unknown detectors: {', '.join(unknown)} "
+            f"(available: {', '.join(sorted(DETECTORS))})"
+        )
+
+    def timed(name):
+        if profile.control is not None:
+            profile.control.check()
+        start = time.perf_counter()
+        candidates = as_candidates(DETECTORS[name](profile, params), name)
+        return candidates, time.perf_counter() - start
+
+    if len(names) == 1 or max_workers == 1:
+        results = [timed(name) for name in names]
+    else:
+        with ThreadPoolExecutor(max_workers or len(names)) as pool:
+            results = list(pool.map(timed, names))
+
+    if timings is not None:
+        for name, (_, elapsed) in zip(names, results):
+            timings[name] = elapsed
+    return np.concatenate([found for found, _ in results] or [np.empty(0, CANDIDATE_DTYPE)])
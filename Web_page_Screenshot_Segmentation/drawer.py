@@ -1,51 +1,57 @@
-import cv2
 import argparse
 import os
 import numpy as np
+from .backend import cv2
+from .image_io import load_image
+from .metrics import ENCODED_BYTES, STAGE_SECONDS
+from .streams import Writer, binary_stdout, read_source, source_name
 
 
 def draw_line_from_file(
-    image_file: str,
+    image_file: str | bytes,
     heights: list[int],
     color: tuple[int, int, int] = (0, 0, 255),
     output_dir: str = "result",
+    writer: Writer | None = None,
 ) -> str:
     """
     Draws horizontal lines on an image at specified heights and saves it.
 
-    :param image_file: Path to the image file.
+    :param image_file: Path to the image file, or the encoded image bytes.
     :param heights: A list of integer heights where the lines will be drawn.
     :param color: The color of the lines in BGR format.
     :param output_dir: The directory to save the output image.
-    :return: The absolute path to the saved image.
+    :param writer: If given, the encoded image is passed to it as
+                   ``(file name, bytes)`` instead of being saved into
+                   ``output_dir``.
+    :return: The absolute path to the saved image, or its file name if it was
+             passed to ``writer``.
     """
-    try:
-        # Read image as a byte stream to handle non-ASCII file paths
-        img_data = np.fromfile(image_file, np.uint8)
-        image = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-        if image is None:
-            raise FileNotFoundError(
-                f"Image not found or could not be decoded at path: {image_file}"
-            )
-    except Exception as e:
-        raise IOError(f"Failed to read image file: {e}")
+    image = load_image(image_file)
 
     for height in heights:
         cv2.line(image, (0, height), (image.shape[1], height), color, 2)
 
-    os.makedirs(output_dir, exist_ok=True)
-    base_name, ext = os.path.splitext(os.path.basename(image_file))
-    output_filename = f"{base_name}_result{ext}"
+    ext = os.path.splitext(image_file)[1] if isinstance(image_file, str) else ""
+    if not ext:
+        # Stdin input has no extension to keep; save it losslessly
+        ext = ".png"
+    output_filename = f"{source_name(image_file)}_result{ext}"
     output_path = os.path.join(output_dir, output_filename)
 
     # Use imencode + binary write to handle Unicode filenames
-    success, encoded_img = cv2.imencode(ext if ext else ".jpg", image)
-    if success:
-        with open(output_path, "wb") as f:
-            f.write(encoded_img)
-    else:
+    with STAGE_SECONDS.time("encode"):
+        success, encoded_img = cv2.imencode(ext, image)
+    if not success:
         raise IOError(f"Failed to encode image for writing to {output_path}")
+    ENCODED_BYTES.inc(encoded_img.size)
+    if writer is not None:
+        writer(output_filename, encoded_img.tobytes())
+        return output_filename
 
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(encoded_img)
     return os.path.abspath(output_path)
 
 
@@ -67,7 +73,9 @@ def draw_line(
 
 def main():
     parser = argparse.ArgumentParser(description="Draw lines on an image.")
-    parser.add_argument("image_file", type=str, help="Path to the image file.")
+    parser.add_argument(
+        "image_file", type=str, help="Path to the image file, or '-' to read it from stdin."
+    )
     parser.add_argument(
         "--heights",
         type=int,
@@ -88,6 +96,14 @@ def main():
         default="result",
         help="The directory to save the output image.",
     )
+    parser.add_argument(
+        "-om",
+        "--output_mode",
+        type=str,
+        default="files",
+        choices=("files", "image"),
+        help="Save the image into the output directory, or write the encoded image to stdout.",
+    )
     args = parser.parse_args()
 
     try:
@@ -97,9 +113,14 @@ def main():
     except ValueError as e:
         raise ValueError(f"Invalid color format: {e}") from e
 
-    result_path = draw_line_from_file(
-        args.image_file, args.heights, color, args.output_dir
-    )
+    image_file = read_source(args.image_file)
+    if args.output_mode == "image":
+        with binary_stdout() as out:
+            draw_line_from_file(
+                image_file, args.heights, color, writer=lambda filename, data: out.write(data)
+            )
+        return
+    result_path = draw_line_from_file(image_file, args.heights, color, args.output_dir)
     print(f"Image saved to: {result_path}")
 
 
@@ -0,0 +1,147 @@
+import contextlib
+import threading
+from dataclasses import dataclass
+
+from .image_io import ImageHeader, check_limits, probe_image_header
+
+# Decoded BGR image (3 bytes), grayscale copy (1 byte) and the float64
+# temporaries of the row statistics (2 x 8 bytes) per pixel
+BYTES_PER_PIXEL = 20
+# Bytes per pixel of the decoded BGR image alone
+BGR_BYTES_PER_PIXEL = 3
+# Decode reductions supported by cv2.IMREAD_REDUCED_COLOR_*
+REDUCE_FACTORS = (2, 4, 8)
+# Formats whose decoders reduce while decoding (JPEG scales its DCT blocks);
+# the others are decoded at full resolution and then shrunk
+REDUCED_DECODE_FORMATS = ("jpeg",)
+
+
+def estimate_decoded_bytes(header: ImageHeader, reduce_factor: int = 1) -> int:
+    """
+    Estimates the peak memory needed to segment an image.
+
+    :param header: The image header, see :func:`image_io.probe_image_header`.
+    :param reduce_factor: Factor by which both dimensions are reduced on decode.
+    :return: The estimated number of bytes.
+    """
+    width = -(-header.width // reduce_factor)
+    height = -(-header.height // reduce_factor)
+    return width * height * BYTES_PER_PIXEL
+
+
+@dataclass
+class Admission:
+    """
+    How a job admitted by :class:`MemoryGovernor` should be processed.
+
+    :param header: The probed image header.
+    :param strategy: ``"full"`` for a full-resolution decode or ``"reduced"``
+                     for a reduced decode used for detection.
+    :param reduce_factor: Factor to pass to the decoder (1 for ``"full"``).
+    :param nbytes: Bytes reserved from the budget for this job.
+    """
+
+    header: ImageHeader
+    strategy: str
+    reduce_factor: int
+    nbytes: int
+
+
+class MemoryGovernor:
+    """
+    Admits segmentation jobs against a global memory budget.
+
+    The decoded size of each image is estimated from its header. Jobs wait
+    until their estimate fits into the remaining budget; a job larger than the
+    whole budget is admitted once nothing else is running. Images whose
+    estimate exceeds ``large_image_bytes`` are routed to a reduced decode, using
+    the smallest reduction that brings them under that size.
+
+    Only JPEG is decoded directly at the reduced size. Other formats such as
+    PNG are decoded at full resolution and shrunk afterwards, so their
+    reservation also covers the full-resolution BGR image; a reduced decode
+    then only saves the memory of the detection.
+
+    The governor is thread-safe; share one instance between all threads that
+    segment images in a process.
+
+    :param budget_bytes: Total bytes that admitted jobs may use at once.
+    :param large_image_bytes: Estimate above which images use a reduced
+                              decode. None disables the reduced strategy.
+    """
+
+    def __init__(self, budget_bytes: int, large_image_bytes: int | None = None):
+        self.budget_bytes = budget_bytes
+        self.large_image_bytes = large_image_bytes
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def plan(self, source: str | bytes, full_image: bool = False) -> Admission:
+        """
+        Chooses the strategy for an image without reserving memory.
+
+        :param source: Path to the image file or the encoded image bytes.
+        :param full_image: Whether the job also needs the full-resolution image
+                           afterwards, e.g. to export segments.
+        :return: The planned admission.
+        :raises ImageTooLargeError: If the header exceeds the image size limits.
+        """
+        header = probe_image_header(source)
+        check_limits(header)
+        reduce_factor = 1
+        nbytes = estimate_decoded_bytes(header)
+        if self.large_image_bytes is not None and nbytes > self.large_image_bytes:
+            for reduce_factor in REDUCE_FACTORS:
+                nbytes = estimate_decoded_bytes(header, reduce_factor)
+                if nbytes <= self.large_image_bytes:
+                    break
+            if header.format not in REDUCED_DECODE_FORMATS:
+                nbytes += header.pixels * BGR_BYTES_PER_PIXEL
+        if full_image:
+            nbytes = max(nbytes, header.pixels * BGR_BYTES_PER_PIXEL)
+        strategy = "full" if reduce_factor == 1 else "reduced"
+        return Admission(header, strategy, reduce_factor, nbytes)
+
+    def acquire(self, nbytes: int, timeout: float | None = None) -> bool:
+        """
+        Blocks until ``nbytes`` fit into the budget and reserves them.
+
+        :param nbytes: The number of bytes to reserve.
+        :param timeout: Maximum seconds to wait, or None to wait forever.
+        :return: True if the bytes were reserved, False on timeout.
+        """
+        nbytes = min(nbytes, self.budget_bytes)
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self.in_use + nbytes <= self.budget_bytes, timeout
+            ):
+                return False
+            self.in_use += nbytes
+            return True
+
+    def release(self, nbytes: int):
+        """
+        Returns bytes reserved with :meth:`acquire` to the budget.
+
+        :param nbytes: The number of bytes passed to :meth:`acquire`.
+        """
+        nbytes = min(nbytes, self.budget_bytes)
+        with self._condition:
+            self.in_use -= nbytes
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, source: str | bytes, full_image: bool = False):
+        """
+        Plans a job, waits for its memory and releases it on exit.
+
+        :param source: Path to the image file or the encoded image bytes.
+        :param full_image: Whether the job also needs the full-resolution image.
+        :return: A context manager yielding the :class:`Admission`.
+        """
+        admission = self.plan(source, full_image)
+        self.acquire(admission.nbytes)
+        try:
+            yield admission
+        finally:
+            self.release(admission.nbytes)
@@ -0,0 +1,277 @@
+import struct
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from .backend import cv2, decode_pil, get_backend
+from .metrics import DECODE_FAILURES, STAGE_SECONDS
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG color type -> number of channels
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic)
+JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+# OpenCV decode flag for each supported reduction factor, in color and
+# grayscale; names are resolved on use so OpenCV is only imported if needed
+DECODE_FLAGS = {
+    (1, False): "IMREAD_COLOR",
+    (2, False): "IMREAD_REDUCED_COLOR_2",
+    (4, False): "IMREAD_REDUCED_COLOR_4",
+    (8, False): "IMREAD_REDUCED_COLOR_8",
+    (1, True): "IMREAD_GRAYSCALE",
+    (2, True): "IMREAD_REDUCED_GRAYSCALE_2",
+    (4, True): "IMREAD_REDUCED_GRAYSCALE_4",
+    (8, True): "IMREAD_REDUCED_GRAYSCALE_8",
+}
+
+
+class ImageTooLargeError(IOError):
+    """Raised when an image header declares a size above the configured limits."""
+
+
+@dataclass
+class ImageLimits:
+    """
+    Size limits enforced from the header before an image is decoded.
+
+    :param max_pixels: Maximum width x height.
+    :param max_width: Maximum width in pixels.
+    :param max_height: Maximum height in pixels.
+    """
+
+    max_pixels: int = 400_000_000
+    max_width: int = 100_000
+    max_height: int = 2_000_000
+
+
+# Limits used when none are passed; change its fields to configure a process
+DEFAULT_LIMITS = ImageLimits()
+
+
+@dataclass
+class ImageHeader:
+    """
+    Image properties read from the file header without decoding pixels.
+
+    :param width: Width in pixels.
+    :param height: Height in pixels.
+    :param channels: Number of stored channels.
+    :param bit_depth: Bits per channel sample.
+    :param format: ``"png"``, ``"jpeg"`` or the Pillow format name in lower case.
+    """
+
+    width: int
+    height: int
+    channels: int
+    bit_depth: int
+    format: str
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def _read_head(source: str | bytes, size: int) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:size])
+    with open(source, "rb") as f:
+        return f.read(size)
+
+
+def _probe_png(head: bytes) -> ImageHeader | None:
+    # Signature, then the IHDR chunk: length, type, width, height, depth, color
+    if len(head) < 26 or head[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", head[16:26])
+    return ImageHeader(width, height, PNG_CHANNELS.get(color_type, 3), bit_depth, "png")
+
+
+def _probe_jpeg(source: str | bytes) -> ImageHeader | None:
+    # Walk the marker segments until a start-of-frame marker. APPn segments
+    # (e.g. EXIF thumbnails) can be large, so read as we go.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        stream = BytesIO(source)
+    else:
+        stream = open(source, "rb")
+    with stream:
+        stream.seek(2)
+        while True:
+            marker = stream.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            if code == 0xFF:
+                # Fill byte before the actual marker
+                stream.seek(-1, 1)
+                continue
+            if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+                # Markers without a length field
+                continue
+            length_bytes = stream.read(2)
+            if len(length_bytes) < 2:
+                return None
+            (length,) = struct.unpack(">H", length_bytes)
+            if code in JPEG_SOF_MARKERS:
+                frame = stream.read(6)
+                if len(frame) < 6:
+                    return None
+                bit_depth, height, width, channels = struct.unpack(">BHHB", frame)
+                return ImageHeader(width, height, channels, bit_depth, "jpeg")
+            if code == 0xDA:
+                # Start of scan before any frame header
+                return None
+            stream.seek(length - 2, 1)
+
+
+def probe_image_header(source: str | bytes) -> ImageHeader:
+    """
+    Reads the dimensions, channels and bit depth of an encoded image.
+
+    PNG (IHDR) and JPEG (SOF) headers are parsed directly from the first bytes
+    of the file. Other formats fall back to Pillow, which also only reads the
+    header.
+
+    :param source: Path to the image file or the encoded image bytes.
+    :return: The parsed header.
+    """
+    try:
+        head = _read_head(source, 32)
+        header = None
+        if head.startswith(PNG_SIGNATURE):
+            header = _probe_png(head)
+        elif head.startswith(b"\xff\xd8"):
+            header = _probe_jpeg(source)
+        if header is not None:
+            return header
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = BytesIO(source)
+        with Image.open(source) as img:
+            width, height = img.size
+            channels = len(img.getbands())
+            bit_depth = 16 if img.mode.startswith("I;16") else 8
+            return ImageHeader(width, height, channels, bit_depth, img.format.lower())
+    except Exception as e:
+        raise IOError(f"Failed to read image header: {e}")
+
+
+def check_limits(header: ImageHeader, limits: ImageLimits | None = None):
+    """
+    Rejects images whose declared size exceeds the limits.
+
+    :param header: The probed image header.
+    :param limits: The limits to enforce. Defaults to :data:`DEFAULT_LIMITS`.
+    :raises ImageTooLargeError: If any limit is exceeded.
+    """
+    limits = limits or DEFAULT_LIMITS
+    if (
+        header.width > limits.max_width
+        or header.height > limits.max_height
+        or header.pixels > limits.max_pixels
+    ):
+        raise ImageTooLargeError(
+            f"Image of {header.width}x{header.height} pixels exceeds the limits "
+            f"({limits.max_width}x{limits.max_height}, {limits.max_pixels} pixels)"
+        )
+
+
+def choose_reduce_factor(header: ImageHeader, max_decode_pixels: int | None) -> int:
+    """
+    Chooses the smallest decode reduction that fits a pixel budget.
+
+    :param header: The probed image header.
+    :param max_decode_pixels: Maximum number of decoded pixels, or None for
+                              a full-resolution decode.
+    :return: 1, 2, 4 or 8.
+    """
+    if max_decode_pixels is None:
+        return 1
+    for reduce_factor in (1, 2, 4):
+        if header.pixels // (reduce_factor * reduce_factor) <= max_decode_pixels:
+            return reduce_factor
+    return 8
+
+
+def load_image(
+    source: str | bytes,
+    reduce_factor: int = 1,
+    grayscale: bool = False,
+    limits: ImageLimits | None = None,
+    max_decode_pixels: int | None = None,
+    name: str | None = None,
+) -> np.ndarray:
+    """
+    Reads and decodes an image after checking its header against the limits.
+
+    The header is probed from the encoded bytes first, so an oversized or
+    malicious image is rejected before any pixel memory is allocated. The
+    decode flag is then chosen from the requested reduction and color mode,
+    so reduced or grayscale decodes never build the full BGR image for JPEG.
+    With the numpy backend (see :func:`backend.set_backend`) the image is
+    decoded with Pillow instead of OpenCV.
+
+    :param source: Path to the image file or the encoded image bytes.
+    :param reduce_factor: Decode at 1/2, 1/4 or 1/8 of the size if 2, 4 or 8.
+    :param grayscale: Decode a single grayscale channel instead of BGR.
+    :param limits: Size limits to enforce. Defaults to :data:`DEFAULT_LIMITS`.
+    :param max_decode_pixels: If given, the reduction is raised as needed so
+                              the decoded image has at most this many pixels.
+    :param name: Name of the image used in error messages when ``source`` is
+                 bytes.
+    :return: The decoded image.
+    :raises ImageTooLargeError: If the header exceeds the limits.
+    :raises IOError: If the image cannot be read or decoded.
+    """
+    start = time.perf_counter()
+    try:
+        img = _load_image(source, reduce_factor, grayscale, limits, max_decode_pixels, name)
+    except ImageTooLargeError:
+        raise
+    except IOError:
+        DECODE_FAILURES.inc()
+        raise
+    STAGE_SECONDS.observe("decode", time.perf_counter() - start)
+    return img
+
+
+def _load_image(
+    source: str | bytes,
+    reduce_factor: int,
+    grayscale: bool,
+    limits: ImageLimits | None,
+    max_decode_pixels: int | None,
+    name: str | None,
+) -> np.ndarray:
+    if name is None:
+        name = source if isinstance(source, str) else "<bytes>"
+    try:
+        if isinstance(source, str):
+            # Read image as a byte stream to handle non-ASCII file paths
+            img_data = np.fromfile(source, np.uint8)
+        else:
+            img_data = np.frombuffer(source, np.uint8)
+    except Exception as e:
+        raise IOError(f"Failed to read image file: {e}")
+
+    header = probe_image_header(img_data.data)
+    check_limits(header, limits)
+    reduce_factor = max(reduce_factor, choose_reduce_factor(header, max_decode_pixels))
+
+    try:
+        if get_backend() == "numpy":
+            img = decode_pil(img_data, reduce_factor, grayscale)
+        else:
+            flag = getattr(cv2, DECODE_FLAGS[reduce_factor, grayscale])
+            img = cv2.imdecode(img_data, flag)
+        if img is None:
+            raise FileNotFoundError(
+                f"Image not found or could not be decoded at path: {name}"
+            )
+    except Exception as e:
+        raise IOError(f"Failed to read image file: {e}")
+    return img
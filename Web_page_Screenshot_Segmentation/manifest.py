@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class SegmentRecord:
+    """
+    Describes one exported segment without referring to its pixel data.
+
+    :param index: Position of the segment in top-to-bottom order.
+    :param y0: First row of the segment in the source image.
+    :param y1: Row after the last row of the segment in the source image.
+    :param x0: First column kept after auto-crop.
+    :param x1: Column after the last column kept after auto-crop.
+    :param byte_size: Size of the encoded segment in bytes.
+    :param sha256: Hex SHA-256 digest of the encoded segment.
+    :param y0_detector: Detector that produced the top boundary
+                        (``"blank"``, ``"color"``, ``"blank+color"``, ``"edge"``
+                        for the image border or ``"manual"`` for given heights).
+    :param y1_detector: Detector that produced the bottom boundary.
+    :param file: File name of the segment inside the output directory.
+    :param duplicate_of: Index of the segment this one duplicates. Duplicates
+                         are not encoded; they reuse that segment's file and
+                         hash and report a ``byte_size`` of 0.
+    :param width: Width of the encoded segment if it was resized on export.
+    :param height: Height of the encoded segment if it was resized on export.
+    """
+
+    index: int
+    y0: int
+    y1: int
+    x0: int
+    x1: int
+    byte_size: int
+    sha256: str
+    y0_detector: str
+    y1_detector: str
+    file: str | None = None
+    duplicate_of: int | None = None
+    width: int | None = None
+    height: int | None = None
+
+
+@dataclass
+class SegmentManifest:
+    """
+    Structured result of a segment export, also written as ``manifest.json``.
+
+    :param source: Path of the source image, if it came from a file.
+    :param width: Width of the source image.
+    :param height: Height of the source image.
+    :param output_dir: Absolute path of the directory holding the segments.
+    :param segments: One record per exported segment.
+    :param thresholds: The blank and color thresholds, if they were derived
+                       from the image (``auto_thresholds``).
+    :param degraded: Whether the split points were detected on a reduced
+                     decode or sampled columns to meet a deadline.
+    """
+
+    source: str | None
+    width: int
+    height: int
+    output_dir: str
+    segments: list[SegmentRecord] = field(default_factory=list)
+    thresholds: dict[str, float] | None = None
+    degraded: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def write(self, filename: str = "manifest.json") -> str:
+        """
+        Writes the manifest as JSON into the output directory.
+
+        :param filename: Name of the manifest file.
+        :return: The absolute path to the written manifest.
+        """
+        manifest_path = os.path.join(self.output_dir, filename)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+        return os.path.abspath(manifest_path)
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Returns the hex SHA-256 digest used to identify encoded segments.
+
+    :param data: The encoded segment bytes.
+    :return: The hex digest.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def label_boundaries(heights: list[int], candidates: dict[str, list[int]]) -> list[str]:
+    """
+    Names the detectors responsible for each merged split height.
+
+    :param heights: The merged split heights.
+    :param candidates: The candidate heights produced by each detector.
+    :return: One label per height, joining the names of all detectors that
+             produced it with ``+``, e.g. ``"blank+color"``.
+    """
+    found = {name: set(rows) for name, rows in candidates.items()}
+    return [
+        "+".join(name for name, rows in found.items() if height in rows)
+        for height in heights
+    ]
@@ -1,10 +1,45 @@
-import cv2
+import contextlib
+import json
 import os
 import argparse
+import time
 import numpy as np
-from .blank_spliter import find_height_spliter
-from .color_spliter import color_height_spliter
+from .backend import BACKENDS, cv2, set_backend, to_gray
+from .calibrate import calibrate_thresholds, threshold_values
+from .candidates import (
+    MERGE_POLICIES,
+    candidate_labels,
+    merge_candidates,
+    scale_candidates,
+)
+from .columns import content_columns, sample_columns
+from .control import RunControl
+from .dedup import SegmentDeduplicator
+from .detectors import DEFAULT_DETECTORS, DetectorParams, RowProfile, run_detectors
 from .drawer import draw_line
+from .governor import MemoryGovernor
+from .image_io import choose_reduce_factor, load_image, probe_image_header
+from .preview import render_preview
+from .resize import downscale, fit_size
+from .results import RESULT_FORMATS, ResultsWriter, image_record
+from .manifest import SegmentManifest, SegmentRecord, content_hash
+from .metrics import (
+    ENCODED_BYTES,
+    IMAGES_PROCESSED,
+    PIXELS_ANALYZED,
+    REGISTRY,
+    ROWS_ANALYZED,
+    SEGMENTS_EMITTED,
+    STAGE_SECONDS,
+)
+from .templates import TemplateCache, TemplateEntry, layout_signature
+from .workspace import Workspace, scratch
+from .streams import TarWriter, Writer, binary_stdout, read_source, source_name
+
+
+# Output modes of the CLI: "text" prints the result, the others write only
+# the heights (json), the segments (tar) or the preview image to stdout
+OUTPUT_MODES = ("text", "json", "tar", "preview")
 
 
 def remove_close_values(
@@ -41,11 +76,25 @@ def remove_close_values(
     return result
 
 
-def auto_crop_image(
-    image: np.ndarray, threshold: int = 240, min_width: int = 50
+def _workspace_gray(
+    image: np.ndarray, workspace: Workspace | None, name: str = "gray"
 ) -> np.ndarray:
     """
-    Automatically crops blank/white areas from left and right edges using OpenCV.
+    Converts an image to grayscale into a workspace buffer, if there is one.
+    """
+    if image.ndim == 2:
+        return image
+    return to_gray(image, dst=scratch(workspace, name, image.shape[:2], np.uint8))
+
+
+def auto_crop_bounds(
+    image: np.ndarray,
+    threshold: int = 240,
+    min_width: int = 50,
+    workspace: Workspace | None = None,
+) -> tuple[int, int]:
+    """
+    Finds the column range left after cropping blank left/right edges.
 
     This function intelligently identifies content (text/graphics with contrast) vs blank areas.
     It detects columns with text/content by analyzing pixel contrast and variation, then
@@ -55,50 +104,36 @@ def auto_crop_image(
     :param threshold: Pixel value threshold for detecting blank areas (0-255).
                       Used to identify truly blank (uniform) regions.
     :param min_width: Minimum width to keep (prevents over-cropping).
-    :return: The cropped image with blank left/right edges removed.
+    :param workspace: If given, the grayscale copy and the column statistics
+                      use its buffers, see :class:`workspace.Workspace`.
+    :return: The ``(left, right)`` column bounds of the content, where
+             ``right`` is exclusive. The full width is returned when nothing
+             should be cropped.
     """
+    full_width = (0, image.shape[1])
     if image.shape[1] <= min_width:
-        return image
+        return full_width
 
-    # Convert to grayscale for analysis
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
+    # Convert to grayscale for analysis; the image itself is only read
+    gray = _workspace_gray(image, workspace, "crop.gray")
 
     # Detect content by finding columns with significant variation/contrast
-    # Text and graphics have variation, blank areas are uniform
-    col_variance = np.var(gray, axis=0)  # Variance of pixel values in each column
-    
-    # Also check for columns with darker pixels (content is typically darker than white background)
-    col_min = np.min(gray, axis=0)  # Minimum pixel value in each column
-
-    # A column has content if:
-    # 1. It has significant variance (text/graphics have varying pixel values)
-    # 2. OR it has darker pixels (min value significantly below threshold)
-    
-    # Normalize variance to 0-1 range for comparison
-    max_variance = np.max(col_variance) if np.max(col_variance) > 0 else 1
-    normalized_variance = col_variance / max_variance
-    
-    # Detect columns with content: high variance OR dark pixels present
-    has_variance = normalized_variance > 0.05  # At least 5% of max variance
-    has_dark_pixels = col_min < (threshold - 30)  # Pixels noticeably darker than threshold
-    has_content = has_variance | has_dark_pixels
+    # or darker pixels; text and graphics have variation, blank areas are uniform
+    has_content = content_columns(gray, threshold, workspace=workspace)
 
     # Find first and last columns with content
     content_cols = np.where(has_content)[0]
 
     if len(content_cols) == 0:
-        # No content found, return original
-        return image
+        # No content found, keep original
+        return full_width
 
     left = max(0, content_cols[0])
     right = min(image.shape[1], content_cols[-1] + 1)
 
     # Ensure minimum width
     if right - left < min_width:
-        return image
+        return full_width
 
     # Additional safety: only crop if we're removing at least 5 pixels on each side
     # to avoid cropping for minor imperfections
@@ -107,13 +142,350 @@ def auto_crop_image(
     
     if left_margin < 5 and right_margin < 5:
         # Not enough blank margin, keep original
-        return image
+        return full_width
+
+    return int(left), int(right)
 
+
+def auto_crop_image(
+    image: np.ndarray,
+    threshold: int = 240,
+    min_width: int = 50,
+    workspace: Workspace | None = None,
+) -> np.ndarray:
+    """
+    Automatically crops blank/white areas from left and right edges using OpenCV.
+
+    See :func:`auto_crop_bounds` for how content columns are detected.
+
+    :param image: The input image as a NumPy array (BGR format).
+    :param threshold: Pixel value threshold for detecting blank areas (0-255).
+    :param min_width: Minimum width to keep (prevents over-cropping).
+    :param workspace: Reused buffers for the analysis, see :func:`auto_crop_bounds`.
+    :return: The cropped image with blank left/right edges removed.
+    """
+    left, right = auto_crop_bounds(image, threshold, min_width, workspace)
+    if (left, right) == (0, image.shape[1]):
+        return image
     return image[:, left:right]
 
 
-def split_heights(
+def _analyzed_gray(
+    gray: np.ndarray,
+    scale: int,
+    columns: tuple[int, int] | str | None,
+    column_stride: int,
+    row_stride: int,
+) -> np.ndarray:
+    """
+    Restricts a grayscale image decoded at ``1 / scale`` to the analyzed columns.
+
+    :raises ValueError: If an ``(x0, x1)`` band is empty or outside the image.
+    """
+    if columns is not None and columns != "auto":
+        x0, x1 = columns
+        width = gray.shape[1] * scale
+        if not 0 <= x0 < x1 <= width:
+            raise ValueError(
+                f"Invalid column band ({x0}, {x1}): needs 0 <= x0 < x1 <= {width}, "
+                "the image width"
+            )
+        columns = (x0 // scale, -(-x1 // scale))
+    return sample_columns(gray, columns, column_stride, row_stride)
+
+
+def _detect_candidates(
+    img: np.ndarray,
+    height_threshold: int,
+    variation_threshold: float,
+    color_threshold: int,
+    color_variation_threshold: int,
+    scale: int = 1,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+    detectors: list[str] | None = None,
+    timings: dict | None = None,
+    auto_thresholds: bool = False,
+    thresholds: dict | None = None,
+    control: RunControl | None = None,
+    analyzed: np.ndarray | None = None,
+    workspace: Workspace | None = None,
+    statistics: dict | None = None,
+) -> np.ndarray:
+    """
+    Runs the selected detectors on a decoded image.
+
+    :param scale: Reduction factor the image was decoded with. Row thresholds
+                  and the column band are divided by it and the candidates are
+                  returned in full-resolution rows.
+    :param columns: Column band for the detectors; ``"auto"`` is resolved once
+                    here and shared by all detectors.
+    :param detectors: Names of the registered detectors to run, see
+                      :data:`detectors.DETECTORS`. Defaults to blank and color.
+    :param timings: If given, receives the wall time of each detector.
+    :param auto_thresholds: Whether to derive the blank and color thresholds
+                            from the image, see
+                            :func:`calibrate.calibrate_thresholds`.
+    :param thresholds: If given, receives the blank and color thresholds used.
+    :param control: If given, the row statistics report progress to it and
+                    stop when it is cancelled or past its deadline.
+    :param analyzed: The analyzed columns of the grayscale image, if
+                     :func:`_analyzed_gray` was already called.
+    :param workspace: If given, the grayscale copy and the temporaries of the
+                      row statistics use its buffers.
+    :param statistics: If given, receives the per-row statistics the detectors
+                       computed, see :meth:`detectors.RowProfile.statistics`.
+    :return: The candidate table of all detectors.
+    """
+    start = time.perf_counter()
+    if analyzed is None:
+        gray = _workspace_gray(img, workspace)
+        analyzed = _analyzed_gray(gray, scale, columns, column_stride, row_stride)
+    profile = RowProfile(analyzed, control=control, workspace=workspace)
+    params = DetectorParams(
+        height_threshold, variation_threshold, color_threshold, color_variation_threshold
+    ).scaled(scale)
+    if auto_thresholds:
+        params = calibrate_thresholds(profile, params)
+    if thresholds is not None:
+        thresholds.update(threshold_values(params))
+    candidates = run_detectors(profile, params, detectors, timings=timings)
+    if statistics is not None:
+        statistics.update(profile.statistics())
+    STAGE_SECONDS.observe("detect", time.perf_counter() - start)
+    IMAGES_PROCESSED.inc()
+    ROWS_ANALYZED.inc(profile.gray.shape[0])
+    PIXELS_ANALYZED.inc(profile.gray.size)
+    return scale_candidates(candidates, scale)
+
+
+def _detect_heights(
+    img: np.ndarray,
+    height_threshold: int,
+    variation_threshold: float,
+    color_threshold: int,
+    color_variation_threshold: int,
+    merge_threshold: int,
+    scale: int = 1,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+    detectors: list[str] | None = None,
+    timings: dict | None = None,
+    merge_policy: str = "first",
+    auto_thresholds: bool = False,
+    thresholds: dict | None = None,
+    control: RunControl | None = None,
+    template_cache: TemplateCache | None = None,
+    workspace: Workspace | None = None,
+    analysis: dict | None = None,
+) -> tuple[list[int], list[str]]:
+    """
+    Runs the selected detectors on a decoded image and merges their split points.
+
+    See :func:`_detect_candidates` for the detection parameters and
+    :func:`candidates.merge_candidates` for ``merge_policy``. With a
+    ``template_cache``, the heights of a verified matching template are
+    returned without running the detectors, and the heights of any other
+    image are added to the cache.
+
+    If ``analysis`` is given, it receives a summary of the detection for
+    :func:`results.image_record`: the image ``width`` and ``height``, the
+    ``heights``, their ``labels`` and candidate ``scores`` (NaN for reused
+    heights), whether a ``template`` was reused, the ``seconds`` of the
+    ``detect`` and ``merge`` stages, and the per-row ``statistics`` of the
+    analyzed image, whose rows are ``row_scale`` full-resolution rows.
+
+    :return: The merged split heights and the detector label of each height.
+    """
+    start = time.perf_counter()
+    statistics = None
+    if analysis is not None:
+        seconds = analysis.setdefault("seconds", {})
+        statistics = analysis.setdefault("statistics", {})
+        analysis.update(
+            width=img.shape[1] * scale, height=img.shape[0] * scale, row_scale=scale
+        )
+    analyzed = None
+    if template_cache is not None:
+        gray = _workspace_gray(img, workspace)
+        analyzed = _analyzed_gray(gray, scale, columns, column_stride, row_stride)
+        signature = layout_signature(gray)
+        width, height = gray.shape[1] * scale, gray.shape[0] * scale
+        key = json.dumps(
+            [
+                height_threshold,
+                variation_threshold,
+                color_threshold,
+                color_variation_threshold,
+                merge_threshold,
+                scale,
+                columns,
+                column_stride,
+                row_stride,
+                list(detectors or DEFAULT_DETECTORS),
+                merge_policy,
+                auto_thresholds,
+            ]
+        )
+        entry = template_cache.lookup(
+            signature, width, height, key, analyzed, scale, time.perf_counter() - start
+        )
+        if entry is not None:
+            # The image counts as processed even though no detector ran
+            IMAGES_PROCESSED.inc()
+            ROWS_ANALYZED.inc(analyzed.shape[0])
+            PIXELS_ANALYZED.inc(analyzed.size)
+            if thresholds is not None:
+                thresholds.update(entry.thresholds)
+            if analysis is not None:
+                seconds["template"] = time.perf_counter() - start
+                analysis.update(
+                    heights=list(entry.heights),
+                    labels=list(entry.labels),
+                    scores=[float("nan")] * len(entry.heights),
+                    template=True,
+                )
+            return list(entry.heights), list(entry.labels)
+        # The template is built from the thresholds actually used
+        thresholds = {} if thresholds is None else thresholds
+        img = gray
+
+    candidates = _detect_candidates(
+        img,
+        height_threshold,
+        variation_threshold,
+        color_threshold,
+        color_variation_threshold,
+        scale,
+        columns,
+        column_stride,
+        row_stride,
+        detectors,
+        timings,
+        auto_thresholds,
+        thresholds,
+        control,
+        analyzed,
+        workspace,
+        statistics,
+    )
+    merged = time.perf_counter()
+    with STAGE_SECONDS.time("merge"):
+        kept = merge_candidates(
+            candidates, merge_threshold // scale * scale, 200 // scale * scale, merge_policy
+        )
+        heights, labels = kept["row"].tolist(), candidate_labels(kept, candidates)
+    if analysis is not None:
+        seconds["detect"] = merged - start
+        seconds["merge"] = time.perf_counter() - merged
+        analysis.update(
+            heights=heights, labels=labels, scores=kept["score"].tolist(), template=False
+        )
+    if template_cache is not None:
+        template_cache.store(
+            TemplateEntry(
+                width,
+                height,
+                key,
+                signature,
+                heights,
+                labels,
+                dict(thresholds),
+                height_threshold,
+                time.perf_counter() - start,
+            )
+        )
+    return heights, labels
+
+
+def _planned(
+    control: RunControl | None,
+    file_path: str | bytes,
+    reduce_factor: int,
+    column_stride: int,
+    max_decode_pixels: int | None = None,
+    export: bool = False,
+) -> tuple[int, int]:
+    """
+    Raises the reduction to fit ``max_decode_pixels`` and lets the run
+    control pick a cheaper strategy if its budget is short. ``export`` tells
+    the control that the segments are exported afterwards.
+
+    :return: The reduce factor and column stride to use.
+    """
+    if control is None and max_decode_pixels is None:
+        return reduce_factor, column_stride
+    header = probe_image_header(file_path)
+    reduce_factor = max(reduce_factor, choose_reduce_factor(header, max_decode_pixels))
+    if control is None:
+        return reduce_factor, column_stride
+    return control.plan(header, reduce_factor, column_stride, export)
+
+
+@contextlib.contextmanager
+def _governed(governor: MemoryGovernor | None, file_path: str, full_image: bool):
+    """
+    Admits a job through the governor and yields its decode reduction factor.
+    """
+    if governor is None:
+        yield 1
+        return
+    with governor.admit(file_path, full_image) as admission:
+        yield admission.reduce_factor
+
+
+def detect_candidates(
     file_path: str,
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    governor: MemoryGovernor | None = None,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+    detectors: list[str] | None = None,
+    timings: dict | None = None,
+    auto_thresholds: bool = False,
+    thresholds: dict | None = None,
+) -> np.ndarray:
+    """
+    Finds all split candidates of an image without merging them.
+
+    The result is a NumPy structured array with the fields ``row``, ``start``,
+    ``end`` (the rows the separator spans), ``score`` and ``source`` (the
+    detector name). Pass it to :func:`candidates.merge_candidates` to apply a
+    merge policy; re-merging takes microseconds, so different policies and
+    merge thresholds can be tried without running the detectors again.
+
+    :param file_path: Path to the image file.
+    :return: The candidate table, in full-resolution rows.
+
+    The other parameters are the same as in :func:`split_heights`.
+    """
+    with _governed(governor, file_path, full_image=False) as reduce_factor:
+        img = load_image(file_path, reduce_factor)
+        return _detect_candidates(
+            img,
+            height_threshold,
+            variation_threshold,
+            color_threshold,
+            color_variation_threshold,
+            scale=reduce_factor,
+            columns=columns,
+            column_stride=column_stride,
+            row_stride=row_stride,
+            detectors=detectors,
+            timings=timings,
+            auto_thresholds=auto_thresholds,
+            thresholds=thresholds,
+        )
+
+
+def split_heights(
+    file_path: str | bytes,
     split: bool = False,
     output_dir: str = "result",
     height_threshold: int = 102,
@@ -121,6 +493,25 @@ def split_heights(
     color_threshold: int = 100,
     color_variation_threshold: int = 15,
     merge_threshold: int = 350,
+    governor: MemoryGovernor | None = None,
+    full_resolution: bool = False,
+    preview_max_dim: int = 2048,
+    preview_labels: bool = False,
+    contact_sheet: bool = False,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+    detectors: list[str] | None = None,
+    timings: dict | None = None,
+    merge_policy: str = "first",
+    writer: Writer | None = None,
+    auto_thresholds: bool = False,
+    thresholds: dict | None = None,
+    control: RunControl | None = None,
+    template_cache: TemplateCache | None = None,
+    workspace: Workspace | None = None,
+    analysis: dict | None = None,
+    max_decode_pixels: int | None = None,
 ) -> list[int] | str:
     """
     Splits a long web page screenshot into several parts based on visual cues.
@@ -129,58 +520,365 @@ def split_heights(
     low variation regions (blank spaces) and color differences. It can return
     the heights of the split lines or save the split image with the lines drawn.
 
-    :param file_path: Path to the image file.
-    :param split: If True, saves the image with split lines drawn.
+    :param file_path: Path to the image file, or the encoded image bytes.
+    :param split: If True, saves a preview of the image with split lines drawn.
     :param output_dir: The directory to save the split image.
     :param height_threshold: The height threshold for low variation regions.
     :param variation_threshold: The variation threshold for low variation regions.
     :param color_threshold: The threshold for color differences.
     :param color_variation_threshold: The threshold for color difference variations.
     :param merge_threshold: The minimum distance between two split lines.
+    :param governor: Optional memory governor that admits the job against a
+                     shared budget. Large images are then detected on a reduced
+                     decode, and the split image is saved at that reduced size.
+    :param full_resolution: If True, draws the lines on the decoded image
+                            instead of a downscaled preview (at the reduced
+                            size if the image was decoded reduced).
+    :param preview_max_dim: Maximum width and height of the preview.
+    :param preview_labels: Whether to label each segment in the preview.
+    :param contact_sheet: Whether to lay the preview out as side-by-side
+                          columns of segments.
+    :param columns: Column band the detectors analyze: ``None`` for the full
+                    width, an ``(x0, x1)`` band with ``0 <= x0 < x1 <= width``
+                    (a ValueError otherwise), or ``"auto"`` for the widest
+                    band of content columns (leaves out scrollbars and
+                    sidebars separated by a blank gutter).
+    :param column_stride: Analyze only every ``column_stride``-th column.
+    :param row_stride: Use every ``row_stride``-th row for the column
+                       statistics of ``columns="auto"``.
+    :param detectors: Names of the detectors to run: ``"blank"``, ``"color"``,
+                      ``"rule"`` (thin horizontal lines), ``"band"``
+                      (background band changes) or any detector added with
+                      :func:`detectors.register_detector`. Defaults to
+                      ``["blank", "color"]``. The detectors run concurrently.
+    :param timings: If given, the wall time of each detector in seconds is
+                    stored in it under the detector name.
+    :param merge_policy: How to choose among candidates closer than
+                         ``merge_threshold``: ``"first"`` keeps the topmost,
+                         ``"score"`` the strongest. See
+                         :func:`candidates.merge_candidates`.
+    :param writer: If given, the encoded preview is passed to it as
+                   ``(file name, bytes)`` instead of being saved into
+                   ``output_dir``, e.g. a :class:`streams.TarWriter`.
+    :param auto_thresholds: If True, ``variation_threshold``,
+                            ``color_threshold`` and
+                            ``color_variation_threshold`` are derived from the
+                            image's row statistics with Otsu's method; the
+                            given values are only used where the image gives
+                            no clear cut. See
+                            :func:`calibrate.calibrate_thresholds`.
+    :param thresholds: If given, receives the blank and color thresholds that
+                       were used, e.g. to report the calibrated values.
+    :param control: Deadline, progress callback and cancellation token, see
+                    :class:`control.RunControl`. If the deadline is too close
+                    for a full-resolution run, the image is detected on a
+                    reduced decode and sampled columns, and
+                    ``control.degraded`` is set. Raises
+                    :class:`control.Cancelled` or
+                    :class:`control.DeadlineExceeded` when the run is stopped.
+    :param template_cache: If given, screenshots of a page template seen
+                           before reuse its split heights after a check of
+                           the rows around each cut, instead of running the
+                           detectors. See :class:`templates.TemplateCache`.
+    :param workspace: If given, the grayscale copy and the temporaries of the
+                      detectors are taken from its reused buffers instead of
+                      being allocated per image, see :class:`workspace.Workspace`.
+    :param analysis: If given, receives the split heights with their
+                     candidate scores, the seconds of each stage and the row
+                     statistics, e.g. for a :class:`results.ResultsWriter`.
+                     See :func:`_detect_heights`; ``seconds`` also holds the
+                     ``decode`` time.
+    :param max_decode_pixels: If given, images with more pixels are detected
+                              on a reduced decode (1/2, 1/4 or 1/8 size) with
+                              at most this many pixels, see
+                              :func:`image_io.choose_reduce_factor`.
     :return: A list of split line heights or the path to the split image.
     """
-    print(f"Debug: file_path received: {file_path}")
-    try:
-        # Read image as a byte stream to handle non-ASCII file paths
-        img_data = np.fromfile(file_path, np.uint8)
-        img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-        if img is None:
-            raise FileNotFoundError(
-                f"Image not found or could not be decoded at path: {file_path}"
+    shown = file_path if isinstance(file_path, str) else source_name(file_path)
+    print(f"Debug: file_path received: {shown}")
+    with _governed(governor, file_path, full_image=False) as reduce_factor:
+        reduce_factor, column_stride = _planned(
+            control, file_path, reduce_factor, column_stride, max_decode_pixels
+        )
+        decoding = time.perf_counter()
+        img = load_image(file_path, reduce_factor)
+        if analysis is not None:
+            analysis.setdefault("seconds", {})["decode"] = time.perf_counter() - decoding
+
+        heights, _ = _detect_heights(
+            img,
+            height_threshold,
+            variation_threshold,
+            color_threshold,
+            color_variation_threshold,
+            merge_threshold,
+            scale=reduce_factor,
+            columns=columns,
+            column_stride=column_stride,
+            row_stride=row_stride,
+            detectors=detectors,
+            timings=timings,
+            merge_policy=merge_policy,
+            auto_thresholds=auto_thresholds,
+            thresholds=thresholds,
+            control=control,
+            template_cache=template_cache,
+            workspace=workspace,
+            analysis=analysis,
+        )
+
+        if split:
+            return _save_split_image(
+                img,
+                [h // reduce_factor for h in heights],
+                file_path,
+                output_dir,
+                full_resolution,
+                preview_max_dim,
+                preview_labels,
+                contact_sheet,
+                writer,
             )
-    except Exception as e:
-        raise IOError(f"Failed to read image file: {e}")
-
-    heights = []
-    regions = find_height_spliter(img, height_threshold, variation_threshold)
-    heights.extend(regions)
-    regions = color_height_spliter(img, color_threshold, color_variation_threshold)
-    heights.extend(regions)
-    heights = remove_close_values(heights, merge_threshold)
-
-    if split:
-        os.makedirs(output_dir, exist_ok=True)
+        else:
+            return heights
+
+
+def _save_split_image(
+    img: np.ndarray,
+    heights: list[int],
+    file_path: str | bytes,
+    output_dir: str,
+    full_resolution: bool = False,
+    preview_max_dim: int = 2048,
+    preview_labels: bool = False,
+    contact_sheet: bool = False,
+    writer: Writer | None = None,
+) -> str:
+    """
+    Draws the split lines and saves the result as ``<name>_result.jpg``.
+
+    By default the lines are drawn on a preview rendered by
+    :func:`preview.render_preview`, which is always a new array, so ``img``
+    is left unchanged even when it already fits ``preview_max_dim``. With
+    ``full_resolution`` the lines are drawn on ``img`` at its decoded size,
+    without a copy, so ``img`` is modified; callers pass an image they no
+    longer need.
+
+    :param img: The decoded image.
+    :param heights: The split heights in rows of ``img``, i.e. divided by the
+                    decode reduction factor.
+    :param file_path: Path to the image file, or the encoded image bytes; names
+                      the output file.
+    :param output_dir: The directory to save the image into.
+    :param full_resolution: Whether to draw on ``img`` instead of a preview.
+    :param preview_max_dim: Maximum width and height of the preview.
+    :param preview_labels: Whether to label each segment in the preview.
+    :param contact_sheet: Whether to lay the preview out as columns of segments.
+    :param writer: If given, the encoded image is passed to it as
+                   ``(file name, bytes)`` instead of being saved.
+    :return: The absolute path to the saved image, or its file name if it was
+             passed to ``writer``.
+    :raises IOError: If the image cannot be encoded.
+    """
+    if full_resolution:
         draw_line(img, heights, color=(0, 255, 0))
+    else:
+        img = render_preview(
+            img,
+            heights,
+            preview_max_dim,
+            color=(0, 255, 0),
+            labels=preview_labels,
+            contact_sheet=contact_sheet,
+        )
 
-        base_name, ext = os.path.splitext(os.path.basename(file_path))
-        output_filename = f"{base_name}_result.jpg"
-        output_path = os.path.join(output_dir, output_filename)
+    output_filename = f"{source_name(file_path)}_result.jpg"
+    output_path = os.path.join(output_dir, output_filename)
 
-        # Use imencode + binary write to handle Unicode filenames
+    # Use imencode + binary write to handle Unicode filenames
+    with STAGE_SECONDS.time("encode"):
         success, encoded_img = cv2.imencode(".jpg", img)
-        if success:
-            with open(output_path, "wb") as f:
-                f.write(encoded_img)
+    if not success:
+        raise IOError(f"Failed to encode image for writing to {output_path}")
+    ENCODED_BYTES.inc(encoded_img.size)
+    if writer is not None:
+        writer(output_filename, encoded_img.tobytes())
+        return output_filename
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(encoded_img)
+    return os.path.abspath(output_path)
+
+
+class _SegmentExporter:
+    """
+    Crops, encodes and writes the segments of one image, one at a time.
+
+    Segments must be exported in index order. Keeping the per-segment work in
+    :meth:`export` lets callers schedule each segment separately, e.g. on an
+    executor. With a ``writer``, files are passed to it instead of being
+    written into ``output_dir``. With a ``workspace``, auto-crop reuses its
+    buffers; segments exported concurrently need separate workspaces.
+    """
+
+    def __init__(
+        self,
+        img: np.ndarray,
+        heights: list[int],
+        labels: list[str],
+        file_path: str | bytes,
+        output_dir: str,
+        auto_crop: bool,
+        crop_threshold: int,
+        crop_min_width: int,
+        dedup: bool,
+        dedup_threshold: int,
+        target_width: int | None = None,
+        max_pixels: int | None = None,
+        writer: Writer | None = None,
+        workspace: Workspace | None = None,
+    ):
+        self.img = img
+        self.output_dir = output_dir
+        self.target_width = target_width
+        self.max_pixels = max_pixels
+        self.writer = writer
+        self.workspace = workspace
+        self.auto_crop = auto_crop
+        self.crop_threshold = crop_threshold
+        self.crop_min_width = crop_min_width
+        self.deduplicator = SegmentDeduplicator(dedup_threshold) if dedup else None
+
+        # Create output directory
+        if writer is None:
+            os.makedirs(output_dir, exist_ok=True)
+
+        # Get original filename without extension
+        self.base_name = source_name(file_path)
+
+        img_height, img_width = img.shape[:2]
+        self.split_heights_list = sorted(list(set([0] + heights + [img_height])))
+        self.count = len(self.split_heights_list) - 1
+        self.detectors = dict(zip(heights, labels))
+        self.detectors[0] = self.detectors[img_height] = "edge"
+        self.manifest = SegmentManifest(
+            source=file_path if isinstance(file_path, str) else None,
+            width=img_width,
+            height=img_height,
+            output_dir=os.path.abspath(output_dir),
+        )
+        self.segment_count = 0
+        self.cropped_count = 0
+        self.duplicate_count = 0
+
+    def export(self, i: int) -> SegmentRecord:
+        """
+        Exports segment ``i`` and records it in the manifest.
+
+        :param i: Index of the segment.
+        :return: The manifest record of the segment.
+        """
+        start_y = self.split_heights_list[i]
+        end_y = self.split_heights_list[i + 1]
+
+        # Extract segment
+        segment = self.img[start_y:end_y, :]
+        x0, x1 = 0, segment.shape[1]
+
+        # Apply auto-crop if enabled
+        if self.auto_crop:
+            with STAGE_SECONDS.time("crop"):
+                x0, x1 = auto_crop_bounds(
+                    segment,
+                    threshold=self.crop_threshold,
+                    min_width=self.crop_min_width,
+                    workspace=self.workspace,
+                )
+            if x1 - x0 != segment.shape[1]:
+                segment = segment[:, x0:x1]
+                self.cropped_count += 1
+
+        record = SegmentRecord(
+            index=i,
+            y0=int(start_y),
+            y1=int(end_y),
+            x0=int(x0),
+            x1=int(x1),
+            byte_size=0,
+            sha256="",
+            y0_detector=self.detectors[start_y],
+            y1_detector=self.detectors[end_y],
+        )
+
+        if self.deduplicator is not None:
+            original = self.deduplicator.find(segment, i)
+            if original is not None:
+                kept = self.manifest.segments[original]
+                record.sha256 = kept.sha256
+                record.file = kept.file
+                record.duplicate_of = original
+                record.width, record.height = kept.width, kept.height
+                self.manifest.segments.append(record)
+                self.duplicate_count += 1
+                return record
+
+        # Save segment with descriptive name
+        segment_filename = f"{self.base_name}_segment_{i:03d}.jpg"
+        segment_path = os.path.join(self.output_dir, segment_filename)
+
+        with STAGE_SECONDS.time("encode"):
+            # Resize after cropping, in the same pass as encoding
+            size = fit_size(
+                segment.shape[1], segment.shape[0], self.target_width, self.max_pixels
+            )
+            if size != (segment.shape[1], segment.shape[0]):
+                segment = downscale(segment, size)
+                record.width, record.height = size
+
+            # Use imencode + binary write for Unicode filename support
+            success, encoded_img = cv2.imencode(".jpg", segment)
+        if not success:
+            raise IOError(f"Failed to encode image for writing to {segment_path}")
+        data = encoded_img.tobytes()
+        SEGMENTS_EMITTED.inc()
+        ENCODED_BYTES.inc(len(data))
+        if self.writer is not None:
+            self.writer(segment_filename, data)
         else:
-            raise IOError(f"Failed to encode image for writing to {output_path}")
+            with open(segment_path, "wb") as f:
+                f.write(data)
 
-        return os.path.abspath(output_path)
-    else:
-        return heights
+        record.byte_size = len(data)
+        record.sha256 = content_hash(data)
+        record.file = segment_filename
+        self.manifest.segments.append(record)
+        self.segment_count += 1
+        return record
+
+    def finish(self, write_manifest: bool = True) -> SegmentManifest:
+        """
+        Reports the export and optionally writes ``manifest.json``.
+
+        :param write_manifest: Whether to write the manifest file.
+        :return: The completed manifest.
+        """
+        output_dir = os.path.abspath(self.output_dir)
+        message = f"✓ Exported {self.segment_count} segments to: {output_dir}"
+        if self.auto_crop:
+            message += f" (auto-cropped {self.cropped_count} segments)"
+        if self.deduplicator is not None:
+            message += f" (skipped {self.duplicate_count} duplicates)"
+        print(message)
+        if write_manifest and self.writer is not None:
+            self.writer("manifest.json", self.manifest.to_json().encode("utf-8"))
+        elif write_manifest:
+            self.manifest.write()
+        return self.manifest
 
 
 def split_and_export_segments(
-    file_path: str,
+    file_path: str | bytes,
     output_dir: str = "segments",
     height_threshold: int = 102,
     variation_threshold: float = 0.5,
@@ -190,7 +888,29 @@ def split_and_export_segments(
     auto_crop: bool = False,
     crop_threshold: int = 240,
     crop_min_width: int = 50,
-) -> str:
+    write_manifest: bool = True,
+    return_manifest: bool = False,
+    dedup: bool = False,
+    dedup_threshold: int = 10,
+    governor: MemoryGovernor | None = None,
+    columns: tuple[int, int] | str | None = None,
+    column_stride: int = 1,
+    row_stride: int = 1,
+    detectors: list[str] | None = None,
+    timings: dict | None = None,
+    merge_policy: str = "first",
+    target_width: int | None = None,
+    max_pixels: int | None = None,
+    writer: Writer | None = None,
+    auto_thresholds: bool = False,
+    thresholds: dict | None = None,
+    control: RunControl | None = None,
+    template_cache: TemplateCache | None = None,
+    workspace: Workspace | None = None,
+    analysis: dict | None = None,
+    max_decode_pixels: int | None = None,
+    source_path: str | None = None,
+) -> str | SegmentManifest:
     """
     Detects split points and exports each segmented area as a standalone image.
 
@@ -198,7 +918,7 @@ def split_and_export_segments(
     each segmented area as an individual image file in the output directory.
     Optionally applies auto-cropping to remove blank (white) areas from left and right edges.
 
-    :param file_path: Path to the image file.
+    :param file_path: Path to the image file, or the encoded image bytes.
     :param output_dir: The directory to save the segmented images (default: 'segments').
     :param height_threshold: The height threshold for low variation regions.
     :param variation_threshold: The variation threshold for low variation regions.
@@ -208,81 +928,132 @@ def split_and_export_segments(
     :param auto_crop: Whether to auto-crop blank areas from left/right edges (default: False).
     :param crop_threshold: Pixel threshold for detecting blank areas (0-255, default: 240).
     :param crop_min_width: Minimum width to preserve after cropping (default: 50).
-    :return: The absolute path to the output directory containing all segments.
+    :param write_manifest: Whether to write ``manifest.json`` describing every
+                           segment into the output directory (default: True).
+    :param return_manifest: If True, returns the :class:`SegmentManifest`
+                            instead of the output directory path.
+    :param dedup: Whether to skip encoding segments that duplicate an earlier
+                  one; duplicates are recorded in the manifest (default: False).
+    :param dedup_threshold: Maximum fingerprint Hamming distance for two
+                            segments to count as near duplicates (default: 10).
+    :param governor: Optional memory governor that admits the job against a
+                     shared budget. Large images are then detected on a reduced
+                     decode; segments are always exported at full resolution.
+    :param columns: Column band the detectors analyze, see :func:`split_heights`.
+    :param column_stride: Analyze only every ``column_stride``-th column.
+    :param row_stride: Row stride for the column statistics of ``"auto"``.
+    :param detectors: Names of the detectors to run, see :func:`split_heights`.
+    :param timings: If given, receives the wall time of each detector.
+    :param merge_policy: How to merge close candidates, see :func:`split_heights`.
+    :param target_width: If given, segments wider than this are downscaled to
+                         it (after auto-crop, keeping the aspect ratio) before
+                         encoding.
+    :param max_pixels: If given, segments with more pixels are downscaled to
+                       at most this many before encoding.
+    :param writer: If given, each segment and the manifest are passed to it as
+                   ``(file name, bytes)`` instead of being written into
+                   ``output_dir``, e.g. a :class:`streams.TarWriter`.
+    :param auto_thresholds: Whether to derive the blank and color thresholds
+                            from the image, see :func:`split_heights`. The
+                            chosen values are recorded in the manifest.
+    :param thresholds: If given, receives the blank and color thresholds used.
+    :param control: Deadline, progress callback and cancellation token, see
+                    :func:`split_heights`. It is also checked after each
+                    exported segment; a degraded run is recorded in the
+                    manifest.
+    :param template_cache: Reuses the split heights of matching page
+                           templates, see :func:`split_heights`.
+    :param workspace: Reused buffers for detection and auto-crop, see
+                      :func:`split_heights`.
+    :param analysis: If given, receives the detection summary, see
+                     :func:`split_heights`; ``seconds`` also holds the
+                     ``export`` time.
+    :param max_decode_pixels: If given, images with more pixels are detected
+                              on a reduced decode, see :func:`split_heights`;
+                              segments are still exported at full resolution.
+    :param source_path: Path the image was read from when ``file_path`` holds
+                        its bytes; it names the segment files and is recorded
+                        in the manifest.
+    :return: The absolute path to the output directory containing all segments,
+             or the segment manifest if ``return_manifest`` is True.
     """
-    # Get split heights
-    heights = split_heights(
-        file_path,
-        split=False,
-        height_threshold=height_threshold,
-        variation_threshold=variation_threshold,
-        color_threshold=color_threshold,
-        color_variation_threshold=color_variation_threshold,
-        merge_threshold=merge_threshold,
-    )
-
-    # Read the image
-    try:
-        img_data = np.fromfile(file_path, np.uint8)
-        img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-        if img is None:
-            raise FileNotFoundError(
-                f"Image not found or could not be decoded at path: {file_path}"
-            )
-    except Exception as e:
-        raise IOError(f"Failed to read image file: {e}")
-
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Get original filename without extension
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-
-    # Split and save segments
-    img_height = img.shape[0]
-    split_heights_list = sorted(list(set([0] + heights + [img_height])))
-
-    segment_count = 0
-    cropped_count = 0
-    for i in range(len(split_heights_list) - 1):
-        start_y = split_heights_list[i]
-        end_y = split_heights_list[i + 1]
-
-        # Extract segment
-        segment = img[start_y:end_y, :]
-
-        # Apply auto-crop if enabled
-        if auto_crop:
-            cropped_segment = auto_crop_image(
-                segment, threshold=crop_threshold, min_width=crop_min_width
-            )
-            if cropped_segment.shape[1] != segment.shape[1]:
-                segment = cropped_segment
-                cropped_count += 1
-
-        # Save segment with descriptive name
-        segment_filename = f"{base_name}_segment_{segment_count:03d}.jpg"
-        segment_path = os.path.join(output_dir, segment_filename)
+    used = {} if thresholds is None else thresholds
+    with _governed(governor, file_path, full_image=True) as reduce_factor:
+        reduce_factor, column_stride = _planned(
+            control, file_path, reduce_factor, column_stride, max_decode_pixels, export=True
+        )
+        # Read the image once and get split heights with their detectors
+        decoding = time.perf_counter()
+        img = load_image(file_path, reduce_factor)
+        seconds = {} if analysis is None else analysis.setdefault("seconds", {})
+        seconds["decode"] = time.perf_counter() - decoding
+        heights, labels = _detect_heights(
+            img,
+            height_threshold,
+            variation_threshold,
+            color_threshold,
+            color_variation_threshold,
+            merge_threshold,
+            scale=reduce_factor,
+            columns=columns,
+            column_stride=column_stride,
+            row_stride=row_stride,
+            detectors=detectors,
+            timings=timings,
+            merge_policy=merge_policy,
+            auto_thresholds=auto_thresholds,
+            thresholds=used,
+            control=control,
+            template_cache=template_cache,
+            workspace=workspace,
+            analysis=analysis,
+        )
+        if reduce_factor != 1:
+            del img
+            decoding = time.perf_counter()
+            img = load_image(file_path)
+            seconds["decode"] += time.perf_counter() - decoding
+            if analysis is not None:
+                analysis.update(width=img.shape[1], height=img.shape[0])
 
-        # Use imencode + binary write for Unicode filename support
-        success, encoded_img = cv2.imencode(".jpg", segment)
-        if success:
-            with open(segment_path, "wb") as f:
-                f.write(encoded_img)
-            segment_count += 1
-        else:
-            raise IOError(f"Failed to encode image for writing to {segment_path}")
+        exporter = _SegmentExporter(
+            img,
+            heights,
+            labels,
+            file_path if source_path is None else source_path,
+            output_dir,
+            auto_crop,
+            crop_threshold,
+            crop_min_width,
+            dedup,
+            dedup_threshold,
+            target_width,
+            max_pixels,
+            writer,
+            workspace,
+        )
+        if auto_thresholds:
+            exporter.manifest.thresholds = dict(used)
+        if control is not None:
+            exporter.manifest.degraded = control.degraded
+        exporting = time.perf_counter()
+        for i in range(exporter.count):
+            exporter.export(i)
+            if control is not None:
+                control.report("export", i + 1, exporter.count)
+        manifest = exporter.finish(write_manifest)
+        seconds["export"] = time.perf_counter() - exporting
 
-    message = f"✓ Exported {segment_count} segments to: {os.path.abspath(output_dir)}"
-    if auto_crop:
-        message += f" (auto-cropped {cropped_count} segments)"
-    print(message)
+    if return_manifest:
+        return manifest
     return os.path.abspath(output_dir)
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("-f", "--file", type=str, help="path of the image file")
+    parser.add_argument(
+        "-f", "--file", type=str, help="path of the image file, or '-' to read it from stdin"
+    )
     parser.add_argument(
         "-s", "--split", type=bool, default=False, help="whether to split the image"
     )
@@ -363,12 +1134,206 @@ def main():
         default=50,
         help="minimum width to preserve after cropping blank left/right edges",
     )
+    parser.add_argument(
+        "-dd",
+        "--dedup",
+        type=bool,
+        default=False,
+        help="whether to skip exporting duplicate and near-duplicate segments",
+    )
+    parser.add_argument(
+        "-ddt",
+        "--dedup_threshold",
+        type=int,
+        default=10,
+        help="the largest fingerprint bit difference for near-duplicate segments",
+    )
+    parser.add_argument(
+        "-tw",
+        "--target_width",
+        type=int,
+        default=None,
+        help="downscale exported segments wider than this to this width",
+    )
+    parser.add_argument(
+        "-mpx",
+        "--max_pixels",
+        type=int,
+        default=None,
+        help="downscale exported segments to at most this many pixels",
+    )
+    parser.add_argument(
+        "-fr",
+        "--full_resolution",
+        type=bool,
+        default=False,
+        help="whether to draw the split lines on the full-resolution image",
+    )
+    parser.add_argument(
+        "-pd",
+        "--preview_max_dim",
+        type=int,
+        default=2048,
+        help="the largest width or height of the split image preview",
+    )
+    parser.add_argument(
+        "-pl",
+        "--preview_labels",
+        type=bool,
+        default=False,
+        help="whether to label each segment with its index in the preview",
+    )
+    parser.add_argument(
+        "-cs",
+        "--contact_sheet",
+        type=bool,
+        default=False,
+        help="whether to lay the preview out as columns of segments",
+    )
+    parser.add_argument(
+        "-cols",
+        "--columns",
+        type=str,
+        default=None,
+        help="the column band to analyze: 'auto' or 'x0,x1' (default: full width)",
+    )
+    parser.add_argument(
+        "-cstr",
+        "--column_stride",
+        type=int,
+        default=1,
+        help="analyze only every k-th column",
+    )
+    parser.add_argument(
+        "-rstr",
+        "--row_stride",
+        type=int,
+        default=1,
+        help="use every k-th row for the column statistics of '-cols auto'",
+    )
+    parser.add_argument(
+        "-det",
+        "--detectors",
+        type=str,
+        default="blank,color",
+        help="comma-separated detectors to run: blank, color, rule, band",
+    )
+    parser.add_argument(
+        "-tm",
+        "--timings",
+        type=bool,
+        default=False,
+        help="whether to print the time taken by each detector",
+    )
+    parser.add_argument(
+        "-mp",
+        "--merge_policy",
+        type=str,
+        default="first",
+        choices=MERGE_POLICIES,
+        help="which of two close split lines to keep: the first or the highest scored",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        type=str,
+        default=None,
+        choices=BACKENDS,
+        help="decode and detect with opencv or with pillow and numpy only",
+    )
+    parser.add_argument(
+        "-at",
+        "--auto_thresholds",
+        type=bool,
+        default=False,
+        help="whether to derive -vt, -ct and -cvt from the image and print them",
+    )
+    parser.add_argument(
+        "-dl",
+        "--deadline",
+        type=float,
+        default=None,
+        help="seconds the run may take; detect on a reduced image if needed to meet it",
+    )
+    parser.add_argument(
+        "-mdp",
+        "--max_decode_pixels",
+        type=int,
+        default=None,
+        help="detect on a reduced decode of at most this many pixels for larger images",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        type=str,
+        default=None,
+        help="write the pipeline metrics in the Prometheus text format to this file",
+    )
+    parser.add_argument(
+        "-om",
+        "--output_mode",
+        type=str,
+        default="text",
+        choices=OUTPUT_MODES,
+        help="write the result as text, or write only the heights as json, a tar "
+        "stream of the segments or the encoded preview to stdout",
+    )
+    parser.add_argument(
+        "-rd",
+        "--results_dir",
+        type=str,
+        default=None,
+        help="append a columnar record of the result to a shard in this directory "
+        "(text output mode)",
+    )
+    parser.add_argument(
+        "-rfmt",
+        "--results_format",
+        type=str,
+        default=None,
+        choices=RESULT_FORMATS,
+        help="format of the results shard (default: parquet if pyarrow is installed)",
+    )
+    parser.add_argument(
+        "-pb",
+        "--profile_bins",
+        type=int,
+        default=0,
+        help="store the row profiles in the result record, downsampled to this many bins",
+    )
     args = parser.parse_args()
 
+    if args.backend is not None:
+        set_backend(args.backend)
+    detectors = [name.strip() for name in args.detectors.split(",") if name.strip()]
+    timings = {} if args.timings else None
+    thresholds = {} if args.auto_thresholds else None
+    control = RunControl(args.deadline) if args.deadline is not None else None
+    analysis = {} if args.results_dir is not None else None
+    if analysis is not None and timings is None:
+        # Detector timings are part of the record
+        timings = {}
+
+    columns = args.columns
+    if columns is not None and columns != "auto":
+        try:
+            columns = tuple(map(int, columns.split(",")))
+            if len(columns) != 2:
+                raise ValueError("Columns must be two comma-separated integers.")
+        except ValueError as e:
+            raise ValueError(f"Invalid columns format: {e}") from e
+
+    source = read_source(args.file)
+    if args.output_mode != "text":
+        _write_stdout(source, args, columns, detectors, timings, thresholds, control)
+        if args.metrics_file is not None:
+            REGISTRY.write(args.metrics_file)
+        return
+
     if args.export:
         # Export segments with optional auto-crop
         res = split_and_export_segments(
-            args.file,
+            source,
             args.segments_dir,
             args.height_threshold,
             args.variation_threshold,
@@ -378,11 +1343,26 @@ def main():
             args.auto_crop,
             args.crop_threshold,
             args.crop_min_width,
+            dedup=args.dedup,
+            dedup_threshold=args.dedup_threshold,
+            target_width=args.target_width,
+            max_pixels=args.max_pixels,
+            columns=columns,
+            column_stride=args.column_stride,
+            row_stride=args.row_stride,
+            detectors=detectors,
+            timings=timings,
+            merge_policy=args.merge_policy,
+            auto_thresholds=args.auto_thresholds,
+            thresholds=thresholds,
+            control=control,
+            analysis=analysis,
+            max_decode_pixels=args.max_decode_pixels,
         )
     else:
         # Original behavior: get split heights or split image
         res = split_heights(
-            args.file,
+            source,
             args.split,
             args.output_dir,
             args.height_threshold,
@@ -390,9 +1370,114 @@ def main():
             args.color_threshold,
             args.color_variation_threshold,
             args.merge_threshold,
+            full_resolution=args.full_resolution,
+            preview_max_dim=args.preview_max_dim,
+            preview_labels=args.preview_labels,
+            contact_sheet=args.contact_sheet,
+            columns=columns,
+            column_stride=args.column_stride,
+            row_stride=args.row_stride,
+            detectors=detectors,
+            timings=timings,
+            merge_policy=args.merge_policy,
+            auto_thresholds=args.auto_thresholds,
+            thresholds=thresholds,
+            control=control,
+            analysis=analysis,
+            max_decode_pixels=args.max_decode_pixels,
         )
+    _print_report(timings if args.timings else None, thresholds, control)
+    if analysis is not None:
+        with ResultsWriter(args.results_dir, args.results_format) as results:
+            results.append(image_record(args.file, analysis, timings, args.profile_bins))
+        print(f"Result record written to {results.shards[0]}")
+    if args.metrics_file is not None:
+        REGISTRY.write(args.metrics_file)
     print(res)
 
 
+def _print_report(
+    timings: dict | None, thresholds: dict | None, control: RunControl | None = None
+):
+    if timings is not None:
+        for name, seconds in timings.items():
+            print(f"{name}: {seconds * 1000:.1f} ms")
+    if thresholds is not None:
+        print("thresholds: " + ", ".join(f"{k}={v}" for k, v in thresholds.items()))
+    if control is not None and control.degraded:
+        print(
+            f"degraded: detected at 1/{control.reduce_factor} scale, "
+            f"every {control.column_stride} column(s), to meet the deadline"
+        )
+
+
+def _write_stdout(
+    source: str | bytes,
+    args,
+    columns,
+    detectors: list[str],
+    timings: dict | None,
+    thresholds: dict | None,
+    control: RunControl | None = None,
+):
+    """
+    Runs the CLI in one of the stdout output modes.
+
+    Only the payload is written to stdout; progress messages and timings go
+    to stderr.
+    """
+    options = dict(
+        height_threshold=args.height_threshold,
+        variation_threshold=args.variation_threshold,
+        color_threshold=args.color_threshold,
+        color_variation_threshold=args.color_variation_threshold,
+        merge_threshold=args.merge_threshold,
+        columns=columns,
+        column_stride=args.column_stride,
+        row_stride=args.row_stride,
+        detectors=detectors,
+        timings=timings,
+        merge_policy=args.merge_policy,
+        auto_thresholds=args.auto_thresholds,
+        thresholds=thresholds,
+        control=control,
+        max_decode_pixels=args.max_decode_pixels,
+    )
+    with binary_stdout() as out:
+        if args.output_mode == "json":
+            result = {"heights": split_heights(source, **options)}
+            if thresholds is not None:
+                result["thresholds"] = thresholds
+            if control is not None:
+                result["degraded"] = control.degraded
+            out.write(json.dumps(result).encode("utf-8") + b"\n")
+        elif args.output_mode == "tar":
+            with TarWriter(out) as tar:
+                split_and_export_segments(
+                    source,
+                    auto_crop=args.auto_crop,
+                    crop_threshold=args.crop_threshold,
+                    crop_min_width=args.crop_min_width,
+                    dedup=args.dedup,
+                    dedup_threshold=args.dedup_threshold,
+                    target_width=args.target_width,
+                    max_pixels=args.max_pixels,
+                    writer=tar,
+                    **options,
+                )
+        else:
+            split_heights(
+                source,
+                split=True,
+                full_resolution=args.full_resolution,
+                preview_max_dim=args.preview_max_dim,
+                preview_labels=args.preview_labels,
+                contact_sheet=args.contact_sheet,
+                writer=lambda filename, data: out.write(data),
+                **options,
+            )
+        _print_report(timings, thresholds, control)
+
+
 if __name__ == "__main__":
     main()
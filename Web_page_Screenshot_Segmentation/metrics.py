@@ -0,0 +1,316 @@
+import contextlib
+import http.server
+import os
+import tempfile
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing count, e.g. of processed images.
+
+    :param name: Metric name in the Prometheus exposition.
+    :param help: One-line description of the metric.
+    """
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int | float = 1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+    def snapshot(self) -> int | float:
+        with self._lock:
+            return self.value
+
+    def merge(self, value: int | float):
+        self.inc(value)
+
+    def expose(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_format_value(self.value)}",
+        ]
+
+
+class Histogram:
+    """
+    Latency histogram with one series per value of a single label.
+
+    Each observation costs one bucket search and one lock, so it can be
+    updated from the pipeline's hot paths.
+
+    :param name: Metric name in the Prometheus exposition.
+    :param help: One-line description of the metric.
+    :param label: Name of the label that tells the series apart, e.g.
+                  ``"stage"``.
+    :param buckets: Increasing bucket upper bounds in seconds.
+    """
+
+    def __init__(self, name: str, help: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # Per label value: per-bucket counts (not cumulative), sum, count
+        self._series: dict[str, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        """
+        Records one observation.
+
+        :param label_value: The series, e.g. ``"decode"``.
+        :param seconds: The observed duration.
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += seconds
+            series[1][1] += 1
+
+    @contextlib.contextmanager
+    def time(self, label_value: str):
+        """
+        Observes the wall time of the ``with`` block.
+
+        :param label_value: The series, e.g. ``"encode"``.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    def count(self, label_value: str) -> int:
+        with self._lock:
+            series = self._series.get(label_value)
+            return 0 if series is None else series[1][1]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> dict[str, tuple[list[int], list[float]]]:
+        with self._lock:
+            return {k: (list(c), list(s)) for k, (c, s) in self._series.items()}
+
+    def merge(self, snapshot: dict[str, tuple[list[int], list[float]]]):
+        with self._lock:
+            for label_value, (counts, (total, count)) in snapshot.items():
+                series = self._series.get(label_value)
+                if series is None:
+                    series = self._series[label_value] = (
+                        [0] * (len(self.buckets) + 1),
+                        [0.0, 0],
+                    )
+                for i, n in enumerate(counts):
+                    series[0][i] += n
+                series[1][0] += total
+                series[1][1] += count
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        snapshot = self.snapshot()
+        for value, (counts, (total, count)) in sorted(snapshot.items()):
+            labels = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{_format_value(bound)}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process collection of metrics, exposed in the Prometheus text format.
+
+    The registry is thread-safe. The package updates :data:`REGISTRY`; dump it
+    with :meth:`write` (e.g. for the node_exporter textfile collector) or
+    serve it with :meth:`serve`.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        """
+        Creates and registers a :class:`Counter`.
+        """
+        return self._register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, label: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        """
+        Creates and registers a :class:`Histogram`.
+        """
+        return self._register(Histogram(name, help, label, buckets))
+
+    def reset(self):
+        """Sets all metrics back to zero."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> dict:
+        """
+        Copies the current values of all metrics.
+
+        The copy can be pickled, e.g. to send the metrics of a worker process
+        to its parent, which adds them with :meth:`merge`.
+
+        :return: The state of each metric, by name.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def merge(self, snapshot: dict):
+        """
+        Adds the values of a :meth:`snapshot` to the metrics.
+
+        :param snapshot: A snapshot of a registry with the same metrics;
+                         metrics unknown to this registry are ignored.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, state in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(state)
+
+    def to_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        :return: The exposition, ending with a newline.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.expose()) + "\n"
+
+    def write(self, path: str) -> str:
+        """
+        Writes the exposition to a file, replacing it atomically.
+
+        Readers never see a partially written file, as required by the
+        node_exporter textfile collector.
+
+        :param path: Path of the file, e.g. ``/var/lib/node_exporter/seg.prom``.
+        :return: The absolute path to the written file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return os.path.abspath(path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> http.server.ThreadingHTTPServer:
+        """
+        Serves the exposition over HTTP from a daemon thread.
+
+        Every path returns the metrics, so Prometheus can scrape
+        ``http://<host>:<port>/metrics``.
+
+        :param port: Port to listen on; 0 picks a free one.
+        :param host: Address to bind, local only by default.
+        :return: The running server; call ``shutdown()`` to stop it. The bound
+                 port is ``server.server_address[1]``.
+        """
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+IMAGES_PROCESSED = REGISTRY.counter(
+    "screenshot_images_processed_total", "Images whose split points were detected."
+)
+ROWS_ANALYZED = REGISTRY.counter(
+    "screenshot_rows_analyzed_total", "Image rows analyzed by the detectors."
+)
+PIXELS_ANALYZED = REGISTRY.counter(
+    "screenshot_pixels_analyzed_total", "Grayscale pixels analyzed by the detectors."
+)
+SEGMENTS_EMITTED = REGISTRY.counter(
+    "screenshot_segments_emitted_total", "Segments and slices encoded for output."
+)
+ENCODED_BYTES = REGISTRY.counter(
+    "screenshot_encoded_bytes_total", "Bytes of encoded segments, slices and previews."
+)
+DECODE_FAILURES = REGISTRY.counter(
+    "screenshot_decode_failures_total", "Images that could not be read or decoded."
+)
+TEMPLATE_HITS = REGISTRY.counter(
+    "screenshot_template_hits_total", "Images whose split heights came from a page template."
+)
+TEMPLATE_MISSES = REGISTRY.counter(
+    "screenshot_template_misses_total", "Template cache lookups that ran the full detection."
+)
+TEMPLATE_SECONDS_SAVED = REGISTRY.counter(
+    "screenshot_template_seconds_saved_total",
+    "Detection seconds saved by reusing page templates, estimated from the templates.",
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "screenshot_stage_seconds",
+    "Wall time of each pipeline stage: decode, detect, merge, crop, encode.",
+    label="stage",
+)
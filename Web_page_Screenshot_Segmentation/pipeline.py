@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# Marks the end of the input of a stage
+_END = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a :class:`StagedPipeline`.
+
+    :param name: Name used in the statistics.
+    :param function: Called with the output of the previous stage, or with
+                     the submitted item for the first stage.
+    :param workers: Number of threads running the stage. NumPy, OpenCV and
+                    file I/O release the GIL, so threads overlap well here.
+    :param buffer: Size of the queue between this stage and the next one;
+                   for a reading first stage this is how far it reads ahead.
+    """
+
+    name: str
+    function: Callable[[Any], Any]
+    workers: int = 1
+    buffer: int = 2
+
+
+@dataclass
+class StageStats:
+    """
+    Where the threads of one stage spent their time.
+
+    :param name: The stage name.
+    :param workers: Number of threads of the stage.
+    :param items: Items the stage finished, including failed ones.
+    :param busy: Thread-seconds spent running the stage function.
+    :param starved: Thread-seconds spent waiting for input.
+    :param blocked: Thread-seconds spent waiting for room in the next queue.
+    :param wall: Seconds the pipeline ran, set when it has stopped.
+    """
+
+    name: str
+    workers: int
+    items: int = 0
+    busy: float = 0.0
+    starved: float = 0.0
+    blocked: float = 0.0
+    wall: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, busy: float, starved: float, blocked: float):
+        with self._lock:
+            self.items += 1
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+    @property
+    def utilization(self) -> float:
+        """
+        Share of the stage's thread time spent working, from 0 to 1.
+
+        A stage near 1 is the bottleneck; stages well below it mostly wait.
+        """
+        if self.wall <= 0:
+            return 0.0
+        return min(1.0, self.busy / (self.wall * self.workers))
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.items} items, {self.utilization:.0%} busy "
+            f"({self.busy:.2f} s working, {self.starved:.2f} s waiting for input, "
+            f"{self.blocked:.2f} s waiting for output, {self.workers} workers)"
+        )
+
+
+class StagedPipeline:
+    """
+    Runs items through a chain of stages that work concurrently.
+
+    Each stage has its own threads and hands its output to the next stage
+    through a bounded queue, so e.g. the next files are read while the
+    current ones are analyzed and the previous ones encoded, and a slow stage
+    holds back the stages before it instead of letting buffers grow. An item
+    whose stage function raises skips the remaining stages; the exception is
+    returned by :meth:`get`.
+
+    Items may finish out of submission order when a stage has several
+    workers. Use it as a context manager, or call :meth:`close` and drain
+    :meth:`get` until it returns None. The statistics in :attr:`stats` are
+    complete once the last stage has stopped.
+
+    :param stages: The stages, in order.
+    :param buffer: Size of the queue in front of the first stage.
+    """
+
+    def __init__(self, stages: list[Stage], buffer: int = 2):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.stats = [StageStats(stage.name, stage.workers) for stage in stages]
+        self._queues = [queue.Queue(buffer)]
+        self._queues += [queue.Queue(stage.buffer) for stage in stages[:-1]]
+        # The results are drained by the caller and never block the stages
+        self._queues.append(queue.Queue())
+        self._running = [stage.workers for stage in stages]
+        self._running_lock = threading.Lock()
+        self._closed = False
+        self._started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._work, args=(index,), daemon=True)
+            for index, stage in enumerate(stages)
+            for _ in range(stage.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        inbox, outbox = self._queues[index], self._queues[index + 1]
+        while True:
+            waited = time.perf_counter()
+            envelope = inbox.get()
+            started = time.perf_counter()
+            if envelope is _END:
+                break
+            item, value, error = envelope
+            if error is None:
+                try:
+                    value = stage.function(value)
+                except Exception as e:
+                    value, error = None, e
+            done = time.perf_counter()
+            outbox.put((item, value, error))
+            self.stats[index].add(done - started, started - waited, time.perf_counter() - done)
+        with self._running_lock:
+            self._running[index] -= 1
+            last = self._running[index] == 0
+        # The last worker to stop ends the input of the next stage
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_END)
+        elif last:
+            wall = time.perf_counter() - self._started
+            for stats in self.stats:
+                stats.wall = wall
+            outbox.put(_END)
+
+    def put(self, item):
+        """
+        Submits an item, waiting while the first queue is full.
+
+        :param item: Passed to the first stage and returned by :meth:`get`.
+        """
+        if self._closed:
+            raise ValueError("The pipeline is closed")
+        self._queues[0].put((item, item, None))
+
+    def get(self, timeout: float | None = None):
+        """
+        Returns the next finished item.
+
+        :param timeout: Seconds to wait; None waits until an item finishes.
+        :return: ``(item, result, error)``, where ``result`` is the output of
+                 the last stage and ``error`` the exception that stopped the
+                 item or None, or None once the pipeline is closed and empty.
+        :raises queue.Empty: If no item finished within ``timeout``.
+        """
+        envelope = self._queues[-1].get(timeout=timeout)
+        if envelope is _END:
+            # Keep returning None to further calls
+            self._queues[-1].put(_END)
+            return None
+        return envelope
+
+    def close(self):
+        """
+        Ends the input; submitted items still run to the end.
+        """
+        if not self._closed:
+            self._closed = True
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_END)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+
+from .backend import cv2
+from .resize import downscale
+
+
+def _label(
+    image: np.ndarray, text: str, x: int, y: int, width: int, color: tuple[int, int, int]
+):
+    # Size the text relative to the width of the segment it labels
+    scale = max(0.4, width / 1000)
+    thickness = max(1, int(scale * 2))
+    (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    cv2.rectangle(image, (x, y), (x + w + 4, y + h + baseline + 4), (255, 255, 255), -1)
+    cv2.putText(
+        image,
+        text,
+        (x + 2, y + h + 2),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        scale,
+        color,
+        thickness,
+        cv2.LINE_AA,
+    )
+
+
+def _pack_columns(spans: list[tuple[int, int]], width: int) -> list[list[int]]:
+    # Aim for a roughly square sheet: n columns of about height / n rows each
+    total = spans[-1][1]
+    n_columns = max(1, round(math.sqrt(total / max(width, 1))))
+    target = total / n_columns
+    columns = [[]]
+    column_height = 0
+    for i, (y0, y1) in enumerate(spans):
+        if columns[-1] and column_height + (y1 - y0) > target:
+            columns.append([])
+            column_height = 0
+        columns[-1].append(i)
+        column_height += y1 - y0
+    return columns
+
+
+def render_preview(
+    image: np.ndarray,
+    heights: list[int],
+    max_dim: int = 2048,
+    color: tuple[int, int, int] = (0, 255, 0),
+    labels: bool = False,
+    contact_sheet: bool = False,
+) -> np.ndarray:
+    """
+    Draws split lines onto a downscaled copy of an image.
+
+    The input image is never modified. In contact-sheet mode the segments are
+    packed top to bottom into side-by-side columns, so that a tall page fits a
+    roughly square preview; each segment then gets a border instead of lines.
+
+    :param image: The input image as a NumPy array (BGR format).
+    :param heights: A list of integer heights where the lines will be drawn.
+    :param max_dim: Maximum width and height of the preview in pixels.
+    :param color: The color of the lines in BGR format.
+    :param labels: Whether to label each segment with its index.
+    :param contact_sheet: Whether to lay the segments out in columns.
+    :return: The preview image.
+    """
+    img_height, img_width = image.shape[:2]
+    split_heights = sorted(set([0] + [h for h in heights if 0 < h < img_height]))
+    split_heights.append(img_height)
+    spans = list(zip(split_heights, split_heights[1:]))
+
+    if not contact_sheet:
+        scale = min(1.0, max_dim / max(img_height, img_width))
+        size = (max(1, round(img_width * scale)), max(1, round(img_height * scale)))
+        preview = downscale(image, size)
+        if preview is image:
+            # Nothing to resize: draw on a copy, not on the caller's array
+            preview = image.copy()
+        if preview.ndim == 2:
+            preview = cv2.cvtColor(preview, cv2.COLOR_GRAY2BGR)
+        for height in split_heights[1:-1]:
+            y = round(height * scale)
+            cv2.line(preview, (0, y), (preview.shape[1], y), color, 2)
+        if labels:
+            for i, (y0, _) in enumerate(spans):
+                _label(preview, str(i), 4, round(y0 * scale) + 4, size[0], color)
+        return preview
+
+    columns = _pack_columns(spans, img_width)
+    gap = max(1, img_width // 50)
+    sheet_width = len(columns) * img_width + (len(columns) - 1) * gap
+    sheet_height = max(sum(spans[i][1] - spans[i][0] for i in c) for c in columns)
+    scale = min(1.0, max_dim / max(sheet_width, sheet_height))
+    column_width = max(1, round(img_width * scale))
+    column_pitch = round((img_width + gap) * scale)
+    preview = np.full(
+        (
+            max(1, round(sheet_height * scale)),
+            max(1, (len(columns) - 1) * column_pitch + column_width),
+            3,
+        ),
+        255,
+        dtype=np.uint8,
+    )
+    for c, column in enumerate(columns):
+        x = c * column_pitch
+        y = 0
+        for i in column:
+            y0, y1 = spans[i]
+            # Resize only this segment so no full-resolution copy is made
+            segment_height = max(1, round((y1 - y0) * scale))
+            segment_height = min(segment_height, preview.shape[0] - y)
+            if segment_height <= 0:
+                break
+            thumb = downscale(image[y0:y1], (column_width, segment_height))
+            if thumb.ndim == 2:
+                thumb = cv2.cvtColor(thumb, cv2.COLOR_GRAY2BGR)
+            preview[y : y + segment_height, x : x + column_width] = thumb
+            cv2.rectangle(
+                preview, (x, y), (x + column_width - 1, y + segment_height - 1), color, 1
+            )
+            if labels:
+                _label(preview, str(i), x + 4, y + 4, column_width, color)
+            y += segment_height
+    return preview
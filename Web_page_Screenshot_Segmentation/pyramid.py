@@ -0,0 +1,319 @@
+import argparse
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .backend import cv2
+from .image_io import load_image
+from .master import _detect_heights
+from .metrics import ENCODED_BYTES, STAGE_SECONDS
+from .streams import TarWriter, Writer, binary_stdout, read_source, source_name
+
+# Supported tile image formats
+TILE_FORMATS = ("jpg", "png")
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+# Split lines are drawn this many pixels thick at every level
+LINE_THICKNESS = 2
+
+
+def pyramid_levels(width: int, height: int) -> list[tuple[int, int]]:
+    """
+    Computes the image size at each level of a Deep Zoom pyramid.
+
+    Level 0 is 1×1 and the last level is the full image; each level is the
+    next one halved, rounding up.
+
+    :param width: Width of the full image.
+    :param height: Height of the full image.
+    :return: The ``(width, height)`` of each level, from level 0 up.
+    """
+    count = math.ceil(math.log2(max(width, height, 1))) + 1
+    sizes = [(width, height)]
+    for _ in range(count - 1):
+        width, height = (width + 1) // 2, (height + 1) // 2
+        sizes.append((width, height))
+    return sizes[::-1]
+
+
+def dzi_descriptor(
+    width: int, height: int, tile_size: int = 254, overlap: int = 1, tile_format: str = "jpg"
+) -> str:
+    """
+    Renders the ``.dzi`` XML descriptor read by Deep Zoom viewers.
+
+    :param width: Width of the full image.
+    :param height: Height of the full image.
+    :param tile_size: Width and height of the tiles, without overlap.
+    :param overlap: Pixels each tile repeats from its neighbours.
+    :param tile_format: File extension of the tiles.
+    :return: The XML document.
+    """
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" Format="{tile_format}" '
+        f'Overlap="{overlap}" TileSize="{tile_size}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        "</Image>\n"
+    )
+
+
+def _encode_tile(
+    level: np.ndarray,
+    bounds: tuple[int, int, int, int],
+    lines: np.ndarray,
+    color: tuple[int, int, int],
+    tile_format: str,
+    params: list[int],
+) -> bytes:
+    x0, y0, x1, y1 = bounds
+    tile = level[y0:y1, x0:x1]
+    # Lines are drawn per tile at the level's scale, so they stay visible
+    # when zoomed out and the clean level can still be downsampled
+    hits = lines[(lines + LINE_THICKNESS > y0) & (lines < y1)]
+    if len(hits):
+        tile = tile.copy()
+        for y in hits:
+            tile[max(0, y - y0) : max(0, y + LINE_THICKNESS - y0)] = color
+    with STAGE_SECONDS.time("encode"):
+        success, encoded = cv2.imencode(f".{tile_format}", tile, params)
+    if not success:
+        raise IOError(f"Failed to encode tile {bounds}")
+    ENCODED_BYTES.inc(encoded.size)
+    return encoded.tobytes()
+
+
+def _tile_bounds(width: int, height: int, tile_size: int, overlap: int):
+    for row in range(math.ceil(height / tile_size)):
+        for col in range(math.ceil(width / tile_size)):
+            x0 = max(0, col * tile_size - overlap)
+            y0 = max(0, row * tile_size - overlap)
+            x1 = min(width, (col + 1) * tile_size + overlap)
+            y1 = min(height, (row + 1) * tile_size + overlap)
+            yield col, row, (x0, y0, x1, y1)
+
+
+def _directory_writer(output_dir: str) -> Writer:
+    def write(filename: str, data: bytes):
+        path = os.path.join(output_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    return write
+
+
+def write_pyramid(
+    image: np.ndarray,
+    heights: list[int],
+    name: str,
+    writer: Writer,
+    tile_size: int = 254,
+    overlap: int = 1,
+    tile_format: str = "jpg",
+    quality: int = 85,
+    color: tuple[int, int, int] = (0, 0, 255),
+    max_workers: int | None = None,
+) -> str:
+    """
+    Writes a Deep Zoom (DZI) tile pyramid of an image with split lines.
+
+    The levels are written from the full image down to 1×1. Each level is
+    downsampled from the previous one, its tiles are encoded by a thread
+    pool and passed to ``writer`` in order as soon as they are ready. Only
+    the current level, the next one and a bounded number of encoded tiles
+    are held at a time, so memory stays near the size of the full image.
+
+    :param image: The image as a NumPy array (BGR or grayscale). It is not
+                  modified.
+    :param heights: Split line heights in full-image rows.
+    :param name: Base name of the pyramid: ``<name>.dzi`` and
+                 ``<name>_files/<level>/<column>_<row>.<format>``.
+    :param writer: Receives every file as ``(file name, bytes)``.
+    :param tile_size: Width and height of the tiles, without overlap.
+    :param overlap: Pixels each tile repeats from its neighbours.
+    :param tile_format: ``"jpg"`` or ``"png"``.
+    :param quality: JPEG quality of the tiles.
+    :param color: The color of the split lines in BGR format.
+    :param max_workers: Threads encoding tiles. Defaults to the CPU count.
+    :return: The file name of the descriptor.
+    :raises ValueError: If the tile format is unknown.
+    """
+    if tile_format not in TILE_FORMATS:
+        raise ValueError(
+            f"Unknown tile format: {tile_format} (available: {', '.join(TILE_FORMATS)})"
+        )
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if tile_format == "jpg" else []
+    full_height, full_width = image.shape[:2]
+    sizes = pyramid_levels(full_width, full_height)
+    descriptor = f"{name}.dzi"
+    xml = dzi_descriptor(full_width, full_height, tile_size, overlap, tile_format)
+    writer(descriptor, xml.encode("utf-8"))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    level = image
+    with ThreadPoolExecutor(max_workers) as pool:
+        for index in range(len(sizes) - 1, -1, -1):
+            width, height = sizes[index]
+            if (level.shape[1], level.shape[0]) != (width, height):
+                level = cv2.resize(level, (width, height), interpolation=cv2.INTER_AREA)
+            scale = height / full_height
+            lines = np.array(
+                sorted({round(h * scale) for h in heights if 0 < h < full_height}), dtype=int
+            )
+            pending = deque()
+            for col, row, bounds in _tile_bounds(width, height, tile_size, overlap):
+                filename = f"{name}_files/{index}/{col}_{row}.{tile_format}"
+                future = pool.submit(_encode_tile, level, bounds, lines, color, tile_format, params)
+                pending.append((filename, future))
+                # Keep a few tiles per thread in flight; write the rest out
+                while len(pending) > 4 * max_workers:
+                    filename, future = pending.popleft()
+                    writer(filename, future.result())
+            while pending:
+                filename, future = pending.popleft()
+                writer(filename, future.result())
+    return descriptor
+
+
+def export_pyramid(
+    file_path: str | bytes,
+    output_dir: str = "pyramid",
+    heights: list[int] | None = None,
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    merge_threshold: int = 350,
+    detectors: list[str] | None = None,
+    tile_size: int = 254,
+    overlap: int = 1,
+    tile_format: str = "jpg",
+    quality: int = 85,
+    color: tuple[int, int, int] = (0, 0, 255),
+    max_workers: int | None = None,
+    writer: Writer | None = None,
+) -> str:
+    """
+    Exports a screenshot as a Deep Zoom tile pyramid with its split lines.
+
+    Viewers such as OpenSeadragon load only the tiles in view, so very tall
+    screenshots can be reviewed in a browser. See :func:`write_pyramid`.
+
+    :param file_path: Path to the image file, or the encoded image bytes.
+    :param output_dir: The directory to save the pyramid into.
+    :param heights: Split line heights. If None, they are detected with the
+                    detection parameters, as in :func:`master.split_heights`.
+    :param writer: If given, the files are passed to it as
+                   ``(file name, bytes)`` instead of being saved into
+                   ``output_dir``, e.g. a :class:`streams.TarWriter`.
+    :return: The absolute path to the ``.dzi`` descriptor, or its file name if
+             the files were passed to ``writer``.
+
+    The other parameters are the same as in :func:`master.split_heights` and
+    :func:`write_pyramid`.
+    """
+    img = load_image(file_path)
+    if heights is None:
+        heights, _ = _detect_heights(
+            img,
+            height_threshold,
+            variation_threshold,
+            color_threshold,
+            color_variation_threshold,
+            merge_threshold,
+            detectors=detectors,
+        )
+    descriptor = write_pyramid(
+        img,
+        heights,
+        source_name(file_path),
+        writer if writer is not None else _directory_writer(output_dir),
+        tile_size,
+        overlap,
+        tile_format,
+        quality,
+        color,
+        max_workers,
+    )
+    if writer is not None:
+        return descriptor
+    return os.path.abspath(os.path.join(output_dir, descriptor))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a screenshot with its split lines as a Deep Zoom tile pyramid."
+    )
+    parser.add_argument(
+        "image_file", type=str, help="Path to the image file, or '-' to read it from stdin."
+    )
+    parser.add_argument(
+        "--heights",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Split line heights to draw. Detected if not given.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=str,
+        default="pyramid",
+        help="The directory to save the pyramid into.",
+    )
+    parser.add_argument(
+        "-ts", "--tile_size", type=int, default=254, help="Width and height of the tiles."
+    )
+    parser.add_argument(
+        "-ov",
+        "--overlap",
+        type=int,
+        default=1,
+        help="Pixels each tile repeats from its neighbours.",
+    )
+    parser.add_argument(
+        "-fmt",
+        "--tile_format",
+        type=str,
+        default="jpg",
+        choices=TILE_FORMATS,
+        help="Image format of the tiles.",
+    )
+    parser.add_argument("-q", "--quality", type=int, default=85, help="JPEG quality of the tiles.")
+    parser.add_argument(
+        "-w", "--max_workers", type=int, default=None, help="Threads encoding tiles."
+    )
+    parser.add_argument(
+        "-om",
+        "--output_mode",
+        type=str,
+        default="files",
+        choices=("files", "tar"),
+        help="Save the pyramid into the output directory, or write it to stdout as a tar stream.",
+    )
+    args = parser.parse_args()
+
+    source = read_source(args.image_file)
+    options = dict(
+        heights=args.heights,
+        tile_size=args.tile_size,
+        overlap=args.overlap,
+        tile_format=args.tile_format,
+        quality=args.quality,
+        max_workers=args.max_workers,
+    )
+    if args.output_mode == "tar":
+        with binary_stdout() as out, TarWriter(out) as tar:
+            export_pyramid(source, writer=tar, **options)
+        return
+    descriptor = export_pyramid(source, args.output_dir, **options)
+    print(f"Pyramid saved to: {descriptor}")
+
+
+if __name__ == "__main__":
+    main()
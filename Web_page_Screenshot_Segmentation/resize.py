@@ -0,0 +1,51 @@
+import numpy as np
+
+from .backend import cv2
+
+
+def fit_size(
+    width: int, height: int, target_width: int | None = None, max_pixels: int | None = None
+) -> tuple[int, int]:
+    """
+    Computes the size of an image downscaled to a target width and area.
+
+    The aspect ratio is kept. Images are never upscaled: an image narrower
+    than ``target_width`` and smaller than ``max_pixels`` keeps its size.
+
+    :param width: Width of the image.
+    :param height: Height of the image.
+    :param target_width: Width to scale down to, or None.
+    :param max_pixels: Largest number of pixels of the result, or None.
+    :return: The ``(width, height)`` of the result.
+    """
+    scale = 1.0
+    if target_width is not None and width > target_width:
+        scale = target_width / width
+    if max_pixels is not None and width * height * scale * scale > max_pixels:
+        scale = (max_pixels / (width * height)) ** 0.5
+    if scale == 1.0:
+        return width, height
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def downscale(image: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """
+    Downscales an image with area interpolation.
+
+    :param image: The image as a NumPy array.
+    :param size: The ``(width, height)`` of the result.
+    :return: The downscaled image; a contiguous copy if ``size`` is the size
+             of a view.
+    """
+    # INTER_AREA is much faster for exact 2x reductions than for arbitrary
+    # factors, so halve first and only do the last, fractional step on the
+    # small image
+    width, height = size
+    while image.shape[1] >= 2 * width and image.shape[0] >= 2 * height:
+        half = (image.shape[1] // 2, image.shape[0] // 2)
+        image = cv2.resize(
+            image[: half[1] * 2, : half[0] * 2], half, interpolation=cv2.INTER_AREA
+        )
+    if (image.shape[1], image.shape[0]) == size:
+        return image.copy() if image.base is not None else image
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
@@ -0,0 +1,436 @@
+import contextlib
+import glob
+import importlib.util
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
+
+from .backend import _LazyModule
+
+# Shard formats: NumPy .npz archives, or Parquet files written with pyarrow
+RESULT_FORMATS = ("npz", "parquet")
+# Estimated size of the buffered records at which they are written as a shard
+SHARD_BYTES = 64 * 1024 * 1024
+# Buffer of the file a shard is written through
+WRITE_BUFFER_BYTES = 1024 * 1024
+# Bins of a downsampled row profile
+PROFILE_BINS = 256
+# Columns holding one list per record; the others hold one value per record
+LIST_COLUMNS = ("heights", "labels", "scores")
+_LIST_DTYPES = {"heights": np.int64, "labels": np.str_, "scores": np.float64}
+
+pa = _LazyModule("pyarrow", "install pyarrow, or write npz shards")
+pq = _LazyModule("pyarrow.parquet", "install pyarrow, or write npz shards")
+
+
+def pyarrow_available() -> bool:
+    """
+    Checks whether pyarrow can be imported.
+
+    :return: True if ``pyarrow`` is installed.
+    """
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+@dataclass
+class ResultRecord:
+    """
+    The segmentation result of one image, as stored in a results shard.
+
+    :param file_id: Identifies the image, e.g. its path.
+    :param width: Width of the image in pixels.
+    :param height: Height of the image in pixels.
+    :param heights: The split heights, in full-resolution rows.
+    :param labels: The detector label of each height.
+    :param scores: The candidate score of each height; NaN for heights
+                   reused from a page template.
+    :param template: Whether the heights were reused from a page template.
+    :param content_hash: The content hash of the encoded image, if known.
+    :param seconds: Wall time of each stage, e.g. ``decode``, ``detect``,
+                    ``merge`` and ``export``.
+    :param timings: Wall time of each detector.
+    :param profiles: Downsampled per-row statistics by name, see
+                     :func:`downsample_profile`. Bin ``i`` of ``n`` covers
+                     rows ``i * height // n`` up to ``(i + 1) * height // n``.
+    """
+
+    file_id: str
+    width: int
+    height: int
+    heights: list[int]
+    labels: list[str]
+    scores: list[float]
+    template: bool = False
+    content_hash: str = ""
+    seconds: dict[str, float] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    profiles: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the record in a shard."""
+        return (
+            64
+            + 4 * (len(self.file_id) + len(self.content_hash))
+            + 16 * len(self.heights)
+            + 4 * sum(len(label) for label in self.labels)
+            + 8 * (len(self.seconds) + len(self.timings))
+            + sum(4 * len(values) for values in self.profiles.values())
+        )
+
+
+def downsample_profile(values: np.ndarray, bins: int = PROFILE_BINS) -> np.ndarray:
+    """
+    Averages a per-row statistic over bins of consecutive rows.
+
+    :param values: One value per row.
+    :param bins: Number of bins.
+    :return: The mean of each bin, as float32; one value per row for
+             statistics with fewer rows than bins.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= bins:
+        return values.astype(np.float32)
+    edges = np.linspace(0, len(values), bins + 1).astype(np.int64)
+    sums = np.add.reduceat(values, edges[:-1])
+    return (sums / np.diff(edges)).astype(np.float32)
+
+
+def image_record(
+    file_id: str,
+    analysis: dict,
+    timings: dict | None = None,
+    profile_bins: int = 0,
+    content_hash: str = "",
+) -> ResultRecord:
+    """
+    Builds the record of one image from a detection summary.
+
+    :param file_id: Identifies the image, e.g. its path.
+    :param analysis: The dict filled by the ``analysis`` parameter of
+                     :func:`master.split_heights` or
+                     :func:`master.split_and_export_segments`.
+    :param timings: The wall time of each detector, if measured.
+    :param profile_bins: If positive, the row statistics the detectors
+                         computed are stored, downsampled to this many bins.
+    :param content_hash: The content hash of the encoded image, if known.
+    :return: The record.
+    """
+    profiles = {}
+    if profile_bins > 0:
+        profiles = {
+            name: downsample_profile(values, profile_bins)
+            for name, values in analysis.get("statistics", {}).items()
+        }
+    return ResultRecord(
+        file_id,
+        int(analysis["width"]),
+        int(analysis["height"]),
+        [int(h) for h in analysis["heights"]],
+        list(analysis["labels"]),
+        [float(score) for score in analysis["scores"]],
+        bool(analysis.get("template", False)),
+        content_hash,
+        dict(analysis.get("seconds", {})),
+        dict(timings or {}),
+        profiles,
+    )
+
+
+def _columns(records: list[ResultRecord]) -> dict[str, np.ndarray]:
+    """
+    Lays out records as columns.
+
+    List columns are stored as their concatenated values plus an
+    ``<name>.offsets`` column of ``len(records) + 1`` positions, as in Arrow's
+    list layout; the values of record ``i`` are ``values[offsets[i]:offsets[i + 1]]``.
+    """
+    columns = {
+        "file_id": np.array([r.file_id for r in records], dtype=np.str_),
+        "content_hash": np.array([r.content_hash for r in records], dtype=np.str_),
+        "width": np.array([r.width for r in records], dtype=np.int64),
+        "height": np.array([r.height for r in records], dtype=np.int64),
+        "template": np.array([r.template for r in records], dtype=bool),
+    }
+    # Stages and detectors missing from a record are NaN
+    for prefix, attr in (("seconds", "seconds"), ("timing", "timings")):
+        names = sorted({name for r in records for name in getattr(r, attr)})
+        for name in names:
+            columns[f"{prefix}.{name}"] = np.array(
+                [getattr(r, attr).get(name, np.nan) for r in records], dtype=np.float64
+            )
+    lists = {
+        name: ([getattr(r, name) for r in records], _LIST_DTYPES[name]) for name in LIST_COLUMNS
+    }
+    for name in sorted({name for r in records for name in r.profiles}):
+        empty = np.zeros(0, dtype=np.float32)
+        lists[f"profile.{name}"] = ([r.profiles.get(name, empty) for r in records], np.float32)
+    for name, (values, dtype) in lists.items():
+        lengths = [len(v) for v in values]
+        columns[f"{name}.offsets"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        parts = [np.asarray(v, dtype=dtype) for v in values if len(v)]
+        columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    return columns
+
+
+def _write_npz(f, columns: dict[str, np.ndarray], compress: bool):
+    (np.savez_compressed if compress else np.savez)(f, **columns)
+
+
+def _write_parquet(f, columns: dict[str, np.ndarray], compress: bool):
+    arrays = {}
+    for name, values in columns.items():
+        if name.endswith(".offsets"):
+            continue
+        if f"{name}.offsets" in columns:
+            offsets = pa.array(columns[f"{name}.offsets"], type=pa.int64())
+            arrays[name] = pa.LargeListArray.from_arrays(offsets, pa.array(values))
+        else:
+            arrays[name] = pa.array(values)
+    pq.write_table(pa.table(arrays), f, compression="zstd" if compress else "none")
+
+
+_WRITERS = {"npz": _write_npz, "parquet": _write_parquet}
+
+
+def read_shard(path: str) -> dict[str, np.ndarray]:
+    """
+    Reads the columns of a results shard.
+
+    Both formats are returned in the layout of npz shards: list columns as
+    their concatenated values plus an ``<name>.offsets`` column.
+
+    :param path: A shard written by :class:`ResultsWriter`.
+    :return: The columns by name.
+    :raises IOError: If the shard cannot be read.
+    """
+    try:
+        if path.endswith(".parquet"):
+            return _read_parquet(path)
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError) as e:
+        raise IOError(f"Failed to read results shard {path}: {e}")
+
+
+def _read_parquet(path: str) -> dict[str, np.ndarray]:
+    columns = {}
+    table = pq.read_table(path)
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if pa.types.is_large_list(column.type) or pa.types.is_list(column.type):
+            offsets = column.offsets.to_numpy().astype(np.int64)
+            columns[f"{name}.offsets"] = offsets - offsets[0]
+            column = column.flatten()
+        values = column.to_numpy(zero_copy_only=False)
+        if values.dtype == object:
+            values = values.astype(np.str_)
+        columns[name] = values
+    return columns
+
+
+def iter_records(path: str) -> Iterator[ResultRecord]:
+    """
+    Reads the records of a results shard.
+
+    For scans over many shards, reading the columns with :func:`read_shard`
+    is faster than building records.
+
+    :param path: A shard written by :class:`ResultsWriter`.
+    :return: An iterator over the records, in the order they were appended.
+    :raises IOError: If the shard cannot be read.
+    """
+    columns = read_shard(path)
+
+    def values(name, i):
+        offsets = columns[f"{name}.offsets"]
+        return columns[name][offsets[i] : offsets[i + 1]]
+
+    profiles = [
+        name[len("profile.") :]
+        for name in columns
+        if name.startswith("profile.") and not name.endswith(".offsets")
+    ]
+    for i in range(len(columns["file_id"])):
+        yield ResultRecord(
+            str(columns["file_id"][i]),
+            int(columns["width"][i]),
+            int(columns["height"][i]),
+            values("heights", i).tolist(),
+            [str(label) for label in values("labels", i)],
+            values("scores", i).tolist(),
+            bool(columns["template"][i]),
+            str(columns["content_hash"][i]),
+            _present(columns, "seconds.", i),
+            _present(columns, "timing.", i),
+            {
+                name: values(f"profile.{name}", i)
+                for name in profiles
+                if len(values(f"profile.{name}", i))
+            },
+        )
+
+
+def _present(columns: dict[str, np.ndarray], prefix: str, i: int) -> dict[str, float]:
+    # The non-NaN values of the columns under prefix for record i
+    found = {}
+    for name, values in columns.items():
+        if name.startswith(prefix) and not np.isnan(values[i]):
+            found[name[len(prefix) :]] = float(values[i])
+    return found
+
+
+def shard_paths(directory: str) -> list[str]:
+    """
+    Lists the results shards in a directory.
+
+    :param directory: The directory the shards were written to.
+    :return: The shard paths, sorted by name.
+    """
+    return sorted(
+        path
+        for extension in RESULT_FORMATS
+        for path in glob.glob(os.path.join(glob.escape(directory), f"*.{extension}"))
+    )
+
+
+class ResultsWriter:
+    """
+    Appends one record per image to columnar shards in a directory.
+
+    Records are buffered in memory. Once their estimated size reaches
+    ``shard_bytes``, and on :meth:`close`, they are written in one go as a
+    shard of columns (see :func:`read_shard`), through a buffered temporary
+    file that is then renamed into place, so readers never see a partial
+    shard. If a shard cannot be written, its temporary file is removed and
+    its records stay buffered for the next attempt. Analytics can then scan heights, scores, timings and row profiles
+    of a whole batch without touching the images.
+
+    A writer numbers its shards ``<prefix>-00000.<format>`` on, after any
+    shards with the same prefix already in the directory. Writers in
+    different processes on one directory need different prefixes. Appending
+    is safe from several threads. Use it as a context manager, or call
+    :meth:`close` so the last records are written.
+
+    :param directory: The directory to write the shards to; created if needed.
+    :param format: ``"parquet"`` (needs pyarrow) or ``"npz"``; by default
+                   Parquet if pyarrow is installed, npz otherwise.
+    :param shard_bytes: Estimated size of the records of one shard.
+    :param prefix: The file name prefix of the shards.
+    :param compress: Whether to compress the shards.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        format: str | None = None,
+        shard_bytes: int = SHARD_BYTES,
+        prefix: str = "results",
+        compress: bool = False,
+    ):
+        if format is None:
+            format = "parquet" if pyarrow_available() else "npz"
+        if format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown results format {format!r}; use one of {RESULT_FORMATS}")
+        if shard_bytes <= 0:
+            raise ValueError("The shard size must be positive")
+        self.directory = directory
+        self.format = format
+        self.shard_bytes = shard_bytes
+        self.prefix = prefix
+        self.compress = compress
+        # Paths of the shards written so far
+        self.shards: list[str] = []
+        self.records = 0
+        self._buffer: list[ResultRecord] = []
+        self._buffered_bytes = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            raise IOError(f"Failed to create results directory: {e}")
+        pattern = re.compile(rf"{re.escape(prefix)}-(\d+)\.(?:npz|parquet)$")
+        numbers = [
+            int(match.group(1))
+            for match in map(pattern.match, os.listdir(directory))
+            if match is not None
+        ]
+        self._next_shard = max(numbers, default=-1) + 1
+
+    def append(self, record: ResultRecord):
+        """
+        Buffers a record, writing a shard if the buffer is full.
+
+        :param record: The record of one image, see :func:`image_record`.
+        :raises IOError: If a full shard cannot be written.
+        """
+        with self._lock:
+            self._buffer.append(record)
+            self._buffered_bytes += record.nbytes
+            self.records += 1
+            if self._buffered_bytes < self.shard_bytes:
+                return
+            records, number = self._take()
+        self._write(records, number)
+
+    def _take(self) -> tuple[list[ResultRecord], int]:
+        # Called with the lock held; the shard is written outside of it
+        records, self._buffer, self._buffered_bytes = self._buffer, [], 0
+        number = self._next_shard
+        self._next_shard += 1
+        return records, number
+
+    def flush(self) -> str | None:
+        """
+        Writes the buffered records as a shard.
+
+        :return: The path of the shard, or None if no records were buffered.
+        :raises IOError: If the shard cannot be written.
+        """
+        with self._lock:
+            if not self._buffer:
+                return None
+            records, number = self._take()
+        return self._write(records, number)
+
+    def _write(self, records: list[ResultRecord], number: int) -> str:
+        name = f"{self.prefix}-{number:05d}.{self.format}"
+        path = os.path.join(self.directory, name)
+        # Hidden while written, so shard_paths() skips it
+        temp_path = os.path.join(self.directory, f".{name}.tmp")
+        try:
+            columns = _columns(records)
+            with open(temp_path, "wb", buffering=WRITE_BUFFER_BYTES) as f:
+                _WRITERS[self.format](f, columns, self.compress)
+            os.replace(temp_path, path)
+        except BaseException as e:
+            # Keep the records for the next flush and no partial file behind
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            with self._lock:
+                self._buffer[:0] = records
+                self._buffered_bytes += sum(record.nbytes for record in records)
+            if isinstance(e, OSError):
+                raise IOError(f"Failed to write results shard {path}: {e}")
+            raise
+        with self._lock:
+            self.shards.append(path)
+        return path
+
+    def close(self):
+        """
+        Writes the remaining buffered records.
+
+        :raises IOError: If the shard cannot be written.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
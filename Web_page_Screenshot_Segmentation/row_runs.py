@@ -0,0 +1,68 @@
+import numpy as np
+
+from .workspace import Workspace, scratch
+
+# Collapse only if at most this fraction of the rows is unique; otherwise
+# copying the unique rows costs more than it saves
+MAX_UNIQUE_FRACTION = 0.9
+
+
+def identical_row_runs(
+    gray: np.ndarray, band_rows: int = 1024, workspace: Workspace | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds runs of consecutive byte-identical rows.
+
+    Each row is compared with the one above it, band by band to bound the
+    temporary memory.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param band_rows: Number of rows compared at a time.
+    :param workspace: If given, the comparison buffer is taken from it.
+    :return: The first row of each run and the length of each run.
+    """
+    height = gray.shape[0]
+    if height == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    repeats = np.zeros(height, dtype=bool)
+    shape = (min(band_rows, height - 1),) + gray.shape[1:]
+    equal_rows = scratch(workspace, "runs.equal", shape, bool)
+    for start in range(1, height, band_rows):
+        band = gray[start - 1 : start + band_rows]
+        equal = equal_rows[: len(band) - 1]
+        np.equal(band[1:], band[:-1], out=equal)
+        repeats[start : start + len(band) - 1] = equal.all(axis=1)
+    starts = np.flatnonzero(~repeats)
+    lengths = np.diff(np.append(starts, height))
+    return starts, lengths
+
+
+def per_unique_row(
+    stat,
+    gray: np.ndarray,
+    runs: tuple[np.ndarray, np.ndarray] | None = None,
+    unique: np.ndarray | None = None,
+):
+    """
+    Computes a per-row statistic once per run of identical rows.
+
+    ``stat`` is applied to the first row of every run only, and its result is
+    repeated back to one value per row. Statistics that compare a row with
+    its neighbors must not be used here.
+
+    :param stat: A function from a grayscale image to one array of values per
+                 row, or to a tuple of such arrays.
+    :param gray: The grayscale image as a NumPy array.
+    :param runs: The runs of ``gray``, see :func:`identical_row_runs`.
+                 Computed if not given.
+    :param unique: ``gray[starts]``, if already gathered, e.g. to share it
+                   between statistics.
+    :return: The result of ``stat`` for every row of ``gray``.
+    """
+    starts, lengths = identical_row_runs(gray) if runs is None else runs
+    if len(starts) > MAX_UNIQUE_FRACTION * gray.shape[0]:
+        return stat(gray)
+    values = stat(gray[starts] if unique is None else unique)
+    if isinstance(values, tuple):
+        return tuple(np.repeat(v, lengths) for v in values)
+    return np.repeat(values, lengths)
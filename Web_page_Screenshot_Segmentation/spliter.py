@@ -1,48 +1,111 @@
-import cv2
 import argparse
 import os
 from pathlib import Path
 from PIL import Image
 from io import BytesIO
 import numpy as np
-
-
-def split_and_save_image(image: np.ndarray, heights: list[int], output_dir: str) -> str:
+from .backend import cv2
+from .image_io import load_image
+from .manifest import SegmentManifest, SegmentRecord, content_hash
+from .metrics import ENCODED_BYTES, SEGMENTS_EMITTED, STAGE_SECONDS
+from .resize import fit_size
+from .streams import TarWriter, Writer, binary_stdout, read_source
+
+
+def split_and_save_image(
+    image: np.ndarray,
+    heights: list[int],
+    output_dir: str,
+    write_manifest: bool = True,
+    return_manifest: bool = False,
+    writer: Writer | None = None,
+) -> str | SegmentManifest:
     """
     Splits an image into multiple parts based on a list of heights and saves them.
 
     :param image: The input image as a NumPy array.
     :param heights: A list of integer heights to split the image at.
     :param output_dir: The directory to save the split images.
-    :return: The absolute path to the output directory.
+    :param write_manifest: Whether to write ``manifest.json`` describing every
+                           slice into the output directory (default: True).
+    :param return_manifest: If True, returns the :class:`SegmentManifest`
+                            instead of the output directory path.
+    :param writer: If given, each slice and the manifest are passed to it as
+                   ``(file name, bytes)`` instead of being written into
+                   ``output_dir``, e.g. a :class:`streams.TarWriter`.
+    :return: The absolute path to the output directory, or the slice manifest
+             if ``return_manifest`` is True.
     """
-    img_height = image.shape[0]
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    img_height, img_width = image.shape[:2]
+    if writer is None:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest = SegmentManifest(
+        source=None,
+        width=img_width,
+        height=img_height,
+        output_dir=os.path.abspath(output_dir),
+    )
 
     start_y = 0
     split_heights = sorted(list(set([0] + heights + [img_height])))
 
     for i, end_y in enumerate(split_heights[1:]):
         img_slice = image[start_y:end_y, :]
-        slice_path = os.path.join(output_dir, f"slice_{i}.png")
+        slice_filename = f"slice_{i}.png"
+        slice_path = os.path.join(output_dir, slice_filename)
         # Use imencode + binary write to handle Unicode filenames
-        success, encoded_img = cv2.imencode(".png", img_slice)
-        if success:
-            with open(slice_path, "wb") as f:
-                f.write(encoded_img)
-        else:
+        with STAGE_SECONDS.time("encode"):
+            success, encoded_img = cv2.imencode(".png", img_slice)
+        if not success:
             raise IOError(f"Failed to encode image for writing to {slice_path}")
+        data = encoded_img.tobytes()
+        SEGMENTS_EMITTED.inc()
+        ENCODED_BYTES.inc(len(data))
+        if writer is not None:
+            writer(slice_filename, data)
+        else:
+            with open(slice_path, "wb") as f:
+                f.write(data)
+        manifest.segments.append(
+            SegmentRecord(
+                index=i,
+                y0=int(start_y),
+                y1=int(end_y),
+                x0=0,
+                x1=img_width,
+                byte_size=len(data),
+                sha256=content_hash(data),
+                y0_detector="edge" if start_y == 0 else "manual",
+                y1_detector="edge" if end_y == img_height else "manual",
+                file=slice_filename,
+            )
+        )
         start_y = end_y
 
+    if write_manifest and writer is not None:
+        writer("manifest.json", manifest.to_json().encode("utf-8"))
+    elif write_manifest:
+        manifest.write()
+    if return_manifest:
+        return manifest
     return os.path.abspath(output_dir)
 
 
-def split_and_save_image_pil(img: Image.Image, heights: list[int]) -> list[bytes]:
+def split_and_save_image_pil(
+    img: Image.Image,
+    heights: list[int],
+    target_width: int | None = None,
+    max_pixels: int | None = None,
+) -> list[bytes]:
     """
     Splits a PIL image into multiple parts based on a list of heights.
 
     :param img: The input PIL image.
     :param heights: A list of integer heights to split the image at.
+    :param target_width: If given, parts wider than this are downscaled to it,
+                         keeping the aspect ratio, before encoding.
+    :param max_pixels: If given, parts with more pixels are downscaled to at
+                       most this many before encoding.
     :return: A list of bytes, where each element is a split image in PNG format.
     """
     img_height = img.height
@@ -52,18 +115,42 @@ def split_and_save_image_pil(img: Image.Image, heights: list[int]) -> list[bytes
     split_heights = sorted(list(set([0] + heights + [img_height])))
 
     for end_y in split_heights[1:]:
-        img_slice = img.crop((0, start_y, img.width, end_y))
-        img_byte_arr = BytesIO()
-        img_slice.save(img_byte_arr, format="PNG")
-        images.append(img_byte_arr.getvalue())
+        images.append(_encode_slice_pil(img, start_y, end_y, target_width, max_pixels))
         start_y = end_y
 
     return images
 
 
+def _encode_slice_pil(
+    img: Image.Image,
+    start_y: int,
+    end_y: int,
+    target_width: int | None = None,
+    max_pixels: int | None = None,
+) -> bytes:
+    """
+    Crops rows ``start_y:end_y`` of a PIL image, downscales them to fit
+    ``target_width`` and ``max_pixels`` and encodes them as PNG.
+    """
+    with STAGE_SECONDS.time("encode"):
+        img_slice = img.crop((0, start_y, img.width, end_y))
+        size = fit_size(img_slice.width, img_slice.height, target_width, max_pixels)
+        if size != img_slice.size:
+            # Box filtering averages each source area, like cv2.INTER_AREA
+            img_slice = img_slice.resize(size, Image.Resampling.BOX)
+        img_byte_arr = BytesIO()
+        img_slice.save(img_byte_arr, format="PNG")
+        data = img_byte_arr.getvalue()
+    SEGMENTS_EMITTED.inc()
+    ENCODED_BYTES.inc(len(data))
+    return data
+
+
 def main():
     parser = argparse.ArgumentParser(description="Split an image into multiple parts.")
-    parser.add_argument("image_file", type=str, help="Path to the image file.")
+    parser.add_argument(
+        "image_file", type=str, help="Path to the image file, or '-' to read it from stdin."
+    )
     parser.add_argument(
         "--heights",
         type=int,
@@ -78,19 +165,22 @@ def main():
         default="split_images",
         help="The directory to save the split images.",
     )
+    parser.add_argument(
+        "-om",
+        "--output_mode",
+        type=str,
+        default="files",
+        choices=("files", "tar"),
+        help="Save the images into the output directory, or write them to stdout as a tar stream.",
+    )
     args = parser.parse_args()
 
-    try:
-        # Read image as a byte stream to handle non-ASCII file paths
-        img_data = np.fromfile(args.image_file, np.uint8)
-        image = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-        if image is None:
-            raise FileNotFoundError(
-                f"Image not found or could not be decoded at path: {args.image_file}"
-            )
-    except Exception as e:
-        raise IOError(f"Failed to read image file: {e}")
+    image = load_image(read_source(args.image_file))
 
+    if args.output_mode == "tar":
+        with binary_stdout() as out, TarWriter(out) as tar:
+            split_and_save_image(image, args.heights, args.output_dir, writer=tar)
+        return
     result_path = split_and_save_image(image, args.heights, args.output_dir)
     print(f"Images saved to: {result_path}")
 
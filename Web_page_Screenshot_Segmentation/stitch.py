@@ -0,0 +1,454 @@
+import argparse
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .backend import cv2, to_gray
+from .candidates import merge_candidates
+from .columns import sample_columns
+from .detectors import DetectorParams, RowProfile, run_detectors
+from .image_io import load_image
+
+# Number of column blocks in a row profile
+PROFILE_BLOCKS = 8
+
+
+@dataclass
+class StitchPiece:
+    """
+    Rows of one frame placed into the stitched image.
+
+    :param frame: Index of the frame.
+    :param y0: First row taken from the frame.
+    :param y1: Row after the last row taken from the frame.
+    :param offset: Row of the stitched image where ``y0`` is placed.
+    """
+
+    frame: int
+    y0: int
+    y1: int
+    offset: int
+
+
+@dataclass
+class StitchPlan:
+    """
+    How a sequence of frames maps onto the stitched image.
+
+    :param width: Width of the frames.
+    :param height: Height of the stitched image.
+    :param header: Rows of the sticky header, kept only from the first frame.
+    :param footer: Rows of the sticky footer, kept only from the last frame.
+    :param overlaps: Rows each frame shares with the previous one, after the
+                     header and footer are removed; None where no overlap was
+                     found and the frame was appended as is.
+    :param pieces: The rows taken from each frame, top to bottom.
+    """
+
+    width: int = 0
+    height: int = 0
+    header: int = 0
+    footer: int = 0
+    overlaps: list[int | None] = field(default_factory=list)
+    pieces: list[StitchPiece] = field(default_factory=list)
+
+
+def row_hashes(image: np.ndarray) -> np.ndarray:
+    """
+    Hashes the bytes of every row of an image.
+
+    :param image: The image as a NumPy array.
+    :return: One 64-bit hash per row.
+    """
+    return np.array([hash(row.tobytes()) for row in image], dtype=np.int64)
+
+
+def row_profile(image: np.ndarray, blocks: int = PROFILE_BLOCKS) -> np.ndarray:
+    """
+    Summarizes each row by the mean gray level of a few column blocks.
+
+    :param image: The image as a NumPy array (BGR or grayscale).
+    :param blocks: The number of column blocks.
+    :return: A ``(rows, blocks)`` float64 array.
+    """
+    gray = to_gray(image)
+    blocks = max(1, min(blocks, gray.shape[1]))
+    width = gray.shape[1] // blocks * blocks
+    return gray[:, :width].reshape(len(gray), blocks, -1).mean(axis=2, dtype=np.float64)
+
+
+def _common_rows(a: np.ndarray, b: np.ndarray, tolerance: float) -> np.ndarray:
+    # Rows at the same position whose profiles agree within the tolerance
+    n = min(len(a), len(b))
+    return (np.abs(a[:n] - b[:n]) <= tolerance).all(axis=1)
+
+
+def find_sticky_bars(
+    profile_a: np.ndarray,
+    profile_b: np.ndarray,
+    tolerance: float = 2.0,
+    max_fraction: float = 0.34,
+) -> tuple[int, int]:
+    """
+    Finds the sticky header and footer shared by two frames.
+
+    The header is the longest run of rows at the top that is the same in both
+    frames, and the footer the same at the bottom. Blank rows directly below a
+    header or above a footer are counted with it, which is harmless because
+    they also lie in the overlap. :func:`stitch_bands` takes the smallest
+    bars over all pairs of consecutive frames.
+
+    :param profile_a: The row profile of a frame, see :func:`row_profile`.
+    :param profile_b: The row profile of the next frame.
+    :param tolerance: The largest block mean difference of equal rows.
+    :param max_fraction: Header and footer are each at most this fraction of
+                         the shorter frame.
+    :return: The header and footer heights in rows.
+    """
+    limit = int(min(len(profile_a), len(profile_b)) * max_fraction)
+    top = _common_rows(profile_a, profile_b, tolerance)
+    bottom = _common_rows(profile_a[::-1], profile_b[::-1], tolerance)
+    header = int(np.argmin(top)) if not top.all() else len(top)
+    footer = int(np.argmin(bottom)) if not bottom.all() else len(bottom)
+    return min(header, limit), min(footer, limit)
+
+
+def _closest(overlaps: list[int], expected: int | None) -> int | None:
+    # Blank stretches can match at several overlaps; the scroll step of the
+    # previous frame pair is the best guess, otherwise take the largest
+    if not overlaps:
+        return None
+    if expected is None:
+        return max(overlaps)
+    return min(overlaps, key=lambda k: (abs(k - expected), -k))
+
+
+def _suffix_prefix_lengths(a: list, b: list) -> list[int]:
+    # Every k for which the last k items of a equal the first k items of b.
+    # These are the borders of b + [separator] + a, read off the prefix
+    # function of Knuth-Morris-Pratt in O(len(a) + len(b))
+    length = min(len(a), len(b))
+    sequence = b[:length] + [None] + a[len(a) - length :]
+    prefix = [0] * len(sequence)
+    for i in range(1, len(sequence)):
+        k = prefix[i - 1]
+        while k and sequence[i] != sequence[k]:
+            k = prefix[k - 1]
+        if sequence[i] == sequence[k]:
+            k += 1
+        prefix[i] = k
+    lengths = []
+    k = prefix[-1]
+    while k:
+        lengths.append(k)
+        k = prefix[k - 1]
+    return lengths
+
+
+def find_overlap_exact(
+    hashes_a: np.ndarray,
+    hashes_b: np.ndarray,
+    min_overlap: int = 16,
+    expected: int | None = None,
+) -> int | None:
+    """
+    Finds how many rows at the top of frame B repeat the bottom of frame A.
+
+    All overlaps at which the row hashes of both frames agree are found at
+    once with the Knuth-Morris-Pratt prefix function, so the cost is linear in
+    the rows, also for frames full of repeated or blank rows.
+
+    :param hashes_a: The row hashes of frame A, see :func:`row_hashes`.
+    :param hashes_b: The row hashes of frame B.
+    :param min_overlap: The smallest overlap to accept.
+    :param expected: The overlap of the previous frame pair, preferred when
+                     several overlaps match (e.g. within a blank stretch).
+    :return: The matching overlap in rows, or None.
+    """
+    overlaps = _suffix_prefix_lengths(hashes_a.tolist(), hashes_b.tolist())
+    return _closest([k for k in overlaps if k >= min_overlap], expected)
+
+
+def find_overlap_profile(
+    profile_a: np.ndarray,
+    profile_b: np.ndarray,
+    min_overlap: int = 16,
+    tolerance: float = 2.0,
+    expected: int | None = None,
+) -> int | None:
+    """
+    Finds the overlap of two frames by matching their row profiles.
+
+    Used when lossy compression makes the rows differ slightly. The mean
+    squared profile difference of every possible overlap is computed at once
+    from an FFT cross-correlation, in O(rows log rows).
+
+    :param profile_a: The row profile of frame A, see :func:`row_profile`.
+    :param profile_b: The row profile of frame B.
+    :param min_overlap: The smallest overlap to accept.
+    :param tolerance: The largest RMS block mean difference of a match.
+    :param expected: The overlap of the previous frame pair, preferred among
+                     equally good matches.
+    :return: The best overlap in rows, or None if none is within tolerance.
+    """
+    n, m = len(profile_a), len(profile_b)
+    longest = min(n, m)
+    if longest < min_overlap:
+        return None
+    size = 1 << (n + m).bit_length()
+    # corr[n - k] = sum over the overlap k of a[n - k + i] * b[i]
+    spectrum = np.fft.rfft(profile_a, size, axis=0) * np.conj(np.fft.rfft(profile_b, size, axis=0))
+    corr = np.fft.irfft(spectrum, size, axis=0).sum(axis=1)
+    k = np.arange(1, longest + 1)
+    tail_a = np.cumsum((profile_a[::-1] ** 2).sum(axis=1))[:longest]
+    head_b = np.cumsum((profile_b**2).sum(axis=1))[:longest]
+    msd = (tail_a + head_b - 2 * corr[n - k]) / (k * profile_a.shape[1])
+    msd[: min_overlap - 1] = np.inf
+    lowest = msd.min()
+    if lowest > tolerance**2:
+        return None
+    # Rounding noise of the FFT aside, these overlaps match equally well
+    ties = np.flatnonzero(msd <= lowest + 1e-6 * max(1.0, lowest)) + 1
+    return _closest(ties.tolist(), expected)
+
+
+def _load(frame: str | np.ndarray) -> np.ndarray:
+    return load_image(frame) if isinstance(frame, str) else frame
+
+
+def stitch_bands(
+    frames: Iterable[str | np.ndarray],
+    plan: StitchPlan | None = None,
+    min_overlap: int = 16,
+    tolerance: float = 2.0,
+    remove_sticky: bool = True,
+) -> Iterator[np.ndarray]:
+    """
+    Stitches consecutive scrolling screenshots, yielding the new rows of each.
+
+    Frames are processed in a single pass and only two are decoded at a time.
+    The overlap with the previous frame is found by row hashes, or by row
+    profiles if no exact match exists (e.g. for JPEG frames). A sticky header
+    and footer are kept from the first and last frame only. They are found by
+    comparing the first two frames and shrink to the rows that every
+    following frame shares too; rows of earlier frames that were taken for a
+    bar lie in the overlap with their neighbor frame and are emitted from
+    there.
+
+    :param frames: Image paths or BGR arrays of equal width, top to bottom.
+    :param plan: If given, filled with the :class:`StitchPlan` as frames are
+                 processed.
+    :param min_overlap: The smallest overlap to accept, in rows.
+    :param tolerance: The largest block mean difference for profile matching.
+    :param remove_sticky: Whether to detect and drop repeated header/footer.
+    :return: An iterator of BGR bands; stacked, they form the stitched image.
+    :raises ValueError: If the frames differ in width.
+    """
+    plan = plan if plan is not None else StitchPlan()
+    frames = iter(frames)
+    try:
+        previous = _load(next(frames))
+    except StopIteration:
+        return
+    plan.width = previous.shape[1]
+    prev_index = 0
+    prev_profile = row_profile(previous)
+    prev_hashes = None
+    pending = None  # (frame, y0) of the previous frame's unemitted rows
+    index = 0
+
+    for index, frame in enumerate(frames, start=1):
+        current = _load(frame)
+        if current.shape[1] != plan.width:
+            raise ValueError(
+                f"Frame {index} is {current.shape[1]} pixels wide, expected {plan.width}"
+            )
+        profile = row_profile(current)
+        if index == 1:
+            pending = (previous, 0)
+        if remove_sticky:
+            header, footer = find_sticky_bars(prev_profile, profile, tolerance)
+            if index > 1:
+                header, footer = min(header, plan.header), min(footer, plan.footer)
+            if (header, footer) != (plan.header, plan.footer):
+                # The previous frame's body changed
+                prev_hashes = None
+            plan.header, plan.footer = header, footer
+        header, footer = plan.header, plan.footer
+
+        # Emit the previous frame without its footer
+        source, y0 = pending
+        y1 = len(source) - footer
+        if y1 > y0:
+            plan.pieces.append(StitchPiece(prev_index, y0, y1, plan.height))
+            plan.height += y1 - y0
+            yield source[y0:y1]
+
+        body_a = slice(header, len(previous) - footer)
+        body_b = slice(header, len(current) - footer)
+        if prev_hashes is None:
+            prev_hashes = row_hashes(previous[body_a])
+        hashes = row_hashes(current[body_b])
+        expected = next((k for k in reversed(plan.overlaps) if k is not None), None)
+        overlap = find_overlap_exact(prev_hashes, hashes, min_overlap, expected)
+        if overlap is None:
+            overlap = find_overlap_profile(
+                prev_profile[body_a], profile[body_b], min_overlap, tolerance, expected
+            )
+        if overlap is None:
+            print(f"Warning: no overlap found between frames {index - 1} and {index}")
+        plan.overlaps.append(overlap)
+
+        pending = (current, header + (overlap or 0))
+        previous, prev_index, prev_profile, prev_hashes = current, index, profile, hashes
+
+    # The last frame keeps its footer
+    source, y0 = pending if pending is not None else (previous, 0)
+    if len(source) > y0:
+        plan.pieces.append(StitchPiece(prev_index, y0, len(source), plan.height))
+        plan.height += len(source) - y0
+        yield source[y0:]
+
+
+def stitch_frames(
+    frames: Iterable[str | np.ndarray],
+    min_overlap: int = 16,
+    tolerance: float = 2.0,
+    remove_sticky: bool = True,
+) -> tuple[np.ndarray, StitchPlan]:
+    """
+    Stitches scrolling screenshots into one long image.
+
+    See :func:`stitch_bands` for the parameters.
+
+    :return: The stitched BGR image and its plan.
+    """
+    plan = StitchPlan()
+    bands = list(stitch_bands(frames, plan, min_overlap, tolerance, remove_sticky))
+    if not bands:
+        return np.zeros((0, 0, 3), dtype=np.uint8), plan
+    return np.vstack(bands), plan
+
+
+def stitched_rows(
+    frames: list[str | np.ndarray], plan: StitchPlan, y0: int, y1: int
+) -> np.ndarray:
+    """
+    Rebuilds rows ``y0:y1`` of a stitched image from its frames.
+
+    Only the frames that contribute to those rows are loaded, so segments can
+    be exported without the full stitched image.
+
+    :param frames: The frames passed to :func:`stitch_bands`.
+    :param plan: The plan filled by :func:`stitch_bands`.
+    :param y0: The first row.
+    :param y1: The row after the last row.
+    :return: The requested rows as a BGR image.
+    """
+    parts = []
+    for piece in plan.pieces:
+        start = max(y0, piece.offset)
+        end = min(y1, piece.offset + piece.y1 - piece.y0)
+        if start < end:
+            frame = _load(frames[piece.frame])
+            shift = piece.y0 - piece.offset
+            parts.append(frame[start + shift : end + shift])
+    if not parts:
+        return np.zeros((0, plan.width, 3), dtype=np.uint8)
+    return np.vstack(parts)
+
+
+def split_stitched_heights(
+    frames: Iterable[str | np.ndarray],
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    merge_threshold: int = 350,
+    columns: tuple[int, int] | None = None,
+    column_stride: int = 1,
+    detectors: list[str] | None = None,
+    merge_policy: str = "first",
+    min_overlap: int = 16,
+    tolerance: float = 2.0,
+    remove_sticky: bool = True,
+) -> tuple[list[int], StitchPlan]:
+    """
+    Stitches scrolling screenshots and finds the split heights of the result.
+
+    The stitched bands stream into the detectors' row statistics, so the long
+    image is never built. Only an explicit ``(x0, x1)`` column band is
+    supported, because ``"auto"`` needs the whole image.
+
+    :param frames: Image paths or BGR arrays of equal width, top to bottom.
+    :return: The split heights in stitched rows and the stitch plan.
+
+    The detection parameters are the same as in :func:`master.split_heights`,
+    and the stitching parameters as in :func:`stitch_bands`.
+    """
+    plan = StitchPlan()
+    params = DetectorParams(
+        height_threshold, variation_threshold, color_threshold, color_variation_threshold
+    )
+    bands = stitch_bands(frames, plan, min_overlap, tolerance, remove_sticky)
+    profile = RowProfile.from_bands(
+        (sample_columns(to_gray(band), columns, column_stride) for band in bands),
+        edge_thresholds=(params.edge_threshold,),
+    )
+    candidates = run_detectors(profile, params, detectors)
+    kept = merge_candidates(candidates, merge_threshold, 200, merge_policy)
+    return kept["row"].tolist(), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stitch scrolling screenshots into one long image."
+    )
+    parser.add_argument("frames", type=str, nargs="+", help="Paths of the frames, top to bottom.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="stitched.png",
+        help="The path to save the stitched image.",
+    )
+    parser.add_argument(
+        "-mo",
+        "--min_overlap",
+        type=int,
+        default=16,
+        help="The smallest overlap between two frames, in rows.",
+    )
+    parser.add_argument(
+        "-tol",
+        "--tolerance",
+        type=float,
+        default=2.0,
+        help="The largest gray level difference for matching lossy frames.",
+    )
+    parser.add_argument(
+        "-st",
+        "--remove_sticky",
+        type=bool,
+        default=True,
+        help="Whether to keep sticky headers and footers only once.",
+    )
+    args = parser.parse_args()
+
+    image, plan = stitch_frames(args.frames, args.min_overlap, args.tolerance, args.remove_sticky)
+    ext = os.path.splitext(args.output)[1] or ".png"
+    success, encoded_img = cv2.imencode(ext, image)
+    if not success:
+        raise IOError(f"Failed to encode image for writing to {args.output}")
+    with open(args.output, "wb") as f:
+        f.write(encoded_img)
+    print(
+        f"Stitched {len(plan.overlaps) + 1} frames into {plan.width}x{plan.height} "
+        f"(header {plan.header}, footer {plan.footer}): {os.path.abspath(args.output)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
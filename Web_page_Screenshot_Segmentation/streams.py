@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import sys
+import tarfile
+import time
+from typing import BinaryIO, Callable
+
+# Path that stands for stdin on the command line
+STDIN_PATH = "-"
+# Receives each output file as (file name, encoded bytes) instead of the
+# file being written into an output directory
+Writer = Callable[[str, bytes], None]
+
+
+def read_source(path: str) -> str | bytes:
+    """
+    Resolves a command-line image argument.
+
+    :param path: A file path, or ``"-"`` to read the image from stdin.
+    :return: The path unchanged, or the bytes read from stdin.
+    :raises IOError: If stdin is empty.
+    """
+    if path != STDIN_PATH:
+        return path
+    data = sys.stdin.buffer.read()
+    if not data:
+        raise IOError("Failed to read image file: stdin is empty")
+    return data
+
+
+def source_name(source: str | bytes) -> str:
+    """
+    Returns the base name used for output files of an image.
+
+    :param source: The image path, or the encoded bytes of an image read from
+                   stdin.
+    :return: The file name without extension, or ``"stdin"``.
+    """
+    if isinstance(source, str):
+        return os.path.splitext(os.path.basename(source))[0]
+    return "stdin"
+
+
+class TarWriter:
+    """
+    Streams output files into an uncompressed tar archive.
+
+    The archive is written sequentially, so ``fileobj`` may be a pipe such as
+    stdout. Use it as the ``writer`` of the export functions.
+
+    :param fileobj: The binary stream to write the archive to.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._tar = tarfile.open(fileobj=fileobj, mode="w|")
+
+    def __call__(self, filename: str, data: bytes):
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        """Writes the end-of-archive marker."""
+        self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextlib.contextmanager
+def binary_stdout():
+    """
+    Yields stdout as a binary stream reserved for the payload.
+
+    While active, ``print`` output (progress and debug messages) goes to
+    stderr so it cannot corrupt the payload.
+
+    :return: A context manager yielding the binary stdout stream.
+    """
+    out = sys.stdout.buffer
+    with contextlib.redirect_stdout(sys.stderr):
+        yield out
+    out.flush()
@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from .blank_spliter import row_laplacian_variance
+from .color_spliter import color_change_rows, row_mean_variance
+from .detectors import DetectorParams
+from .metrics import TEMPLATE_HITS, TEMPLATE_MISSES, TEMPLATE_SECONDS_SAVED
+
+# Row bins of a layout signature
+SIGNATURE_BINS = 256
+# Gray levels per quantization step of a signature bin
+SIGNATURE_STEP = 8
+# Only every n-th column is averaged into the signature
+SIGNATURE_COLUMN_STRIDE = 4
+# Share of signature bins that may differ by more than one step in a near match
+MAX_MISMATCH = 0.05
+# Rows checked on each side of a cached blank cut
+VERIFY_ROWS = 16
+# Rows above a cached color cut searched, in blocks of VERIFY_BLOCK_ROWS, for
+# the uniform row it was measured against; a longer gap causes a miss
+VERIFY_COLOR_ROWS = 1024
+VERIFY_BLOCK_ROWS = 64
+# Templates kept by default; the least recently used are dropped first
+DEFAULT_CAPACITY = 512
+
+
+def layout_signature(gray: np.ndarray) -> np.ndarray:
+    """
+    Computes a compact fingerprint of the vertical layout of a screenshot.
+
+    The mean of every row, over every :data:`SIGNATURE_COLUMN_STRIDE`-th
+    column, is averaged into :data:`SIGNATURE_BINS` bins of consecutive rows
+    and quantized to steps of :data:`SIGNATURE_STEP` gray levels. Screenshots
+    of the same page template give signatures that differ only in the bins
+    where their content differs.
+
+    :param gray: The grayscale image as a NumPy array.
+    :return: One quantized level per bin, as uint8; fewer bins for images
+             with fewer rows.
+    """
+    height = gray.shape[0]
+    if height == 0 or gray.shape[1] == 0:
+        return np.zeros(0, dtype=np.uint8)
+    row_means = gray[:, ::SIGNATURE_COLUMN_STRIDE].mean(axis=1, dtype=np.float64)
+    edges = np.unique(np.linspace(0, height, SIGNATURE_BINS + 1).astype(np.int64)[:-1])
+    bins = np.add.reduceat(row_means, edges) / np.diff(np.append(edges, height))
+    return (bins // SIGNATURE_STEP).astype(np.uint8)
+
+
+def signature_mismatch(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Measures how much two layout signatures differ.
+
+    :param a: A signature from :func:`layout_signature`.
+    :param b: Another signature.
+    :return: The share of bins that differ by more than one step; 1 for
+             signatures of different lengths.
+    """
+    if len(a) != len(b) or len(a) == 0:
+        return 1.0
+    differing = np.abs(a.astype(np.int16) - b.astype(np.int16)) > 1
+    return float(np.count_nonzero(differing)) / len(a)
+
+
+def _verify_blank(gray: np.ndarray, row: int, params: DetectorParams) -> bool:
+    # A blank cut is the middle of a blank region of at least height_threshold rows
+    radius = max(1, min(VERIFY_ROWS, params.height_threshold // 2))
+    if row - radius < 0 or row + radius > gray.shape[0]:
+        return False
+    window = gray[row - radius : row + radius]
+    return bool((row_laplacian_variance(window) < params.variation_threshold).all())
+
+
+def _verify_color(gray: np.ndarray, row: int, params: DetectorParams) -> bool:
+    # A color cut is a uniform row whose color differs from the uniform row above
+    if row >= gray.shape[0]:
+        return False
+    means, variances = row_mean_variance(gray[row : row + 1])
+    if variances[0] >= params.color_threshold:
+        return False
+    end = row
+    while end > max(0, row - VERIFY_COLOR_ROWS):
+        start = max(0, end - VERIFY_BLOCK_ROWS)
+        block_means, block_vars = row_mean_variance(gray[start:end])
+        uniform = np.flatnonzero(block_vars < params.color_threshold)
+        if len(uniform):
+            difference = abs(means[0] - block_means[uniform[-1]])
+            return bool(difference > params.color_variation_threshold)
+        end = start
+    return False
+
+
+# Local checks of cached cuts by detector label
+VERIFIERS = {"blank": _verify_blank, "color": _verify_color}
+
+
+def verify_cut(gray: np.ndarray, row: int, label: str, params: DetectorParams) -> bool:
+    """
+    Checks that a cached cut is still a separator in a new image.
+
+    Only the rows around the cut are analyzed. A cut found by several
+    detectors (label ``"blank+color"``) passes if any of their checks
+    passes; cuts of detectors without a check never pass.
+
+    :param gray: The analyzed grayscale image, see :func:`columns.sample_columns`.
+    :param row: The row of the cut in ``gray``.
+    :param label: The detector label of the cut.
+    :param params: The detector thresholds, in rows of ``gray``.
+    :return: Whether the cut is still valid.
+    """
+    return any(
+        name in VERIFIERS and VERIFIERS[name](gray, row, params) for name in label.split("+")
+    )
+
+
+@dataclass
+class TemplateEntry:
+    """
+    The split heights of one page template.
+
+    :param width: Width of the image in pixels.
+    :param height: Height of the image in pixels.
+    :param key: The detection parameters the heights were found with.
+    :param signature: The layout signature, see :func:`layout_signature`.
+    :param heights: The split heights, in full-resolution rows.
+    :param labels: The detector label of each height.
+    :param thresholds: The blank and color thresholds used, see
+                       :data:`calibrate.CALIBRATED`.
+    :param height_threshold: The minimum blank region height, in
+                             full-resolution rows.
+    :param seconds: Wall time of the detection that found the heights.
+    """
+
+    width: int
+    height: int
+    key: str
+    signature: np.ndarray
+    heights: list[int]
+    labels: list[str]
+    thresholds: dict
+    height_threshold: int
+    seconds: float
+
+
+class TemplateCache:
+    """
+    Reuses the split heights of screenshots that share a page template.
+
+    Before the detectors run, the image's layout signature is compared with
+    those of earlier images of the same size detected with the same
+    parameters. On a near match, each cached cut is checked on the rows
+    around it (:func:`verify_cut`); if all cuts hold, the cached heights are
+    returned and the full detection is skipped. Otherwise the image is
+    detected as usual and becomes a template itself.
+
+    Pass it as ``template_cache`` to :func:`master.split_heights` or
+    :func:`master.split_and_export_segments`. It is safe to share between
+    threads. A cache written with :meth:`save` can be loaded in a later run,
+    e.g. for daily snapshots of the same sites.
+
+    :param capacity: Number of templates kept.
+    :param max_mismatch: Largest signature mismatch of a near match, see
+                         :func:`signature_mismatch`.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_mismatch: float = MAX_MISMATCH):
+        self.capacity = capacity
+        self.max_mismatch = max_mismatch
+        self.hits = 0
+        self.misses = 0
+        # Misses that had a near match whose cuts failed verification
+        self.rejected = 0
+        self.seconds_saved = 0.0
+        self._entries: OrderedDict[int, TemplateEntry] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _near_matches(self, width: int, height: int, key: str, signature: np.ndarray):
+        with self._lock:
+            entries = [
+                (entry_id, entry)
+                for entry_id, entry in self._entries.items()
+                if (entry.width, entry.height, entry.key) == (width, height, key)
+            ]
+        matches = [
+            (signature_mismatch(signature, entry.signature), entry_id, entry)
+            for entry_id, entry in entries
+        ]
+        return sorted(
+            (match for match in matches if match[0] <= self.max_mismatch),
+            key=lambda match: match[:2],
+        )
+
+    def lookup(
+        self,
+        signature: np.ndarray,
+        width: int,
+        height: int,
+        key: str,
+        analyzed: np.ndarray,
+        scale: int = 1,
+        elapsed: float = 0.0,
+    ) -> TemplateEntry | None:
+        """
+        Finds a template whose cuts hold in an image.
+
+        Near matches are tried from the closest signature on.
+
+        :param signature: The image's layout signature.
+        :param width: Width of the image in full-resolution pixels.
+        :param height: Height of the image in full-resolution pixels.
+        :param key: The detection parameters, as a string.
+        :param analyzed: The analyzed grayscale image the cuts are checked on.
+        :param scale: Reduction factor of ``analyzed``.
+        :param elapsed: Seconds already spent on this image, e.g. on the
+                        signature, to subtract from the time saved.
+        :return: The matching template, or None on a miss.
+        """
+        start = time.perf_counter()
+        matches = self._near_matches(width, height, key, signature)
+        for _, entry_id, entry in matches:
+            params = DetectorParams(entry.height_threshold, **entry.thresholds).scaled(scale)
+            if not all(
+                verify_cut(analyzed, h // scale, label, params)
+                for h, label in zip(entry.heights, entry.labels)
+            ):
+                continue
+            saved = max(0.0, entry.seconds - elapsed - (time.perf_counter() - start))
+            with self._lock:
+                if entry_id in self._entries:
+                    self._entries.move_to_end(entry_id)
+                self.hits += 1
+                self.seconds_saved += saved
+            TEMPLATE_HITS.inc()
+            TEMPLATE_SECONDS_SAVED.inc(saved)
+            return entry
+        with self._lock:
+            self.misses += 1
+            self.rejected += bool(matches)
+        TEMPLATE_MISSES.inc()
+        return None
+
+    def store(self, entry: TemplateEntry):
+        """
+        Adds a template, dropping the least recently used one if full.
+
+        :param entry: The template of a fully detected image.
+        """
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups that reused a template."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        """
+        Summarizes the lookups, e.g. for printing after a batch.
+        """
+        return (
+            f"Template cache: {self.hits} hits, {self.misses} misses "
+            f"({self.rejected} failed verification), hit rate {self.hit_rate:.0%}, "
+            f"{self.seconds_saved:.2f} s saved, {len(self)} templates"
+        )
+
+    def save(self, path: str) -> str:
+        """
+        Writes the templates to a JSON file.
+
+        :param path: The file to write.
+        :return: The absolute path of the file.
+        :raises IOError: If the file cannot be written.
+        """
+        with self._lock:
+            entries = [
+                dict(asdict(entry), signature=entry.signature.tobytes().hex())
+                for entry in self._entries.values()
+            ]
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "templates": entries}, f)
+        except OSError as e:
+            raise IOError(f"Failed to write template cache: {e}")
+        return os.path.abspath(path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "TemplateCache":
+        """
+        Reads templates written by :meth:`save`.
+
+        :param path: The file to read.
+        :param kwargs: Passed to the constructor.
+        :return: A cache with the templates; empty if the file does not exist.
+        :raises IOError: If the file cannot be read or parsed.
+        """
+        cache = cls(**kwargs)
+        if not os.path.exists(path):
+            return cache
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for fields in data["templates"]:
+                signature = np.frombuffer(bytes.fromhex(fields.pop("signature")), np.uint8)
+                cache.store(TemplateEntry(signature=signature, **fields))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise IOError(f"Failed to read template cache: {e}")
+        return cache
@@ -0,0 +1,453 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .backend import cv2, get_backend
+from .batch import (
+    IMAGE_EXTENSIONS,
+    add_export_arguments,
+    export_params,
+    memory_governor,
+    segment_input,
+)
+from .metrics import REGISTRY
+from .workspace import thread_workspace
+
+# What happens to an input after it was processed: moved into a directory,
+# or left in place next to a marker file
+FINISH_MODES = ("move", "mark")
+# Subdirectories of the watched directory that receive finished inputs
+PROCESSED_DIR = "processed"
+FAILED_DIR = "failed"
+# Suffixes of the marker files written next to inputs in "mark" mode
+DONE_MARKER = ".done"
+FAILED_MARKER = ".failed"
+# Directory modification times closer to the last scan than this are not
+# trusted to skip a scan, for filesystems with coarse timestamps
+COARSE_MTIME_SECONDS = 2.0
+# Times an input may be in flight when a worker process dies before it is
+# failed instead of queued again, so an input that crashes workers stops
+MAX_WORKER_CRASHES = 2
+
+# Stat signature of a file: (size, mtime in nanoseconds)
+Signature = tuple[int, int]
+
+# Memory governor of a worker process, set up by _warm_worker
+_governor = None
+
+
+def scan_directory(
+    directory: str, extensions: tuple[str, ...] = IMAGE_EXTENSIONS, skip_marked: bool = False
+) -> dict[str, Signature]:
+    """
+    Lists the images directly inside a directory with their stat signatures.
+
+    Hidden files are skipped, so writers that create ``.name.tmp`` and rename
+    it when complete are never picked up early.
+
+    :param directory: The directory to scan; subdirectories are not entered.
+    :param extensions: File extensions to include, in lower case.
+    :param skip_marked: Whether to skip images that have a done or failed
+                        marker file next to them.
+    :return: The signature of each image, by path.
+    """
+    found = {}
+    names = set()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            names.add(entry.name)
+            if entry.name.startswith(".") or not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    if skip_marked:
+        found = {
+            path: signature
+            for path, signature in found.items()
+            if os.path.basename(path) + DONE_MARKER not in names
+            and os.path.basename(path) + FAILED_MARKER not in names
+        }
+    return found
+
+
+class SettleTracker:
+    """
+    Tells when files have stopped changing.
+
+    A file is settled once its size and modification time have stayed the
+    same for ``settle_seconds`` across scans, so files that are still being
+    written or copied are not processed half-finished. Empty files never
+    settle.
+
+    :param settle_seconds: How long a signature must stay unchanged.
+    """
+
+    def __init__(self, settle_seconds: float):
+        self.settle_seconds = settle_seconds
+        # Per path: the last signature and when it was first seen
+        self._seen: dict[str, tuple[Signature, float]] = {}
+
+    def update(self, files: dict[str, Signature], now: float) -> list[str]:
+        """
+        Records a scan and returns the files that have settled.
+
+        Settled files are forgotten; a file that reappears later, e.g.
+        rewritten under the same name, has to settle again.
+
+        :param files: The result of a scan.
+        :param now: The time of the scan, from :func:`time.monotonic`.
+        :return: The settled paths, in sorted order.
+        """
+        seen = {}
+        ready = []
+        for path, signature in files.items():
+            previous = self._seen.get(path)
+            since = now if previous is None or previous[0] != signature else previous[1]
+            if signature[0] > 0 and now - since >= self.settle_seconds:
+                ready.append(path)
+            else:
+                seen[path] = (signature, since)
+        self._seen = seen
+        return sorted(ready)
+
+    @property
+    def unsettled(self) -> int:
+        """Number of files seen that have not settled yet."""
+        return len(self._seen)
+
+
+def _warm_worker(memory_budget: int | None = None, workers: int = 1):
+    # Load OpenCV and its JPEG codec once per worker process, not per file.
+    # Processes cannot share a governor, so each one gets its share of the
+    # budget and runs one file at a time within it
+    global _governor
+    if memory_budget is not None:
+        _governor = memory_governor(max(1, memory_budget // workers))
+    if get_backend() == "opencv":
+        cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))
+
+
+def _segment(path: str, output_root: str, params: dict) -> tuple[tuple | Exception, dict]:
+    # Runs in a worker process, which keeps its scratch buffers between files.
+    # The worker's metrics are reset per file and returned with the result or
+    # the error, so the watcher can add them to its own registry
+    REGISTRY.reset()
+    try:
+        result = segment_input(
+            path, output_root, params, workspace=thread_workspace(), governor=_governor
+        )
+    except Exception as e:
+        return e, REGISTRY.snapshot()
+    return result, REGISTRY.snapshot()
+
+
+class FolderWatcher:
+    """
+    Segments the screenshots that appear in a directory.
+
+    The directory is polled with ``os.scandir``; a scan is skipped while the
+    directory's modification time is unchanged and no file is waiting to
+    settle, so an idle directory costs one ``stat`` per poll. Settled files
+    are handed to a pool of worker processes that stay alive between files,
+    so the interpreter, OpenCV and NumPy start once per worker instead of once
+    per file. Finished inputs are moved into ``processed/`` or ``failed/``
+    below the directory (``"move"``), or get a ``.done`` or ``.failed``
+    marker file next to them (``"mark"``); restarting the watcher therefore
+    skips them. If a worker process dies, e.g. killed for running out of
+    memory, the pool is recreated and the inputs that were in flight are
+    queued again; an input in flight during ``MAX_WORKER_CRASHES`` deaths
+    is failed.
+
+    :param directory: The directory to watch.
+    :param output_root: Directory holding the segments of all inputs, in one
+                        subdirectory per input, see :func:`batch.output_location`.
+    :param params: Keyword arguments for
+                   :func:`master.split_and_export_segments`.
+    :param finish_mode: ``"move"`` or ``"mark"``.
+    :param settle_seconds: How long a file must stay unchanged before it is
+                           processed.
+    :param poll_seconds: Seconds between scans.
+    :param max_workers: Worker processes. Defaults to the CPU count.
+    :param metrics_file: If given, the metrics are written to this file after
+                         every finished file. The metrics of the worker
+                         processes are added to :data:`metrics.REGISTRY` of
+                         the watcher's process as each file finishes.
+    :param memory_budget: If given, MiB that all workers together may use for
+                          the images they segment. Each worker gets an equal
+                          share; images whose estimate exceeds it are detected
+                          on a reduced decode, see :class:`governor.MemoryGovernor`.
+    :raises ValueError: If the finish mode is unknown or the memory budget is
+                        not positive.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        output_root: str,
+        params: dict | None = None,
+        finish_mode: str = "move",
+        settle_seconds: float = 2.0,
+        poll_seconds: float = 1.0,
+        max_workers: int | None = None,
+        metrics_file: str | None = None,
+        memory_budget: int | None = None,
+    ):
+        if finish_mode not in FINISH_MODES:
+            raise ValueError(
+                f"Unknown finish mode: {finish_mode} (available: {', '.join(FINISH_MODES)})"
+            )
+        if memory_budget is not None and memory_budget <= 0:
+            raise ValueError(f"Memory budget must be positive, got {memory_budget} MiB")
+        self.directory = directory
+        self.output_root = output_root
+        self.params = params or {}
+        self.finish_mode = finish_mode
+        self.poll_seconds = poll_seconds
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.metrics_file = metrics_file
+        self.memory_budget = memory_budget
+        self.tracker = SettleTracker(settle_seconds)
+        self.counts = {"done": 0, "failed": 0}
+        self._pending: dict[Future, str] = {}
+        self._queued: list[str] = []
+        self._crashes: dict[str, int] = {}
+        self._broken = False
+        self._directory_mtime = None
+        self._last_scan = 0.0
+
+    def _scan(self) -> list[str]:
+        """
+        Scans the directory if it may have changed and returns settled files.
+        """
+        mtime = os.stat(self.directory).st_mtime_ns
+        unchanged = mtime == self._directory_mtime
+        trusted = self._last_scan - mtime / 1e9 > COARSE_MTIME_SECONDS
+        if unchanged and trusted and not self.tracker.unsettled:
+            return []
+        self._directory_mtime = mtime
+        self._last_scan = time.time()
+        files = scan_directory(self.directory, skip_marked=self.finish_mode == "mark")
+        for path in self._pending.values():
+            files.pop(path, None)
+        for path in self._queued:
+            files.pop(path, None)
+        return self.tracker.update(files, time.monotonic())
+
+    def _pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.max_workers,
+            initializer=_warm_worker,
+            initargs=(self.memory_budget, self.max_workers),
+        )
+
+    def _submit(self, pool: ProcessPoolExecutor):
+        # Keep two files per worker in flight so no worker waits for the
+        # next scan, and leave the rest queued in arrival order
+        while self._queued and len(self._pending) < 2 * self.max_workers and not self._broken:
+            path = self._queued[0]
+            try:
+                future = pool.submit(_segment, path, self.output_root, self.params)
+            except BrokenProcessPool:
+                self._broken = True
+                break
+            self._pending[future] = self._queued.pop(0)
+
+    def _restart(self, pool: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        # The futures of a broken pool all fail; collect them, then start over
+        for future in list(self._pending):
+            wait([future])
+            self._finish(future)
+        pool.shutdown()
+        self._broken = False
+        return self._pool()
+
+    def _crashed(self, path: str) -> bool:
+        # A worker died while the input was in flight; queue it again unless
+        # it was in flight during too many deaths. Returns whether it was queued
+        self._broken = True
+        self._crashes[path] = self._crashes.get(path, 0) + 1
+        if self._crashes[path] >= MAX_WORKER_CRASHES:
+            return False
+        print(f"Queueing {path} again: a worker process died")
+        self._queued.insert(0, path)
+        return True
+
+    def _finish(self, future: Future):
+        path = self._pending.pop(future)
+        name = os.path.basename(path)
+        try:
+            outcome, worker_metrics = future.result()
+            REGISTRY.merge(worker_metrics)
+            if isinstance(outcome, Exception):
+                raise outcome
+            input_hash, output_dir, segments, _ = outcome
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and self._crashed(path):
+                return
+            error = f"{type(e).__name__}: {e}"
+            print(f"✗ {path}: {error}")
+            self._crashes.pop(path, None)
+            self._store(path, FAILED_DIR, FAILED_MARKER, error)
+            self.counts["failed"] += 1
+        else:
+            print(f"✓ {name}: {segments} segments in {output_dir}")
+            self._crashes.pop(path, None)
+            record = {"output_dir": output_dir, "sha256": input_hash, "segments": segments}
+            self._store(path, PROCESSED_DIR, DONE_MARKER, json.dumps(record))
+            self.counts["done"] += 1
+        if self.metrics_file is not None:
+            REGISTRY.write(self.metrics_file)
+
+    def _store(self, path: str, subdirectory: str, marker: str, note: str):
+        if self.finish_mode == "mark":
+            with open(path + marker, "w", encoding="utf-8") as f:
+                f.write(note + "\n")
+            return
+        target_dir = os.path.join(self.directory, subdirectory)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(os.path.basename(path))
+            target = os.path.join(target_dir, f"{stem}-{time.time_ns()}{ext}")
+        os.replace(path, target)
+        if subdirectory == FAILED_DIR:
+            with open(target + ".error", "w", encoding="utf-8") as f:
+                f.write(note + "\n")
+
+    def run(self, stop: threading.Event | None = None, until_idle: bool = False) -> dict[str, int]:
+        """
+        Watches the directory until stopped.
+
+        :param stop: Event that ends the loop when set, e.g. from a signal
+                     handler. Files in flight are finished first.
+        :param until_idle: Return once no file is in flight, queued or
+                           waiting to settle, e.g. to drain a directory.
+        :return: The number of files processed (``"done"``) and failed
+                 (``"failed"``).
+        """
+        stop = stop or threading.Event()
+        pool = self._pool()
+        try:
+            while not stop.is_set():
+                if self._broken:
+                    pool = self._restart(pool)
+                self._queued.extend(self._scan())
+                self._submit(pool)
+                if not self._pending:
+                    if self._broken:
+                        continue
+                    if until_idle and not self._queued and not self.tracker.unsettled:
+                        break
+                    stop.wait(self.poll_seconds)
+                    continue
+                done, _ = wait(
+                    list(self._pending), timeout=self.poll_seconds, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    self._finish(future)
+            for future in list(self._pending):
+                wait([future])
+                self._finish(future)
+        finally:
+            pool.shutdown()
+        return dict(self.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch a directory and segment every screenshot that appears in it."
+    )
+    parser.add_argument("directory", type=str, help="The directory to watch.")
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=str,
+        default="segments",
+        help="The directory to save the segments of all images.",
+    )
+    parser.add_argument(
+        "-fm",
+        "--finish_mode",
+        type=str,
+        default="move",
+        choices=FINISH_MODES,
+        help="Move finished inputs into processed/ and failed/, or mark them with a file.",
+    )
+    parser.add_argument(
+        "-se",
+        "--settle_seconds",
+        type=float,
+        default=2.0,
+        help="How long a file must stay unchanged before it is processed.",
+    )
+    parser.add_argument(
+        "-pi", "--poll_seconds", type=float, default=1.0, help="Seconds between scans."
+    )
+    parser.add_argument(
+        "-w", "--max_workers", type=int, default=None, help="Worker processes."
+    )
+    parser.add_argument(
+        "-ui",
+        "--until_idle",
+        type=bool,
+        default=False,
+        help="Exit once the directory has no more files to process.",
+    )
+    parser.add_argument(
+        "-mf",
+        "--metrics_file",
+        type=str,
+        default=None,
+        help="Write the pipeline metrics in the Prometheus text format to this file.",
+    )
+    parser.add_argument(
+        "-mport",
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Serve the pipeline metrics for Prometheus on this local port.",
+    )
+    parser.add_argument(
+        "-mb",
+        "--memory_budget",
+        type=int,
+        default=None,
+        help="MiB that all workers may use at once for images; shared equally between them.",
+    )
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    if args.metrics_port is not None:
+        REGISTRY.serve(args.metrics_port)
+    watcher = FolderWatcher(
+        args.directory,
+        args.output_dir,
+        export_params(args),
+        args.finish_mode,
+        args.settle_seconds,
+        args.poll_seconds,
+        args.max_workers,
+        args.metrics_file,
+        args.memory_budget,
+    )
+    print(f"Watching {os.path.abspath(args.directory)}")
+    try:
+        result = watcher.run(until_idle=args.until_idle)
+    except KeyboardInterrupt:
+        result = watcher.counts
+    print(f"Completed {result['done']} files, {result['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
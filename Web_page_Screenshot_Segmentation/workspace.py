@@ -0,0 +1,95 @@
+import math
+import threading
+
+import numpy as np
+
+
+class Workspace:
+    """
+    Scratch buffers that are reused across segmentation calls.
+
+    A worker that segments many images allocates, per image, a grayscale
+    copy, the unique rows of the analyzed columns, and integer band
+    temporaries for the row and column statistics. With a workspace, each of
+    these is taken from a named buffer that only grows, to the largest image
+    seen, so a long-lived worker stops churning the allocator after its first
+    few images.
+
+    Pass it as ``workspace`` to :func:`master.split_heights`,
+    :func:`master.split_and_export_segments` or :func:`master.auto_crop_bounds`.
+    Buffers are overwritten by the next call, so only results that are
+    returned (heights, row statistics, bounds) outlive a call. The detectors
+    of one run use separate buffers and may run concurrently, but two runs
+    must not share a workspace at the same time; use one per worker thread.
+    """
+
+    def __init__(self):
+        self._buffers: dict[tuple[str, np.dtype], np.ndarray] = {}
+        self._lock = threading.Lock()
+        # Number of times a buffer had to be allocated or grown
+        self.allocations = 0
+
+    def array(self, name: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+        """
+        Returns an uninitialized array backed by the named buffer.
+
+        :param name: The buffer name; each concurrent user needs its own.
+        :param shape: The shape of the array.
+        :param dtype: The data type of the array.
+        :return: A C-contiguous view of the buffer, grown first if it is too small.
+        """
+        dtype = np.dtype(dtype)
+        size = math.prod(shape)
+        key = (name, dtype)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None or buffer.size < size:
+                buffer = np.empty(size, dtype)
+                self._buffers[key] = buffer
+                self.allocations += 1
+        return buffer[:size].reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the buffers in bytes."""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        """
+        Releases all buffers, e.g. after an unusually large image.
+        """
+        with self._lock:
+            self._buffers.clear()
+
+
+def scratch(
+    workspace: Workspace | None, name: str, shape: tuple[int, ...], dtype
+) -> np.ndarray:
+    """
+    Returns a buffer from ``workspace``, or a new array without one.
+
+    :param workspace: The workspace, or None.
+    :param name: The buffer name.
+    :param shape: The shape of the array.
+    :param dtype: The data type of the array.
+    :return: An uninitialized array.
+    """
+    if workspace is None:
+        return np.empty(shape, dtype)
+    return workspace.array(name, shape, dtype)
+
+
+_local = threading.local()
+
+
+def thread_workspace() -> Workspace:
+    """
+    Returns the workspace of the calling thread, creating it on first use.
+
+    Worker threads and processes that segment one image at a time can pass
+    this as ``workspace`` without coordinating buffer ownership.
+    """
+    workspace = getattr(_local, "workspace", None)
+    if workspace is None:
+        workspace = _local.workspace = Workspace()
+    return workspace
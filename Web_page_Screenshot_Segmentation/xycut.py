@@ -0,0 +1,331 @@
+import argparse
+import json
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .backend import to_gray
+from .blank_spliter import low_variation_runs
+from .image_io import load_image
+from .master import _detect_heights
+from .streams import read_source
+
+# Longest line whose sum of squares fits the wrapping uint32 tables
+_UINT32_MAX_LINE = (2**32 - 1) // (255 * 255)
+AXES = ("rows", "columns")
+_SQUARES = np.arange(256, dtype=np.uint32) ** 2
+
+
+def _integral(values: np.ndarray, dtype) -> np.ndarray:
+    """
+    Builds a summed-area table with a zero first row and column.
+
+    Rows are accumulated one at a time over contiguous memory, which is
+    faster than a strided cumulative sum down the columns.
+    """
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=dtype)
+    inner = table[1:, 1:]
+    np.cumsum(values, axis=1, dtype=dtype, out=inner)
+    with np.errstate(over="ignore"):
+        for y in range(1, len(inner)):
+            np.add(inner[y], inner[y - 1], out=inner[y])
+    return table
+
+
+class SummedAreaTable:
+    """
+    Summed-area tables (integral images) of a grayscale image and its square.
+
+    After one pass over the image, the sum, mean and variance of any line
+    inside any rectangle cost O(1): four table lookups per line.
+
+    The tables are uint32 and wrap around on overflow. Differences of
+    wrapped entries are still exact as long as the true sum fits into 32
+    bits, which holds for the sums of any single row or column of images up
+    to 66051 pixels per side; larger images use uint64 tables.
+
+    :param gray: The grayscale image as a NumPy array.
+    """
+
+    def __init__(self, gray: np.ndarray):
+        height, width = gray.shape
+        dtype = np.uint32 if max(height, width) <= _UINT32_MAX_LINE else np.uint64
+        self.shape = gray.shape
+        self.sums = _integral(gray, dtype)
+        self.squares = _integral(_SQUARES.astype(dtype)[gray], dtype)
+
+    @staticmethod
+    def _lines(table: np.ndarray, axis: str, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            if axis == "rows":
+                right = table[y0 + 1 : y1 + 1, x1] - table[y0:y1, x1]
+                left = table[y0 + 1 : y1 + 1, x0] - table[y0:y1, x0]
+            else:
+                right = table[y1, x0 + 1 : x1 + 1] - table[y1, x0:x1]
+                left = table[y0, x0 + 1 : x1 + 1] - table[y0, x0:x1]
+            return right - left
+
+    def line_variance(self, axis: str, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """
+        Computes the variance of every row or column inside a rectangle.
+
+        :param axis: ``"rows"`` or ``"columns"``.
+        :param y0: First row of the rectangle.
+        :param y1: Row after the last row.
+        :param x0: First column of the rectangle.
+        :param x1: Column after the last column.
+        :return: One variance per row (``y1 - y0`` values) or per column.
+        """
+        count = (x1 - x0) if axis == "rows" else (y1 - y0)
+        sums = self._lines(self.sums, axis, y0, y1, x0, x1).astype(np.float64)
+        squares = self._lines(self.squares, axis, y0, y1, x0, x1).astype(np.float64)
+        return (squares - sums * sums / count) / count
+
+
+@dataclass
+class XYNode:
+    """
+    A rectangle of the XY-cut tree.
+
+    :param x0: First column.
+    :param y0: First row.
+    :param x1: Column after the last column.
+    :param y1: Row after the last row.
+    :param axis: ``"rows"`` if the children are stacked vertically,
+                 ``"columns"`` if they are side by side, None for a leaf.
+    :param children: The content rectangles inside this one, blank margins
+                     and gutters removed.
+    """
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    axis: str | None = None
+    children: list["XYNode"] = field(default_factory=list)
+
+    def leaves(self) -> list["XYNode"]:
+        """
+        Returns the leaf rectangles in reading order.
+        """
+        if not self.children:
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def to_dict(self) -> dict:
+        return {
+            "x0": self.x0,
+            "y0": self.y0,
+            "x1": self.x1,
+            "y1": self.y1,
+            "axis": self.axis,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def _content_spans(
+    variance: np.ndarray, variation_threshold: float, min_gap: int
+) -> list[tuple[int, int]]:
+    """
+    Splits a line profile into content spans at blank gutters.
+
+    Blank margins at both ends are dropped. Inner blank runs shorter than
+    ``min_gap`` stay inside a span.
+    """
+    content = np.flatnonzero(variance >= variation_threshold)
+    if len(content) == 0:
+        return []
+    first, last = int(content[0]), int(content[-1]) + 1
+    gutters = low_variation_runs(variance[first:last], min_gap, variation_threshold)
+    bounds = [first] + [first + b for gutter in gutters for b in gutter] + [last]
+    return list(zip(bounds[::2], bounds[1::2]))
+
+
+def _trim(
+    sat: SummedAreaTable, y0: int, y1: int, x0: int, x1: int, variation_threshold: float
+) -> tuple[int, int, int, int] | None:
+    """
+    Shrinks a rectangle to its content, or returns None if it is blank.
+    """
+    rows = _content_spans(sat.line_variance("rows", y0, y1, x0, x1), variation_threshold, 1)
+    if not rows:
+        return None
+    y0, y1 = y0 + rows[0][0], y0 + rows[-1][1]
+    cols = _content_spans(sat.line_variance("columns", y0, y1, x0, x1), variation_threshold, 1)
+    if cols:
+        x0, x1 = x0 + cols[0][0], x0 + cols[-1][1]
+    return y0, y1, x0, x1
+
+
+def _cut(
+    sat: SummedAreaTable,
+    node: XYNode,
+    axis: str,
+    variation_threshold: float,
+    min_gap: int,
+    max_depth: int,
+) -> XYNode:
+    if max_depth == 0:
+        return node
+    for axis in (axis, AXES[1 - AXES.index(axis)]):
+        variance = sat.line_variance(axis, node.y0, node.y1, node.x0, node.x1)
+        spans = _content_spans(variance, variation_threshold, min_gap)
+        if len(spans) < 2:
+            continue
+        node.axis = axis
+        other = AXES[1 - AXES.index(axis)]
+        for start, end in spans:
+            if axis == "rows":
+                bounds = (node.y0 + start, node.y0 + end, node.x0, node.x1)
+            else:
+                bounds = (node.y0, node.y1, node.x0 + start, node.x0 + end)
+            rect = _trim(sat, *bounds, variation_threshold)
+            if rect is None:
+                continue
+            y0, y1, x0, x1 = rect
+            child = XYNode(x0, y0, x1, y1)
+            node.children.append(
+                _cut(sat, child, other, variation_threshold, min_gap, max_depth - 1)
+            )
+        return node
+    return node
+
+
+def xy_cut(
+    gray: np.ndarray,
+    heights: list[int] | None = None,
+    variation_threshold: float = 16.0,
+    min_gap: int = 16,
+    max_depth: int = 6,
+    sat: SummedAreaTable | None = None,
+) -> XYNode:
+    """
+    Segments an image into a tree of content rectangles by recursive XY-cut.
+
+    Each rectangle is cut at blank gutters: runs of at least ``min_gap``
+    rows (or columns) whose pixel variance inside the rectangle is below
+    ``variation_threshold``. Cuts alternate between rows and columns; when a
+    rectangle has no gutter along one axis the other is tried, and it is a
+    leaf if neither has one. Children are trimmed to their content, like
+    :func:`master.auto_crop_image`.
+
+    All line statistics come from one :class:`SummedAreaTable`, so the
+    recursion never rescans pixels.
+
+    :param gray: The grayscale image as a NumPy array.
+    :param heights: If given, the first level of the tree is the segments
+                    between these horizontal splits, e.g. from
+                    :func:`master.split_heights`, trimmed to their content
+                    (blank segments are left out), and the recursion starts
+                    with column cuts inside each segment. Otherwise it starts
+                    with row cuts of the whole image.
+    :param variation_threshold: Lines with a lower pixel variance are blank.
+    :param min_gap: The narrowest gutter, in pixels.
+    :param max_depth: Maximum number of cut levels below the root.
+    :param sat: The summed-area tables of ``gray``, if already built.
+    :return: The root rectangle, covering the whole image.
+    """
+    height, width = gray.shape
+    sat = SummedAreaTable(gray) if sat is None else sat
+    root = XYNode(0, 0, width, height)
+    if heights is None:
+        return _cut(sat, root, "rows", variation_threshold, min_gap, max_depth)
+
+    root.axis = "rows"
+    bounds = sorted(set([0] + list(heights) + [height]))
+    for y0, y1 in zip(bounds, bounds[1:]):
+        # Trimmed like the children of any cut, so a segment without a
+        # gutter is a leaf without its blank margins
+        rect = _trim(sat, y0, y1, 0, width, variation_threshold)
+        if rect is None:
+            continue
+        y0, y1, x0, x1 = rect
+        segment = XYNode(x0, y0, x1, y1)
+        root.children.append(
+            _cut(sat, segment, "columns", variation_threshold, min_gap, max_depth - 1)
+        )
+    return root
+
+
+def xy_cut_segments(
+    file_path: str | bytes,
+    height_threshold: int = 102,
+    variation_threshold: float = 0.5,
+    color_threshold: int = 100,
+    color_variation_threshold: int = 15,
+    merge_threshold: int = 350,
+    detectors: list[str] | None = None,
+    gutter_threshold: float = 16.0,
+    min_gap: int = 16,
+    max_depth: int = 6,
+) -> XYNode:
+    """
+    Splits a screenshot like :func:`master.split_heights` and XY-cuts each segment.
+
+    Multi-column layouts (sidebar and content, card grids) inside a segment
+    become separate rectangles instead of one wide segment with blank
+    gutters.
+
+    :param file_path: Path to the image file, or the encoded image bytes.
+    :param gutter_threshold: Lines with a lower pixel variance are blank
+                             gutters, see :func:`xy_cut`.
+    :param min_gap: The narrowest gutter, in pixels.
+    :param max_depth: Maximum number of cut levels, including the segments.
+    :return: The tree of rectangles; its children are the segments.
+
+    The detection parameters are the same as in :func:`master.split_heights`.
+    """
+    img = load_image(file_path)
+    heights, _ = _detect_heights(
+        img,
+        height_threshold,
+        variation_threshold,
+        color_threshold,
+        color_variation_threshold,
+        merge_threshold,
+        detectors=detectors,
+    )
+    gray = to_gray(img)
+    del img
+    return xy_cut(gray, heights, gutter_threshold, min_gap, max_depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Segment a screenshot into a tree of rectangles by recursive XY-cut."
+    )
+    parser.add_argument(
+        "image_file", type=str, help="Path to the image file, or - to read it from stdin."
+    )
+    parser.add_argument(
+        "-gt",
+        "--gutter_threshold",
+        type=float,
+        default=16.0,
+        help="Lines with a lower pixel variance are blank gutters.",
+    )
+    parser.add_argument(
+        "-mg", "--min_gap", type=int, default=16, help="The narrowest gutter, in pixels."
+    )
+    parser.add_argument(
+        "-md", "--max_depth", type=int, default=6, help="Maximum number of cut levels."
+    )
+    parser.add_argument(
+        "-l", "--leaves", type=bool, default=False, help="Print only the leaf rectangles."
+    )
+    args = parser.parse_args()
+
+    tree = xy_cut_segments(
+        read_source(args.image_file),
+        gutter_threshold=args.gutter_threshold,
+        min_gap=args.min_gap,
+        max_depth=args.max_depth,
+    )
+    if args.leaves:
+        print(json.dumps([leaf.to_dict() for leaf in tree.leaves()]))
+    else:
+        print(json.dumps(tree.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares the opencv and numpy backends on the images/ corpus.
+
+For each backend it measures the cold import time of the package in a fresh
+interpreter (including OpenCV when that backend loads it), decode time, and
+detection time with all built-in detectors. The cuts of the numpy backend are
+compared with those of the opencv backend.
+
+Usage: python benchmarks/bench_backends.py [image ...]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from Web_page_Screenshot_Segmentation.backend import BACKEND_ENV, set_backend
+from Web_page_Screenshot_Segmentation.image_io import load_image
+from Web_page_Screenshot_Segmentation.master import _detect_heights
+
+BACKENDS = ("opencv", "numpy")
+DETECTORS = ["blank", "color", "rule", "band"]
+REPEATS = 3
+# Imports the package and decodes a tiny image in a fresh interpreter
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "from Web_page_Screenshot_Segmentation.image_io import load_image; "
+    "load_image({path!r}); print(time.perf_counter() - start)"
+)
+
+
+def cold_start(backend: str, path: str) -> float:
+    env = dict(os.environ, **{BACKEND_ENV: backend})
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    times = []
+    for _ in range(REPEATS):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(path=path)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(out.stdout))
+    return min(times)
+
+
+def best_of(func, *args):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    paths = sys.argv[1:] or sorted(
+        str(p) for p in (Path(__file__).parent.parent / "images").iterdir()
+    )
+    smallest = min(paths, key=os.path.getsize)
+
+    results = {}
+    print(f"{'backend':<10}{'import (s)':>12}{'decode (s)':>12}{'detect (s)':>12}")
+    for backend in BACKENDS:
+        set_backend(backend)
+        decode_time = detect_time = 0.0
+        cuts = []
+        for path in paths:
+            img, elapsed = best_of(load_image, path)
+            decode_time += elapsed
+            (heights, _), elapsed = best_of(
+                lambda: _detect_heights(img, 102, 0.5, 100, 15, 350, detectors=DETECTORS)
+            )
+            detect_time += elapsed
+            cuts.append(heights)
+        results[backend] = cuts
+        print(
+            f"{backend:<10}{cold_start(backend, smallest):>12.3f}"
+            f"{decode_time:>12.3f}{detect_time:>12.3f}"
+        )
+
+    same = sum(a == b for a, b in zip(results["opencv"], results["numpy"]))
+    print(f"identical cuts: {same}/{len(paths)} images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures the speed/accuracy trade-off of column sampling on the images/ corpus.
+
+Each configuration is compared with full-width detection: a cut counts as
+matched if the other set has a cut within ``TOLERANCE`` rows.
+
+Usage: python benchmarks/bench_column_sampling.py [image ...]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from Web_page_Screenshot_Segmentation.image_io import load_image
+from Web_page_Screenshot_Segmentation.master import _detect_heights
+
+TOLERANCE = 16
+CONFIGS = [
+    ("full width", {}),
+    ("stride 2", {"column_stride": 2}),
+    ("stride 4", {"column_stride": 4}),
+    ("stride 8", {"column_stride": 8}),
+    ("auto band", {"columns": "auto"}),
+    ("auto band, row stride 8", {"columns": "auto", "row_stride": 8}),
+    ("auto band, stride 4", {"columns": "auto", "column_stride": 4, "row_stride": 8}),
+]
+
+
+def detect(img, **options) -> tuple[list[int], float]:
+    start = time.perf_counter()
+    heights, _ = _detect_heights(img, 102, 0.5, 100, 15, 350, **options)
+    return heights, time.perf_counter() - start
+
+
+def matched(cuts: list[int], reference: list[int]) -> int:
+    return sum(1 for c in cuts if any(abs(c - r) <= TOLERANCE for r in reference))
+
+
+def main():
+    paths = sys.argv[1:] or sorted(
+        str(p) for p in (Path(__file__).parent.parent / "images").iterdir()
+    )
+    images = [load_image(p) for p in paths]
+    references = [detect(img)[0] for img in images]
+
+    print(f"{'config':<28}{'time (s)':>10}{'speedup':>9}{'precision':>11}{'recall':>8}")
+    baseline = None
+    for name, options in CONFIGS:
+        total_time = 0.0
+        found = kept = n_cuts = n_reference = 0
+        for img, reference in zip(images, references):
+            heights, elapsed = detect(img, **options)
+            total_time += elapsed
+            found += matched(heights, reference)
+            kept += matched(reference, heights)
+            n_cuts += len(heights)
+            n_reference += len(reference)
+        baseline = baseline or total_time
+        precision = found / n_cuts if n_cuts else 1.0
+        recall = kept / n_reference if n_reference else 1.0
+        print(
+            f"{name:<28}{total_time:>10.3f}{baseline / total_time:>8.2f}x"
+            f"{precision:>11.2f}{recall:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
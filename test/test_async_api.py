@@ -0,0 +1,155 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.async_api module."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from Web_page_Screenshot_Segmentation.async_api import (
+    PixelMemoryLimiter,
+    estimate_pixel_memory,
+    split_and_export_segments_async,
+    split_and_save_image_pil_async,
+    split_heights_async,
+)
+from Web_page_Screenshot_Segmentation.governor import BYTES_PER_PIXEL
+from Web_page_Screenshot_Segmentation.image_io import probe_image_header
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments, split_heights
+from Web_page_Screenshot_Segmentation.spliter import split_and_save_image_pil
+
+
+class TestAsyncApi:
+    """Tests for the asyncio variants of the pipeline functions."""
+
+    @pytest.mark.unit
+    def test_split_heights_async_matches_sync(self, sample_image_path):
+        with ThreadPoolExecutor(2) as executor:
+            result = asyncio.run(
+                split_heights_async(sample_image_path, executor=executor)
+            )
+        assert result == split_heights(sample_image_path)
+
+    @pytest.mark.unit
+    def test_split_heights_async_invalid_path_raises_error(self):
+        with pytest.raises(IOError):
+            asyncio.run(split_heights_async("/nonexistent/path/image.png"))
+
+    @pytest.mark.unit
+    def test_export_async_returns_manifest(self, sample_image_path, tmp_path):
+        manifest = asyncio.run(
+            split_and_export_segments_async(
+                sample_image_path,
+                output_dir=str(tmp_path / "segments"),
+                return_manifest=True,
+            )
+        )
+        assert (tmp_path / "segments" / "manifest.json").exists()
+        for record in manifest.segments:
+            assert (Path(manifest.output_dir) / record.file).exists()
+
+    @pytest.mark.unit
+    def test_keyword_arguments_reach_the_sync_functions(self, sample_image_path, tmp_path):
+        params = {"detectors": ["blank", "rule"], "columns": "auto", "merge_policy": "score"}
+        timings = {}
+        heights = asyncio.run(split_heights_async(sample_image_path, timings=timings, **params))
+        assert heights == split_heights(sample_image_path, **params)
+        assert set(timings) == {"blank", "rule"}
+
+        params["max_decode_pixels"] = probe_image_header(sample_image_path).pixels // 4
+        expected = split_and_export_segments(
+            sample_image_path, str(tmp_path / "sync"), return_manifest=True, **params
+        )
+        manifest = asyncio.run(
+            split_and_export_segments_async(
+                sample_image_path, str(tmp_path / "async"), return_manifest=True, **params
+            )
+        )
+        assert manifest.segments == expected.segments
+
+    @pytest.mark.unit
+    def test_unsupported_keyword_arguments_raise_error(self, sample_image_path):
+        for params in ({"governor": None}, {"no_such_param": 1}):
+            with pytest.raises(ValueError):
+                asyncio.run(split_heights_async(sample_image_path, **params))
+
+    @pytest.mark.unit
+    def test_split_and_save_image_pil_async_matches_sync(self):
+        img = Image.new("RGB", (40, 100), "white")
+        result = asyncio.run(split_and_save_image_pil_async(img, [30, 60]))
+        assert result == split_and_save_image_pil(img, [30, 60])
+
+    @pytest.mark.unit
+    def test_export_async_cancellation(self, sample_image_path, tmp_path):
+        async def run():
+            task = asyncio.create_task(
+                split_and_export_segments_async(
+                    sample_image_path, output_dir=str(tmp_path / "segments")
+                )
+            )
+            await asyncio.sleep(0)
+            task.cancel()
+            await task
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(run())
+        assert not (tmp_path / "segments" / "manifest.json").exists()
+
+
+class TestPixelMemoryLimiter:
+    """Tests for PixelMemoryLimiter and the memory estimate."""
+
+    @pytest.mark.unit
+    def test_estimate_from_header(self, sample_image_path):
+        data = Path(sample_image_path).read_bytes()
+        with Image.open(sample_image_path) as img:
+            width, height = img.size
+        assert estimate_pixel_memory(data) == width * height * BYTES_PER_PIXEL
+
+    @pytest.mark.unit
+    def test_limiter_serializes_jobs_over_budget(self):
+        limiter = PixelMemoryLimiter(100)
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            async with limiter.reserve(60):
+                peak = max(peak, limiter.in_use)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(job(), job(), job())
+
+        asyncio.run(run())
+        assert peak == 60
+        assert limiter.in_use == 0
+
+    @pytest.mark.unit
+    def test_limiter_reduces_large_images(self, sample_image_path, tmp_path):
+        header = probe_image_header(sample_image_path)
+        limiter = PixelMemoryLimiter(
+            header.pixels * BYTES_PER_PIXEL, large_image_bytes=header.pixels
+        )
+        analysis = {}
+        manifest = asyncio.run(
+            split_and_export_segments_async(
+                sample_image_path,
+                str(tmp_path / "segments"),
+                return_manifest=True,
+                limiter=limiter,
+                analysis=analysis,
+            )
+        )
+        assert analysis["row_scale"] > 1
+        assert manifest.segments[-1].y1 == header.height
+        assert limiter.in_use == 0
+
+    @pytest.mark.unit
+    def test_limiter_admits_oversized_job_alone(self):
+        limiter = PixelMemoryLimiter(100)
+
+        async def run():
+            async with limiter.reserve(1000):
+                return limiter.in_use
+
+        assert asyncio.run(run()) == 100
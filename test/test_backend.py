@@ -0,0 +1,86 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.backend module."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation import backend
+from Web_page_Screenshot_Segmentation.master import split_heights
+
+
+@pytest.fixture
+def numpy_backend():
+    """Selects the numpy backend for one test."""
+    previous = backend.get_backend()
+    backend.set_backend("numpy")
+    yield
+    backend.set_backend(previous)
+
+
+def _encode(ext, img):
+    ok, data = cv2.imencode(ext, img)
+    assert ok
+    return data
+
+
+class TestBackend:
+    """Tests for the opencv and numpy backends."""
+
+    @pytest.mark.unit
+    def test_to_gray_matches_opencv(self, numpy_backend):
+        img = np.random.default_rng(0).integers(0, 256, (300, 500, 3), dtype=np.uint8)
+        gray = backend.to_gray(img)
+        assert gray.dtype == np.uint8
+        np.testing.assert_array_equal(gray, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+    @pytest.mark.unit
+    def test_sliding_max_matches_opencv(self, numpy_backend):
+        values = np.random.default_rng(1).random(500)
+        expected = cv2.dilate(
+            values.astype(np.float32).reshape(-1, 1), np.ones((21, 1), np.uint8)
+        ).ravel()
+        np.testing.assert_array_equal(backend.sliding_max(values, 10), expected)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("ext", [".png", ".jpg"])
+    def test_decode_pil_matches_opencv(self, ext):
+        rng = np.random.default_rng(2)
+        img = np.full((400, 300, 3), 255, dtype=np.uint8)
+        img[100:300, 50:250] = rng.integers(0, 256, (200, 200, 3), dtype=np.uint8)
+        data = _encode(ext, img)
+        np.testing.assert_array_equal(
+            backend.decode_pil(data), cv2.imdecode(data, cv2.IMREAD_COLOR)
+        )
+        reduced = backend.decode_pil(data, 4)
+        assert abs(reduced.shape[0] - 100) <= 1 and abs(reduced.shape[1] - 75) <= 1
+        assert backend.decode_pil(data, grayscale=True).shape == (400, 300)
+
+    @pytest.mark.unit
+    def test_set_backend_unknown(self):
+        with pytest.raises(ValueError, match="Unknown backend"):
+            backend.set_backend("torch")
+
+    @pytest.mark.unit
+    def test_split_heights_same_on_both_backends(self, sample_image_path, numpy_backend):
+        heights = split_heights(sample_image_path)
+        backend.set_backend("opencv")
+        assert split_heights(sample_image_path) == heights
+
+    @pytest.mark.unit
+    def test_numpy_backend_does_not_import_opencv(self, sample_image_path):
+        code = (
+            "import sys\n"
+            "from Web_page_Screenshot_Segmentation import split_heights\n"
+            f"split_heights({str(sample_image_path)!r})\n"
+            "print('cv2' in sys.modules)\n"
+        )
+        env = dict(os.environ, **{backend.BACKEND_ENV: "numpy"})
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+        out = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+        )
+        assert out.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,338 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.batch module."""
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import time
+
+import pytest
+from Web_page_Screenshot_Segmentation.batch import (
+    JobLedger,
+    add_export_arguments,
+    collect_inputs,
+    export_params,
+    memory_governor,
+    params_key,
+    run_batch,
+    run_batch_pipelined,
+)
+from Web_page_Screenshot_Segmentation.governor import MemoryGovernor
+from Web_page_Screenshot_Segmentation.image_io import probe_image_header
+from Web_page_Screenshot_Segmentation.results import ResultsWriter, iter_records, shard_paths
+from Web_page_Screenshot_Segmentation.templates import TemplateCache
+
+
+class _RecordingGovernor(MemoryGovernor):
+    """Memory governor that records every reservation."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reserved = []
+
+    def acquire(self, nbytes: int, timeout: float | None = None) -> bool:
+        self.reserved.append(nbytes)
+        return super().acquire(nbytes, timeout)
+
+
+def _claim_all(ledger_path, worker, queue):
+    with JobLedger(ledger_path, worker=worker) as ledger:
+        claimed = []
+        while jobs := ledger.claim(2):
+            claimed.extend(job.id for job in jobs)
+        queue.put(claimed)
+
+
+class TestJobLedger:
+    """Tests for the SQLite job ledger."""
+
+    @pytest.mark.unit
+    def test_add_is_idempotent(self, tmp_path):
+        with JobLedger(str(tmp_path / "ledger.db")) as ledger:
+            assert ledger.add(["a.png", "b.png"]) == 2
+            assert ledger.add(["a.png", "b.png", "c.png"]) == 1
+            assert ledger.add(["a.png"], {"merge_threshold": 100}) == 1
+            assert ledger.counts()["pending"] == 4
+
+    @pytest.mark.unit
+    def test_params_key_ignores_order(self):
+        assert params_key({"a": 1, "b": 2}) == params_key({"b": 2, "a": 1})
+
+    @pytest.mark.unit
+    def test_export_params_keep_the_keys_of_existing_jobs(self):
+        parser = argparse.ArgumentParser()
+        add_export_arguments(parser)
+        params = export_params(parser.parse_args([]))
+        assert sorted(params) == [
+            "auto_crop",
+            "color_threshold",
+            "color_variation_threshold",
+            "dedup",
+            "detectors",
+            "height_threshold",
+            "merge_policy",
+            "merge_threshold",
+            "variation_threshold",
+        ]
+        params = export_params(parser.parse_args(["-tw", "800", "-at", "1"]))
+        assert (params["target_width"], params["auto_thresholds"]) == (800, True)
+        assert "max_pixels" not in params
+
+    @pytest.mark.unit
+    def test_export_arguments_are_documented_and_checked(self):
+        parser = argparse.ArgumentParser()
+        add_export_arguments(parser)
+        assert all(action.help for action in parser._actions)
+        assert export_params(parser.parse_args(["-mp", "score"]))["merge_policy"] == "score"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["-mp", "best"])
+
+    @pytest.mark.unit
+    def test_failures_are_retried_up_to_the_cap(self, tmp_path):
+        with JobLedger(str(tmp_path / "ledger.db"), max_attempts=2) as ledger:
+            ledger.add(["missing.png"])
+            for attempt in (1, 2):
+                (job,) = ledger.claim()
+                assert job.attempts == attempt
+                ledger.fail(job, "IOError", 0.0)
+            assert ledger.claim() == []
+            assert ledger.counts()["failed"] == 1
+
+    @pytest.mark.unit
+    def test_expired_lease_is_handed_out_again(self, tmp_path):
+        path = str(tmp_path / "ledger.db")
+        with JobLedger(path, lease_seconds=-1, worker="lost") as lost:
+            lost.add(["a.png"])
+            (job,) = lost.claim()
+        with JobLedger(path, worker="other") as other:
+            (again,) = other.claim()
+            assert again.id == job.id
+            # The lost worker no longer holds the lease
+            with JobLedger(path, worker="lost") as lost:
+                lost.complete(job, "0" * 64, "out", 1, 0.0)
+            assert other.counts()["running"] == 1
+
+    @pytest.mark.unit
+    def test_expired_leases_count_against_the_cap(self, tmp_path):
+        # A job that kills its worker is not handed out forever
+        with JobLedger(str(tmp_path / "ledger.db"), max_attempts=2, lease_seconds=-1) as ledger:
+            ledger.add(["crash.png"])
+            assert [job.attempts for job in ledger.claim()] == [1]
+            assert [job.attempts for job in ledger.claim()] == [2]
+            assert ledger.claim() == []
+            assert ledger.counts()["failed"] == 1
+            (error,) = ledger._conn.execute("SELECT error FROM jobs").fetchone()
+            assert error == "Lease expired after 2 attempts"
+
+    @pytest.mark.unit
+    def test_start_renews_the_lease(self, tmp_path):
+        path = str(tmp_path / "ledger.db")
+        with JobLedger(path, lease_seconds=-1, worker="slow") as slow:
+            slow.add(["a.png", "b.png"])
+            first, second = slow.claim(2)
+            slow.lease_seconds = 600
+            assert slow.start(first)
+            slow.renew([first])
+            with JobLedger(path, worker="other") as other:
+                # Only the job the slow worker had not started yet expired
+                (taken,) = other.claim(2)
+                assert taken.id == second.id
+            assert not slow.start(second)
+            started_at = slow._conn.execute(
+                "SELECT started_at FROM jobs WHERE id = ?", (second.id,)
+            ).fetchone()[0]
+            assert started_at is None
+
+    @pytest.mark.unit
+    def test_processes_never_claim_the_same_job(self, tmp_path):
+        path = str(tmp_path / "ledger.db")
+        with JobLedger(path) as ledger:
+            ledger.add([f"{i}.png" for i in range(200)])
+        queue = multiprocessing.get_context("spawn").Queue()
+        workers = [
+            multiprocessing.get_context("spawn").Process(
+                target=_claim_all, args=(path, f"w{i}", queue)
+            )
+            for i in range(4)
+        ]
+        for w in workers:
+            w.start()
+        claimed = [job_id for _ in workers for job_id in queue.get(timeout=60)]
+        for w in workers:
+            w.join()
+        assert sorted(claimed) == list(range(1, 201))
+
+
+class TestRunBatch:
+    """Tests for running a batch against a ledger."""
+
+    @pytest.mark.unit
+    def test_run_and_resume(self, sample_image_path, tmp_path):
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        shutil.copy(sample_image_path, inputs / "page.png")
+        (inputs / "broken.png").write_bytes(b"not an image")
+        path = str(tmp_path / "ledger.db")
+
+        with JobLedger(path, max_attempts=2) as ledger:
+            ledger.add(collect_inputs([str(inputs)]))
+            result = run_batch(ledger, str(tmp_path / "out"))
+            assert result == {"done": 1, "failed": 2, "lost": 0}
+            assert ledger.counts() == {"pending": 0, "running": 0, "done": 1, "failed": 1}
+
+            # A restart finds nothing left to do
+            ledger.add(collect_inputs([str(inputs)]))
+            assert run_batch(ledger, str(tmp_path / "out")) == {"done": 0, "failed": 0, "lost": 0}
+
+            row = ledger._conn.execute(
+                "SELECT content_hash, output_dir, segments, timings FROM jobs "
+                "WHERE status = 'done'"
+            ).fetchone()
+        content_hash, output_dir, segments, timings = row
+        assert output_dir.endswith(f"page-{content_hash[:12]}")
+        manifest_path = tmp_path / "out" / f"page-{content_hash[:12]}" / "manifest.json"
+        manifest = json.loads(manifest_path.read_text())
+        assert len(manifest["segments"]) == segments
+        assert set(json.loads(timings)) == {"blank", "color"}
+
+    @pytest.mark.unit
+    def test_pipelined_matches_sequential(self, sample_image_path, tmp_path):
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        for name in ("a.png", "b.png", "c.png"):
+            shutil.copy(sample_image_path, inputs / name)
+        (inputs / "broken.png").write_bytes(b"not an image")
+        params = {"merge_threshold": 300, "auto_crop": True}
+
+        with JobLedger(str(tmp_path / "sequential.db"), max_attempts=1) as ledger:
+            ledger.add(collect_inputs([str(inputs)]), params)
+            assert run_batch(ledger, str(tmp_path / "seq")) == {"done": 3, "failed": 1, "lost": 0}
+        stats = []
+        with JobLedger(str(tmp_path / "pipelined.db"), max_attempts=1) as ledger:
+            ledger.add(collect_inputs([str(inputs)]), params)
+            result = run_batch_pipelined(
+                ledger, str(tmp_path / "pipe"), claim_size=2, prefetch=1, stats=stats
+            )
+            assert result == {"done": 3, "failed": 1, "lost": 0}
+            assert ledger.counts()["done"] == 3
+
+        for output_dir in (tmp_path / "seq").iterdir():
+            expected = json.loads((output_dir / "manifest.json").read_text())
+            actual = json.loads((tmp_path / "pipe" / output_dir.name / "manifest.json").read_text())
+            assert [s["sha256"] for s in actual["segments"]] == [
+                s["sha256"] for s in expected["segments"]
+            ]
+        assert [s.name for s in stats] == ["read", "analyze", "export"]
+        assert [s.items for s in stats] == [4, 4, 4]
+
+    @pytest.mark.unit
+    def test_max_decode_pixels_in_both_runners(self, sample_image_path, tmp_path):
+        pixels = probe_image_header(sample_image_path).pixels
+        params = {"max_decode_pixels": pixels // 4}
+        manifests = []
+        for runner in (run_batch, run_batch_pipelined):
+            out = tmp_path / runner.__name__
+            with JobLedger(str(tmp_path / f"{runner.__name__}.db")) as ledger:
+                ledger.add([sample_image_path], params)
+                assert runner(ledger, str(out)) == {"done": 1, "failed": 0, "lost": 0}
+            (output_dir,) = out.iterdir()
+            manifests.append(json.loads((output_dir / "manifest.json").read_text()))
+        sequential, pipelined = manifests
+        assert pipelined["segments"] == sequential["segments"]
+        # Detected at half size, cut at full resolution
+        assert sequential["segments"][-1]["y1"] == probe_image_header(sample_image_path).height
+
+    @pytest.mark.unit
+    def test_memory_governor_in_both_runners(self, sample_image_path, tmp_path):
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        for name in ("a.png", "b.png"):
+            shutil.copy(sample_image_path, inputs / name)
+        # Smaller than the sample image, so it is detected on a reduced decode
+        governor = _RecordingGovernor(1024**2, large_image_bytes=1024**2)
+        manifests = []
+        for runner in (run_batch, run_batch_pipelined):
+            out = tmp_path / runner.__name__
+            with JobLedger(str(tmp_path / f"{runner.__name__}.db")) as ledger:
+                ledger.add(collect_inputs([str(inputs)]))
+                result = runner(ledger, str(out), governor=governor)
+                assert result == {"done": 2, "failed": 0, "lost": 0}
+            for output_dir in sorted(out.iterdir()):
+                manifests.append(json.loads((output_dir / "manifest.json").read_text()))
+        assert len(governor.reserved) == 4
+        assert governor.in_use == 0
+        sequential, pipelined = manifests[:2], manifests[2:]
+        assert [m["segments"] for m in pipelined] == [m["segments"] for m in sequential]
+        assert sequential[0]["segments"][-1]["y1"] == probe_image_header(sample_image_path).height
+
+    @pytest.mark.unit
+    def test_jobs_taken_over_while_running_are_lost(self, sample_image_path, tmp_path):
+        for runner in (run_batch, run_batch_pipelined):
+            path = str(tmp_path / f"{runner.__name__}.db")
+            with JobLedger(path, lease_seconds=0, worker="slow") as ledger, JobLedger(
+                path, worker="other"
+            ) as other:
+                ledger.add([sample_image_path])
+                start = ledger.start
+
+                def start_and_lose(job):
+                    # The lease expires at once and another worker takes the job
+                    started = start(job)
+                    time.sleep(0.01)
+                    assert other.claim(1)
+                    return started
+
+                ledger.start = start_and_lose
+                result = runner(ledger, str(tmp_path / "out"))
+                assert result == {"done": 0, "failed": 0, "lost": 1}
+                assert ledger.counts()["running"] == 1
+
+    @pytest.mark.unit
+    def test_memory_governor_rejects_empty_budget(self):
+        with pytest.raises(ValueError):
+            memory_governor(0)
+
+    @pytest.mark.unit
+    def test_pipelined_rejects_unsupported_params(self, sample_image_path, tmp_path):
+        with JobLedger(str(tmp_path / "ledger.db"), max_attempts=1) as ledger:
+            ledger.add([sample_image_path], {"no_such_param": 1})
+            result = run_batch_pipelined(ledger, str(tmp_path / "out"))
+            assert result == {"done": 0, "failed": 1, "lost": 0}
+
+    @pytest.mark.unit
+    def test_template_cache_is_shared_by_jobs(self, sample_image_path, tmp_path):
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        for name in ("monday.png", "tuesday.png"):
+            shutil.copy(sample_image_path, inputs / name)
+        cache = TemplateCache()
+        with JobLedger(str(tmp_path / "ledger.db")) as ledger:
+            ledger.add(collect_inputs([str(inputs)]))
+            result = run_batch(ledger, str(tmp_path / "out"), template_cache=cache)
+        assert result == {"done": 2, "failed": 0, "lost": 0}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    @pytest.mark.unit
+    def test_results_are_written_by_both_runners(self, sample_image_path, tmp_path):
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        for name in ("a.png", "b.png"):
+            shutil.copy(sample_image_path, inputs / name)
+        records = {}
+        for runner in (run_batch, run_batch_pipelined):
+            directory = tmp_path / runner.__name__
+            with JobLedger(str(tmp_path / f"{runner.__name__}.db")) as ledger:
+                ledger.add(collect_inputs([str(inputs)]))
+                with ResultsWriter(str(directory), format="npz") as results:
+                    runner(ledger, str(tmp_path / "out"), results=results, profile_bins=32)
+            (shard,) = shard_paths(str(directory))
+            records[runner] = sorted(iter_records(shard), key=lambda r: r.file_id)
+
+        for sequential, pipelined in zip(records[run_batch], records[run_batch_pipelined]):
+            assert sequential.file_id == pipelined.file_id
+            assert sequential.heights == pipelined.heights
+            assert sequential.scores == pipelined.scores
+            assert len(sequential.content_hash) == 64
+            assert set(pipelined.seconds) == {"decode", "detect", "merge", "export"}
+            assert set(pipelined.timings) == {"blank", "color"}
+            assert pipelined.profiles["mean"].shape == (32,)
@@ -0,0 +1,106 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.calibrate module."""
+
+import json
+
+import pytest
+import numpy as np
+from Web_page_Screenshot_Segmentation.calibrate import (
+    MIN_SEPARABILITY,
+    calibrate_thresholds,
+    otsu_threshold,
+)
+from Web_page_Screenshot_Segmentation.detectors import (
+    DetectorParams,
+    RowProfile,
+    detect_blank,
+    detect_color,
+)
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments, split_heights
+
+
+def _noisy_page(noise: int) -> np.ndarray:
+    """A gray page whose blank rows carry encoder-like noise."""
+    rng = np.random.default_rng(0)
+    gray = np.full((3000, 400), 200, dtype=np.int16)
+    gray += rng.integers(-noise, noise + 1, gray.shape, dtype=np.int16)
+    for top in (300, 1300, 2300):
+        gray[top : top + 400] = rng.integers(0, 256, (400, 400))
+    gray[1500:] -= 60
+    return np.clip(gray, 0, 255).astype(np.uint8)
+
+
+class TestOtsuThreshold:
+    """Tests for otsu_threshold."""
+
+    @pytest.mark.unit
+    def test_splits_two_clusters(self):
+        values = np.concatenate([np.full(500, 0.1), np.full(500, 1000.0)])
+        cut, separability = otsu_threshold(values)
+        assert 0.1 < cut < 1000
+        assert separability > 0.99
+
+    @pytest.mark.unit
+    def test_constant_values_have_no_separability(self):
+        assert otsu_threshold(np.full(10, 3.0)) == (pytest.approx(3.0), 0.0)
+
+
+class TestCalibrateThresholds:
+    """Tests for calibrate_thresholds."""
+
+    @pytest.mark.unit
+    def test_noise_floor_raises_variation_threshold(self):
+        profile = RowProfile(_noisy_page(2))
+        params = calibrate_thresholds(profile, DetectorParams())
+        assert len(detect_blank(profile, DetectorParams())) == 0
+        assert detect_blank(profile, params)["row"].tolist() == [150, 1000, 2000, 2850]
+
+    @pytest.mark.unit
+    def test_color_change_above_noise(self):
+        profile = RowProfile(_noisy_page(2))
+        params = calibrate_thresholds(profile, DetectorParams())
+        # The first uniform row after the content block has the new color
+        assert detect_color(profile, params)["row"].tolist() == [1700]
+
+    @pytest.mark.unit
+    def test_unimodal_image_keeps_defaults(self):
+        gray = np.random.default_rng(1).integers(0, 256, (500, 300), dtype=np.uint8)
+        profile = RowProfile(gray)
+        assert otsu_threshold(profile.laplacian_variance)[1] < MIN_SEPARABILITY
+        assert calibrate_thresholds(profile, DetectorParams()) == DetectorParams()
+
+
+class TestAutoThresholds:
+    """Tests for auto_thresholds in the pipeline."""
+
+    @pytest.mark.unit
+    def test_reported_thresholds_reproduce_the_run(self, sample_image_path):
+        thresholds = {}
+        heights = split_heights(sample_image_path, auto_thresholds=True, thresholds=thresholds)
+        assert set(thresholds) == {
+            "variation_threshold",
+            "color_threshold",
+            "color_variation_threshold",
+        }
+        assert split_heights(sample_image_path, **thresholds) == heights
+
+    @pytest.mark.unit
+    def test_fixed_thresholds_are_reported(self, sample_image_path):
+        thresholds = {}
+        split_heights(sample_image_path, thresholds=thresholds)
+        assert thresholds == {
+            "variation_threshold": 0.5,
+            "color_threshold": 100,
+            "color_variation_threshold": 15,
+        }
+
+    @pytest.mark.unit
+    def test_manifest_records_thresholds(self, sample_image_path, tmp_path):
+        split_and_export_segments(sample_image_path, str(tmp_path), auto_thresholds=True)
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert manifest["thresholds"]["variation_threshold"] > 0
+
+    @pytest.mark.unit
+    def test_manifest_has_no_thresholds_by_default(self, sample_image_path, tmp_path):
+        split_and_export_segments(sample_image_path, str(tmp_path))
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert manifest["thresholds"] is None
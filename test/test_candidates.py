@@ -0,0 +1,89 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.candidates module."""
+
+import pytest
+import numpy as np
+from Web_page_Screenshot_Segmentation.candidates import (
+    CANDIDATE_DTYPE,
+    as_candidates,
+    candidate_labels,
+    make_candidates,
+    merge_candidates,
+    scale_candidates,
+)
+from Web_page_Screenshot_Segmentation.master import (
+    detect_candidates,
+    remove_close_values,
+    split_heights,
+)
+
+
+@pytest.fixture
+def table():
+    """Candidates from two detectors with different score units."""
+    return np.concatenate(
+        [
+            make_candidates([300, 1000], [250, 900], [350, 1100], [100, 200], "blank"),
+            make_candidates([300, 1050, 1400], scores=[20, 90, 30], source="color"),
+        ]
+    )
+
+
+class TestCandidates:
+    """Tests for the candidate table and merge policies."""
+
+    @pytest.mark.unit
+    def test_make_candidates_defaults(self):
+        table = make_candidates([500, 100], source="color")
+        assert table.dtype == CANDIDATE_DTYPE
+        assert table["row"].tolist() == [100, 500]
+        assert table["start"].tolist() == [100, 500]
+        assert table["end"].tolist() == [101, 501]
+        assert table["score"].tolist() == [1.0, 1.0]
+
+    @pytest.mark.unit
+    def test_as_candidates_from_pairs(self):
+        table = as_candidates([(10, 2.0), (5, 1.0)], "custom")
+        assert table["row"].tolist() == [5, 10]
+        assert set(table["source"]) == {"custom"}
+
+    @pytest.mark.unit
+    def test_scale_candidates(self, table):
+        scaled = scale_candidates(table, 4)
+        assert scaled["row"][0] == 1200
+        assert scaled["end"][0] == 1400
+        assert table["row"][0] == 300
+
+    @pytest.mark.unit
+    def test_merge_first_matches_remove_close_values(self, table):
+        kept = merge_candidates(table, 350)
+        assert kept["row"].tolist() == remove_close_values(table["row"].tolist(), 350)
+        assert candidate_labels(kept, table) == ["blank+color", "blank", "color"]
+
+    @pytest.mark.unit
+    def test_merge_score_keeps_strongest(self, table):
+        # Blank 1000 and color 1050 both normalize to 1; the upper row wins
+        kept = merge_candidates(table, 350, policy="score")
+        assert kept["row"].tolist() == [300, 1000, 1400]
+        # Color 300 (20/90) is dropped next to blank 300 (100/200)
+        kept = merge_candidates(table, 100, min_height=0, policy="score")
+        assert kept["row"].tolist() == [300, 1000, 1400]
+        assert kept["source"].tolist() == ["blank", "blank", "color"]
+
+    @pytest.mark.unit
+    def test_merge_unknown_policy(self, table):
+        with pytest.raises(ValueError, match="Unknown merge policy"):
+            merge_candidates(table, 350, policy="median")
+
+    @pytest.mark.unit
+    def test_merge_empty(self):
+        assert len(merge_candidates(make_candidates([]), 350)) == 0
+
+    @pytest.mark.unit
+    def test_detect_candidates_remerge(self, sample_image_path):
+        table = detect_candidates(sample_image_path)
+        assert set(table["source"]) <= {"blank", "color"}
+        blank = table[table["source"] == "blank"]
+        assert (blank["start"] < blank["row"]).all()
+        assert (blank["row"] < blank["end"]).all()
+        kept = merge_candidates(table, 350)
+        assert kept["row"].tolist() == split_heights(sample_image_path)
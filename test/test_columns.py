@@ -0,0 +1,62 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.columns module."""
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.blank_spliter import (
+    find_height_spliter,
+    row_laplacian_variance,
+)
+from Web_page_Screenshot_Segmentation.columns import main_column_band, sample_columns
+
+
+@pytest.fixture
+def page_with_scrollbar():
+    """A page with a content column and a noisy scrollbar at the right edge."""
+    rng = np.random.default_rng(0)
+    img = np.full((1200, 600, 3), 255, dtype=np.uint8)
+    img[100:400, 50:500] = rng.integers(0, 255, (300, 450, 3), dtype=np.uint8)
+    img[800:1100, 50:500] = rng.integers(0, 255, (300, 450, 3), dtype=np.uint8)
+    img[:, 585:595] = rng.integers(0, 255, (1200, 10, 3), dtype=np.uint8)
+    return img
+
+
+class TestColumnBand:
+    """Tests for the column band helpers."""
+
+    @pytest.mark.unit
+    def test_main_column_band_skips_scrollbar(self, page_with_scrollbar):
+        gray = cv2.cvtColor(page_with_scrollbar, cv2.COLOR_BGR2GRAY)
+        assert main_column_band(gray) == (50, 500)
+        assert main_column_band(gray, row_stride=4) == (50, 500)
+
+    @pytest.mark.unit
+    def test_main_column_band_blank_image(self):
+        gray = np.full((50, 80), 255, dtype=np.uint8)
+        assert main_column_band(gray) == (0, 80)
+
+    @pytest.mark.unit
+    def test_sample_columns(self):
+        gray = np.arange(100, dtype=np.uint8).reshape(1, 100)
+        assert sample_columns(gray, (10, 20)).tolist() == [list(range(10, 20))]
+        assert sample_columns(gray, (10, 20), column_stride=5).tolist() == [[10, 15]]
+
+
+class TestDetectorColumns:
+    """Tests for the column options of the detectors."""
+
+    @pytest.mark.unit
+    def test_auto_band_finds_blank_gap_behind_scrollbar(self, page_with_scrollbar):
+        assert find_height_spliter(page_with_scrollbar, 100, 0.5) == []
+        assert find_height_spliter(page_with_scrollbar, 100, 0.5, columns="auto") == [
+            50,
+            600,
+            1150,
+        ]
+
+    @pytest.mark.unit
+    def test_row_laplacian_variance_matches_opencv(self, sample_image_path):
+        img = cv2.imdecode(np.fromfile(sample_image_path, np.uint8), cv2.IMREAD_COLOR)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)[::37]
+        expected = [cv2.Laplacian(row[None, :], cv2.CV_64F).var() for row in gray]
+        np.testing.assert_allclose(row_laplacian_variance(gray), expected, atol=1e-6)
@@ -0,0 +1,167 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.control module."""
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation.control import (
+    BAND_ROWS,
+    BUDGET_SHARE,
+    Cancelled,
+    CancelToken,
+    DeadlineExceeded,
+    RunControl,
+)
+from Web_page_Screenshot_Segmentation.detectors import RowProfile
+from Web_page_Screenshot_Segmentation.image_io import ImageHeader
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments, split_heights
+
+HEADER = ImageHeader(width=2000, height=100000, channels=3, bit_depth=8, format="jpeg")
+
+
+def _tall_gray() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (2 * BAND_ROWS + 100, 40), dtype=np.uint8)
+
+
+class TestRunControl:
+    """Tests for RunControl planning and checks."""
+
+    @pytest.mark.unit
+    def test_no_deadline_keeps_full_quality(self):
+        control = RunControl()
+        assert control.plan(HEADER) == (1, 1)
+        assert not control.degraded
+
+    @pytest.mark.unit
+    def test_short_budget_degrades(self):
+        control = RunControl(deadline=1.5)
+        assert control.plan(HEADER) == (4, 1)
+        assert control.estimate(HEADER, 4, 1) <= 1.5 * BUDGET_SHARE < control.estimate(HEADER, 2, 1)
+        assert control.degraded
+
+    @pytest.mark.unit
+    def test_plan_keeps_required_reduction(self):
+        control = RunControl(deadline=3600)
+        assert control.plan(HEADER, reduce_factor=4, column_stride=2) == (4, 2)
+        assert not control.degraded
+
+    @pytest.mark.unit
+    def test_impossible_budget_uses_cheapest_strategy(self):
+        control = RunControl(deadline=3600, speed=1e9)
+        assert control.plan(HEADER) == (8, 4)
+
+    @pytest.mark.unit
+    def test_degrading_never_plans_a_slower_run(self):
+        png = ImageHeader(width=2000, height=100000, channels=3, bit_depth=8, format="png")
+        for header in (HEADER, png):
+            for export in (False, True):
+                for deadline in (0.5, 1.5, 3, 10, 3600):
+                    for speed in (1, 1e9):
+                        control = RunControl(deadline=deadline, speed=speed)
+                        chosen = control.plan(header, export=export)
+                        assert control.estimate(header, *chosen, export) <= control.estimate(
+                            header, 1, 1, export
+                        )
+
+    @pytest.mark.unit
+    def test_export_counts_the_full_decode(self):
+        png = ImageHeader(width=2000, height=100000, channels=3, bit_depth=8, format="png")
+        control = RunControl(deadline=3600, speed=1e9)
+        # A reduced PNG decode only adds a second decode before the export
+        assert control.plan(png, export=True) == (1, 1)
+        assert not control.degraded
+        assert control.estimate(png, 2, 1, export=True) > control.estimate(png, 1, 1, export=True)
+        assert control.plan(HEADER, export=True) == (8, 4)
+
+    @pytest.mark.unit
+    def test_checks(self):
+        token = CancelToken()
+        control = RunControl(cancel=token)
+        control.check()
+        token.cancel()
+        with pytest.raises(Cancelled):
+            control.check()
+        with pytest.raises(DeadlineExceeded):
+            RunControl(deadline=0).check()
+
+
+class TestBandedProfile:
+    """Tests for the row statistics of a RowProfile with a control."""
+
+    @pytest.mark.unit
+    def test_progress_per_band_and_same_values(self):
+        gray = _tall_gray()
+        reports = []
+        control = RunControl(progress=lambda *report: reports.append(report))
+        profile = RowProfile(gray, control=control)
+        np.testing.assert_array_equal(
+            profile.laplacian_variance, RowProfile(gray).laplacian_variance
+        )
+        total = gray.shape[0]
+        assert reports == [
+            ("laplacian", BAND_ROWS, total),
+            ("laplacian", 2 * BAND_ROWS, total),
+            ("laplacian", total, total),
+        ]
+
+    @pytest.mark.unit
+    def test_cancel_stops_at_next_band(self):
+        token = CancelToken()
+        reports = []
+
+        def progress(stage, done, total):
+            reports.append(done)
+            token.cancel()
+
+        profile = RowProfile(_tall_gray(), control=RunControl(progress=progress, cancel=token))
+        with pytest.raises(Cancelled):
+            profile.mean_variance
+        assert reports == [BAND_ROWS]
+
+
+class TestControlledPipeline:
+    """Tests for split_heights and split_and_export_segments with a control."""
+
+    @pytest.mark.unit
+    def test_degraded_run_returns_heights(self, sample_image_path):
+        control = RunControl(deadline=3600, speed=1e9)
+        heights = split_heights(sample_image_path, control=control)
+        assert control.degraded
+        assert (control.reduce_factor, control.column_stride) == (8, 4)
+        full = split_heights(sample_image_path)
+        assert len(heights) == len(full)
+        assert max(abs(a - b) for a, b in zip(heights, full)) <= 64
+
+    @pytest.mark.unit
+    def test_expired_deadline(self, sample_image_path):
+        with pytest.raises(DeadlineExceeded):
+            split_heights(sample_image_path, control=RunControl(deadline=0))
+
+    @pytest.mark.unit
+    def test_export_reports_and_cancels(self, sample_image_path, tmp_path):
+        token = CancelToken()
+        exported = []
+
+        def progress(stage, done, total):
+            if stage == "export":
+                exported.append(done)
+                token.cancel()
+
+        with pytest.raises(Cancelled):
+            split_and_export_segments(
+                sample_image_path,
+                str(tmp_path),
+                control=RunControl(progress=progress, cancel=token),
+            )
+        assert exported == [1]
+        assert len(list(tmp_path.glob("*.jpg"))) == 1
+
+    @pytest.mark.unit
+    def test_manifest_records_degraded(self, sample_image_path, tmp_path):
+        # Only a JPEG export gets faster with a reduced decode
+        jpeg = cv2.imencode(".jpg", cv2.imread(sample_image_path))[1].tobytes()
+        control = RunControl(deadline=3600, speed=1e9)
+        split_and_export_segments(jpeg, str(tmp_path), control=control)
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert manifest["degraded"] is True
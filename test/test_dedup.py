@@ -0,0 +1,111 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.dedup module."""
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.dedup import (
+    SegmentDeduplicator,
+    hamming_distance,
+    segment_fingerprint,
+)
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments
+
+
+def _card(text: str, height: int = 120) -> np.ndarray:
+    """Create a white card with a dark border and a line of text."""
+    img = np.full((height, 400, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (10, 10), (390, height - 10), (40, 40, 40), 2)
+    cv2.putText(img, text, (30, 70), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return img
+
+
+class TestFingerprint:
+    """Tests for the fingerprint helpers."""
+
+    @pytest.mark.unit
+    def test_identical_segments_have_identical_fingerprints(self):
+        assert segment_fingerprint(_card("abc")) == segment_fingerprint(_card("abc"))
+
+    @pytest.mark.unit
+    def test_hamming_distance(self):
+        assert hamming_distance(0b1011, 0b0001) == 2
+        assert hamming_distance(5, 5) == 0
+
+
+class TestSegmentDeduplicator:
+    """Tests for SegmentDeduplicator."""
+
+    @pytest.mark.unit
+    def test_exact_duplicate(self):
+        dedup = SegmentDeduplicator()
+        assert dedup.find(_card("abc"), 0) is None
+        assert dedup.find(_card("abc"), 1) == 0
+
+    @pytest.mark.unit
+    def test_near_duplicate_within_threshold(self):
+        dedup = SegmentDeduplicator(threshold=10)
+        card = _card("abc")
+        noisy = card.copy()
+        noisy[50, 200] = [0, 0, 0]
+        assert dedup.find(card, 0) is None
+        assert dedup.find(noisy, 1) == 0
+
+    @pytest.mark.unit
+    def test_different_segments_are_kept(self):
+        dedup = SegmentDeduplicator(threshold=0)
+        assert dedup.find(_card("abc"), 0) is None
+        assert dedup.find(_card("XYZ 123 !!"), 1) is None
+        assert dedup.find(_card("abc", height=300), 2) is None
+
+    @pytest.mark.unit
+    def test_uniform_bands_of_different_colors_are_kept(self):
+        dedup = SegmentDeduplicator()
+        for i, color in enumerate([(255, 255, 255), (0, 0, 255), (0, 0, 0)]):
+            band = np.full((120, 400, 3), color, dtype=np.uint8)
+            assert dedup.find(band, i) is None
+        assert dedup.find(np.full((121, 400, 3), 250, dtype=np.uint8), 3) == 0
+
+    @pytest.mark.unit
+    def test_inverted_content_is_kept(self):
+        dedup = SegmentDeduplicator()
+        card = _card("abc")
+        rule = np.full((120, 400, 3), 255, dtype=np.uint8)
+        rule[60:62] = 0
+        for i, segment in enumerate([card, 255 - card, rule, 255 - rule]):
+            assert dedup.find(segment, i) is None
+
+    @pytest.mark.unit
+    def test_cards_cut_a_few_rows_apart_are_duplicates(self):
+        dedup = SegmentDeduplicator()
+        page = np.vstack([np.full((20, 400, 3), 255, dtype=np.uint8), _card("abc")])
+        assert dedup.find(page[5:], 0) is None
+        assert dedup.find(page[:-3], 1) == 0
+
+
+class TestExportDedup:
+    """Tests for the dedup option of split_and_export_segments."""
+
+    @pytest.mark.unit
+    def test_repeated_cards_are_encoded_once(self, tmp_path):
+        gap = np.full((150, 400, 3), 255, dtype=np.uint8)
+        card = _card("repeated")
+        image = np.vstack([gap, card, gap, card, gap, card, gap])
+        image_path = tmp_path / "feed.png"
+        cv2.imwrite(str(image_path), image)
+
+        manifest = split_and_export_segments(
+            str(image_path),
+            output_dir=str(tmp_path / "segments"),
+            height_threshold=100,
+            merge_threshold=100,
+            dedup=True,
+            return_manifest=True,
+        )
+
+        duplicates = [r for r in manifest.segments if r.duplicate_of is not None]
+        written = list((tmp_path / "segments").glob("*_segment_*.jpg"))
+        assert duplicates
+        assert len(written) == len(manifest.segments) - len(duplicates)
+        for record in duplicates:
+            assert record.byte_size == 0
+            assert manifest.segments[record.duplicate_of].duplicate_of is None
@@ -0,0 +1,139 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.detectors module."""
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.color_spliter import color_height_spliter
+from Web_page_Screenshot_Segmentation.detectors import (
+    DETECTORS,
+    DetectorParams,
+    RowProfile,
+    register_detector,
+    run_detectors,
+)
+from Web_page_Screenshot_Segmentation.manifest import label_boundaries
+from Web_page_Screenshot_Segmentation.master import split_heights
+
+
+def _profile(img):
+    return RowProfile(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+@pytest.fixture
+def page_with_rule():
+    """A white page with text blocks and a 2-row gray rule at row 300."""
+    rng = np.random.default_rng(0)
+    img = np.full((600, 400, 3), 255, dtype=np.uint8)
+    img[100:250, 20:380] = rng.integers(0, 255, (150, 360, 3), dtype=np.uint8)
+    img[300:302] = 128
+    img[350:500, 20:380] = rng.integers(0, 255, (150, 360, 3), dtype=np.uint8)
+    return img
+
+
+class TestDetectors:
+    """Tests for the built-in detectors and the registry."""
+
+    @pytest.mark.unit
+    def test_builtin_detectors_registered(self):
+        assert {"blank", "color", "rule", "band"} <= set(DETECTORS)
+
+    @pytest.mark.unit
+    def test_rule_detector(self, page_with_rule):
+        candidates = DETECTORS["rule"](_profile(page_with_rule), DetectorParams())
+        assert candidates["row"].tolist() == [301]
+        assert (candidates["start"][0], candidates["end"][0]) == (300, 302)
+        assert candidates["score"][0] == pytest.approx(1.0)
+
+    @pytest.mark.unit
+    def test_band_detector(self):
+        img = np.full((800, 300, 3), 255, dtype=np.uint8)
+        img[400:] = 200
+        # Text on the band must not start a new band
+        img[500:510, 50:250] = 0
+        candidates = DETECTORS["band"](_profile(img), DetectorParams())
+        assert candidates["row"].tolist() == [400]
+        assert candidates["score"][0] == pytest.approx(55)
+
+    @pytest.mark.unit
+    def test_color_detector_matches_color_height_spliter(self, sample_image_path):
+        img = cv2.imdecode(np.fromfile(sample_image_path, np.uint8), cv2.IMREAD_COLOR)
+        candidates = DETECTORS["color"](_profile(img), DetectorParams())
+        assert candidates["row"].tolist() == color_height_spliter(img, 100, 15)
+        assert (candidates["start"] <= candidates["row"]).all()
+        assert (candidates["score"] > 15).all()
+
+    @pytest.mark.unit
+    def test_run_detectors_timings(self, page_with_rule):
+        timings = {}
+        names = ["blank", "color", "rule", "band"]
+        candidates = run_detectors(
+            _profile(page_with_rule), DetectorParams(), names, timings=timings
+        )
+        assert list(dict.fromkeys(candidates["source"])) == ["color", "rule"]
+        assert set(timings) == set(names)
+        assert all(seconds >= 0 for seconds in timings.values())
+
+    @pytest.mark.unit
+    def test_run_detectors_unknown(self, page_with_rule):
+        with pytest.raises(ValueError, match="Unknown detectors: nope"):
+            run_detectors(_profile(page_with_rule), DetectorParams(), ["nope"])
+
+    @pytest.mark.unit
+    def test_run_detectors_empty(self, page_with_rule):
+        with pytest.raises(ValueError, match="No detectors selected"):
+            run_detectors(_profile(page_with_rule), DetectorParams(), [])
+
+    @pytest.mark.unit
+    def test_register_detector(self, page_with_rule):
+        @register_detector("every_100")
+        def every_100(profile, params):
+            return [(row, 1.0) for row in range(100, profile.height, 100)]
+
+        try:
+            candidates = run_detectors(
+                _profile(page_with_rule), DetectorParams(), ["every_100"]
+            )
+            assert candidates["row"].tolist() == [100, 200, 300, 400, 500]
+            assert set(candidates["source"]) == {"every_100"}
+        finally:
+            del DETECTORS["every_100"]
+
+    @pytest.mark.unit
+    def test_register_detector_rejects_long_names(self):
+        with pytest.raises(ValueError):
+            register_detector("a_very_long_detector_name")
+        with pytest.raises(ValueError):
+            register_detector("")
+        assert "a_very_long_detector_name" not in DETECTORS
+
+    @pytest.mark.unit
+    def test_profile_statistics_cached(self, page_with_rule):
+        profile = _profile(page_with_rule)
+        assert profile.mean_variance is profile.mean_variance
+        assert profile.edge_density(32) is profile.edge_density(32)
+
+    @pytest.mark.unit
+    def test_scaled_params(self):
+        params = DetectorParams().scaled(4)
+        assert params.height_threshold == 25
+        assert params.band_window == 8
+        assert params.rule_max_thickness == 1
+        assert params.variation_threshold == 0.5
+
+    @pytest.mark.unit
+    def test_label_boundaries(self):
+        labels = label_boundaries(
+            [100, 200, 300], {"blank": [100, 200], "color": [200], "rule": [300]}
+        )
+        assert labels == ["blank", "blank+color", "rule"]
+
+    @pytest.mark.unit
+    def test_split_heights_with_detectors(self, sample_image_path):
+        timings = {}
+        default = split_heights(sample_image_path)
+        assert split_heights(sample_image_path, detectors=["blank", "color"]) == default
+        heights = split_heights(
+            sample_image_path, detectors=["blank", "rule"], timings=timings
+        )
+        assert isinstance(heights, list)
+        assert set(timings) == {"blank", "rule"}
@@ -0,0 +1,98 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.governor module."""
+
+import threading
+import time
+
+import cv2
+import pytest
+from Web_page_Screenshot_Segmentation.governor import (
+    BGR_BYTES_PER_PIXEL,
+    BYTES_PER_PIXEL,
+    MemoryGovernor,
+    estimate_decoded_bytes,
+)
+from Web_page_Screenshot_Segmentation.image_io import ImageHeader, probe_image_header
+from Web_page_Screenshot_Segmentation.master import (
+    split_and_export_segments,
+    split_heights,
+)
+
+
+class TestMemoryGovernor:
+    """Tests for MemoryGovernor."""
+
+    @pytest.mark.unit
+    def test_estimate_scales_with_reduction(self):
+        header = ImageHeader(1000, 3000, 3, 8, "png")
+        assert estimate_decoded_bytes(header) == 3_000_000 * BYTES_PER_PIXEL
+        assert estimate_decoded_bytes(header, 2) == 750_000 * BYTES_PER_PIXEL
+
+    @pytest.mark.unit
+    def test_plan_routes_large_images_to_reduced_decode(self, sample_image_path):
+        header = probe_image_header(sample_image_path)
+        full = estimate_decoded_bytes(header)
+
+        governor = MemoryGovernor(budget_bytes=full, large_image_bytes=full // 10)
+        admission = governor.plan(sample_image_path)
+        assert admission.strategy == "reduced"
+        assert admission.reduce_factor == 4
+        # A PNG is decoded at full resolution before it is shrunk
+        assert admission.nbytes == (
+            header.pixels * BGR_BYTES_PER_PIXEL + estimate_decoded_bytes(header, 4)
+        )
+
+        assert MemoryGovernor(full).plan(sample_image_path).strategy == "full"
+
+    @pytest.mark.unit
+    def test_plan_jpeg_reserves_only_the_reduced_decode(self, sample_image_path):
+        ok, encoded = cv2.imencode(".jpg", cv2.imread(sample_image_path))
+        assert ok
+        jpeg = encoded.tobytes()
+        full = estimate_decoded_bytes(probe_image_header(jpeg))
+
+        admission = MemoryGovernor(full, large_image_bytes=full // 10).plan(jpeg)
+        assert (admission.strategy, admission.reduce_factor) == ("reduced", 4)
+        assert admission.nbytes <= full // 10
+
+    @pytest.mark.unit
+    def test_acquire_waits_for_budget(self):
+        governor = MemoryGovernor(100)
+        assert governor.acquire(80)
+        assert not governor.acquire(30, timeout=0.01)
+
+        threading.Timer(0.05, governor.release, args=(80,)).start()
+        start = time.monotonic()
+        assert governor.acquire(30, timeout=5)
+        assert time.monotonic() - start >= 0.04
+        governor.release(30)
+        assert governor.in_use == 0
+
+    @pytest.mark.unit
+    def test_split_heights_with_reduced_decode(self, sample_image_path):
+        header = probe_image_header(sample_image_path)
+        full = estimate_decoded_bytes(header)
+        governor = MemoryGovernor(budget_bytes=full, large_image_bytes=full // 2)
+
+        reduced = split_heights(sample_image_path, governor=governor)
+        exact = split_heights(sample_image_path)
+        assert governor.in_use == 0
+        assert len(reduced) > 0
+        matched = [h for h in reduced if min(abs(h - e) for e in exact) <= 8]
+        assert len(matched) >= 0.8 * len(exact)
+
+    @pytest.mark.unit
+    def test_export_with_reduced_decode_keeps_full_resolution(
+        self, sample_image_path, tmp_path
+    ):
+        header = probe_image_header(sample_image_path)
+        full = estimate_decoded_bytes(header)
+        governor = MemoryGovernor(budget_bytes=full, large_image_bytes=full // 2)
+
+        manifest = split_and_export_segments(
+            sample_image_path,
+            output_dir=str(tmp_path),
+            governor=governor,
+            return_manifest=True,
+        )
+        assert manifest.width == header.width
+        assert manifest.segments[-1].y1 == header.height
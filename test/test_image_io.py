@@ -0,0 +1,111 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.image_io module."""
+
+from pathlib import Path
+
+import struct
+import zlib
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.drawer import draw_line_from_file
+from Web_page_Screenshot_Segmentation.image_io import (
+    ImageLimits,
+    ImageTooLargeError,
+    load_image,
+    probe_image_header,
+)
+from Web_page_Screenshot_Segmentation.master import split_heights
+
+
+def _png_bomb(width: int = 100_000, height: int = 100_000) -> bytes:
+    """Build a tiny PNG whose header declares a huge image."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    crc = struct.pack(">I", zlib.crc32(chunk))
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + chunk + crc
+
+
+class TestProbeImageHeader:
+    """Tests for probe_image_header."""
+
+    @pytest.mark.unit
+    def test_probe_matches_decoded_shape(self, test_images_dir):
+        for image_path in sorted(test_images_dir.iterdir()):
+            header = probe_image_header(str(image_path))
+            img = cv2.imdecode(np.fromfile(str(image_path), np.uint8), cv2.IMREAD_COLOR)
+            assert (header.height, header.width) == img.shape[:2]
+            assert header.bit_depth == 8
+
+    @pytest.mark.unit
+    def test_probe_from_bytes(self, sample_image_path):
+        data = Path(sample_image_path).read_bytes()
+        assert probe_image_header(data) == probe_image_header(sample_image_path)
+
+    @pytest.mark.unit
+    def test_probe_png_and_jpeg_fields(self):
+        img = np.zeros((30, 70, 3), dtype=np.uint8)
+        png = cv2.imencode(".png", img)[1].tobytes()
+        jpeg = cv2.imencode(".jpg", img)[1].tobytes()
+
+        png_header = probe_image_header(png)
+        assert (png_header.width, png_header.height) == (70, 30)
+        assert (png_header.channels, png_header.format) == (3, "png")
+        jpeg_header = probe_image_header(jpeg)
+        assert (jpeg_header.width, jpeg_header.height) == (70, 30)
+        assert (jpeg_header.channels, jpeg_header.format) == (3, "jpeg")
+
+    @pytest.mark.unit
+    def test_probe_other_format_uses_pillow(self):
+        bmp = cv2.imencode(".bmp", np.zeros((5, 9), dtype=np.uint8))[1].tobytes()
+        header = probe_image_header(bmp)
+        assert (header.width, header.height, header.format) == (9, 5, "bmp")
+
+    @pytest.mark.unit
+    def test_probe_invalid_data_raises_error(self):
+        with pytest.raises(IOError):
+            probe_image_header(b"not an image")
+
+
+class TestLoadImage:
+    """Tests for load_image and the decompression-bomb guard."""
+
+    @pytest.mark.unit
+    def test_bomb_rejected_before_decode(self, tmp_path):
+        bomb = _png_bomb()
+        with pytest.raises(ImageTooLargeError):
+            load_image(bomb)
+
+        bomb_path = tmp_path / "bomb.png"
+        bomb_path.write_bytes(bomb)
+        with pytest.raises(IOError):
+            split_heights(str(bomb_path))
+        with pytest.raises(IOError):
+            draw_line_from_file(str(bomb_path), [10], output_dir=str(tmp_path))
+
+    @pytest.mark.unit
+    def test_custom_limits(self, sample_image_path):
+        header = probe_image_header(sample_image_path)
+        with pytest.raises(ImageTooLargeError):
+            load_image(
+                sample_image_path, limits=ImageLimits(max_height=header.height - 1)
+            )
+        img = load_image(
+            sample_image_path, limits=ImageLimits(max_pixels=header.pixels)
+        )
+        assert img.shape == (header.height, header.width, 3)
+
+    @pytest.mark.unit
+    def test_reduced_and_grayscale_decode(self, sample_image_path):
+        header = probe_image_header(sample_image_path)
+        img = load_image(
+            sample_image_path, grayscale=True, max_decode_pixels=header.pixels // 4
+        )
+        assert img.ndim == 2
+        assert abs(img.shape[0] - header.height / 2) <= 1
+        assert abs(img.shape[1] - header.width / 2) <= 1
+
+    @pytest.mark.unit
+    def test_invalid_path_raises_error(self):
+        with pytest.raises(IOError):
+            load_image("/nonexistent/path/image.png")
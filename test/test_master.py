@@ -3,6 +3,8 @@
 import pytest
 import numpy as np
 from pathlib import Path
+from Web_page_Screenshot_Segmentation import master
+from Web_page_Screenshot_Segmentation.image_io import load_image, probe_image_header
 from Web_page_Screenshot_Segmentation.master import (
     split_heights,
     remove_close_values,
@@ -101,6 +103,35 @@ class TestSplitHeights:
 
         assert isinstance(result, list)
 
+    @pytest.mark.unit
+    def test_split_heights_with_max_decode_pixels(self, sample_image_path, monkeypatch):
+        """Test that large images are detected on a reduced decode."""
+        pixels = probe_image_header(sample_image_path).pixels
+        factors = []
+
+        def load(source, reduce_factor=1):
+            factors.append(reduce_factor)
+            return load_image(source, reduce_factor)
+
+        monkeypatch.setattr(master, "load_image", load)
+        reduced = split_heights(sample_image_path, max_decode_pixels=pixels // 4)
+        exact = split_heights(sample_image_path)
+
+        assert factors == [2, 1]
+        matched = [h for h in reduced if min(abs(h - e) for e in exact) <= 4]
+        assert len(matched) >= 0.8 * len(exact)
+        assert split_heights(sample_image_path, max_decode_pixels=pixels) == exact
+
+
+    @pytest.mark.unit
+    def test_split_heights_rejects_invalid_column_bands(self, sample_image_path):
+        """Test that column bands are checked against the decoded width."""
+        width = probe_image_header(sample_image_path).width
+        assert split_heights(sample_image_path, columns=(0, width))
+        for band in [(0, width + 1), (50, 50), (60, 40), (-1, 10)]:
+            with pytest.raises(ValueError, match="Invalid column band"):
+                split_heights(sample_image_path, columns=band)
+
 
 class TestSplitAndExportSegments:
     """Tests for the split_and_export_segments function."""
@@ -273,3 +304,48 @@ class TestAutoCropImage:
         # Height should be preserved
         assert cropped.shape[0] == 100
         assert len(cropped.shape) == 2  # Still grayscale
+
+
+class TestSegmentManifest:
+    """Tests for the manifest produced by split_and_export_segments."""
+
+    @pytest.mark.unit
+    def test_manifest_json_written(self, sample_image_path, tmp_path):
+        """Test that manifest.json lists every exported segment."""
+        import json
+
+        output_dir = tmp_path / "segments"
+        split_and_export_segments(sample_image_path, output_dir=str(output_dir))
+
+        manifest = json.loads((output_dir / "manifest.json").read_text("utf-8"))
+        segment_files = sorted(p.name for p in output_dir.glob("*_segment_*.jpg"))
+        assert sorted(s["file"] for s in manifest["segments"]) == segment_files
+        for record in manifest["segments"]:
+            path = output_dir / record["file"]
+            assert path.stat().st_size == record["byte_size"]
+
+    @pytest.mark.unit
+    def test_return_manifest_records(self, sample_image_path, tmp_path):
+        """Test that the returned manifest covers the image without gaps."""
+        import hashlib
+
+        manifest = split_and_export_segments(
+            sample_image_path,
+            output_dir=str(tmp_path / "segments"),
+            auto_crop=True,
+            return_manifest=True,
+        )
+
+        records = manifest.segments
+        assert records[0].y0 == 0
+        assert records[0].y0_detector == "edge"
+        assert records[-1].y1 == manifest.height
+        assert records[-1].y1_detector == "edge"
+        for prev, cur in zip(records, records[1:]):
+            assert prev.y1 == cur.y0
+            assert cur.y0_detector in ("blank", "color", "blank+color")
+        for index, record in enumerate(records):
+            assert record.index == index
+            assert 0 <= record.x0 < record.x1 <= manifest.width
+            data = (Path(manifest.output_dir) / record.file).read_bytes()
+            assert record.sha256 == hashlib.sha256(data).hexdigest()
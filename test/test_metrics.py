@@ -0,0 +1,100 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.metrics module."""
+
+import urllib.request
+
+import pytest
+from Web_page_Screenshot_Segmentation import metrics
+from Web_page_Screenshot_Segmentation.image_io import load_image
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments
+
+
+@pytest.fixture
+def registry():
+    """Resets the package registry around one test."""
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY
+    metrics.REGISTRY.reset()
+
+
+class TestMetricsRegistry:
+    """Tests for counters, histograms and the Prometheus exposition."""
+
+    @pytest.mark.unit
+    def test_histogram_exposition(self):
+        registry = metrics.MetricsRegistry()
+        hist = registry.histogram("t_seconds", "Test.", label="stage", buckets=(0.1, 1.0))
+        hist.observe("a", 0.05)
+        hist.observe("a", 0.5)
+        hist.observe("a", 5.0)
+        lines = registry.to_prometheus().splitlines()
+        assert "# TYPE t_seconds histogram" in lines
+        assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{stage="a",le="1.0"} 2' in lines
+        assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 't_seconds_count{stage="a"} 3' in lines
+        assert 't_seconds_sum{stage="a"} 5.55' in lines
+
+    @pytest.mark.unit
+    def test_duplicate_names_are_rejected(self):
+        registry = metrics.MetricsRegistry()
+        registry.counter("c_total", "Test.")
+        with pytest.raises(ValueError):
+            registry.counter("c_total", "Test.")
+
+    @pytest.mark.unit
+    def test_snapshot_merge(self):
+        worker, parent = metrics.MetricsRegistry(), metrics.MetricsRegistry()
+        counter = worker.counter("c_total", "Test.")
+        hist = worker.histogram("t_seconds", "Test.", label="stage", buckets=(0.1, 1.0))
+        parent.counter("c_total", "Test.")
+        parent.histogram("t_seconds", "Test.", label="stage", buckets=(0.1, 1.0)).observe("a", 0.05)
+        counter.inc(2)
+        hist.observe("a", 0.5)
+        parent.merge(worker.snapshot())
+        parent.merge({"unknown_total": 1})
+        lines = parent.to_prometheus().splitlines()
+        assert "c_total 2" in lines
+        assert 't_seconds_bucket{stage="a",le="1.0"} 2' in lines
+        assert 't_seconds_count{stage="a"} 2' in lines
+
+    @pytest.mark.unit
+    def test_write_and_serve(self, tmp_path):
+        registry = metrics.MetricsRegistry()
+        registry.counter("c_total", "Test.").inc(3)
+        path = registry.write(str(tmp_path / "seg.prom"))
+        with open(path, encoding="utf-8") as f:
+            assert "c_total 3" in f.read().splitlines()
+
+        server = registry.serve(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                assert "c_total 3" in response.read().decode().splitlines()
+        finally:
+            server.shutdown()
+
+
+class TestPipelineMetrics:
+    """Tests for the metrics updated by the pipeline."""
+
+    @pytest.mark.unit
+    def test_export_updates_metrics(self, registry, sample_image_path, tmp_path):
+        manifest = split_and_export_segments(
+            sample_image_path, str(tmp_path), return_manifest=True, auto_crop=True
+        )
+        assert metrics.IMAGES_PROCESSED.value == 1
+        assert metrics.ROWS_ANALYZED.value == manifest.height
+        assert metrics.PIXELS_ANALYZED.value == manifest.width * manifest.height
+        assert metrics.SEGMENTS_EMITTED.value == len(manifest.segments)
+        assert metrics.ENCODED_BYTES.value == sum(s.byte_size for s in manifest.segments)
+        for stage in ("decode", "detect", "merge"):
+            assert metrics.STAGE_SECONDS.count(stage) == 1
+        for stage in ("crop", "encode"):
+            assert metrics.STAGE_SECONDS.count(stage) == len(manifest.segments)
+
+    @pytest.mark.unit
+    def test_decode_failures_are_counted(self, registry):
+        with pytest.raises(IOError):
+            load_image(b"not an image")
+        assert metrics.DECODE_FAILURES.value == 1
+        assert metrics.STAGE_SECONDS.count("decode") == 0
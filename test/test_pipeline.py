@@ -0,0 +1,94 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.pipeline module."""
+
+import threading
+import time
+
+import pytest
+from Web_page_Screenshot_Segmentation.pipeline import Stage, StagedPipeline
+
+
+def _drain(pipe):
+    results = []
+    while (result := pipe.get(timeout=10)) is not None:
+        results.append(result)
+    return results
+
+
+class TestStagedPipeline:
+    """Tests for running items through stages."""
+
+    @pytest.mark.unit
+    def test_items_pass_all_stages(self):
+        stages = [Stage("add", lambda x: x + 1, workers=2), Stage("double", lambda x: x * 2)]
+        with StagedPipeline(stages) as pipe:
+            for i in range(20):
+                pipe.put(i)
+            pipe.close()
+            results = _drain(pipe)
+        assert sorted((item, value) for item, value, _ in results) == [
+            (i, (i + 1) * 2) for i in range(20)
+        ]
+        assert all(error is None for _, _, error in results)
+        assert [s.items for s in pipe.stats] == [20, 20]
+        assert all(s.wall > 0 for s in pipe.stats)
+
+    @pytest.mark.unit
+    def test_failed_item_skips_later_stages(self):
+        calls = []
+
+        def check(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x
+
+        stages = [Stage("check", check), Stage("record", lambda x: calls.append(x) or x)]
+        with StagedPipeline(stages) as pipe:
+            for i in range(5):
+                pipe.put(i)
+            pipe.close()
+            results = {item: (value, error) for item, value, error in _drain(pipe)}
+        assert isinstance(results[3][1], ValueError)
+        assert results[3][0] is None
+        assert sorted(calls) == [0, 1, 2, 4]
+
+    @pytest.mark.unit
+    def test_bounded_queue_limits_read_ahead(self):
+        release = threading.Event()
+        read = []
+
+        def slow(x):
+            release.wait(10)
+            return x
+
+        stages = [Stage("read", lambda x: read.append(x) or x, buffer=2), Stage("slow", slow)]
+        with StagedPipeline(stages, buffer=10) as pipe:
+            for i in range(10):
+                pipe.put(i)
+            time.sleep(0.2)
+            # One item in the slow stage, two queued, one held by the reader
+            assert len(read) == 4
+            release.set()
+            pipe.close()
+            assert len(_drain(pipe)) == 10
+
+    @pytest.mark.unit
+    def test_utilization_shows_the_bottleneck(self):
+        stages = [Stage("fast", lambda x: x), Stage("slow", lambda x: time.sleep(0.02) or x)]
+        with StagedPipeline(stages) as pipe:
+            for i in range(10):
+                pipe.put(i)
+            pipe.close()
+            _drain(pipe)
+        fast, slow = pipe.stats
+        assert slow.utilization > 0.8 > fast.utilization
+        assert fast.blocked > 0.1
+        assert "slow: 10 items" in str(slow)
+
+    @pytest.mark.unit
+    def test_put_after_close(self):
+        with StagedPipeline([Stage("id", lambda x: x)]) as pipe:
+            pipe.close()
+            with pytest.raises(ValueError):
+                pipe.put(1)
+            assert pipe.get(timeout=10) is None
+            assert pipe.get(timeout=10) is None
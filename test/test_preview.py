@@ -0,0 +1,80 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.preview module."""
+
+from pathlib import Path
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.preview import render_preview
+from Web_page_Screenshot_Segmentation.master import split_heights
+
+
+class TestRenderPreview:
+    """Tests for render_preview."""
+
+    @pytest.fixture
+    def tall_image(self):
+        img = np.full((6000, 800, 3), 255, dtype=np.uint8)
+        img[1000:2000, 100:700] = [90, 90, 90]
+        img[4000:5000, 100:700] = [30, 30, 30]
+        return img
+
+    @pytest.mark.unit
+    def test_preview_fits_max_dim_and_keeps_input(self, tall_image):
+        original = tall_image.copy()
+        preview = render_preview(tall_image, [3000], max_dim=600, labels=True)
+
+        assert max(preview.shape[:2]) == 600
+        assert preview.shape[0] / preview.shape[1] == pytest.approx(6000 / 800, 0.02)
+        assert np.array_equal(tall_image, original)
+
+    @pytest.mark.unit
+    def test_preview_draws_lines_at_scaled_heights(self, tall_image):
+        preview = render_preview(tall_image, [3000], max_dim=600, color=(0, 255, 0))
+        assert tuple(preview[300, 40]) == (0, 255, 0)
+
+    @pytest.mark.unit
+    def test_small_image_is_not_upscaled(self):
+        img = np.full((100, 50, 3), 255, dtype=np.uint8)
+        assert render_preview(img, [50], max_dim=2048).shape == (100, 50, 3)
+
+    @pytest.mark.unit
+    def test_small_image_is_not_modified(self):
+        img = np.full((100, 50, 3), 255, dtype=np.uint8)
+        for labels in (False, True):
+            preview = render_preview(img, [50], max_dim=2048, labels=labels)
+            assert tuple(preview[50, 10]) == (0, 255, 0)
+            assert (img == 255).all()
+
+    @pytest.mark.unit
+    def test_contact_sheet_is_roughly_square(self, tall_image):
+        sheet = render_preview(
+            tall_image, [1000, 2000, 3000, 4000, 5000], max_dim=500, contact_sheet=True
+        )
+        assert max(sheet.shape[:2]) <= 500
+        assert 0.5 < sheet.shape[0] / sheet.shape[1] < 2
+
+
+class TestSplitHeightsPreview:
+    """Tests for the preview written by split_heights(split=True)."""
+
+    @pytest.mark.unit
+    def test_preview_is_downscaled(self, sample_image_path, tmp_path):
+        result = split_heights(
+            sample_image_path, split=True, output_dir=str(tmp_path), preview_max_dim=512
+        )
+        preview = cv2.imdecode(np.fromfile(result, np.uint8), cv2.IMREAD_COLOR)
+        assert max(preview.shape[:2]) == 512
+
+    @pytest.mark.unit
+    def test_full_resolution_flag(self, sample_image_path, tmp_path):
+        result = split_heights(
+            sample_image_path,
+            split=True,
+            output_dir=str(tmp_path),
+            full_resolution=True,
+        )
+        full = cv2.imdecode(np.fromfile(result, np.uint8), cv2.IMREAD_COLOR)
+        source = cv2.imdecode(np.fromfile(sample_image_path, np.uint8), cv2.IMREAD_COLOR)
+        assert full.shape == source.shape
+        assert Path(result).name.endswith("_result.jpg")
@@ -0,0 +1,96 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.pyramid module."""
+
+import io
+import tarfile
+
+import cv2
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation.pyramid import (
+    export_pyramid,
+    pyramid_levels,
+    write_pyramid,
+)
+from Web_page_Screenshot_Segmentation.streams import TarWriter, source_name
+
+
+def _collect(image, heights, **kwargs) -> dict[str, bytes]:
+    files = {}
+    write_pyramid(image, heights, "page", files.__setitem__, **kwargs)
+    return files
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+class TestPyramidLevels:
+    """Tests for pyramid_levels."""
+
+    @pytest.mark.unit
+    def test_halves_down_to_one_pixel(self):
+        assert pyramid_levels(5, 9) == [(1, 1), (1, 2), (2, 3), (3, 5), (5, 9)]
+
+    @pytest.mark.unit
+    def test_single_pixel(self):
+        assert pyramid_levels(1, 1) == [(1, 1)]
+
+
+class TestWritePyramid:
+    """Tests for write_pyramid."""
+
+    @pytest.mark.unit
+    def test_layout_and_tile_sizes(self):
+        image = np.full((1000, 300, 3), 255, dtype=np.uint8)
+        files = _collect(image, [500], tile_size=254, overlap=1, tile_format="png")
+        assert list(files)[0] == "page.dzi"
+        assert 'TileSize="254"' in files["page.dzi"].decode()
+        assert '<Size Width="300" Height="1000"/>' in files["page.dzi"].decode()
+        # 10 levels: 1000 rows halve to 1 in 9 steps
+        top = sorted(name for name in files if name.startswith("page_files/10/"))
+        assert top == [f"page_files/10/{c}_{r}.png" for c in range(2) for r in range(4)]
+        assert _decode(files["page_files/10/0_0.png"]).shape == (255, 255, 3)
+        assert _decode(files["page_files/10/1_1.png"]).shape == (256, 47, 3)
+        assert _decode(files["page_files/0/0_0.png"]).shape == (1, 1, 3)
+
+    @pytest.mark.unit
+    def test_lines_are_drawn_at_every_level(self):
+        image = np.full((1024, 64, 3), 255, dtype=np.uint8)
+        files = _collect(image, [512], tile_format="png", color=(0, 0, 255))
+        for level, row in ((10, 512), (7, 64), (4, 8)):
+            tile = _decode(files[f"page_files/{level}/0_{row // 254}.png"])
+            y = row - max(0, (row // 254) * 254 - 1)
+            assert tile[y, 0].tolist() == [0, 0, 255]
+            assert tile[y - 2, 0].tolist() == [255, 255, 255]
+
+    @pytest.mark.unit
+    def test_image_is_not_modified(self):
+        image = np.full((300, 300), 200, dtype=np.uint8)
+        _collect(image, [100], max_workers=2)
+        assert (image == 200).all()
+
+    @pytest.mark.unit
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            _collect(np.zeros((10, 10, 3), dtype=np.uint8), [], tile_format="webp")
+
+
+class TestExportPyramid:
+    """Tests for export_pyramid."""
+
+    @pytest.mark.unit
+    def test_directory_and_tar_output_match(self, sample_image_path, tmp_path):
+        descriptor = export_pyramid(sample_image_path, str(tmp_path), heights=[100, 400])
+        name = source_name(sample_image_path)
+        assert descriptor == str(tmp_path / f"{name}.dzi")
+        saved = sorted(
+            str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*") if p.is_file()
+        )
+
+        buffer = io.BytesIO()
+        with TarWriter(buffer) as tar:
+            descriptor = export_pyramid(sample_image_path, writer=tar, heights=[100, 400])
+        assert descriptor == f"{name}.dzi"
+        buffer.seek(0)
+        with tarfile.open(fileobj=buffer) as archive:
+            assert sorted(archive.getnames()) == saved
@@ -0,0 +1,75 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.resize module."""
+
+import io
+
+import pytest
+import cv2
+import numpy as np
+from PIL import Image
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments
+from Web_page_Screenshot_Segmentation.resize import downscale, fit_size
+from Web_page_Screenshot_Segmentation.spliter import split_and_save_image_pil
+
+
+class TestFitSize:
+    """Tests for fit_size."""
+
+    @pytest.mark.unit
+    def test_target_width_keeps_aspect_ratio(self):
+        assert fit_size(1600, 900, target_width=800) == (800, 450)
+
+    @pytest.mark.unit
+    def test_never_upscales(self):
+        assert fit_size(400, 300, target_width=800, max_pixels=10**6) == (400, 300)
+
+    @pytest.mark.unit
+    def test_max_pixels_caps_area(self):
+        width, height = fit_size(1000, 4000, target_width=800, max_pixels=100_000)
+        assert width * height <= 100_000
+        assert height / width == pytest.approx(4, rel=0.02)
+
+
+class TestDownscale:
+    """Tests for downscale."""
+
+    @pytest.mark.unit
+    def test_downscale_averages_areas(self):
+        img = np.zeros((4, 4, 3), dtype=np.uint8)
+        img[:, ::2] = 200
+        assert np.all(downscale(img, (2, 2)) == 100)
+
+
+class TestResizeOnExport:
+    """Tests for target_width and max_pixels on export."""
+
+    @pytest.mark.unit
+    def test_segments_are_resized_before_encoding(self, sample_image_path, tmp_path):
+        manifest = split_and_export_segments(
+            sample_image_path, str(tmp_path), return_manifest=True, target_width=300
+        )
+        for record in manifest.segments:
+            segment = cv2.imdecode(
+                np.fromfile(tmp_path / record.file, np.uint8), cv2.IMREAD_COLOR
+            )
+            assert segment.shape[1] == record.width == 300
+            assert segment.shape[0] == record.height
+            assert record.x1 - record.x0 > 300
+
+    @pytest.mark.unit
+    def test_resize_shrinks_output(self, sample_image_path, tmp_path):
+        full = split_and_export_segments(
+            sample_image_path, str(tmp_path / "full"), return_manifest=True
+        )
+        small = split_and_export_segments(
+            sample_image_path, str(tmp_path / "small"), return_manifest=True, max_pixels=50_000
+        )
+        assert sum(s.byte_size for s in small.segments) < sum(s.byte_size for s in full.segments)
+        assert all(s.width * s.height <= 50_000 for s in small.segments)
+        assert all(s.width is None for s in full.segments)
+
+    @pytest.mark.unit
+    def test_pil_split_resizes_slices(self):
+        img = Image.new("RGB", (400, 300), "white")
+        slices = split_and_save_image_pil(img, [100], target_width=200)
+        sizes = [Image.open(io.BytesIO(data)).size for data in slices]
+        assert sizes == [(200, 50), (200, 100)]
@@ -0,0 +1,145 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.results module."""
+
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation import results
+from Web_page_Screenshot_Segmentation.master import split_heights
+from Web_page_Screenshot_Segmentation.results import (
+    ResultRecord,
+    ResultsWriter,
+    downsample_profile,
+    image_record,
+    iter_records,
+    read_shard,
+    shard_paths,
+)
+
+
+def _record(i: int, profile: bool = True) -> ResultRecord:
+    return ResultRecord(
+        f"page-{i}.png",
+        1280,
+        4000 + i,
+        [100 * i, 100 * i + 50],
+        ["blank", "color+blank"],
+        [1.5, float(i)],
+        template=i % 2 == 1,
+        seconds={"decode": 0.1, "detect": 0.2} if i else {"template": 0.01},
+        timings={"blank": 0.05},
+        profiles={"mean": np.arange(8, dtype=np.float32) + i} if profile else {},
+    )
+
+
+class TestRecords:
+    """Tests for building records."""
+
+    @pytest.mark.unit
+    def test_downsample_profile(self):
+        values = np.arange(10, dtype=np.float64)
+        np.testing.assert_allclose(downsample_profile(values, 5), [0.5, 2.5, 4.5, 6.5, 8.5])
+        assert downsample_profile(values, 20).shape == (10,)
+        assert downsample_profile(values, 5).dtype == np.float32
+
+    @pytest.mark.unit
+    def test_record_from_analysis(self, sample_image_path):
+        analysis, timings = {}, {}
+        heights = split_heights(sample_image_path, analysis=analysis, timings=timings)
+        record = image_record("page", analysis, timings, profile_bins=16)
+        assert record.heights == heights
+        assert len(record.scores) == len(heights) and not np.isnan(record.scores).any()
+        assert len(record.labels) == len(heights) and not record.template
+        assert record.height > record.width > 0
+        assert set(record.seconds) == {"decode", "detect", "merge"}
+        assert set(record.profiles) == {"laplacian_variance", "mean", "variance"}
+        assert all(values.shape == (16,) for values in record.profiles.values())
+        assert image_record("page", analysis).profiles == {}
+
+
+class TestResultsWriter:
+    """Tests for writing and reading shards."""
+
+    @pytest.mark.unit
+    def test_npz_round_trip(self, tmp_path):
+        records = [_record(i, profile=i != 2) for i in range(4)]
+        with ResultsWriter(str(tmp_path), format="npz") as writer:
+            for record in records:
+                writer.append(record)
+        (shard,) = shard_paths(str(tmp_path))
+        assert writer.shards == [shard] and writer.records == 4
+
+        columns = read_shard(shard)
+        assert list(columns["height"]) == [4000, 4001, 4002, 4003]
+        assert list(columns["heights.offsets"]) == [0, 2, 4, 6, 8]
+        # Stages a record did not run are NaN
+        assert np.isnan(columns["seconds.decode"][0])
+        read = list(iter_records(shard))
+        for expected, actual in zip(records, read):
+            assert actual.profiles.keys() == expected.profiles.keys()
+            for name, values in expected.profiles.items():
+                np.testing.assert_array_equal(actual.profiles[name], values)
+            actual.profiles = expected.profiles = {}
+            assert actual == expected
+
+    @pytest.mark.unit
+    def test_shards_roll_over_by_size(self, tmp_path):
+        size = _record(0).nbytes
+        with ResultsWriter(str(tmp_path), format="npz", shard_bytes=3 * size) as writer:
+            for i in range(7):
+                writer.append(_record(i))
+            # Two full shards written, one record buffered
+            assert len(writer.shards) == 2
+        shards = shard_paths(str(tmp_path))
+        assert [len(read_shard(path)["file_id"]) for path in shards] == [3, 3, 1]
+        assert [r.file_id for path in shards for r in iter_records(path)] == [
+            f"page-{i}.png" for i in range(7)
+        ]
+        # A new writer continues the numbering instead of overwriting
+        with ResultsWriter(str(tmp_path), format="npz") as writer:
+            writer.append(_record(7))
+        assert writer.shards[0].endswith("results-00003.npz")
+        assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+    @pytest.mark.unit
+    def test_failed_write_keeps_the_records(self, tmp_path, monkeypatch):
+        write_npz = results._WRITERS["npz"]
+
+        def fail(f, columns, compress):
+            f.write(b"partial")
+            raise OSError("disk full")
+
+        size = _record(0).nbytes
+        writer = ResultsWriter(str(tmp_path), format="npz", shard_bytes=2 * size)
+        writer.append(_record(0))
+        monkeypatch.setitem(results._WRITERS, "npz", fail)
+        with pytest.raises(IOError, match="disk full"):
+            writer.append(_record(1))
+        assert list(tmp_path.iterdir()) == []
+
+        monkeypatch.setitem(results._WRITERS, "npz", write_npz)
+        writer.append(_record(2))
+        writer.close()
+        assert [r.file_id for path in writer.shards for r in iter_records(path)] == [
+            f"page-{i}.png" for i in range(3)
+        ]
+
+    @pytest.mark.unit
+    def test_invalid_arguments(self, tmp_path):
+        with pytest.raises(ValueError):
+            ResultsWriter(str(tmp_path), format="csv")
+        with pytest.raises(ValueError):
+            ResultsWriter(str(tmp_path), shard_bytes=0)
+        with ResultsWriter(str(tmp_path), format="npz") as writer:
+            assert writer.flush() is None
+        assert shard_paths(str(tmp_path)) == []
+
+    @pytest.mark.unit
+    def test_parquet_round_trip(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        records = [_record(i) for i in range(3)]
+        with ResultsWriter(str(tmp_path), format="parquet") as writer:
+            for record in records:
+                writer.append(record)
+        (shard,) = shard_paths(str(tmp_path))
+        assert shard.endswith(".parquet")
+        assert [r.heights for r in iter_records(shard)] == [r.heights for r in records]
+        assert list(read_shard(shard)["labels.offsets"]) == [0, 2, 4, 6]
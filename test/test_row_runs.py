@@ -0,0 +1,68 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.row_runs module."""
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.blank_spliter import row_laplacian_variance
+from Web_page_Screenshot_Segmentation.color_spliter import row_mean_variance
+from Web_page_Screenshot_Segmentation.detectors import RowProfile
+from Web_page_Screenshot_Segmentation.row_runs import identical_row_runs, per_unique_row
+
+
+@pytest.fixture
+def banded_gray():
+    """A page of white margins, a solid band and noisy text rows."""
+    rng = np.random.default_rng(0)
+    gray = np.full((3000, 200), 255, dtype=np.uint8)
+    gray[500:900] = 120
+    gray[1200:1500] = rng.integers(0, 256, (300, 200), dtype=np.uint8)
+    gray[2000:2004] = 40
+    return gray
+
+
+class TestRowRuns:
+    """Tests for collapsing runs of identical rows."""
+
+    @pytest.mark.unit
+    def test_identical_row_runs(self):
+        gray = np.array([[1, 2], [1, 2], [3, 4], [1, 2], [1, 2], [1, 2]], dtype=np.uint8)
+        starts, lengths = identical_row_runs(gray, band_rows=2)
+        assert starts.tolist() == [0, 2, 3]
+        assert lengths.tolist() == [2, 1, 3]
+
+    @pytest.mark.unit
+    def test_identical_row_runs_empty(self):
+        starts, lengths = identical_row_runs(np.zeros((0, 5), dtype=np.uint8))
+        assert len(starts) == 0 and len(lengths) == 0
+
+    @pytest.mark.unit
+    def test_per_unique_row_matches_direct(self, banded_gray):
+        np.testing.assert_array_equal(
+            per_unique_row(row_laplacian_variance, banded_gray),
+            row_laplacian_variance(banded_gray),
+        )
+        for collapsed, direct in zip(
+            per_unique_row(row_mean_variance, banded_gray), row_mean_variance(banded_gray)
+        ):
+            np.testing.assert_array_equal(collapsed, direct)
+
+    @pytest.mark.unit
+    def test_profile_collapse_matches(self, banded_gray):
+        collapsed = RowProfile(banded_gray)
+        direct = RowProfile(banded_gray, collapse=False)
+        assert len(collapsed.runs[0]) < 400
+        assert direct.runs is None
+        np.testing.assert_array_equal(
+            collapsed.laplacian_variance, direct.laplacian_variance
+        )
+        np.testing.assert_array_equal(collapsed.edge_density(32), direct.edge_density(32))
+
+    @pytest.mark.unit
+    def test_profile_collapse_on_real_image(self, sample_image_path):
+        img = cv2.imdecode(np.fromfile(sample_image_path, np.uint8), cv2.IMREAD_COLOR)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        collapsed = RowProfile(gray)
+        direct = RowProfile(gray, collapse=False)
+        for a, b in zip(collapsed.mean_variance, direct.mean_variance):
+            np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(collapsed.edge_density(32), direct.edge_density(32))
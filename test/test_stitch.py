@@ -0,0 +1,103 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.stitch module."""
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.master import _detect_heights
+from Web_page_Screenshot_Segmentation.stitch import (
+    find_overlap_exact,
+    split_stitched_heights,
+    stitch_frames,
+    stitched_rows,
+)
+
+
+@pytest.fixture
+def capture(sample_image_path):
+    """Viewport frames of the sample page with a sticky header and footer."""
+    page = cv2.imdecode(np.fromfile(sample_image_path, np.uint8), cv2.IMREAD_COLOR)
+    page = page[:4000]
+    width = page.shape[1]
+    header = np.full((80, width, 3), (200, 120, 40), dtype=np.uint8)
+    cv2.putText(header, "HEADER", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255,) * 3, 3)
+    footer = np.full((50, width, 3), 40, dtype=np.uint8)
+    cv2.putText(footer, "FOOTER", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,) * 3, 2)
+    frames = []
+    for top in range(0, len(page), 1000):
+        frames.append(np.vstack([header, page[top : top + 1300], footer]))
+        if top + 1300 >= len(page):
+            break
+    return frames, np.vstack([header, page, footer])
+
+
+class TestStitch:
+    """Tests for scrolling-capture stitching."""
+
+    @pytest.mark.unit
+    def test_stitch_frames_exact(self, capture):
+        frames, expected = capture
+        image, plan = stitch_frames(frames)
+        assert (plan.header, plan.footer) == (80, 50)
+        assert plan.overlaps == [300] * (len(frames) - 1)
+        assert plan.height == len(expected)
+        np.testing.assert_array_equal(image, expected)
+
+    @pytest.mark.unit
+    def test_stitch_lossy_frames(self, capture):
+        frames, expected = capture
+        frames = [
+            cv2.imdecode(cv2.imencode(".jpg", frame)[1], cv2.IMREAD_COLOR)
+            for frame in frames
+        ]
+        image, plan = stitch_frames(frames)
+        assert abs(len(image) - len(expected)) <= 2
+        assert None not in plan.overlaps
+
+    @pytest.mark.unit
+    def test_stitched_rows(self, capture):
+        frames, expected = capture
+        _, plan = stitch_frames(frames)
+        np.testing.assert_array_equal(
+            stitched_rows(frames, plan, 1200, 2500), expected[1200:2500]
+        )
+
+    @pytest.mark.unit
+    def test_split_stitched_heights_matches_full_image(self, capture):
+        frames, expected = capture
+        heights, plan = split_stitched_heights(frames)
+        assert plan.height == len(expected)
+        assert heights == _detect_heights(expected, 102, 0.5, 100, 15, 350)[0]
+
+    @pytest.mark.unit
+    def test_overlap_prefers_expected_in_blank_stretch(self):
+        hashes_a = np.array([1, 2, 3] + [0] * 50, dtype=np.int64)
+        hashes_b = np.array([0] * 50 + [4, 5], dtype=np.int64)
+        assert find_overlap_exact(hashes_a, hashes_b, expected=30) == 30
+        assert find_overlap_exact(hashes_a, hashes_b) == 50
+
+    @pytest.mark.unit
+    def test_overlap_of_blank_frames(self):
+        blank = np.zeros(5000, dtype=np.int64)
+        assert find_overlap_exact(blank, blank) == 5000
+        assert find_overlap_exact(blank, blank, expected=1000) == 1000
+
+    @pytest.mark.unit
+    def test_sticky_bars_are_shared_by_all_frames(self, capture):
+        # A repeated first frame makes the first two frames look all sticky
+        frames, expected = capture
+        image, plan = stitch_frames([frames[0]] + frames)
+        assert (plan.header, plan.footer) == (80, 50)
+        np.testing.assert_array_equal(image, expected)
+
+    @pytest.mark.unit
+    def test_single_frame(self, capture):
+        frames, _ = capture
+        image, plan = stitch_frames(frames[:1])
+        np.testing.assert_array_equal(image, frames[0])
+        assert plan.overlaps == []
+
+    @pytest.mark.unit
+    def test_width_mismatch(self, capture):
+        frames, _ = capture
+        with pytest.raises(ValueError, match="pixels wide"):
+            stitch_frames([frames[0], frames[1][:, :-1]])
@@ -0,0 +1,121 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.streams module."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+
+import pytest
+import cv2
+import numpy as np
+from Web_page_Screenshot_Segmentation.drawer import draw_line_from_file
+from Web_page_Screenshot_Segmentation.master import split_and_export_segments, split_heights
+from Web_page_Screenshot_Segmentation.spliter import split_and_save_image
+from Web_page_Screenshot_Segmentation.streams import TarWriter, read_source, source_name
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_cli(module, args, stdin_path):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    with open(stdin_path, "rb") as f:
+        return subprocess.run(
+            [sys.executable, "-m", f"Web_page_Screenshot_Segmentation.{module}", *args],
+            stdin=f,
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+
+
+def _tar_members(data):
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r|") as tar:
+        return {m.name: tar.extractfile(m).read() for m in tar}
+
+
+class TestStreams:
+    """Tests for stdin input and stdout output."""
+
+    @pytest.mark.unit
+    def test_read_source_passes_paths_through(self):
+        assert read_source("page.png") == "page.png"
+
+    @pytest.mark.unit
+    def test_source_name(self):
+        assert source_name("/tmp/页面.png") == "页面"
+        assert source_name(b"\x89PNG") == "stdin"
+
+    @pytest.mark.unit
+    def test_tar_writer_streams_members(self):
+        out = io.BytesIO()
+        with TarWriter(out) as tar:
+            tar("a.jpg", b"abc")
+            tar("manifest.json", b"{}")
+        assert _tar_members(out.getvalue()) == {"a.jpg": b"abc", "manifest.json": b"{}"}
+
+    @pytest.mark.unit
+    def test_bytes_input_matches_path_input(self, sample_image_path):
+        with open(sample_image_path, "rb") as f:
+            data = f.read()
+        assert split_heights(data) == split_heights(sample_image_path)
+
+    @pytest.mark.unit
+    def test_export_writer_skips_output_dir(self, sample_image_path, tmp_path):
+        files = {}
+        output_dir = tmp_path / "segments"
+        manifest = split_and_export_segments(
+            sample_image_path,
+            str(output_dir),
+            return_manifest=True,
+            writer=files.__setitem__,
+        )
+        assert not output_dir.exists()
+        assert json.loads(files.pop("manifest.json")) == manifest.to_dict()
+        assert sorted(files) == sorted(s.file for s in manifest.segments)
+
+    @pytest.mark.unit
+    def test_split_and_save_image_writer(self, tmp_path):
+        image = np.zeros((100, 20, 3), dtype=np.uint8)
+        files = {}
+        split_and_save_image(image, [40], str(tmp_path / "out"), writer=files.__setitem__)
+        assert sorted(files) == ["manifest.json", "slice_0.png", "slice_1.png"]
+        assert not (tmp_path / "out").exists()
+
+    @pytest.mark.unit
+    def test_cli_json_from_stdin(self, sample_image_path):
+        out = _run_cli("master", ["-f", "-", "-om", "json"], sample_image_path)
+        assert json.loads(out.stdout) == {"heights": split_heights(sample_image_path)}
+        assert b"Debug: file_path received: stdin" in out.stderr.splitlines()
+
+    @pytest.mark.unit
+    def test_cli_tar_from_stdin(self, sample_image_path):
+        out = _run_cli("master", ["-f", "-", "-om", "tar"], sample_image_path)
+        members = _tar_members(out.stdout)
+        manifest = json.loads(members.pop("manifest.json"))
+        assert manifest["source"] is None
+        assert sorted(members) == sorted(s["file"] for s in manifest["segments"])
+        assert all(name.startswith("stdin_segment_") for name in members)
+
+    @pytest.mark.unit
+    def test_cli_preview_from_stdin(self, sample_image_path):
+        out = _run_cli("master", ["-f", "-", "-om", "preview"], sample_image_path)
+        preview = cv2.imdecode(np.frombuffer(out.stdout, np.uint8), cv2.IMREAD_COLOR)
+        assert preview is not None
+
+    @pytest.mark.unit
+    def test_drawer_cli_image_to_stdout(self, sample_image_path):
+        out = _run_cli("drawer", ["-", "--heights", "100", "-om", "image"], sample_image_path)
+        image = cv2.imdecode(np.frombuffer(out.stdout, np.uint8), cv2.IMREAD_COLOR)
+        assert image is not None
+
+    @pytest.mark.unit
+    def test_drawer_names_bytes_input_with_an_extension(self, sample_image_path):
+        with open(sample_image_path, "rb") as f:
+            data = f.read()
+        files = {}
+        name = draw_line_from_file(data, [100], writer=files.__setitem__)
+        assert name == "stdin_result.png"
+        assert files[name].startswith(b"\x89PNG")
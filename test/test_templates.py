@@ -0,0 +1,132 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.templates module."""
+
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation.backend import cv2, to_gray
+from Web_page_Screenshot_Segmentation.detectors import DetectorParams
+from Web_page_Screenshot_Segmentation.image_io import load_image
+from Web_page_Screenshot_Segmentation.master import split_heights
+from Web_page_Screenshot_Segmentation.metrics import (
+    IMAGES_PROCESSED,
+    PIXELS_ANALYZED,
+    ROWS_ANALYZED,
+)
+from Web_page_Screenshot_Segmentation.templates import (
+    TemplateCache,
+    layout_signature,
+    signature_mismatch,
+    verify_cut,
+)
+
+
+def _encoded(image: np.ndarray) -> bytes:
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def _page() -> np.ndarray:
+    # White page with dark text blocks separated by blank gaps and a gray band
+    gray = np.full((1200, 300), 255, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    for top in (50, 450, 850):
+        gray[top : top + 250, 20:280] = rng.integers(0, 120, (250, 260))
+    gray[700:760] = 180
+    return gray
+
+
+class TestSignature:
+    """Tests for layout signatures and cut checks."""
+
+    @pytest.mark.unit
+    def test_signature_tolerates_small_changes(self):
+        page = _page()
+        changed = page.copy()
+        changed[60:80, 40:200] = 255
+        assert len(layout_signature(page)) == 256
+        assert signature_mismatch(layout_signature(page), layout_signature(changed)) < 0.05
+        moved = np.roll(page, 300, axis=0)
+        assert signature_mismatch(layout_signature(page), layout_signature(moved)) > 0.05
+        assert signature_mismatch(layout_signature(page), layout_signature(page[:200])) == 1
+
+    @pytest.mark.unit
+    def test_verify_cut(self):
+        page = _page()
+        params = DetectorParams()
+        assert verify_cut(page, 375, "blank", params)
+        assert not verify_cut(page, 150, "blank", params)
+        # The gray band starts at row 700
+        assert verify_cut(page, 700, "color", params)
+        assert not verify_cut(page, 720, "color", params)
+        assert not verify_cut(page, 500, "color", params)
+        assert verify_cut(page, 375, "rule+blank", params)
+        assert not verify_cut(page, 375, "rule", params)
+
+
+class TestTemplateCache:
+    """Tests for reusing split heights through the cache."""
+
+    @pytest.mark.unit
+    def test_hit_after_local_change_and_miss_after_broken_cut(self, sample_image_path):
+        image = load_image(sample_image_path)
+        cache = TemplateCache()
+        heights = split_heights(sample_image_path, template_cache=cache)
+        assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+
+        changed = image.copy()
+        y = (heights[2] + heights[3]) // 2
+        changed[y - 20 : y + 20, 100:400] = 0
+        assert split_heights(_encoded(changed), template_cache=cache) == heights
+        assert cache.hits == 1
+        assert cache.seconds_saved > 0
+
+        broken = image.copy()
+        broken[heights[1] - 4 : heights[1] + 4] = np.random.default_rng(0).integers(
+            0, 256, (8,) + image.shape[1:]
+        )
+        assert split_heights(_encoded(broken), template_cache=cache) != heights
+        assert (cache.misses, cache.rejected, len(cache)) == (2, 1, 2)
+        assert "hit rate 33%" in cache.report()
+
+    @pytest.mark.unit
+    def test_parameters_are_part_of_the_key(self, sample_image_path):
+        cache = TemplateCache()
+        split_heights(sample_image_path, template_cache=cache)
+        split_heights(sample_image_path, merge_threshold=500, template_cache=cache)
+        assert (cache.hits, cache.misses) == (0, 2)
+
+    @pytest.mark.unit
+    def test_hits_count_as_processed_images(self, sample_image_path):
+        cache = TemplateCache()
+        split_heights(sample_image_path, template_cache=cache)
+        before = (IMAGES_PROCESSED.value, ROWS_ANALYZED.value, PIXELS_ANALYZED.value)
+        split_heights(sample_image_path, template_cache=cache)
+        assert cache.hits == 1
+        images, rows, pixels = before
+        assert IMAGES_PROCESSED.value == images + 1
+        assert ROWS_ANALYZED.value == rows + load_image(sample_image_path).shape[0]
+        assert PIXELS_ANALYZED.value > pixels
+
+    @pytest.mark.unit
+    def test_capacity(self):
+        cache = TemplateCache(capacity=1)
+        gray = _page()
+        for _ in range(2):
+            split_heights(_encoded(gray), template_cache=cache)
+            gray = gray[::-1].copy()
+        assert len(cache) == 1
+
+    @pytest.mark.unit
+    def test_save_and_load(self, sample_image_path, tmp_path):
+        cache = TemplateCache()
+        thresholds = {}
+        heights = split_heights(sample_image_path, template_cache=cache, thresholds=thresholds)
+        path = cache.save(str(tmp_path / "templates.json"))
+
+        loaded = TemplateCache.load(path)
+        reused = {}
+        assert split_heights(sample_image_path, template_cache=loaded, thresholds=reused) == heights
+        assert loaded.hits == 1
+        assert reused == thresholds
+        assert len(TemplateCache.load(str(tmp_path / "missing.json"))) == 0
+        (tmp_path / "bad.json").write_text("{")
+        with pytest.raises(IOError):
+            TemplateCache.load(str(tmp_path / "bad.json"))
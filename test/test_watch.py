@@ -0,0 +1,189 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.watch module."""
+
+import json
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from Web_page_Screenshot_Segmentation import metrics, watch
+from Web_page_Screenshot_Segmentation.watch import (
+    FolderWatcher,
+    SettleTracker,
+    scan_directory,
+)
+
+_segment = watch._segment
+
+
+def _segment_or_die(path: str, output_root: str, params: dict):
+    # Kills the worker for "crash" inputs, and once for "flaky" inputs
+    name = os.path.basename(path)
+    survived = path + ".survived"
+    if name.startswith("crash") or (name.startswith("flaky") and not os.path.exists(survived)):
+        if name.startswith("flaky"):
+            open(survived, "w").close()
+        os._exit(1)
+    return _segment(path, output_root, params)
+
+
+class TestScan:
+    """Tests for scanning and settling."""
+
+    @pytest.mark.unit
+    def test_scan_filters_entries(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"a")
+        (tmp_path / "B.JPG").write_bytes(b"bb")
+        (tmp_path / ".upload.png").write_bytes(b"c")
+        (tmp_path / "notes.txt").write_bytes(b"d")
+        (tmp_path / "sub.png").mkdir()
+        (tmp_path / "marked.png").write_bytes(b"e")
+        (tmp_path / "marked.png.done").write_text("{}")
+
+        found = scan_directory(str(tmp_path), skip_marked=True)
+        assert sorted(found) == [str(tmp_path / "B.JPG"), str(tmp_path / "a.png")]
+        assert found[str(tmp_path / "B.JPG")][0] == 2
+        assert str(tmp_path / "marked.png") in scan_directory(str(tmp_path))
+
+    @pytest.mark.unit
+    def test_settle_tracker(self):
+        tracker = SettleTracker(2.0)
+        assert tracker.update({"a": (10, 1), "empty": (0, 1)}, now=0.0) == []
+        # Still growing: the settle interval starts over
+        assert tracker.update({"a": (20, 2), "empty": (0, 1)}, now=1.5) == []
+        assert tracker.update({"a": (20, 2), "empty": (0, 1)}, now=3.0) == []
+        assert tracker.update({"a": (20, 2), "empty": (0, 1)}, now=3.5) == ["a"]
+        assert tracker.unsettled == 1
+        # Files that disappear are forgotten
+        assert tracker.update({}, now=4.0) == []
+        assert tracker.unsettled == 0
+
+    @pytest.mark.unit
+    def test_unknown_finish_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            FolderWatcher(str(tmp_path), str(tmp_path / "out"), finish_mode="delete")
+
+
+class TestFolderWatcher:
+    """Tests for processing a watched directory."""
+
+    @pytest.mark.unit
+    def test_move_mode(self, sample_image_path, tmp_path):
+        inbox = tmp_path / "inbox"
+        inbox.mkdir()
+        shutil.copy(sample_image_path, inbox / "page.png")
+        (inbox / "broken.png").write_bytes(b"not an image")
+
+        watcher = FolderWatcher(
+            str(inbox), str(tmp_path / "out"), settle_seconds=0, poll_seconds=0.05, max_workers=2
+        )
+        assert watcher.run(until_idle=True) == {"done": 1, "failed": 1}
+
+        assert sorted(p.name for p in inbox.iterdir()) == ["failed", "processed"]
+        assert (inbox / "processed" / "page.png").exists()
+        assert (inbox / "failed" / "broken.png").exists()
+        assert "Error" in (inbox / "failed" / "broken.png.error").read_text()
+        (output_dir,) = (tmp_path / "out").iterdir()
+        assert output_dir.name.startswith("page-")
+        assert json.loads((output_dir / "manifest.json").read_text())["segments"]
+
+    @pytest.mark.unit
+    def test_mark_mode_skips_marked_inputs(self, sample_image_path, tmp_path):
+        inbox = tmp_path / "inbox"
+        inbox.mkdir()
+        shutil.copy(sample_image_path, inbox / "page.png")
+
+        def watch():
+            watcher = FolderWatcher(
+                str(inbox),
+                str(tmp_path / "out"),
+                finish_mode="mark",
+                settle_seconds=0,
+                poll_seconds=0.05,
+                max_workers=1,
+            )
+            return watcher.run(until_idle=True)
+
+        assert watch() == {"done": 1, "failed": 0}
+        record = json.loads((inbox / "page.png.done").read_text())
+        assert (tmp_path / "out" / Path(record["output_dir"]).name).is_dir()
+        assert record["segments"] > 0
+        # A restart leaves the marked input alone
+        assert watch() == {"done": 0, "failed": 0}
+
+    @pytest.mark.unit
+    def test_memory_budget_is_shared_by_workers(self, sample_image_path, tmp_path):
+        inbox = tmp_path / "inbox"
+        inbox.mkdir()
+        for name in ("a.png", "b.png"):
+            shutil.copy(sample_image_path, inbox / name)
+
+        watcher = FolderWatcher(
+            str(inbox),
+            str(tmp_path / "out"),
+            settle_seconds=0,
+            poll_seconds=0.05,
+            max_workers=2,
+            memory_budget=2,
+        )
+        assert watcher.run(until_idle=True) == {"done": 2, "failed": 0}
+        for output_dir in (tmp_path / "out").iterdir():
+            assert json.loads((output_dir / "manifest.json").read_text())["segments"]
+        with pytest.raises(ValueError):
+            FolderWatcher(str(inbox), str(tmp_path / "out"), memory_budget=0)
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(
+        multiprocessing.get_start_method() != "fork", reason="workers must see the patch"
+    )
+    def test_dead_workers_are_replaced(self, sample_image_path, tmp_path, monkeypatch):
+        monkeypatch.setattr(watch, "_segment", _segment_or_die)
+        inbox = tmp_path / "inbox"
+        inbox.mkdir()
+        shutil.copy(sample_image_path, inbox / "flaky.png")
+        shutil.copy(sample_image_path, inbox / "page.png")
+
+        def run():
+            watcher = FolderWatcher(
+                str(inbox),
+                str(tmp_path / "out"),
+                settle_seconds=0,
+                poll_seconds=0.05,
+                max_workers=1,
+            )
+            return watcher.run(until_idle=True)
+
+        # Inputs in flight when the worker died are queued again
+        assert run() == {"done": 2, "failed": 0}
+        # An input that kills every worker is failed in the end
+        shutil.copy(sample_image_path, inbox / "crash.png")
+        assert run() == {"done": 0, "failed": 1}
+        assert "BrokenProcessPool" in (inbox / "failed" / "crash.png.error").read_text()
+
+    @pytest.mark.unit
+    def test_worker_metrics_reach_the_watcher(self, sample_image_path, tmp_path):
+        inbox = tmp_path / "inbox"
+        inbox.mkdir()
+        shutil.copy(sample_image_path, inbox / "page.png")
+        (inbox / "broken.png").write_bytes(b"not an image")
+
+        metrics.REGISTRY.reset()
+        try:
+            watcher = FolderWatcher(
+                str(inbox),
+                str(tmp_path / "out"),
+                settle_seconds=0,
+                poll_seconds=0.05,
+                max_workers=2,
+                metrics_file=str(tmp_path / "seg.prom"),
+            )
+            assert watcher.run(until_idle=True) == {"done": 1, "failed": 1}
+            assert metrics.IMAGES_PROCESSED.value == 1
+            assert metrics.DECODE_FAILURES.value == 1
+            assert metrics.SEGMENTS_EMITTED.value > 0
+            assert metrics.STAGE_SECONDS.count("detect") == 1
+            exposition = (tmp_path / "seg.prom").read_text().splitlines()
+            assert "screenshot_images_processed_total 1" in exposition
+        finally:
+            metrics.REGISTRY.reset()
@@ -0,0 +1,94 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.workspace module."""
+
+import threading
+
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation.columns import column_variance, content_columns
+from Web_page_Screenshot_Segmentation.image_io import load_image
+from Web_page_Screenshot_Segmentation.master import (
+    _detect_heights,
+    auto_crop_bounds,
+    split_and_export_segments,
+)
+from Web_page_Screenshot_Segmentation.workspace import Workspace, scratch, thread_workspace
+
+
+class TestWorkspace:
+    """Tests for the reused buffers."""
+
+    @pytest.mark.unit
+    def test_buffers_grow_and_are_reused(self):
+        ws = Workspace()
+        a = ws.array("a", (10, 20), np.int32)
+        assert a.shape == (10, 20) and a.dtype == np.int32
+        # A smaller request reuses the buffer
+        b = ws.array("a", (5, 7), np.int32)
+        assert np.shares_memory(a, b)
+        assert ws.allocations == 1
+        # A larger one, or another dtype, allocates
+        ws.array("a", (11, 20), np.int32)
+        ws.array("a", (2, 2), np.uint8)
+        assert ws.allocations == 3
+        assert ws.nbytes == 11 * 20 * 4 + 2 * 2
+        ws.clear()
+        assert ws.nbytes == 0
+
+    @pytest.mark.unit
+    def test_scratch_without_workspace(self):
+        assert scratch(None, "x", (3, 4), np.uint8).shape == (3, 4)
+
+    @pytest.mark.unit
+    def test_thread_workspace_is_per_thread(self):
+        found = []
+        thread = threading.Thread(target=lambda: found.append(thread_workspace()))
+        thread.start()
+        thread.join()
+        assert thread_workspace() is thread_workspace()
+        assert found[0] is not thread_workspace()
+
+
+class TestWorkspaceResults:
+    """Tests that reused buffers do not change results."""
+
+    @pytest.mark.unit
+    def test_column_variance_matches_numpy(self):
+        gray = np.random.default_rng(1).integers(0, 256, (2500, 40), dtype=np.uint8)
+        np.testing.assert_allclose(
+            column_variance(gray, band_rows=600), np.var(gray, axis=0), rtol=1e-9
+        )
+        np.testing.assert_array_equal(
+            content_columns(gray, workspace=Workspace()), content_columns(gray)
+        )
+
+    @pytest.mark.unit
+    def test_detection_and_crop_are_unchanged(self, sample_image_path):
+        img = load_image(sample_image_path)
+        args = (img, 102, 0.5, 100, 15, 350)
+        expected = _detect_heights(*args, detectors=["blank", "color", "rule", "band"])
+        crop = auto_crop_bounds(img[:800])
+
+        ws = Workspace()
+        for _ in range(2):
+            found = _detect_heights(
+                *args, detectors=["blank", "color", "rule", "band"], workspace=ws
+            )
+            assert found == expected
+            assert auto_crop_bounds(img[:800], workspace=ws) == crop
+        allocations = ws.allocations
+        # A smaller image fits into the buffers of the first one
+        _detect_heights(img[: img.shape[0] // 2], *args[1:], workspace=ws)
+        assert ws.allocations == allocations
+
+    @pytest.mark.unit
+    def test_export_with_workspace(self, sample_image_path, tmp_path):
+        ws = Workspace()
+        manifest = split_and_export_segments(
+            sample_image_path,
+            str(tmp_path),
+            auto_crop=True,
+            return_manifest=True,
+            workspace=ws,
+        )
+        assert manifest.segments
+        assert ws.allocations > 0
@@ -0,0 +1,112 @@
+"""Unit tests for Web_page_Screenshot_Segmentation.xycut module."""
+
+import numpy as np
+import pytest
+from Web_page_Screenshot_Segmentation.master import split_heights
+from Web_page_Screenshot_Segmentation.xycut import SummedAreaTable, xy_cut, xy_cut_segments
+
+
+def _two_column_page() -> np.ndarray:
+    """A header band over a sidebar and a main column, on white."""
+    rng = np.random.default_rng(0)
+    gray = np.full((600, 500), 255, dtype=np.uint8)
+    gray[20:80, 20:480] = rng.integers(0, 256, (60, 460))
+    gray[120:580, 20:140] = rng.integers(0, 256, (460, 120))
+    gray[120:300, 180:480] = rng.integers(0, 256, (180, 300))
+    gray[340:580, 180:480] = rng.integers(0, 256, (240, 300))
+    return gray
+
+
+def _rects(nodes) -> list[tuple[int, int, int, int]]:
+    return [(n.x0, n.y0, n.x1, n.y1) for n in nodes]
+
+
+class TestSummedAreaTable:
+    """Tests for SummedAreaTable."""
+
+    @pytest.mark.unit
+    def test_line_variance_matches_numpy(self):
+        gray = np.random.default_rng(1).integers(0, 256, (70, 90), dtype=np.uint8)
+        sat = SummedAreaTable(gray)
+        block = gray[10:60, 5:80].astype(np.float64)
+        np.testing.assert_allclose(sat.line_variance("rows", 10, 60, 5, 80), block.var(axis=1))
+        np.testing.assert_allclose(
+            sat.line_variance("columns", 10, 60, 5, 80), block.var(axis=0)
+        )
+
+    @pytest.mark.unit
+    def test_wrapped_tables_stay_exact(self):
+        # The sum of squares of the whole image overflows 32 bits
+        gray = np.full((300, 300), 255, dtype=np.uint8)
+        gray[:, 150] = 0
+        sat = SummedAreaTable(gray)
+        assert sat.squares.dtype == np.uint32
+        variance = sat.line_variance("rows", 250, 300, 100, 300)
+        np.testing.assert_allclose(variance, gray[250:, 100:].astype(np.float64).var(axis=1))
+
+
+class TestXYCut:
+    """Tests for xy_cut."""
+
+    @pytest.mark.unit
+    def test_cuts_rows_then_columns(self):
+        root = xy_cut(_two_column_page())
+        assert root.axis == "rows"
+        assert _rects(root.children) == [(20, 20, 480, 80), (20, 120, 480, 580)]
+        body = root.children[1]
+        assert body.axis == "columns"
+        assert _rects(body.children) == [(20, 120, 140, 580), (180, 120, 480, 580)]
+        assert body.children[1].axis == "rows"
+        assert _rects(root.leaves()) == [
+            (20, 20, 480, 80),
+            (20, 120, 140, 580),
+            (180, 120, 480, 300),
+            (180, 340, 480, 580),
+        ]
+
+    @pytest.mark.unit
+    def test_narrow_gaps_are_not_cut(self):
+        # All gutters of the page are 40 pixels wide
+        assert len(xy_cut(_two_column_page(), min_gap=40).leaves()) == 4
+        assert _rects(xy_cut(_two_column_page(), min_gap=41).leaves()) == [(0, 0, 500, 600)]
+
+    @pytest.mark.unit
+    def test_max_depth(self):
+        root = xy_cut(_two_column_page(), max_depth=1)
+        assert all(not child.children for child in root.children)
+
+    @pytest.mark.unit
+    def test_heights_seed_the_first_level(self):
+        root = xy_cut(_two_column_page(), heights=[100])
+        assert _rects(root.children) == [(20, 20, 480, 80), (20, 120, 480, 580)]
+        assert root.children[1].axis == "columns"
+
+    @pytest.mark.unit
+    def test_segments_without_gutters_are_trimmed(self):
+        gray = _two_column_page()
+        root = xy_cut(gray, heights=[90, 110])
+        # The header has no gutter and the band between 90 and 110 is blank
+        assert root.children[0].children == []
+        assert _rects(root.children) == [(20, 20, 480, 80), (20, 120, 480, 580)]
+
+    @pytest.mark.unit
+    def test_blank_image_is_a_leaf(self):
+        root = xy_cut(np.full((100, 100), 255, dtype=np.uint8))
+        assert root.children == []
+        assert root.to_dict()["axis"] is None
+
+
+class TestXYCutSegments:
+    """Tests for xy_cut_segments."""
+
+    @pytest.mark.unit
+    def test_segments_are_split_heights(self, sample_image_path):
+        heights = split_heights(sample_image_path)
+        root = xy_cut_segments(sample_image_path)
+        bounds = [0] + heights + [root.y1]
+        for child in root.children:
+            # Each child is a trimmed segment between two split heights
+            assert any(y0 <= child.y0 < child.y1 <= y1 for y0, y1 in zip(bounds, bounds[1:]))
+        for leaf in root.leaves():
+            assert 0 <= leaf.x0 < leaf.x1 <= root.x1
+            assert 0 <= leaf.y0 < leaf.y1 <= root.y1